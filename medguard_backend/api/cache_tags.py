@@ -0,0 +1,217 @@
+"""
+Tag-based cache invalidation for the MedGuard SA API caching layer.
+
+Every cached API entry records the tags it depends on (model, object and
+user tags) together with the generation of each tag at the time it was
+stored. Invalidating a tag is a single atomic increment of its generation
+counter; entries stored under an older generation are treated as misses
+on the next read and are overwritten or expire with their TTL.
+
+Tag formats:
+- ``model:<app_label>.<model_name>`` - any instance of the model changed
+- ``object:<app_label>.<model_name>:<pk>`` - a specific instance changed
+- ``user:<user_id>`` - data personalised for a user changed
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+TAG_VERSION_PREFIX = 'medguard_api_tag'
+TAG_VERSION_TIMEOUT = None  # Generation counters must outlive every entry
+
+# Sentinel distinguishing "not cached" from a cached falsy value
+MISS = object()
+
+
+def model_tag(model_or_instance) -> str:
+    """Return the model-level tag for a model class or instance."""
+    return f"model:{model_or_instance._meta.label_lower}"
+
+
+def object_tag(instance=None, model=None, pk=None) -> str:
+    """Return the object-level tag for a model instance (or model and pk)."""
+    model = model or instance
+    pk = pk if pk is not None else instance.pk
+    return f"object:{model._meta.label_lower}:{pk}"
+
+
+def user_tag(user_id) -> str:
+    """Return the user-level tag for a user ID."""
+    return f"user:{user_id}"
+
+
+def _version_key(tag: str) -> str:
+    return f"{TAG_VERSION_PREFIX}:{tag}"
+
+
+def get_tag_versions(tags: Iterable[str]) -> Dict[str, int]:
+    """
+    Get the current generation of each tag in a single cache round trip.
+
+    Tags that have never been bumped are initialised to generation 1.
+    """
+    tags = list(dict.fromkeys(tags))
+    if not tags:
+        return {}
+
+    keys = {_version_key(tag): tag for tag in tags}
+    stored = cache.get_many(list(keys))
+
+    versions = {}
+    for key, tag in keys.items():
+        if key in stored:
+            versions[tag] = stored[key]
+        elif cache.add(key, 1, TAG_VERSION_TIMEOUT):
+            versions[tag] = 1
+        else:
+            # Initialised or bumped concurrently
+            versions[tag] = cache.get(key, 1)
+
+    return versions
+
+
+def invalidate_tags(tags: Iterable[str]) -> None:
+    """Invalidate every cache entry depending on any of the given tags."""
+    for tag in dict.fromkeys(tags):
+        key = _version_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Unknown tag: nothing can be cached against generation 2 yet
+            if not cache.add(key, 2, TAG_VERSION_TIMEOUT):
+                cache.incr(key)
+        logger.debug(f"Cache tag invalidated: {tag}")
+
+
+def invalidate_tags_on_commit(tags: Iterable[str]) -> None:
+    """
+    Invalidate tags once the current transaction commits.
+
+    For writes that bypass model signals, such as ``bulk_create``. Cache
+    errors are logged and never fail the write.
+    """
+    tags = list(tags)
+
+    def invalidate():
+        try:
+            invalidate_tags(tags)
+        except Exception as e:
+            logger.warning(f"Error invalidating API cache tags {tags}: {e}")
+
+    transaction.on_commit(invalidate)
+
+
+def get_tagged(cache_key: str, default=MISS) -> Any:
+    """
+    Read a tagged cache entry, returning ``default`` if missing or stale.
+    """
+    entry = cache.get(cache_key)
+    if not isinstance(entry, dict) or 'tags' not in entry:
+        return default
+
+    if not tags_current(entry['tags']):
+        return default
+
+    return entry['value']
+
+
+def tags_current(versions: Dict[str, int]) -> bool:
+    """Check whether none of the tags has been bumped since versions were captured."""
+    return get_tag_versions(versions) == versions
+
+
+def set_tagged(cache_key: str, value: Any, tags: Iterable[str],
+               timeout: Optional[int] = None,
+               versions: Optional[Dict[str, int]] = None) -> None:
+    """
+    Store a cache entry together with the generations of the tags it depends on.
+
+    Args:
+        cache_key: Cache key
+        value: Value to cache
+        tags: Tags the value depends on
+        timeout: Cache timeout in seconds
+        versions: Tag generations captured before the value was computed.
+            Passing these guards against caching data computed before a
+            concurrent invalidation.
+    """
+    tags = list(dict.fromkeys(tags))
+    if versions is None:
+        versions = get_tag_versions(tags)
+    else:
+        versions = {tag: versions[tag] for tag in tags if tag in versions}
+        missing = [tag for tag in tags if tag not in versions]
+        versions.update(get_tag_versions(missing))
+
+    cache.set(cache_key, {'value': value, 'tags': versions}, timeout)
+
+
+def tags_for_instance(instance) -> List[str]:
+    """Return the tags invalidated when an instance changes."""
+    tags = [model_tag(instance)]
+    if instance.pk is not None:
+        tags.append(object_tag(instance))
+
+    # Wagtail pages: invalidate the generic page model and the specific type
+    concrete = getattr(instance, 'specific_class', None)
+    if concrete is not None and concrete is not instance.__class__:
+        tags.append(model_tag(concrete))
+    if hasattr(instance, 'depth') and hasattr(instance, 'url_path'):
+        tags.append('model:wagtailcore.page')
+        if instance.pk is not None:
+            tags.append(f"object:wagtailcore.page:{instance.pk}")
+
+    # Patient-scoped records also invalidate the patient's personalised entries
+    for attr in ('patient_id', 'user_id'):
+        user_id = getattr(instance, attr, None)
+        if user_id:
+            tags.append(user_tag(user_id))
+
+    return list(dict.fromkeys(tags))
+
+
+def invalidate_instance(instance) -> List[str]:
+    """Invalidate all cache entries depending on an instance. Returns the tags."""
+    tags = tags_for_instance(instance)
+    invalidate_tags(tags)
+    return tags
+
+
+# API path prefixes whose responses are built from models that are not
+# invalidated on change (e.g. written with bulk_update); they get no model
+# tags, so their entries fall back to short TTLs
+UNTAGGED_PATH_PREFIXES: Tuple[str, ...] = (
+    '/api/medications/stock-analytics/',
+    '/api/medications/pharmacy-integrations/',
+)
+
+# API path prefixes and the models their responses are built from
+PATH_MODEL_TAGS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('/api/medications/', ('model:medications.medication', 'model:medications.medicationschedule')),
+    ('/api/medications/logs/', ('model:medications.medicationlog',)),
+    ('/api/medications/alerts/', ('model:medications.stockalert',)),
+    ('/api/v2/medications/', ('model:medications.medication',)),
+    ('/api/prescriptions/', ('model:medications.enhancedprescription',)),
+    ('/api/v2/prescriptions/', ('model:medications.enhancedprescription',)),
+    ('/api/v2/pages/', ('model:wagtailcore.page',)),
+    ('/api/pages/', ('model:wagtailcore.page',)),
+    ('/api/v2/images/', ('model:wagtailimages.image',)),
+    ('/api/v2/documents/', ('model:wagtaildocs.document',)),
+    ('/api/search/', ('model:medications.medication', 'model:wagtailcore.page')),
+)
+
+
+def tags_for_path(path: str) -> List[str]:
+    """Return the model tags a response for an API path depends on."""
+    if path.startswith(UNTAGGED_PATH_PREFIXES):
+        return []
+    tags = []
+    for prefix, path_tags in PATH_MODEL_TAGS:
+        if path.startswith(prefix):
+            tags.extend(path_tags)
+    return list(dict.fromkeys(tags))
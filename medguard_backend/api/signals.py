@@ -0,0 +1,72 @@
+"""
+Signal handlers that invalidate tagged API cache entries when content changes.
+"""
+import logging
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.documents import get_document_model
+from wagtail.images import get_image_model
+from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished
+
+from medications.models import (
+    EnhancedPrescription, Medication, MedicationLog, MedicationSchedule, StockAlert, StockTransaction
+)
+
+from .cache_tags import invalidate_instance, invalidate_tags, model_tag, object_tag
+
+logger = logging.getLogger(__name__)
+
+INVALIDATING_MODELS = (
+    Medication,
+    MedicationSchedule,
+    MedicationLog,
+    StockAlert,
+    StockTransaction,
+    EnhancedPrescription,
+    get_image_model(),
+    get_document_model(),
+)
+
+
+def _invalidate(instance):
+    try:
+        invalidate_instance(instance)
+    except Exception as e:
+        # Never fail a write because the cache is unavailable
+        logger.warning(f"Error invalidating API cache for {instance!r}: {e}")
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_model_cache(sender, instance, **kwargs):
+    """Invalidate cache tags for saved or deleted API-backed models."""
+    if kwargs.get('raw') or not isinstance(instance, INVALIDATING_MODELS):
+        return
+    _invalidate(instance)
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def invalidate_page_cache(sender, instance, **kwargs):
+    """Invalidate cache tags when a page goes live or is taken down."""
+    _invalidate(instance)
+
+
+@receiver(post_delete)
+def invalidate_deleted_page_cache(sender, instance, **kwargs):
+    """Invalidate cache tags when a page is deleted."""
+    if isinstance(instance, Page):
+        _invalidate(instance)
+
+
+@receiver(post_save, sender=StockTransaction)
+def invalidate_stock_cache(sender, instance, created, **kwargs):
+    """Invalidate medication entries when a transaction changes its stock."""
+    if kwargs.get('raw') or not created:
+        return
+    try:
+        # Stock is updated in the database, not through Medication.save()
+        invalidate_tags([model_tag(Medication), object_tag(model=Medication, pk=instance.medication_id)])
+    except Exception as e:
+        logger.warning(f"Error invalidating API cache for {instance!r}: {e}")
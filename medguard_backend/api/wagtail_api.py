@@ -2011,6 +2011,13 @@ import hashlib
 import time
 from functools import wraps
 
+from medguard_backend.cache import read_through
+
+from .cache_tags import (
+    get_tag_versions, get_tagged, invalidate_instance, model_tag,
+    object_tag, set_tagged, tags_current, tags_for_path, user_tag
+)
+
 
 class PerformanceMetrics:
     """Track API performance metrics for monitoring and optimization."""
@@ -2063,15 +2070,19 @@ def enhanced_cache_key(prefix: str, *args, **kwargs) -> str:
         return f"medguard_api_{prefix}_default"
 
 
-def smart_cache(timeout=300, key_prefix="api", vary_on=None):
+def smart_cache(timeout=300, key_prefix="api", vary_on=None, tags=None):
     """
     Smart caching decorator with enhanced features for Wagtail 7.0.2.
     
     Features:
     - Dynamic timeout based on content type
     - User-specific caching
-    - Cache invalidation triggers
+    - Tag-based cache invalidation
     - Performance monitoring
+    
+    Entries are tagged with the view's model, the requested object and the
+    requesting user, so they are invalidated as soon as the underlying data
+    changes (see ``api.cache_tags``) rather than relying on short TTLs.
     """
     def decorator(view_func):
         @wraps(view_func)
@@ -2085,6 +2096,10 @@ def smart_cache(timeout=300, key_prefix="api", vary_on=None):
             if hasattr(request, 'user') and request.user.is_authenticated:
                 cache_key_parts.append(f"user_{request.user.id}")
             
+            # Add object lookup to cache key
+            if kwargs.get('pk') is not None:
+                cache_key_parts.append(f"pk_{kwargs['pk']}")
+            
             # Add query parameters to cache key
             if request.GET:
                 query_hash = hashlib.md5(
@@ -2100,84 +2115,77 @@ def smart_cache(timeout=300, key_prefix="api", vary_on=None):
                         cache_key_parts.append(f"{header}_{hashlib.md5(value.encode()).hexdigest()[:8]}")
             
             cache_key = enhanced_cache_key(*cache_key_parts)
+            entry_tags = _get_view_cache_tags(self, request, kwargs, tags)
             
-            # Try to get from cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                duration = PerformanceMetrics.end_timer(start_time)
-                PerformanceMetrics.log_performance(
-                    view_func.__name__, request.method, duration, 
-                    cache_hit=True, user_id=getattr(request.user, 'id', None)
-                )
-                return cached_result
-            
-            # Execute view function
-            result = view_func(self, request, *args, **kwargs)
-            
-            # Cache the result with dynamic timeout
+            # Choose the cache timeout
             dynamic_timeout = timeout
             
-            # Adjust timeout based on content type and user
-            if hasattr(request, 'user') and request.user.is_authenticated:
-                # Shorter cache for authenticated users (more personalized content)
-                dynamic_timeout = min(timeout, 180)
-            
-            # Medical content gets shorter cache time for accuracy
-            if 'medication' in key_prefix or 'prescription' in key_prefix:
-                dynamic_timeout = min(dynamic_timeout, 120)
-            
-            # Cache the result
-            cache.set(cache_key, result, dynamic_timeout)
+            # Without model tags, fall back to short TTLs to bound staleness
+            if not any(tag.startswith('model:') for tag in entry_tags):
+                if hasattr(request, 'user') and request.user.is_authenticated:
+                    # Shorter cache for authenticated users (more personalized content)
+                    dynamic_timeout = min(timeout, 180)
+                
+                # Medical content gets shorter cache time for accuracy
+                if 'medication' in key_prefix or 'prescription' in key_prefix:
+                    dynamic_timeout = min(dynamic_timeout, 120)
+            
+            computed = []
+            
+            def compute():
+                # Capture tag generations before computing so a concurrent
+                # invalidation is never masked by this (older) result
+                tag_versions = get_tag_versions(entry_tags)
+                computed.append(True)
+                return {'value': view_func(self, request, *args, **kwargs), 'tags': tag_versions}
+            
+            # Only one worker recomputes an expired or invalidated entry
+            entry = read_through(
+                cache_key, compute, dynamic_timeout,
+                is_current=lambda entry: tags_current(entry['tags'])
+            )
             
             # Log performance
             duration = PerformanceMetrics.end_timer(start_time)
             PerformanceMetrics.log_performance(
                 view_func.__name__, request.method, duration, 
-                cache_hit=False, user_id=getattr(request.user, 'id', None)
+                cache_hit=not computed, user_id=getattr(request.user, 'id', None)
             )
             
-            return result
+            return entry['value']
         
         return wrapper
     return decorator
 
 
+def _get_view_cache_tags(view, request, view_kwargs, extra_tags=None) -> List[str]:
+    """Determine the cache tags a view response depends on."""
+    entry_tags = list(extra_tags or [])
+    
+    model = getattr(view, 'model', None)
+    if model is None:
+        queryset = getattr(view, 'queryset', None)
+        model = getattr(queryset, 'model', None)
+    
+    if model is not None:
+        entry_tags.append(model_tag(model))
+        if view_kwargs.get('pk') is not None:
+            entry_tags.append(object_tag(model=model, pk=view_kwargs['pk']))
+    
+    if hasattr(request, 'user') and request.user.is_authenticated:
+        entry_tags.append(user_tag(request.user.id))
+    
+    return list(dict.fromkeys(entry_tags))
+
+
 class CacheInvalidationMixin:
     """Mixin to handle intelligent cache invalidation."""
     
     def invalidate_related_cache(self, obj, action='update'):
-        """Invalidate cache keys related to the object."""
+        """Invalidate cache entries tagged with the object, its model or its owner."""
         try:
-            cache_patterns = []
-            
-            # Object-specific cache keys
-            if hasattr(obj, 'id'):
-                cache_patterns.extend([
-                    f"medguard_api_*_{obj.__class__.__name__}_{obj.id}_*",
-                    f"medguard_api_{obj.__class__.__name__.lower()}_*",
-                ])
-            
-            # Model-specific cache keys
-            cache_patterns.append(f"medguard_api_{obj._meta.label_lower}_*")
-            
-            # For medications, also invalidate search caches
-            if obj.__class__.__name__ == 'Medication':
-                cache_patterns.extend([
-                    "medguard_api_search_*",
-                    "medguard_api_medication_*",
-                ])
-            
-            # For prescriptions, invalidate user-specific caches
-            elif obj.__class__.__name__ == 'Prescription':
-                if hasattr(obj, 'patient_id'):
-                    cache_patterns.append(f"medguard_api_*_user_{obj.patient_id}_*")
-            
-            # Clear matching cache keys
-            # Note: This is a simplified version - in production, you'd use 
-            # cache versioning or more sophisticated invalidation
-            for pattern in cache_patterns:
-                logger.info(f"Cache invalidation pattern: {pattern}")
-            
+            tags = invalidate_instance(obj)
+            logger.info(f"Cache invalidated on {action} of {obj._meta.label_lower}: {', '.join(tags)}")
         except Exception as e:
             logger.warning(f"Error invalidating cache for {obj}: {e}")
 
@@ -2185,9 +2193,11 @@ class CacheInvalidationMixin:
 class EnhancedCacheMiddleware:
     """Enhanced caching middleware for Wagtail 7.0.2 API performance."""
     
+    UNTAGGED_CACHE_TIMEOUT = 300  # 5 minutes for responses no model change invalidates
+    
     def __init__(self, get_response):
         self.get_response = get_response
-        self.cache_timeout = 300  # 5 minutes default
+        self.cache_timeout = 900  # 15 minutes; tagged entries are invalidated on change
     
     def __call__(self, request):
         # Skip caching for non-API requests
@@ -2202,12 +2212,15 @@ class EnhancedCacheMiddleware:
         cache_key = self._generate_request_cache_key(request)
         
         # Try to get cached response
-        cached_response = cache.get(cache_key)
+        cached_response = get_tagged(cache_key, default=None)
         if cached_response:
             # Add cache hit header
             cached_response['X-Cache'] = 'HIT'
             return cached_response
         
+        entry_tags = self._get_request_cache_tags(request)
+        tag_versions = get_tag_versions(entry_tags)
+        
         # Process request
         response = self.get_response(request)
         
@@ -2217,10 +2230,10 @@ class EnhancedCacheMiddleware:
             response['X-Cache'] = 'MISS'
             
             # Determine cache timeout based on content
-            timeout = self._get_dynamic_timeout(request, response)
+            timeout = self._get_dynamic_timeout(request, response, entry_tags)
             
             # Cache the response
-            cache.set(cache_key, response, timeout)
+            set_tagged(cache_key, response, entry_tags, timeout, versions=tag_versions)
         
         return response
     
@@ -2238,17 +2251,30 @@ class EnhancedCacheMiddleware:
         
         return enhanced_cache_key(*key_parts)
     
-    def _get_dynamic_timeout(self, request, response):
+    def _get_request_cache_tags(self, request):
+        """Determine the cache tags a response for this request depends on."""
+        entry_tags = tags_for_path(request.path)
+        
+        if request.user.is_authenticated:
+            entry_tags.append(user_tag(request.user.id))
+        
+        return entry_tags
+    
+    def _get_dynamic_timeout(self, request, response, entry_tags=None):
         """Determine cache timeout based on request and response characteristics."""
         base_timeout = self.cache_timeout
         
-        # Medical content gets shorter timeout
-        if any(term in request.path for term in ['medication', 'prescription', 'medical']):
-            base_timeout = min(base_timeout, 120)
-        
-        # User-specific content gets shorter timeout
-        if request.user.is_authenticated:
-            base_timeout = min(base_timeout, 180)
+        # Tagged responses are invalidated on change; untagged ones rely on TTL
+        if not any(tag.startswith('model:') for tag in entry_tags or []):
+            base_timeout = min(base_timeout, self.UNTAGGED_CACHE_TIMEOUT)
+            
+            # Medical content gets shorter timeout
+            if any(term in request.path for term in ['medication', 'prescription', 'medical']):
+                base_timeout = min(base_timeout, 120)
+            
+            # User-specific content gets shorter timeout
+            if request.user.is_authenticated:
+                base_timeout = min(base_timeout, 180)
         
         # Large responses get shorter timeout to save memory
         if hasattr(response, 'content') and len(response.content) > 100000:  # 100KB
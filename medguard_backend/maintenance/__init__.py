@@ -17,6 +17,7 @@ def get_maintenance_classes():
     from .wagtail_maintenance import (
         HealthcareContentAuditor,
         MedicalLinkChecker,
+        MediaReferenceIndex,
         MedicationImageCleaner,
         HealthcareSearchIndexManager,
         PageTreeOptimizer
@@ -34,6 +35,7 @@ def get_maintenance_classes():
     return {
         'HealthcareContentAuditor': HealthcareContentAuditor,
         'MedicalLinkChecker': MedicalLinkChecker,
+        'MediaReferenceIndex': MediaReferenceIndex,
         'MedicationImageCleaner': MedicationImageCleaner,
         'HealthcareSearchIndexManager': HealthcareSearchIndexManager,
         'PageTreeOptimizer': PageTreeOptimizer,
@@ -56,6 +58,7 @@ def __getattr__(name):
 __all__ = [
     'HealthcareContentAuditor',
     'MedicalLinkChecker',
+    'MediaReferenceIndex',
     'MedicationImageCleaner',
     'HealthcareSearchIndexManager',
     'PageTreeOptimizer',
@@ -9,9 +9,21 @@ Author: MedGuard SA Development Team
 License: Proprietary
 """
 
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from unittest.mock import patch, MagicMock
+from modelcluster.models import get_serializable_data_for_fields
+from wagtail.coreutils import get_supported_content_language_variant
+from wagtail.images import get_image_model
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Collection, Locale, Page
+
+from medications.models import Medication, MedicationDetailPage
 from maintenance import (
     HealthcareContentAuditor,
     MedicalLinkChecker,
@@ -23,9 +35,12 @@ from maintenance import (
     HealthcareCacheWarmer,
     SecurityUpdateChecker,
     HealthcareHealthChecker,
-    MaintenanceTaskRunner
+    MaintenanceTaskRunner,
+    MediaReferenceIndex
 )
 
+Image = get_image_model()
+
 
 class HealthcareContentAuditorTests(TestCase):
     """Test healthcare content auditing functionality."""
@@ -241,3 +256,91 @@ class IntegrationTests(TestCase):
         # Test that runner can be initialized
         self.assertIsNotNone(runner)
         self.assertIsInstance(runner.task_results, dict)
+
+
+class MediaReferenceIndexTests(TestCase):
+    """Test the media reference index behind image cleanup."""
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        if Collection.get_first_root_node() is None:
+            Collection.add_root(name='Root')
+        Locale.objects.get_or_create(language_code=get_supported_content_language_variant(settings.LANGUAGE_CODE))
+        self.root_page = Page.get_first_root_node() or Page.add_root(title='Root', slug='root')
+        self.collection = Collection.get_first_root_node().add_child(name='Medication Images')
+        self.images = {
+            name: Image.objects.create(title=name, file=get_test_image_file(), collection=self.collection)
+            for name in ['unused', 'foreign_key', 'stream', 'rich_text', 'draft']
+        }
+    
+    def create_page(self):
+        medication = Medication.objects.create(
+            name='Panado', strength='500mg', dosage_unit='mg', medication_type='tablet', pill_count=30,
+            medication_image=self.images['foreign_key']
+        )
+        page = MedicationDetailPage(
+            title='Panado', slug='panado', medication=medication,
+            content=[('images', [{'image': self.images['stream'], 'alt_text': 'Panado', 'caption': '',
+                                  'image_type': 'primary'}])],
+            additional_info=f'<p><embed embedtype="image" id="{self.images["rich_text"].id}" format="left"/></p>',
+        )
+        self.root_page.add_child(instance=page)
+        return page
+    
+    def test_references_are_collected_from_every_source(self):
+        """Test foreign keys, StreamField, rich text and draft revisions are indexed."""
+        page = self.create_page()
+        page.content = [('images', [{'image': self.images['draft'], 'alt_text': 'Draft', 'caption': '',
+                                     'image_type': 'other'}])]
+        page.save_revision()
+        
+        index = MediaReferenceIndex().build()
+        
+        used = {self.images[name].id for name in ['foreign_key', 'stream', 'rich_text', 'draft']}
+        self.assertEqual(index.images & {image.id for image in self.images.values()}, used)
+    
+    def test_draft_foreign_keys_are_indexed(self):
+        """Test a foreign key held only in serialised revision content is indexed."""
+        draft = Medication(
+            name='Panado', strength='500mg', dosage_unit='mg', medication_type='tablet', pill_count=30,
+            medication_image=self.images['draft']
+        )
+        index = MediaReferenceIndex()
+        index._index_serialized(Medication, get_serializable_data_for_fields(draft))
+        
+        self.assertEqual(index.images, {self.images['draft'].id})
+    
+    def test_malformed_content_is_skipped(self):
+        """Test content that is not block JSON does not abort the build."""
+        index = MediaReferenceIndex()
+        field = MedicationDetailPage._meta.get_field('content')
+        index._index_field_value(field, json.dumps('not block JSON'))
+        index._index_field_value(field, 'plain text')
+        
+        self.assertEqual(index.images, set())
+    
+    def test_ids_are_not_matched_as_substrings(self):
+        """Test an image is not kept because its ID appears inside another ID."""
+        index = MediaReferenceIndex()
+        index._index_rich_text('<p><embed embedtype="image" id="12"/><a linktype="document" id="7">Leaflet</a></p>')
+        
+        self.assertEqual(index.images, {12})
+        self.assertEqual(index.documents, {7})
+        self.assertNotIn(1, index.images)
+    
+    def test_unused_images_are_a_set_difference(self):
+        """Test the cleaner reports exactly the unreferenced images from one index build."""
+        self.create_page()
+        cleaner = MedicationImageCleaner()
+        
+        with patch.object(MediaReferenceIndex, 'build', autospec=True, side_effect=MediaReferenceIndex.build) as build:
+            unused = cleaner._find_unused_medication_images()
+            self.assertTrue(cleaner._is_image_used(self.images['stream']))
+            self.assertFalse(cleaner._is_image_used(self.images['unused']))
+        
+        build.assert_called_once()
+        self.assertEqual({image.id for image in unused}, {self.images['unused'].id, self.images['draft'].id})
@@ -10,7 +10,7 @@ and compliance with healthcare regulations.
 Features:
 - Healthcare content audit tools for medical accuracy
 - Medical resource link checking and validation
-- Medication image cleanup for unused resources
+- Medication image cleanup for unused resources, against a reference index
 - Enhanced search index maintenance
 - Page tree optimization tools
 - Automated backup verification for healthcare data
@@ -37,20 +37,29 @@ from urllib.parse import urlparse, urljoin
 from collections import defaultdict
 
 import psutil
+from django.apps import apps
 from django.conf import settings
 from django.core.cache import cache
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
 from django.db import models, connection, transaction
 from django.db.models import Q, Count, F, Sum, Avg
+from django.db.models.functions import Cast
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 
-from wagtail.models import Page, Site, Collection, Revision
-from wagtail.images.models import Image, Rendition
+from modelcluster.models import get_all_child_m2m_relations, get_all_child_relations
+from wagtail.blocks import BaseStreamBlock, BaseStructBlock, ChooserBlock, ListBlock, RichTextBlock
+from wagtail.fields import RichTextField, StreamField
+from wagtail.models import Page, Site, Collection, Revision, RevisionMixin
+from wagtail.images import get_image_model
+from wagtail.images.blocks import ImageBlock
+from wagtail.images.models import AbstractRendition, Image, Rendition
+from wagtail.documents import get_document_model
 from wagtail.documents.models import Document
+from wagtail.rich_text import extract_references_from_rich_text
 from wagtail.search import index
 from wagtail.search.models import IndexEntry
 from wagtail.contrib.redirects.models import Redirect
@@ -607,6 +616,172 @@ class MedicalLinkChecker:
         return recommendations
 
 
+class MediaReferenceIndex:
+    """
+    IDs of every image and document in use, collected in one streaming pass.
+    
+    References are taken from:
+    - foreign keys to the image or document model on any model, including
+      many-to-many through tables (renditions excepted)
+    - StreamField JSON, walked with the field's block definitions, so only
+      chooser block values count and no block is converted to Python
+    - rich text, through Wagtail's own embed and link handlers
+    - the latest revision of every revisable object, child objects
+      included, so images only used in drafts are kept
+    
+    Content columns are read as raw text with ``iterator()``, a chunk of
+    rows at a time, so memory stays flat however many pages there are.
+    Nothing is queried per reference; checking an image is a set lookup.
+    """
+    
+    def __init__(self, chunk_size: int = 500):
+        self.chunk_size = chunk_size
+        self.images = set()
+        self.documents = set()
+        self._targets = {get_image_model(): self.images, get_document_model(): self.documents}
+        self.stats = {'models_scanned': 0, 'rows_scanned': 0, 'revisions_scanned': 0}
+    
+    def build(self) -> 'MediaReferenceIndex':
+        """Collect every reference; returns the index itself."""
+        for model in apps.get_models(include_auto_created=True):
+            if issubclass(model, AbstractRendition):
+                continue
+            self._index_foreign_keys(model)
+            self._index_content(model)
+            if issubclass(model, RevisionMixin) and 'latest_revision' in {
+                    field.name for field in model._meta.local_concrete_fields}:
+                self._index_latest_revisions(model)
+        
+        logger.info(
+            f"Media reference index built: {len(self.images)} images and "
+            f"{len(self.documents)} documents referenced, {self.stats['rows_scanned']} rows scanned"
+        )
+        return self
+    
+    def _index_foreign_keys(self, model):
+        for field in model._meta.local_concrete_fields:
+            target = self._targets.get(field.related_model) if field.is_relation else None
+            if target is None:
+                continue
+            target.update(
+                model._base_manager.exclude(**{f"{field.attname}__isnull": True})
+                .values_list(field.attname, flat=True).distinct()
+            )
+            self.stats['models_scanned'] += 1
+    
+    def _index_content(self, model):
+        fields = [
+            field for field in model._meta.local_concrete_fields
+            if isinstance(field, (StreamField, RichTextField))
+        ]
+        if not fields:
+            return
+        self.stats['models_scanned'] += 1
+        
+        # Raw column text: no StreamValue or RichText objects are built
+        columns = {f"_raw_{field.attname}": Cast(field.attname, models.TextField()) for field in fields}
+        rows = model._base_manager.annotate(**columns).values_list(*columns).iterator(chunk_size=self.chunk_size)
+        for row in rows:
+            self.stats['rows_scanned'] += 1
+            for field, raw in zip(fields, row):
+                self._index_field_value(field, raw)
+    
+    def _index_latest_revisions(self, model):
+        revision_ids = model._base_manager.exclude(latest_revision=None).values('latest_revision_id')
+        revisions = Revision.objects.filter(pk__in=revision_ids).values_list('content_type_id', 'content')
+        for content_type_id, content in revisions.iterator(chunk_size=self.chunk_size):
+            revision_model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if revision_model is None or not isinstance(content, dict):
+                continue
+            self.stats['revisions_scanned'] += 1
+            self._index_serialized(revision_model, content)
+    
+    def _index_serialized(self, model, content):
+        """Collect references from an object serialised by modelcluster, child objects included."""
+        # Fields are keyed by name, foreign keys included, as in serializable_data()
+        for field in model._meta.concrete_fields:
+            if field.name not in content:
+                continue
+            if field.is_relation:
+                target = self._targets.get(field.related_model)
+                if target is not None:
+                    self._add(target, content[field.name])
+            elif isinstance(field, (StreamField, RichTextField)):
+                self._index_field_value(field, content[field.name])
+        
+        for relation in get_all_child_relations(model):
+            for child in content.get(relation.get_accessor_name()) or []:
+                if isinstance(child, dict):
+                    self._index_serialized(relation.related_model, child)
+        
+        for field in get_all_child_m2m_relations(model):
+            target = self._targets.get(field.related_model)
+            if target is not None:
+                for object_id in content.get(field.name) or []:
+                    self._add(target, object_id)
+    
+    def _index_field_value(self, field, raw):
+        if not raw:
+            return
+        if isinstance(field, RichTextField):
+            self._index_rich_text(raw)
+            return
+        if isinstance(raw, str):
+            try:
+                raw = json.loads(raw)
+                # JSON columns cast to text may come back double-encoded
+                if isinstance(raw, str):
+                    raw = json.loads(raw)
+            except ValueError:
+                # Pre-JSON StreamFields could hold plain text
+                return
+        self._walk_block(field.stream_block, raw)
+    
+    def _walk_block(self, block, value):
+        """Collect references from a block's raw JSON value."""
+        if value is None or value == '':
+            return
+        
+        if isinstance(block, ChooserBlock):
+            target = self._targets.get(block.model_class)
+            if target is not None:
+                self._add(target, value)
+        elif isinstance(block, RichTextBlock):
+            self._index_rich_text(value)
+        elif isinstance(block, BaseStreamBlock):
+            for item in value:
+                if isinstance(item, dict) and item.get('type') in block.child_blocks:
+                    self._walk_block(block.child_blocks[item['type']], item.get('value'))
+        elif isinstance(block, ListBlock):
+            for item in value:
+                # List items are stored as {'type': 'item', 'value': ...} or, in old data, bare values
+                if isinstance(item, dict) and item.get('type') == 'item' and 'value' in item:
+                    item = item['value']
+                self._walk_block(block.child_block, item)
+        elif isinstance(block, BaseStructBlock):
+            if isinstance(value, dict):
+                for name, child_block in block.child_blocks.items():
+                    self._walk_block(child_block, value.get(name))
+            elif isinstance(block, ImageBlock):
+                # ImageBlock also reads data saved by an ImageChooserBlock
+                self._add(self.images, value)
+    
+    def _index_rich_text(self, html):
+        if not isinstance(html, str) or 'id=' not in html:
+            return
+        for model, object_id, _, _ in extract_references_from_rich_text(html):
+            target = self._targets.get(model)
+            if target is not None:
+                self._add(target, object_id)
+    
+    @staticmethod
+    def _add(target: set, object_id):
+        try:
+            target.add(int(object_id))
+        except (TypeError, ValueError):
+            pass
+
+
 class MedicationImageCleaner:
     """
     Wagtail 7.0.2's optimized image cleanup for unused medication images.
@@ -623,6 +798,7 @@ class MedicationImageCleaner:
             'renditions_removed': 0,
             'errors': []
         }
+        self.reference_index = None
     
     def cleanup_medication_images(self, dry_run: bool = True) -> Dict[str, Any]:
         """
@@ -675,42 +851,27 @@ class MedicationImageCleaner:
             name__icontains='medication'
         )
         
-        medication_images = Image.objects.filter(
+        medication_image_ids = set(Image.objects.filter(
             collection__in=medication_collections
-        )
+        ).values_list('id', flat=True))
         
-        unused_images = []
+        unused_ids = sorted(medication_image_ids - self._get_reference_index().images)
         
-        for image in medication_images:
-            if not self._is_image_used(image):
-                unused_images.append(image)
+        unused_images = []
+        for start in range(0, len(unused_ids), 500):
+            unused_images.extend(Image.objects.filter(id__in=unused_ids[start:start + 500]).order_by('id'))
         
         return unused_images
     
+    def _get_reference_index(self) -> MediaReferenceIndex:
+        """Build the reference index once per cleaner."""
+        if self.reference_index is None:
+            self.reference_index = MediaReferenceIndex().build()
+        return self.reference_index
+    
     def _is_image_used(self, image: Image) -> bool:
         """Check if an image is currently used anywhere."""
-        # Check if used in pages
-        pages_using_image = Page.objects.filter(
-            Q(body__icontains=str(image.id)) |
-            Q(content__icontains=str(image.id))
-        ).exists()
-        
-        if pages_using_image:
-            return True
-        
-        # Check if used in medications
-        medications_using_image = Medication.objects.filter(
-            Q(image=image) |
-            Q(gallery_images__image=image)
-        ).exists()
-        
-        if medications_using_image:
-            return True
-        
-        # Check if used in snippets or other models
-        # This would need to be expanded based on your specific models
-        
-        return False
+        return image.id in self._get_reference_index().images
     
     def _find_unused_renditions(self) -> List[Rendition]:
         """Find image renditions that are no longer needed."""
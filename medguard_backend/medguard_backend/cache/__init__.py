@@ -0,0 +1,17 @@
+"""
+Caching infrastructure for MedGuard SA.
+
+- two_tier: ``TwoTierCache``, an in-process L1 in front of Redis with
+  invalidation broadcast between workers
+- invalidation: Redis pub/sub and in-memory invalidation buses
+- read_through: ``read_through``, single-flight read-through caching with
+  early and stale-while-revalidate refresh
+"""
+
+from .read_through import read_through
+from .two_tier import TwoTierCache
+
+__all__ = [
+    'read_through',
+    'TwoTierCache',
+]
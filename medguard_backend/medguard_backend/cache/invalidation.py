@@ -0,0 +1,150 @@
+"""
+Invalidation buses for the two-tier cache.
+
+A bus carries invalidation messages between the in-process tiers of every
+worker. Messages are small dicts: ``{'origin': node, 'keys': [...]}`` drops
+keys, ``{'origin': node, 'clear': True}`` drops everything. Delivery is
+best effort; the in-process tier's TTL bounds how long a lost message can
+leave a stale entry behind.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, Any]
+Subscriber = Callable[[Message], None]
+
+
+class InvalidationBus:
+    """
+    Base class for invalidation buses.
+
+    Args:
+        location: Where the bus lives, for example a Redis URL
+        channel: Channel shared by every worker of one cache
+        options: Backend specific options
+    """
+
+    def __init__(self, location: str, channel: str, options: Optional[Dict[str, Any]] = None):
+        self.location = location
+        self.channel = channel
+        self.options = options or {}
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def publish(self, message: Message) -> None:
+        """Send a message to every subscriber of the channel."""
+        raise NotImplementedError
+
+    def subscribe(self, subscriber: Subscriber) -> bool:
+        """
+        Deliver the channel's messages to subscriber; subscribing twice is a no-op.
+
+        Returns:
+            False if the bus cannot listen right now, in which case the
+            subscriber may miss messages and should subscribe again later
+        """
+        with self._lock:
+            if subscriber not in self._subscribers:
+                self._subscribers.append(subscriber)
+        return True
+
+    def _deliver(self, message: Message) -> None:
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber(message)
+            except Exception as e:
+                logger.error(f"Error handling cache invalidation on {self.channel}: {e}")
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """
+    Invalidation over Redis pub/sub.
+
+    Each process listens on a daemon thread, started on first subscription
+    and restarted in forked children. If the subscription connection
+    fails, subscribers are told to clear everything, since messages may
+    have been missed while it was down.
+
+    Options:
+        CLIENT_KWARGS: Extra keyword arguments for ``redis.Redis.from_url``;
+            the connect timeout defaults to 5 seconds
+    """
+
+    def __init__(self, location: str, channel: str, options: Optional[Dict[str, Any]] = None):
+        super().__init__(location, channel, options)
+        self._client = None
+        self._thread = None
+
+    def _get_client(self):
+        if self._client is None:
+            import redis
+            client_kwargs = {'socket_connect_timeout': 5, **self.options.get('CLIENT_KWARGS', {})}
+            self._client = redis.Redis.from_url(self.location, **client_kwargs)
+        return self._client
+
+    def publish(self, message: Message) -> None:
+        try:
+            self._get_client().publish(self.channel, json.dumps(message))
+        except Exception as e:
+            logger.error(f"Error publishing cache invalidation on {self.channel}: {e}")
+
+    def subscribe(self, subscriber: Subscriber) -> bool:
+        super().subscribe(subscriber)
+        with self._lock:
+            # Threads do not survive a fork, so children start their own
+            if self._thread is None or not self._thread.is_alive():
+                try:
+                    pubsub = self._get_client().pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(**{self.channel: self._handle_message})
+                    self._thread = pubsub.run_in_thread(
+                        sleep_time=1.0, daemon=True, exception_handler=self._handle_error
+                    )
+                except Exception as e:
+                    logger.error(f"Error subscribing to cache invalidation on {self.channel}: {e}")
+                    return False
+        return True
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        try:
+            data = json.loads(message['data'])
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed cache invalidation on {self.channel}: {e}")
+            return
+        self._deliver(data)
+
+    def _handle_error(self, exc: BaseException, pubsub, thread) -> None:
+        logger.warning(f"Cache invalidation subscription on {self.channel} failed: {exc}")
+        self._deliver({'origin': None, 'clear': True})
+        # The next poll reconnects and resubscribes
+        time.sleep(1.0)
+
+
+_memory_channels: Dict[str, List['InMemoryInvalidationBus']] = defaultdict(list)
+_memory_channels_lock = threading.Lock()
+
+
+class InMemoryInvalidationBus(InvalidationBus):
+    """
+    Invalidation within one process, delivered synchronously.
+
+    Stands in for Redis pub/sub in tests and single-process deployments:
+    every bus on the same location and channel receives every message.
+    """
+
+    def __init__(self, location: str, channel: str, options: Optional[Dict[str, Any]] = None):
+        super().__init__(location, channel, options)
+        with _memory_channels_lock:
+            _memory_channels[f"{location}:{channel}"].append(self)
+
+    def publish(self, message: Message) -> None:
+        with _memory_channels_lock:
+            buses = list(_memory_channels[f"{self.location}:{self.channel}"])
+        for bus in buses:
+            bus._deliver(message)
@@ -0,0 +1,193 @@
+"""
+Stampede-proof read-through caching.
+
+``read_through`` replaces the get -> compute -> set pattern. When a hot key
+expires under that pattern every worker that misses rebuilds the value at
+once. Here:
+
+- Single flight: only the worker holding a short ``add`` lock on the key
+  computes; the others wait for its result, and compute it themselves only
+  if the lock holder takes longer than ``lock_wait``.
+- Probabilistic early expiration (XFetch): each read may refresh the value
+  shortly before it expires, with a probability that grows as expiry
+  approaches and with how long the value took to compute. Refreshes are
+  spread out instead of piling up on the expiry instant.
+- Stale-while-revalidate: with ``stale_ttl``, an expired value is kept for
+  that many more seconds and served while one worker refreshes it on a
+  background thread.
+
+Values are stored in an envelope recording their logical expiry and how
+long they took to compute, so entries written by ``read_through`` should
+only be read through it.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from django.core.cache import caches
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+LOCK_SUFFIX = ':refresh_lock'
+DEFAULT_LOCK_TIMEOUT = 30
+DEFAULT_LOCK_WAIT = 5.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def read_through(key: str, compute: Callable[[], Any], timeout: Optional[int] = 300, *,
+                 cache_alias: str = 'default', stale_ttl: int = 0, beta: float = 1.0,
+                 lock_timeout: int = DEFAULT_LOCK_TIMEOUT, lock_wait: float = DEFAULT_LOCK_WAIT,
+                 is_current: Optional[Callable[[Any], bool]] = None) -> Any:
+    """
+    Get a value from the cache, computing and storing it at most once at a time.
+
+    Args:
+        key: Cache key
+        compute: Builds the value; called without arguments
+        timeout: Seconds the value is fresh for, or None to keep it until deleted
+        cache_alias: Cache to use
+        stale_ttl: Seconds an expired value is still served while it is
+            refreshed in the background; 0 disables stale-while-revalidate
+        beta: XFetch eagerness; above 1 refreshes earlier, 0 disables early refresh
+        lock_timeout: Seconds after which a lock left by a crashed worker lapses
+        lock_wait: Longest time to wait for another worker's computation
+        is_current: Optional check on a cached value, for example against tag
+            generations; values failing it are recomputed and never served stale
+
+    Returns:
+        The cached or freshly computed value
+    """
+    cache = caches[cache_alias]
+    entry = _get_entry(cache, key, is_current)
+    if entry is not None:
+        now = time.time()
+        expires_at = entry['expires_at']
+        if expires_at is None or now < expires_at:
+            if expires_at is not None and beta > 0 and _xfetch_due(entry, beta, now):
+                _refresh(cache_alias, key, compute, timeout, stale_ttl, lock_timeout, background=stale_ttl > 0)
+            return entry['value']
+        if stale_ttl > 0:
+            _refresh(cache_alias, key, compute, timeout, stale_ttl, lock_timeout, background=True)
+            return entry['value']
+
+    lock_key = key + LOCK_SUFFIX
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, lock_timeout):
+        # The previous holder may have stored the value since it was read
+        entry = _get_entry(cache, key, is_current)
+        if _is_fresh(entry):
+            _release_lock(cache, lock_key, token)
+            return entry['value']
+        return _compute_and_store(cache, key, compute, timeout, stale_ttl, lock_key, token)
+
+    # Another worker is computing: wait for its value rather than repeating the work
+    deadline = time.monotonic() + lock_wait
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = _get_entry(cache, key, is_current)
+        if _is_fresh(entry):
+            return entry['value']
+        if not cache.has_key(lock_key):
+            break
+
+    logger.warning(f"Computing {key} without its refresh lock after waiting {lock_wait}s")
+    return _compute_and_store(cache, key, compute, timeout, stale_ttl)
+
+
+def _get_entry(cache, key: str, is_current: Optional[Callable[[Any], bool]]) -> Optional[Dict[str, Any]]:
+    entry = cache.get(key)
+    if not isinstance(entry, dict) or 'expires_at' not in entry:
+        return None
+    if is_current is not None and not is_current(entry['value']):
+        return None
+    return entry
+
+
+def _is_fresh(entry: Optional[Dict[str, Any]]) -> bool:
+    return entry is not None and (entry['expires_at'] is None or time.time() < entry['expires_at'])
+
+
+def _xfetch_due(entry: Dict[str, Any], beta: float, now: float) -> bool:
+    """
+    Decide whether to refresh a fresh value early.
+
+    XFetch: refresh when ``now - delta * beta * ln(rand) >= expiry``, where
+    delta is how long the value took to compute.
+    """
+    return now - entry['delta'] * beta * math.log(1.0 - random.random()) >= entry['expires_at']
+
+
+def _compute_and_store(cache, key: str, compute: Callable[[], Any], timeout: Optional[int],
+                       stale_ttl: int, lock_key: Optional[str] = None, token: Optional[str] = None) -> Any:
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+
+        if timeout is None:
+            entry_timeout, expires_at = None, None
+        else:
+            entry_timeout, expires_at = timeout + stale_ttl, time.time() + timeout
+        cache.set(key, {'value': value, 'expires_at': expires_at, 'delta': delta}, entry_timeout)
+        return value
+    finally:
+        if lock_key is not None:
+            _release_lock(cache, lock_key, token)
+
+
+def _release_lock(cache, lock_key: str, token: str) -> None:
+    # Only drop the lock if it is still ours; it may have lapsed and been retaken
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _refresh(cache_alias: str, key: str, compute: Callable[[], Any], timeout: Optional[int],
+             stale_ttl: int, lock_timeout: int, background: bool) -> None:
+    """
+    Recompute a cached value if no other worker is already doing so.
+
+    The current value is still being served, so a failed refresh is only logged.
+    """
+    cache = caches[cache_alias]
+    lock_key = key + LOCK_SUFFIX
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, lock_timeout):
+        return
+
+    if not background:
+        try:
+            _compute_and_store(cache, key, compute, timeout, stale_ttl, lock_key, token)
+        except Exception as e:
+            logger.error(f"Error refreshing cached value {key}: {e}")
+        return
+
+    thread = threading.Thread(
+        target=_refresh_in_background,
+        args=(cache_alias, key, compute, timeout, stale_ttl, lock_key, token),
+        name=f"cache-refresh:{key}",
+        daemon=True,
+    )
+    try:
+        thread.start()
+    except RuntimeError:
+        _release_lock(cache, lock_key, token)
+        raise
+
+
+def _refresh_in_background(cache_alias: str, key: str, compute: Callable[[], Any], timeout: Optional[int],
+                           stale_ttl: int, lock_key: str, token: str) -> None:
+    try:
+        # Cache connections, like database ones, belong to a single thread
+        _compute_and_store(caches[cache_alias], key, compute, timeout, stale_ttl, lock_key, token)
+    except Exception as e:
+        # The stale value keeps being served until it lapses or a refresh succeeds
+        logger.error(f"Error refreshing cached value {key}: {e}")
+    finally:
+        # Database connections are per thread and would otherwise be leaked
+        connection.close()
@@ -0,0 +1,401 @@
+"""
+Two-tier cache backend: a bounded in-process tier in front of a shared one.
+
+Reads are served from an in-process LRU (L1) when possible and otherwise
+from the shared backend (L2, normally ``django_redis``), whose values are
+then kept in L1. L1 holds pickled values, bounded by total size in bytes
+and by a short TTL, so a hit costs neither a network round trip nor the
+L2 serializer and compressor.
+
+Every write goes to L2 first and is then broadcast on an invalidation bus,
+so other workers drop their copy of the key. A generation counter guards
+the gap between reading L2 and filling L1: a value is only kept if no
+invalidation arrived while it was being fetched. L1 is shared by every
+thread of a process and is reset in forked children.
+
+Configuration, as a drop-in ``CACHES`` entry::
+
+    'default': {
+        'BACKEND': 'medguard_backend.cache.TwoTierCache',
+        'LOCATION': 'redis://localhost:6379/1',
+        'OPTIONS': {
+            'L2_BACKEND': 'django_redis.cache.RedisCache',
+            'L2_OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+            'L1_MAX_BYTES': 16 * 1024 * 1024,
+            'L1_TIMEOUT': 30,
+        },
+        'KEY_PREFIX': 'medguard_sa',
+        'TIMEOUT': 300,
+    }
+
+Other options: ``L1_MAX_ENTRY_BYTES`` (larger values skip L1),
+``INVALIDATION_BACKEND``, ``INVALIDATION_LOCATION``,
+``INVALIDATION_CHANNEL``, ``INVALIDATION_OPTIONS`` and ``L1_NAME``
+(caches with the same name share an L1; defaults to one per location and
+key prefix).
+"""
+
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from .invalidation import InvalidationBus
+
+DEFAULT_L2_BACKEND = 'django_redis.cache.RedisCache'
+DEFAULT_INVALIDATION_BACKEND = 'medguard_backend.cache.invalidation.RedisInvalidationBus'
+DEFAULT_L1_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_L1_TIMEOUT = 30
+SUBSCRIBE_RETRY_INTERVAL = 5
+
+# Marks a key that is not cached, as distinct from a cached None
+MISSING = object()
+
+
+class LocalTier:
+    """
+    Size-bounded LRU of pickled values with per-entry expiry.
+
+    Args:
+        bus: Invalidation bus shared with the other workers
+        max_bytes: Upper bound on the total size of keys and values
+        max_entry_bytes: Values larger than this are not kept
+        timeout: Longest time in seconds an entry is kept
+    """
+
+    def __init__(self, bus: InvalidationBus, max_bytes: int, max_entry_bytes: int, timeout: float):
+        self.bus = bus
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.timeout = timeout
+        self.generation = 0
+        self.node_id = None
+        self.counters = dict.fromkeys([
+            'l1_hits', 'l1_misses', 'l1_evictions', 'l1_expirations', 'l2_hits', 'l2_misses',
+            'invalidations_published', 'invalidations_received',
+        ], 0)
+        self._data: 'OrderedDict[str, Tuple[bytes, Optional[float]]]' = OrderedDict()
+        self._size = 0
+        self._pid = None
+        self._node_pid = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def ensure_subscribed(self) -> None:
+        """
+        Subscribe this process to the bus, resetting state inherited over a fork.
+
+        Until the subscription succeeds nothing is kept in L1, because
+        invalidations would be missed; it is retried every
+        SUBSCRIBE_RETRY_INTERVAL seconds.
+        """
+        pid = os.getpid()
+        if pid == self._pid or time.monotonic() < self._retry_at:
+            return
+        with self._lock:
+            if pid == self._pid:
+                return
+            if self._node_pid != pid:
+                self._clear()
+                self.generation += 1
+                self.node_id = f"{uuid.uuid4().hex}:{pid}"
+                self._node_pid = pid
+        if self.bus.subscribe(self.receive):
+            self._pid = pid
+        else:
+            self._retry_at = time.monotonic() + SUBSCRIBE_RETRY_INTERVAL
+
+    def get(self, key: str) -> Any:
+        """Cached value for key, or MISSING."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.counters['l1_misses'] += 1
+                return MISSING
+            pickled, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._discard(key)
+                self.counters['l1_expirations'] += 1
+                self.counters['l1_misses'] += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.counters['l1_hits'] += 1
+        return pickle.loads(pickled)
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.time())
+
+    def store(self, key: str, value: Any, generation: int, expires_at: Optional[float] = None) -> bool:
+        """
+        Keep a value fetched from or written to L2.
+
+        Nothing is kept if any invalidation happened since generation was
+        read, because the value may already be out of date.
+        """
+        try:
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        size = len(pickled) + len(key)
+
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            return False
+        expires_at = now + self.timeout if expires_at is None else min(expires_at, now + self.timeout)
+
+        with self._lock:
+            if generation != self.generation or self._pid != os.getpid():
+                return False
+            self._discard(key)
+            if size > self.max_entry_bytes:
+                return False
+            self._data[key] = (pickled, expires_at)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._discard(oldest)
+                self.counters['l1_evictions'] += 1
+        return True
+
+    def invalidate(self, keys: Iterable[str]) -> int:
+        """Drop keys locally; returns the new generation."""
+        with self._lock:
+            for key in keys:
+                self._discard(key)
+            self.generation += 1
+            return self.generation
+
+    def invalidate_all(self) -> int:
+        """Drop every entry locally; returns the new generation."""
+        with self._lock:
+            self._clear()
+            self.generation += 1
+            return self.generation
+
+    def publish(self, keys: Optional[List[str]] = None) -> None:
+        """Tell the other workers to drop keys, or everything when keys is None."""
+        message = {'origin': self.node_id, 'clear': True} if keys is None else {'origin': self.node_id, 'keys': keys}
+        with self._lock:
+            self.counters['invalidations_published'] += 1
+        self.bus.publish(message)
+
+    def receive(self, message: Dict[str, Any]) -> None:
+        """Apply an invalidation published by another worker."""
+        if message.get('origin') == self.node_id:
+            return
+        with self._lock:
+            self.counters['invalidations_received'] += 1
+            if message.get('clear'):
+                self._clear()
+            else:
+                for key in message.get('keys') or ():
+                    self._discard(key)
+            self.generation += 1
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                'l1_entries': len(self._data),
+                'l1_bytes': self._size,
+                'l1_max_bytes': self.max_bytes,
+            }
+
+    def _discard(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0]) + len(key)
+
+    def _clear(self) -> None:
+        self._data.clear()
+        self._size = 0
+
+
+# One L1 per process and configuration, shared by the per-thread backend
+# instances Django creates
+_local_tiers: Dict[Tuple, LocalTier] = {}
+_local_tiers_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    """
+    Django cache backend with an in-process L1 in front of a shared L2.
+
+    The L2 backend is built from the same location, key prefix, version and
+    default timeout, so it reads and writes exactly the keys it would as a
+    standalone cache. Methods this class does not define, such as
+    django-redis's ``ttl``, ``lock`` and ``keys``, go straight to L2.
+    """
+
+    def __init__(self, location: str, params: Dict[str, Any]):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+
+        l2_params = {name: params[name] for name in ('TIMEOUT', 'KEY_PREFIX', 'VERSION', 'KEY_FUNCTION') if name in params}
+        l2_params['OPTIONS'] = options.get('L2_OPTIONS', {})
+        self.l2 = import_string(options.get('L2_BACKEND', DEFAULT_L2_BACKEND))(location, l2_params)
+
+        max_bytes = int(options.get('L1_MAX_BYTES', DEFAULT_L1_MAX_BYTES))
+        config = (
+            options.get('L1_NAME', ''),
+            location,
+            self.key_prefix,
+            options.get('INVALIDATION_BACKEND', DEFAULT_INVALIDATION_BACKEND),
+            options.get('INVALIDATION_LOCATION', location),
+            options.get('INVALIDATION_CHANNEL', f"cache_invalidation:{self.key_prefix}"),
+        )
+        with _local_tiers_lock:
+            tier = _local_tiers.get(config)
+            if tier is None:
+                bus = import_string(config[3])(config[4], config[5], options.get('INVALIDATION_OPTIONS', {}))
+                tier = _local_tiers[config] = LocalTier(
+                    bus,
+                    max_bytes=max_bytes,
+                    max_entry_bytes=int(options.get('L1_MAX_ENTRY_BYTES', max_bytes // 16)),
+                    timeout=float(options.get('L1_TIMEOUT', DEFAULT_L1_TIMEOUT)),
+                )
+        self.local = tier
+
+    def __getattr__(self, name):
+        if name == 'l2':
+            raise AttributeError(name)
+        return getattr(self.l2, name)
+
+    def _l1_key(self, key, version=None) -> str:
+        return self.make_and_validate_key(key, version=version)
+
+    def _expiry(self, timeout) -> Optional[float]:
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        self.local.ensure_subscribed()
+        l1_key = self._l1_key(key, version)
+        value = self.local.get(l1_key)
+        if value is not MISSING:
+            return value
+
+        generation = self.local.generation
+        value = self.l2.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.local.count('l2_misses')
+            return default
+        self.local.count('l2_hits')
+        self.local.store(l1_key, value, generation)
+        return value
+
+    def get_many(self, keys, version=None):
+        self.local.ensure_subscribed()
+        found, missing = {}, {}
+        for key in keys:
+            l1_key = self._l1_key(key, version)
+            value = self.local.get(l1_key)
+            if value is MISSING:
+                missing[key] = l1_key
+            else:
+                found[key] = value
+        if not missing:
+            return found
+
+        generation = self.local.generation
+        fetched = self.l2.get_many(list(missing), version=version)
+        self.local.count('l2_hits', len(fetched))
+        self.local.count('l2_misses', len(missing) - len(fetched))
+        for key, value in fetched.items():
+            self.local.store(missing[key], value, generation)
+        found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        self.local.ensure_subscribed()
+        return self.local.contains(self._l1_key(key, version)) or self.l2.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.ensure_subscribed()
+        l1_key = self._l1_key(key, version)
+        generation = self.local.invalidate([l1_key])
+        result = self.l2.set(key, value, timeout, version=version)
+        self.local.publish([l1_key])
+        self.local.store(l1_key, value, generation, self._expiry(timeout))
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.ensure_subscribed()
+        l1_key = self._l1_key(key, version)
+        generation = self.local.invalidate([l1_key])
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self.local.publish([l1_key])
+            self.local.store(l1_key, value, generation, self._expiry(timeout))
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.ensure_subscribed()
+        l1_keys = {key: self._l1_key(key, version) for key in data}
+        generation = self.local.invalidate(l1_keys.values())
+        failed = self.l2.set_many(data, timeout, version=version) or []
+        self.local.publish(list(l1_keys.values()))
+        expires_at = self._expiry(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self.local.store(l1_keys[key], value, generation, expires_at)
+        return failed
+
+    def _write_through(self, method: str, keys: List[Any], version, *args, **kwargs):
+        self.local.ensure_subscribed()
+        l1_keys = [self._l1_key(key, version) for key in keys]
+        self.local.invalidate(l1_keys)
+        try:
+            return getattr(self.l2, method)(*args, version=version, **kwargs)
+        finally:
+            self.local.publish(l1_keys)
+
+    def delete(self, key, version=None):
+        return self._write_through('delete', [key], version, key)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        return self._write_through('delete_many', keys, version, keys)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write_through('touch', [key], version, key, timeout)
+
+    def incr(self, key, delta=1, version=None):
+        return self._write_through('incr', [key], version, key, delta)
+
+    def decr(self, key, delta=1, version=None):
+        return self._write_through('decr', [key], version, key, delta)
+
+    def delete_pattern(self, pattern, version=None, **kwargs):
+        self.local.ensure_subscribed()
+        self.local.invalidate_all()
+        try:
+            return self.l2.delete_pattern(pattern, version=version, **kwargs)
+        finally:
+            self.local.publish()
+
+    def clear(self):
+        self.local.ensure_subscribed()
+        self.local.invalidate_all()
+        try:
+            return self.l2.clear()
+        finally:
+            self.local.publish()
+
+    def close(self, **kwargs):
+        return self.l2.close(**kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit, miss, eviction and invalidation counters for both tiers."""
+        return self.local.stats()
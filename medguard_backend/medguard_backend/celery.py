@@ -29,15 +29,18 @@ app.conf.update(
         # High priority notification tasks
         'medguard_notifications.tasks.send_email_notification_task': {'queue': 'email_high', 'priority': 9},
         'medguard_notifications.tasks.send_bulk_email_notifications_task': {'queue': 'email_bulk', 'priority': 7},
+        'medguard_notifications.tasks.send_bulk_push_notifications_task': {'queue': 'push_bulk', 'priority': 7},
         'medguard_notifications.tasks.send_daily_digest_notifications': {'queue': 'email_digest', 'priority': 5},
         'medguard_notifications.tasks.send_weekly_digest_notifications': {'queue': 'email_digest', 'priority': 5},
         'medguard_notifications.tasks.send_medication_reminders': {'queue': 'reminders_high', 'priority': 9},
+        'medguard_notifications.tasks.send_medication_reminder_batch': {'queue': 'reminders_high', 'priority': 9},
         'medguard_notifications.tasks.send_stock_alerts': {'queue': 'alerts_high', 'priority': 8},
         
         # Medium priority maintenance tasks
         'medguard_notifications.tasks.cleanup_old_notifications': {'queue': 'maintenance', 'priority': 3},
         'medguard_notifications.tasks.process_scheduled_notifications': {'queue': 'scheduled', 'priority': 6},
         'medguard_notifications.tasks.update_notification_statistics': {'queue': 'maintenance', 'priority': 4},
+        'security.reencrypt_patient_data': {'queue': 'maintenance', 'priority': 2},
         
         # High priority medication tasks
         'medications.tasks.update_stock_analytics': {'queue': 'analytics', 'priority': 7},
@@ -98,7 +101,7 @@ app.conf.update(
         # High priority tasks - frequent execution
         'send-medication-reminders': {
             'task': 'medguard_notifications.tasks.send_medication_reminders',
-            'schedule': 300.0,  # Every 5 minutes
+            'schedule': 60.0,  # Every minute (reminder index is bucketed per minute)
             'options': {'queue': 'reminders_high'},
         },
         'send-stock-alerts': {
@@ -165,6 +168,11 @@ app.conf.update(
             'schedule': 86400.0,  # Daily at 2:00 AM
             'options': {'queue': 'maintenance'},
         },
+        'compact-stock-ledger': {
+            'task': 'medications.compact_stock_ledger',
+            'schedule': 86400.0,  # Daily, before old transactions are cleaned up
+            'options': {'queue': 'maintenance'},
+        },
         'cleanup-old-transactions': {
             'task': 'medications.tasks.cleanup_old_transactions',
             'schedule': 604800.0,  # Weekly
@@ -191,6 +199,7 @@ app.conf.update(
     task_queues={
         'email_high': {'exchange': 'email_high', 'routing_key': 'email_high'},
         'email_bulk': {'exchange': 'email_bulk', 'routing_key': 'email_bulk'},
+        'push_bulk': {'exchange': 'push_bulk', 'routing_key': 'push_bulk'},
         'email_digest': {'exchange': 'email_digest', 'routing_key': 'email_digest'},
         'reminders_high': {'exchange': 'reminders_high', 'routing_key': 'reminders_high'},
         'alerts_high': {'exchange': 'alerts_high', 'routing_key': 'alerts_high'},
@@ -5,6 +5,7 @@ This package contains settings for different environments:
 - base.py: Common settings shared across all environments
 - development.py: Development-specific settings
 - production.py: Production-specific settings
+- test.py: Settings for running the test suite
 - local.py: Local development overrides (not in version control)
 """
 
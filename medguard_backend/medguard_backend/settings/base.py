@@ -125,6 +125,7 @@ LOCAL_APPS = [
     'wagtail_hooks',  # Wagtail admin customizations
     'forms',  # Wagtail 7.0.2 form pages
     'maintenance',  # Wagtail 7.0.2 healthcare maintenance tools
+    'api',  # API cache invalidation signals
 ]
 
 INSTALLED_APPS = DJANGO_APPS + WAGTAIL_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -1136,39 +1137,48 @@ CELERY_TIMEZONE = TIME_ZONE
 # Using Django's built-in async capabilities for now
 # Will implement a modern task queue solution later
 
-# Multi-tier Redis cache configuration for optimal performance
+# Multi-tier Redis cache configuration for optimal performance.
+# TwoTierCache keeps a bounded in-process copy of hot entries in front of
+# Redis; writes are broadcast over Redis pub/sub so every worker drops its
+# copy. The sessions, celery_results and rate_limiting aliases stay plain
+# Redis caches.
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'medguard_backend.cache.TwoTierCache',
         'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-            'SOCKET_CONNECT_TIMEOUT': 5,
-            'SOCKET_TIMEOUT': 5,
-            'CONNECTION_POOL_KWARGS': {
-                'max_connections': 100,
-                'retry_on_timeout': True,
-                'socket_keepalive': True,
-                'socket_keepalive_options': {
-                    'TCP_KEEPIDLE': 1,
-                    'TCP_KEEPINTVL': 3,
-                    'TCP_KEEPCNT': 5,
+            'L2_BACKEND': 'django_redis.cache.RedisCache',
+            'L2_OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'SOCKET_CONNECT_TIMEOUT': 5,
+                'SOCKET_TIMEOUT': 5,
+                'CONNECTION_POOL_KWARGS': {
+                    'max_connections': 100,
+                    'retry_on_timeout': True,
+                    'socket_keepalive': True,
+                    'socket_keepalive_options': {
+                        'TCP_KEEPIDLE': 1,
+                        'TCP_KEEPINTVL': 3,
+                        'TCP_KEEPCNT': 5,
+                    }
+                },
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+                'SERIALIZER': 'django_redis.serializers.json.JSONSerializer',
+                'MASTER_CACHE': os.getenv('REDIS_MASTER_URL', 'redis://localhost:6379/1'),
+                'SLAVE_CACHE': os.getenv('REDIS_SLAVE_URL', 'redis://localhost:6379/2'),
+                'REDIS_CLIENT_KWARGS': {
+                    'health_check_interval': 30,
+                    'socket_keepalive': True,
+                    'socket_keepalive_options': {
+                        'TCP_KEEPIDLE': 1,
+                        'TCP_KEEPINTVL': 3,
+                        'TCP_KEEPCNT': 5,
+                    }
                 }
             },
-            'PARSER_CLASS': 'redis.connection.HiredisParser',
-            'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
-            'SERIALIZER': 'django_redis.serializers.json.JSONSerializer',
-            'MASTER_CACHE': os.getenv('REDIS_MASTER_URL', 'redis://localhost:6379/1'),
-            'SLAVE_CACHE': os.getenv('REDIS_SLAVE_URL', 'redis://localhost:6379/2'),
-            'REDIS_CLIENT_KWARGS': {
-                'health_check_interval': 30,
-                'socket_keepalive': True,
-                'socket_keepalive_options': {
-                    'TCP_KEEPIDLE': 1,
-                    'TCP_KEEPINTVL': 3,
-                    'TCP_KEEPCNT': 5,
-                }
-            }
+            'L1_MAX_BYTES': 32 * 1024 * 1024,
+            'L1_TIMEOUT': 30,
         },
         'KEY_PREFIX': 'medguard_sa',
         'TIMEOUT': 300,  # 5 minutes default
@@ -1185,32 +1195,47 @@ CACHES = {
         'TIMEOUT': 3600,  # 1 hour for sessions
     },
     'medications': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'medguard_backend.cache.TwoTierCache',
         'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-            'CONNECTION_POOL_KWARGS': {'max_connections': 20},
+            'L2_BACKEND': 'django_redis.cache.RedisCache',
+            'L2_OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'CONNECTION_POOL_KWARGS': {'max_connections': 20},
+            },
+            'L1_MAX_BYTES': 16 * 1024 * 1024,
+            'L1_TIMEOUT': 60,
         },
         'KEY_PREFIX': 'medications',
         'TIMEOUT': 1800,  # 30 minutes for medication data
     },
     'analytics': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'medguard_backend.cache.TwoTierCache',
         'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-            'CONNECTION_POOL_KWARGS': {'max_connections': 10},
+            'L2_BACKEND': 'django_redis.cache.RedisCache',
+            'L2_OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'CONNECTION_POOL_KWARGS': {'max_connections': 10},
+            },
+            'L1_MAX_BYTES': 8 * 1024 * 1024,
+            'L1_TIMEOUT': 60,
         },
         'KEY_PREFIX': 'analytics',
         'TIMEOUT': 3600,  # 1 hour for analytics
     },
     'image_processing': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'medguard_backend.cache.TwoTierCache',
         'LOCATION': os.getenv('REDIS_IMAGE_URL', 'redis://localhost:6379/3'),
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-            'CONNECTION_POOL_KWARGS': {'max_connections': 20},
-            'COMPRESSOR': 'django_redis.compressors.lz4.Lz4Compressor',
+            'L2_BACKEND': 'django_redis.cache.RedisCache',
+            'L2_OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'CONNECTION_POOL_KWARGS': {'max_connections': 20},
+                'COMPRESSOR': 'django_redis.compressors.lz4.Lz4Compressor',
+            },
+            'L1_MAX_BYTES': 16 * 1024 * 1024,
+            'L1_TIMEOUT': 60,
         },
         'KEY_PREFIX': 'image_processing',
         'TIMEOUT': 1800,  # 30 minutes for image processing
@@ -1259,6 +1284,13 @@ AUDIT_LOG_RETENTION_DAYS = 2555  # 7 years for HIPAA compliance
 AUDIT_LOG_ENCRYPTION = True
 AUDIT_LOG_COMPRESSION = True
 
+# Buffered audit writes for request-path logging (on by default in
+# production settings only, so development and test runs write synchronously)
+AUDIT_LOG_BUFFERED = os.getenv('AUDIT_LOG_BUFFERED', 'False').lower() == 'true'
+AUDIT_LOG_BUFFER_SIZE = int(os.getenv('AUDIT_LOG_BUFFER_SIZE', 10000))
+AUDIT_LOG_BATCH_SIZE = 200
+AUDIT_LOG_FLUSH_INTERVAL = 1.0  # seconds
+
 # Data retention settings
 DATA_RETENTION_DAYS = 2555  # 7 years for HIPAA compliance
 AUTOMATIC_DATA_PURGE = True
@@ -65,6 +65,8 @@ CORS_EXPOSE_HEADERS = [
 ]
 
 # Development-specific cache settings
+# A single local-memory cache, so development needs no Redis. The two-tier
+# cache from base.py is opt-in here: drop this override to use it.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -54,22 +54,46 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@medguard-sa.com')
 
 # Production cache settings
+# The default cache is a TwoTierCache, as in base.py: hot entries are kept
+# in a bounded in-process L1 in front of Redis, and writes are broadcast
+# over Redis pub/sub so every worker drops its copy.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'BACKEND': 'medguard_backend.cache.TwoTierCache',
         'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
+        'OPTIONS': {
+            'L2_BACKEND': 'django_redis.cache.RedisCache',
+            'L2_OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'CONNECTION_POOL_KWARGS': {
+                    'max_connections': 50,
+                    'retry_on_timeout': True,
+                },
+            },
+            'L1_MAX_BYTES': 32 * 1024 * 1024,
+            'L1_TIMEOUT': 30,
+        },
+        'KEY_PREFIX': 'medguard_sa',
+        'TIMEOUT': 300,  # 5 minutes default
+    },
+    'rate_limiting': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_RATE_URL', 'redis://localhost:6379/5'),
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
             'CONNECTION_POOL_KWARGS': {
-                'max_connections': 50,
+                'max_connections': 30,
                 'retry_on_timeout': True,
             },
         },
-        'KEY_PREFIX': 'medguard_sa',
-        'TIMEOUT': 300,  # 5 minutes default
-    }
+        'KEY_PREFIX': 'rate_limit',
+        'TIMEOUT': 60,  # 1 minute for rate limiting
+    },
 }
 
+# Buffer request-path audit writes in a background writer
+AUDIT_LOG_BUFFERED = os.getenv('AUDIT_LOG_BUFFERED', 'True').lower() == 'true'
+
 # Production static files settings
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
 
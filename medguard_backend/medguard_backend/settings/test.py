@@ -0,0 +1,13 @@
+"""
+Test settings for MedGuard SA backend.
+
+Used by pytest (see pytest.ini) and by
+``python manage.py test --settings=medguard_backend.settings.test``.
+"""
+
+from .development import *
+
+# Audit entries are written synchronously: a background writer would insert
+# on its own database connection, outside each test's transaction. Tests of
+# the buffered writer turn it back on with override_settings.
+AUDIT_LOG_BUFFERED = False
@@ -0,0 +1,28 @@
+"""
+Django management command to rebuild the medication reminder index.
+
+Recomputes the next due dose time for every medication schedule. Run it
+after deploying the reminder dispatcher and after bulk schedule changes
+that bypass model saves.
+"""
+
+from django.core.management.base import BaseCommand
+
+from medguard_notifications.reminders import MedicationReminderDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the next-due reminder index for all medication schedules'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of schedules to update per batch',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding medication reminder index...')
+        pending = MedicationReminderDispatcher().rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reminder index rebuilt: {pending} schedules have a pending reminder'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-16 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medguard_notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='data',
+            field=models.JSONField(blank=True, default=dict, help_text='Structured payload sent with the notification', verbose_name='Data'),
+        ),
+    ]
@@ -249,6 +249,13 @@ class Notification(models.Model):
     )
     
     # Metadata
+    data = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Data'),
+        help_text=_('Structured payload sent with the notification')
+    )
+    
     created_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
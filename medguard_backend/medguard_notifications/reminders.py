@@ -0,0 +1,158 @@
+"""
+Medication reminder dispatch for MedGuard SA.
+
+Every active ``MedicationSchedule`` carries its next due dose time in the
+indexed ``next_reminder_at`` column. Each dispatcher tick claims only the
+schedules that have come due with a single index range query, advances
+their index entries to the following dose and fans the reminders out in
+batches to Celery workers, which deliver them through ``NotificationService``.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from medications.models import MedicationSchedule
+
+logger = logging.getLogger(__name__)
+
+
+class MedicationReminderDispatcher:
+    """
+    Claims due medication doses from the reminder index and fans them out.
+    """
+
+    BATCH_SIZE = 1000
+    MAX_LATENESS = timedelta(minutes=30)  # Older doses are skipped, not reminded
+
+    def __init__(self, batch_size: int = BATCH_SIZE, max_lateness: timedelta = MAX_LATENESS):
+        self.batch_size = batch_size
+        self.max_lateness = max_lateness
+
+    def dispatch_due(self, now=None, max_batches: Optional[int] = None,
+                     enqueue: bool = True) -> Dict[str, int]:
+        """
+        Dispatch reminders for every dose due up to the end of the current minute.
+
+        Args:
+            now: Reference time (defaults to the current time)
+            max_batches: Stop after this many batches (None for no limit)
+            enqueue: Send batches to Celery workers instead of delivering inline
+
+        Returns:
+            Dict with dispatch statistics
+        """
+        now = now or timezone.now()
+        # Reminders are bucketed per minute: a tick covers its whole minute
+        window_end = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        stats = {'batches': 0, 'claimed': 0, 'dispatched': 0, 'skipped_late': 0, 'inactive': 0}
+
+        while max_batches is None or stats['batches'] < max_batches:
+            reminders = self._claim_batch(now, window_end, stats)
+            if reminders is None:
+                break
+
+            stats['batches'] += 1
+            if reminders:
+                self._fan_out(reminders, enqueue)
+                stats['dispatched'] += len(reminders)
+
+        logger.info(
+            f"Medication reminder dispatch: {stats['dispatched']} reminders in "
+            f"{stats['batches']} batches ({stats['skipped_late']} late, {stats['inactive']} inactive)"
+        )
+        return stats
+
+    def _claim_batch(self, now, window_end, stats: Dict[str, int]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Claim one batch of due schedules and advance their index entries.
+
+        Concurrent dispatchers skip rows locked by each other, so every due
+        dose is claimed exactly once.
+
+        Returns:
+            Reminder payloads for the batch, or None when nothing is due
+        """
+        with transaction.atomic():
+            schedules = list(
+                MedicationSchedule.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('medication')
+                .filter(next_reminder_at__lt=window_end)
+                .order_by('next_reminder_at')[:self.batch_size]
+            )
+
+            if not schedules:
+                return None
+
+            reminders = []
+            for schedule in schedules:
+                due_at = schedule.next_reminder_at
+                schedule.next_reminder_at = schedule.compute_next_due(after=max(due_at, now))
+
+                if not schedule.is_active:
+                    stats['inactive'] += 1
+                elif due_at < now - self.max_lateness:
+                    stats['skipped_late'] += 1
+                else:
+                    reminders.append(self._build_reminder(schedule, due_at))
+
+            MedicationSchedule.objects.bulk_update(schedules, ['next_reminder_at'])
+            stats['claimed'] += len(schedules)
+
+        return reminders
+
+    def _build_reminder(self, schedule: MedicationSchedule, due_at) -> Dict[str, Any]:
+        """Build a JSON-serialisable reminder payload."""
+        return {
+            'schedule_id': schedule.id,
+            'user_id': schedule.patient_id,
+            'medication_name': schedule.medication.name,
+            'dosage': f"{schedule.dosage_amount.normalize()} {schedule.medication.dosage_unit}".strip(),
+            'time': timezone.localtime(due_at).strftime('%H:%M'),
+            'due_at': due_at.isoformat(),
+        }
+
+    def _fan_out(self, reminders: List[Dict[str, Any]], enqueue: bool):
+        """Hand a batch of reminders to the delivery workers."""
+        from .tasks import send_medication_reminder_batch
+
+        if enqueue:
+            # Deliver only once the claim is committed
+            transaction.on_commit(lambda: send_medication_reminder_batch.delay(reminders))
+        else:
+            send_medication_reminder_batch(reminders)
+
+    def rebuild_index(self, now=None, chunk_size: int = 2000) -> int:
+        """
+        Recompute ``next_reminder_at`` for every schedule.
+
+        Returns:
+            Number of schedules with a pending reminder
+        """
+        now = now or timezone.now()
+        pending = 0
+        batch = []
+
+        queryset = MedicationSchedule.objects.only(
+            'id', 'status', 'timing', 'custom_time', 'start_date', 'end_date',
+            'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+            'next_reminder_at'
+        ).order_by('pk')
+
+        for schedule in queryset.iterator(chunk_size=chunk_size):
+            schedule.next_reminder_at = schedule.compute_next_due(after=now)
+            pending += schedule.next_reminder_at is not None
+            batch.append(schedule)
+
+            if len(batch) >= chunk_size:
+                MedicationSchedule.objects.bulk_update(batch, ['next_reminder_at'])
+                batch = []
+
+        if batch:
+            MedicationSchedule.objects.bulk_update(batch, ['next_reminder_at'])
+
+        return pending
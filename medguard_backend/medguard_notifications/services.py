@@ -12,7 +12,6 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from django.db import transaction
 from django.urls import reverse
 
@@ -24,6 +23,7 @@ from push_notifications.models import APNSDevice, GCMDevice
 # We'll implement our own web push functionality
 
 # Local imports
+from security.rate_limiting import RateLimit, get_rate_limiter
 from .models import (
     Notification, UserNotification, NotificationTemplate,
     UserNotificationPreferences
@@ -44,8 +44,11 @@ class NotificationService:
     - SMS notifications (via external service)
     """
     
+    # Users per Celery task for bulk email and push delivery
+    BULK_CHUNK_SIZE = 500
+    
     def __init__(self):
-        self.rate_limit_cache = cache
+        self.rate_limiter = get_rate_limiter()
         self.template_cache = {}
     
     def send_notification(
@@ -140,6 +143,12 @@ class NotificationService:
         """
         Send notifications to multiple users efficiently.
         
+        The broadcast shares one Notification record. Preferences are loaded
+        in one query, rate limits are checked and counted in one rate limiter
+        call, in-app deliveries are inserted with bulk_create and email and
+        push are handed off to Celery in chunks of BULK_CHUNK_SIZE users, so
+        the number of database queries does not grow with the number of users.
+        
         Args:
             users: List of target users
             title: Notification title
@@ -153,28 +162,83 @@ class NotificationService:
             template_context: Context data for template rendering
             
         Returns:
-            Dict with results for each user and channel
+            Dict with results for each user and channel; email and push
+            report whether the delivery was queued
         """
         if channels is None:
             channels = ['in_app', 'email']
         
-        results = {}
+        if data is None:
+            data = {}
         
-        # Group users by preferences for efficient sending
-        user_groups = self._group_users_by_preferences(users, channels)
+        users = list(users)
+        if not users:
+            return {}
+        
+        prefs_by_user = self.get_bulk_user_preferences([user.id for user in users])
+        
+        # Group users by the channels their preferences allow
+        user_groups = self._group_users_by_preferences(users, channels, prefs_by_user)
+        allowed = self._check_bulk_rate_limits(
+            [(user.id, channel) for group_key, group_users in user_groups.items()
+             for user in group_users for channel in group_key.split(',')]
+        )
         
+        results = {}
+        deliveries = {channel: [] for channel in channels}
         for group_key, group_users in user_groups.items():
-            group_channels = group_key.split(',')
-            
-            # Send bulk notifications for this group
-            group_results = self._send_bulk_to_group(
-                group_users, title, message, notification_type,
-                group_channels, priority, data, scheduled_at,
-                template_name, template_context
-            )
-            
-            results.update(group_results)
+            for user in group_users:
+                results[user.id] = {}
+                for channel in group_key.split(','):
+                    if (user.id, channel) in allowed:
+                        deliveries[channel].append(user)
+                        results[user.id][channel] = True
+                    else:
+                        logger.warning(f"Rate limit exceeded for user {user.id} on channel {channel}")
+                        results[user.id][channel] = False
+        
+        if not any(deliveries.values()):
+            return results
         
+        try:
+            with transaction.atomic():
+                notification = Notification.objects.create(
+                    title=title,
+                    content=message,
+                    notification_type=notification_type,
+                    priority=priority,
+                    status=Notification.Status.ACTIVE,
+                    scheduled_at=scheduled_at,
+                    data=data,
+                )
+                
+                if deliveries.get('in_app'):
+                    UserNotification.objects.bulk_create([
+                        UserNotification(user=user, notification=notification)
+                        for user in deliveries['in_app']
+                    ])
+                
+                for user in deliveries.get('sms', []):
+                    results[user.id]['sms'] = self._send_sms_notification(
+                        user, message, scheduled_at, prefs_by_user[user.id]
+                    )
+                
+                # Queue email and push once the notification is committed
+                transaction.on_commit(lambda: self._queue_bulk_deliveries(
+                    deliveries, notification, title, message, priority, data,
+                    scheduled_at, template_name, template_context
+                ))
+        except Exception as e:
+            logger.error(f"Error sending bulk notification '{title}': {str(e)}")
+            for user_results in results.values():
+                for channel in user_results:
+                    user_results[channel] = False
+            return results
+        
+        logger.info(
+            f"Bulk notification {notification.pk} sent to {len(results)} users "
+            f"({', '.join(f'{channel}: {len(channel_users)}' for channel, channel_users in deliveries.items())})"
+        )
         return results
     
     def send_medication_reminder(
@@ -226,6 +290,51 @@ class NotificationService:
             template_name='medication_reminder'
         )
     
+    def send_medication_reminder_batch(
+        self,
+        reminders: List[Dict[str, Any]],
+        channels: List[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Deliver a batch of medication reminders.
+        
+        Preferences for the whole batch are loaded in one query. Reminders are
+        dropped for users who disabled medication reminders or are currently
+        in their quiet hours.
+        
+        Args:
+            reminders: Reminder payloads with user_id, medication_name, dosage and time
+            channels: Channels to use
+            
+        Returns:
+            Dict with delivery counts
+        """
+        stats = {'sent': 0, 'disabled': 0, 'quiet_hours': 0, 'failed': 0}
+        prefs_by_user = self.get_bulk_user_preferences(
+            {reminder['user_id'] for reminder in reminders}, select_user=True
+        )
+        
+        for reminder in reminders:
+            prefs = prefs_by_user.get(reminder['user_id'])
+            if prefs is None or not prefs.medication_reminders_enabled:
+                stats['disabled'] += 1
+                continue
+            
+            if prefs.is_in_quiet_hours:
+                stats['quiet_hours'] += 1
+                continue
+            
+            results = self.send_medication_reminder(
+                user=prefs.user,
+                medication_name=reminder['medication_name'],
+                dosage=reminder['dosage'],
+                time=reminder['time'],
+                channels=channels,
+            )
+            stats['sent' if any(results.values()) else 'failed'] += 1
+        
+        return stats
+    
     def send_stock_alert(
         self,
         user: User,
@@ -332,6 +441,30 @@ class NotificationService:
         prefs, created = UserNotificationPreferences.objects.get_or_create(user=user)
         return prefs
     
+    def get_bulk_user_preferences(
+        self,
+        user_ids,
+        select_user: bool = False
+    ) -> Dict[int, UserNotificationPreferences]:
+        """Get preferences for many users in one query, creating missing ones."""
+        user_ids = set(user_ids)
+        queryset = UserNotificationPreferences.objects.all()
+        if select_user:
+            queryset = queryset.select_related('user')
+        
+        prefs_by_user = {prefs.user_id: prefs for prefs in queryset.filter(user_id__in=user_ids)}
+        
+        missing = user_ids - set(prefs_by_user)
+        if missing:
+            UserNotificationPreferences.objects.bulk_create(
+                [UserNotificationPreferences(user_id=user_id) for user_id in missing],
+                ignore_conflicts=True
+            )
+            for prefs in queryset.filter(user_id__in=missing):
+                prefs_by_user[prefs.user_id] = prefs
+        
+        return prefs_by_user
+    
     def _filter_channels_by_preferences(
         self, 
         channels: List[str], 
@@ -353,22 +486,29 @@ class NotificationService:
         return filtered
     
     def _check_rate_limit(self, user: User, channel: str) -> bool:
-        """Check if user has exceeded rate limits for the channel."""
+        """Count a delivery against the user's limits for the channel, if within them."""
+        return self.rate_limiter.hit(*self._rate_limits(user.id, channel))
+    
+    def _rate_limits(self, user_id: int, channel: str) -> List[RateLimit]:
+        """Get the hourly and daily rate limits for a user and channel."""
         limits = settings.NOTIFICATION_RATE_LIMITS.get(channel, {})
+        return [
+            RateLimit(
+                f"notif_rate_limit:{user_id}:{channel}:hour", limits.get('per_user_per_hour', 100), 60 * 60
+            ),
+            RateLimit(
+                f"notif_rate_limit:{user_id}:{channel}:day", limits.get('per_user_per_day', 1000), 24 * 60 * 60
+            ),
+        ]
+    
+    def _check_bulk_rate_limits(self, pairs: List[tuple]) -> set:
+        """
+        Count deliveries for many (user_id, channel) pairs in one rate limiter call.
         
-        # Check hourly limit
-        hourly_key = f"notif_rate_limit:{user.id}:{channel}:hour:{timezone.now().strftime('%Y%m%d%H')}"
-        hourly_count = self.rate_limit_cache.get(hourly_key, 0)
-        if hourly_count >= limits.get('per_user_per_hour', 100):
-            return False
-        
-        # Check daily limit
-        daily_key = f"notif_rate_limit:{user.id}:{channel}:day:{timezone.now().strftime('%Y%m%d')}"
-        daily_count = self.rate_limit_cache.get(daily_key, 0)
-        if daily_count >= limits.get('per_user_per_day', 1000):
-            return False
-        
-        return True
+        Returns:
+            Set of the pairs that were within their limits
+        """
+        return self.rate_limiter.hit_many({pair: self._rate_limits(*pair) for pair in pairs})
     
     def _create_notification_record(
         self,
@@ -380,16 +520,17 @@ class NotificationService:
         data: Dict[str, Any]
     ) -> Notification:
         """Create a notification record in the database."""
-        return Notification.objects.create(
+        notification = Notification.objects.create(
             title=title,
             content=message,
             notification_type=notification_type,
             priority=priority,
-            status='active',
-            target_users=[user],
+            status=Notification.Status.ACTIVE,
             created_by=user,
-            **data
+            data=data,
         )
+        notification.target_users.add(user)
+        return notification
     
     def _send_to_channel(
         self,
@@ -431,14 +572,7 @@ class NotificationService:
         """Send in-app notification using our own implementation."""
         try:
             # Create a user notification record
-            UserNotification.objects.create(
-                user=user,
-                notification=notification,
-                title=title,
-                message=message,
-                is_read=False,
-                created_at=timezone.now()
-            )
+            UserNotification.objects.get_or_create(user=user, notification=notification)
             
             logger.info(f"In-app notification created for user {user.id}: {title}")
             return True
@@ -551,21 +685,26 @@ class NotificationService:
         self, 
         user: User, 
         message: str, 
-        scheduled_at: Optional[datetime]
+        scheduled_at: Optional[datetime],
+        prefs: Optional[UserNotificationPreferences] = None
     ) -> bool:
-        """Send SMS notification (placeholder for external service integration)."""
+        """
+        Send SMS notification (placeholder for external service integration).
+        
+        Single and bulk sends both go through here. Until an SMS service is
+        integrated nothing is sent, so the delivery is reported as failed.
+        """
         try:
-            # Get user's phone number from preferences
-            prefs = self._get_user_preferences(user)
+            # Get user's phone number from preferences, unless already loaded
+            if prefs is None:
+                prefs = self._get_user_preferences(user)
             if not prefs.sms_phone_number:
                 logger.warning(f"No SMS phone number for user {user.id}")
                 return False
             
             # TODO: Integrate with SMS service (Twilio, AWS SNS, etc.)
-            # For now, just log the SMS
-            logger.info(f"SMS to {prefs.sms_phone_number}: {message}")
-            
-            return True
+            logger.warning(f"No SMS service is integrated; SMS to user {user.id} was not sent")
+            return False
         except Exception as e:
             logger.error(f"Error sending SMS notification: {str(e)}")
             return False
@@ -573,13 +712,19 @@ class NotificationService:
     def _group_users_by_preferences(
         self, 
         users: List[User], 
-        channels: List[str]
+        channels: List[str],
+        prefs_by_user: Optional[Dict[int, UserNotificationPreferences]] = None
     ) -> Dict[str, List[User]]:
         """Group users by their notification preferences for efficient sending."""
+        if prefs_by_user is None:
+            prefs_by_user = self.get_bulk_user_preferences([user.id for user in users])
+        
         groups = {}
         
         for user in users:
-            prefs = self._get_user_preferences(user)
+            prefs = prefs_by_user.get(user.id)
+            if prefs is None:
+                continue
             filtered_channels = self._filter_channels_by_preferences(channels, prefs)
             
             if filtered_channels:
@@ -590,37 +735,41 @@ class NotificationService:
         
         return groups
     
-    def _send_bulk_to_group(
+    def _queue_bulk_deliveries(
         self,
-        users: List[User],
+        deliveries: Dict[str, List[User]],
+        notification: Notification,
         title: str,
         message: str,
-        notification_type: str,
-        channels: List[str],
         priority: str,
         data: Dict[str, Any],
         scheduled_at: Optional[datetime],
         template_name: Optional[str],
         template_context: Optional[Dict[str, Any]]
-    ) -> Dict[str, Dict[str, bool]]:
-        """Send bulk notifications to a group of users with same preferences."""
-        results = {}
-        
-        for user in users:
-            results[user.id] = self.send_notification(
-                user=user,
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                channels=channels,
-                priority=priority,
-                data=data,
-                scheduled_at=scheduled_at,
+    ) -> None:
+        """Hand email and push deliveries to Celery in chunks."""
+        from .tasks import send_bulk_email_notifications_task, send_bulk_push_notifications_task
+        
+        email_ids = [user.id for user in deliveries.get('email', [])]
+        for offset in range(0, len(email_ids), self.BULK_CHUNK_SIZE):
+            send_bulk_email_notifications_task.delay(
+                email_ids[offset:offset + self.BULK_CHUNK_SIZE],
+                str(title), str(message),
                 template_name=template_name,
                 template_context=template_context,
+                scheduled_at=scheduled_at,
+                priority=priority,
             )
         
-        return results
+        push_ids = [user.id for user in deliveries.get('push', [])]
+        for offset in range(0, len(push_ids), self.BULK_CHUNK_SIZE):
+            send_bulk_push_notifications_task.delay(
+                push_ids[offset:offset + self.BULK_CHUNK_SIZE],
+                str(title), str(message),
+                notification_id=notification.pk,
+                notification_type=notification.notification_type,
+                data=data,
+            )
     
     def _update_notification_results(
         self, 
@@ -628,10 +777,14 @@ class NotificationService:
         results: Dict[str, bool]
     ) -> None:
         """Update notification record with sending results."""
-        # Create user notification records
-        for user in notification.target_users.all():
+        # Create user notification records for targets the in-app channel did not reach
+        for user in notification.target_users.exclude(user_notifications__notification=notification):
             UserNotification.objects.create(
                 user=user,
                 notification=notification,
                 status='unread' if any(results.values()) else 'failed'
-            ) 
\ No newline at end of file
+            )
+
+
+# Shared service instance for tasks and signal handlers
+notification_service = NotificationService()
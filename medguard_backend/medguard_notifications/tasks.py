@@ -21,6 +21,7 @@ from celery.utils.log import get_task_logger
 # Post-office imports
 from post_office import mail as po_mail
 from post_office.models import Email, EmailTemplate
+from push_notifications.models import APNSDevice, GCMDevice
 
 # Local imports
 from .services import notification_service
@@ -135,15 +136,13 @@ def send_bulk_email_notifications_task(
         priority: Email priority
     """
     try:
-        users = User.objects.filter(id__in=user_ids)
-        
-        # Filter users by preferences
-        users_with_prefs = []
-        for user in users:
-            prefs = UserNotificationPreferences.objects.get_or_create(user=user)[0]
-            if (prefs.email_notifications_enabled and 
-                (not prefs.is_in_quiet_hours or priority == 'critical')):
-                users_with_prefs.append(user)
+        # Filter users by preferences, loaded for the whole chunk at once
+        prefs_by_user = notification_service.get_bulk_user_preferences(user_ids, select_user=True)
+        users_with_prefs = [
+            prefs.user for prefs in prefs_by_user.values()
+            if (prefs.email_notifications_enabled and
+                (not prefs.is_in_quiet_hours or priority == 'critical'))
+        ]
         
         if not users_with_prefs:
             logger.info("No users eligible for bulk email notification")
@@ -193,6 +192,53 @@ def send_bulk_email_notifications_task(
         self.retry(exc=exc)
 
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_bulk_push_notifications_task(
+    self,
+    user_ids: List[int],
+    title: str,
+    message: str,
+    notification_id: Optional[int] = None,
+    notification_type: str = 'general',
+    data: Optional[Dict[str, Any]] = None
+):
+    """
+    Send bulk push notifications asynchronously.
+    
+    Devices for the whole chunk are loaded in one query per platform and
+    sent in one batch each.
+    
+    Args:
+        user_ids: List of user IDs to send push notifications to
+        title: Notification title
+        message: Notification message
+        notification_id: ID of the shared notification record
+        notification_type: Type of notification
+        data: Additional data for the notification
+    """
+    try:
+        extra = dict(data or {})
+        extra.update({
+            'message': message,
+            'notification_id': notification_id,
+            'type': notification_type,
+        })
+        
+        gcm_devices = GCMDevice.objects.filter(user_id__in=user_ids, active=True)
+        apns_devices = APNSDevice.objects.filter(user_id__in=user_ids, active=True)
+        
+        if gcm_devices.exists():
+            gcm_devices.send_message(title, extra=extra)
+        if apns_devices.exists():
+            apns_devices.send_message(title, extra=extra)
+        
+        logger.info(f"Bulk push notifications sent to {len(user_ids)} users")
+        
+    except Exception as exc:
+        logger.error(f"Error sending bulk push notifications: {str(exc)}")
+        self.retry(exc=exc)
+
+
 @shared_task
 def send_daily_digest_notifications():
     """
@@ -422,25 +468,38 @@ def send_medication_reminders():
     """
     Send medication reminders to users.
     
-    This task checks for users who need medication reminders and sends
-    them notifications.
+    Claims the doses that have come due from the medication schedule
+    reminder index and fans them out to send_medication_reminder_batch.
     """
     try:
-        # Get users with medication reminders enabled
-        users = User.objects.filter(
-            notification_preferences__medication_reminders_enabled=True
-        )
+        from .reminders import MedicationReminderDispatcher
         
-        # TODO: Integrate with medication scheduling system
-        # For now, this is a placeholder that would check medication schedules
-        # and send reminders for medications due within the next hour
-        
-        logger.info("Medication reminders task completed")
+        stats = MedicationReminderDispatcher().dispatch_due()
+        logger.info(f"Medication reminders task completed: {stats}")
+        return stats
         
     except Exception as e:
         logger.error(f"Error in medication reminders task: {str(e)}")
 
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def send_medication_reminder_batch(self, reminders: List[Dict[str, Any]]):
+    """
+    Deliver a batch of claimed medication reminders.
+    
+    Args:
+        reminders: Reminder payloads built by MedicationReminderDispatcher
+    """
+    try:
+        stats = notification_service.send_medication_reminder_batch(reminders)
+        logger.info(f"Medication reminder batch delivered: {stats}")
+        return stats
+        
+    except Exception as e:
+        logger.error(f"Error delivering medication reminder batch: {str(e)}")
+        raise self.retry(exc=e)
+
+
 @shared_task
 def send_stock_alerts():
     """
@@ -1,3 +1,258 @@
+"""
+Tests for the MedGuard SA notification system.
+"""
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from medications.models import Medication, MedicationSchedule
+from medguard_notifications.models import Notification, UserNotification, UserNotificationPreferences
+from medguard_notifications.reminders import MedicationReminderDispatcher
+
+User = get_user_model()
+
+
+class MedicationReminderDispatcherTest(TestCase):
+    """Test the due-dose reminder index and dispatcher."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.patient = User.objects.create_user(
+            username='patient',
+            email='patient@example.com',
+            password='testpass123'
+        )
+        self.medication = Medication.objects.create(
+            name='Metformin',
+            generic_name='Metformin',
+            medication_type='tablet',
+            strength='500mg',
+            dosage_unit='mg',
+            pill_count=60
+        )
+        # Wednesday 2025-08-13, 08:00:20 local time
+        self.now = timezone.make_aware(datetime(2025, 8, 13, 8, 0, 20))
+
+    def _create_schedule(self, **kwargs):
+        defaults = {
+            'patient': self.patient,
+            'medication': self.medication,
+            'timing': MedicationSchedule.Timing.MORNING,
+            'dosage_amount': Decimal('1.00'),
+            'start_date': date(2025, 8, 1),
+        }
+        defaults.update(kwargs)
+        return MedicationSchedule.objects.create(**defaults)
+
+    def test_compute_next_due_respects_weekdays_and_end_date(self):
+        """Test next due time honours weekday flags and the schedule period."""
+        schedule = self._create_schedule(wednesday=False, thursday=False)
+        self.assertEqual(
+            schedule.compute_next_due(after=self.now),
+            timezone.make_aware(datetime(2025, 8, 15, 8, 0))
+        )
+
+        schedule.end_date = date(2025, 8, 14)
+        self.assertIsNone(schedule.compute_next_due(after=self.now))
+
+        schedule.status = MedicationSchedule.Status.PAUSED
+        self.assertIsNone(schedule.compute_next_due(after=self.now))
+
+    def test_custom_time_is_used(self):
+        """Test custom times override the timing slot."""
+        schedule = self._create_schedule(timing=MedicationSchedule.Timing.CUSTOM, custom_time=time(9, 15))
+        self.assertEqual(
+            schedule.compute_next_due(after=self.now),
+            timezone.make_aware(datetime(2025, 8, 13, 9, 15))
+        )
+
+    def test_migration_backfills_existing_schedules(self):
+        """Test the backfill migration indexes active schedules created before the column."""
+        from importlib import import_module
+
+        migration = import_module('medications.migrations.0031_backfill_next_reminder_at')
+        schedules = [
+            self._create_schedule(),
+            self._create_schedule(timing=MedicationSchedule.Timing.CUSTOM, custom_time=time(9, 15)),
+            self._create_schedule(wednesday=False, thursday=False),
+            self._create_schedule(status=MedicationSchedule.Status.PAUSED),
+        ]
+        MedicationSchedule.objects.update(next_reminder_at=None)
+
+        indexed = migration.fill_next_reminder_at(MedicationSchedule, self.now, chunk_size=2)
+
+        self.assertEqual(indexed, 3)
+        for schedule in schedules:
+            with self.subTest(schedule=schedule.pk):
+                schedule.refresh_from_db()
+                self.assertEqual(schedule.next_reminder_at, schedule.compute_next_due(after=self.now))
+
+    def test_dispatch_claims_due_doses_once(self):
+        """Test due doses are dispatched once and the index advances."""
+        due = self._create_schedule()
+        later = self._create_schedule(timing=MedicationSchedule.Timing.NIGHT)
+        MedicationReminderDispatcher().rebuild_index(now=self.now - timedelta(minutes=5))
+
+        with patch('medguard_notifications.reminders.MedicationReminderDispatcher._fan_out') as fan_out:
+            stats = MedicationReminderDispatcher().dispatch_due(now=self.now)
+            self.assertEqual(stats['dispatched'], 1)
+            reminders = fan_out.call_args[0][0]
+            self.assertEqual(reminders[0]['schedule_id'], due.id)
+            self.assertEqual(reminders[0]['time'], '08:00')
+
+            stats = MedicationReminderDispatcher().dispatch_due(now=self.now)
+            self.assertEqual(stats['dispatched'], 0)
+
+        due.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(due.next_reminder_at, timezone.make_aware(datetime(2025, 8, 14, 8, 0)))
+        self.assertEqual(later.next_reminder_at, timezone.make_aware(datetime(2025, 8, 13, 20, 0)))
+
+    def test_dispatch_query_count_is_independent_of_due_doses(self):
+        """Test a tick costs a constant number of queries per batch."""
+        for _index in range(25):
+            self._create_schedule()
+        MedicationReminderDispatcher().rebuild_index(now=self.now - timedelta(minutes=5))
+
+        dispatcher = MedicationReminderDispatcher(batch_size=100)
+        with patch.object(dispatcher, '_fan_out'):
+            # one claim (savepoint, select, bulk update) plus the empty final claim
+            with self.assertNumQueries(7):
+                stats = dispatcher.dispatch_due(now=self.now)
+        self.assertEqual(stats['dispatched'], 25)
+
+    def test_dispatch_delivers_in_app_reminder(self):
+        """Test a claimed dose ends up as a stored in-app notification for the patient."""
+        schedule = self._create_schedule()
+        MedicationReminderDispatcher().rebuild_index(now=self.now - timedelta(minutes=5))
+
+        stats = MedicationReminderDispatcher().dispatch_due(now=self.now, enqueue=False)
+
+        self.assertEqual(stats['dispatched'], 1)
+        notification = Notification.objects.get(notification_type=Notification.NotificationType.MEDICATION)
+        self.assertEqual(list(notification.target_users.all()), [self.patient])
+        self.assertEqual(notification.data['medication_name'], 'Metformin')
+        self.assertEqual(notification.data['time'], '08:00')
+        self.assertEqual(
+            UserNotification.objects.filter(user=self.patient, notification=notification).count(), 1
+        )
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.next_reminder_at, timezone.make_aware(datetime(2025, 8, 14, 8, 0)))
+
+    def test_quiet_hours_suppress_reminders(self):
+        """Test the batch sender honours quiet hours and opt-outs."""
+        from medguard_notifications.services import NotificationService
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        UserNotificationPreferences.objects.create(user=other, medication_reminders_enabled=False)
+        UserNotificationPreferences.objects.create(
+            user=self.patient, quiet_hours_enabled=True,
+            quiet_hours_start=time(0, 0), quiet_hours_end=time(23, 59, 59)
+        )
+
+        reminders = [
+            {'user_id': self.patient.id, 'medication_name': 'Metformin', 'dosage': '1 mg', 'time': '08:00'},
+            {'user_id': other.id, 'medication_name': 'Metformin', 'dosage': '1 mg', 'time': '08:00'},
+        ]
+        with patch.object(NotificationService, 'send_medication_reminder') as send:
+            stats = NotificationService().send_medication_reminder_batch(reminders)
+
+        send.assert_not_called()
+        self.assertEqual(stats['quiet_hours'], 1)
+        self.assertEqual(stats['disabled'], 1)
+
+
+class BulkNotificationTest(TestCase):
+    """Test the batched fan-out in NotificationService.send_bulk_notifications."""
+
+    def setUp(self):
+        """Set up test data."""
+        from django.core.cache import cache
+
+        from medguard_notifications.services import NotificationService
+
+        cache.clear()
+        self.service = NotificationService()
+
+    def _create_users(self, count):
+        offset = User.objects.count()
+        users = [
+            User.objects.create_user(username=f'bulk{offset + index}', email=f'bulk{offset + index}@example.com')
+            for index in range(count)
+        ]
+        UserNotificationPreferences.objects.bulk_create(
+            [UserNotificationPreferences(user=user) for user in users]
+        )
+        return users
+
+    def _send(self, users, channels=('in_app', 'email', 'push')):
+        with patch('medguard_notifications.tasks.send_bulk_email_notifications_task.delay') as email, \
+                patch('medguard_notifications.tasks.send_bulk_push_notifications_task.delay') as push:
+            with self.captureOnCommitCallbacks(execute=True):
+                results = self.service.send_bulk_notifications(
+                    users, 'Maintenance', 'Back soon', notification_type='maintenance', channels=list(channels)
+                )
+        return results, email, push
+
+    def test_broadcast_shares_one_notification(self):
+        """Test recipients share one notification and email is queued in chunks."""
+        from medguard_notifications.models import Notification, UserNotification
+
+        users = self._create_users(5)
+        UserNotificationPreferences.objects.filter(user=users[0]).update(in_app_notifications_enabled=False)
+        self.service.BULK_CHUNK_SIZE = 2
+
+        results, email, push = self._send(users)
+
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(UserNotification.objects.count(), 4)
+        self.assertNotIn('in_app', results[users[0].id])
+        self.assertEqual(email.call_count, 3)
+        self.assertEqual(sum(len(call.args[0]) for call in email.call_args_list), 5)
+        self.assertEqual(push.call_args.kwargs['notification_id'], Notification.objects.get().pk)
+
+    def test_rate_limits_are_checked_and_counted(self):
+        """Test users over their limit are skipped and deliveries are counted."""
+        users = self._create_users(2)
+        for _ in range(10):
+            self.service._check_rate_limit(users[0], 'email')
+
+        results, email, _push = self._send(users, channels=('email',))
+
+        self.assertEqual(results, {users[0].id: {'email': False}, users[1].id: {'email': True}})
+        self.assertEqual(email.call_args.args[0], [users[1].id])
+        # The hourly email limit is 10 and the broadcast used one of them
+        self.assertEqual(sum(self.service._check_rate_limit(users[1], 'email') for _ in range(10)), 9)
+
+    def test_query_count_is_independent_of_recipients(self):
+        """Benchmark: a broadcast to 100 users costs the same queries as to 10."""
+        def count_queries(users):
+            with CaptureQueriesContext(connection) as context:
+                self._send(users)
+            return len(context.captured_queries)
+
+        small = count_queries(self._create_users(10))
+        large = count_queries(self._create_users(100))
+
+        self.assertEqual(small, large)
+
+    def test_sms_is_reported_undelivered_without_a_service(self):
+        """Test bulk SMS uses the single SMS sender and reports what it returns."""
+        users = self._create_users(2)
+        UserNotificationPreferences.objects.filter(user__in=users).update(
+            sms_notifications_enabled=True, sms_phone_number='+27821234567'
+        )
+
+        with patch.object(self.service, '_send_sms_notification', wraps=self.service._send_sms_notification) as sms:
+            results, _email, _push = self._send(users, channels=('sms',))
 
-# Create your tests here.
+        self.assertEqual(sms.call_count, 2)
+        self.assertEqual(results, {users[0].id: {'sms': False}, users[1].id: {'sms': False}})
@@ -7,16 +7,23 @@ This module contains Celery tasks for:
 - Converting to modern formats (WebP, AVIF, JPEG XL)
 - Image metadata extraction and storage
 - Batch image processing with priority handling
+
+Each source is decoded once into a downscaled working raster shared by
+every encoder, and identical uploads, recognised by their SHA-256, are
+only rendered once.
 """
 
+import hashlib
 import logging
 import os
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
 
-from celery import shared_task
+from celery import group, shared_task
 from django.core.files import File
 from django.core.files.base import ContentFile
 from django.conf import settings
@@ -230,106 +237,55 @@ def cleanup_old_medication_images_task(self, days_to_keep: int = 90):
         raise
 
 
+# Longest edge of the working raster every output is encoded from
+WORKING_MAX_SIZE = (2048, 2048)
+THUMBNAIL_SIZE = (150, 150)
+
+# Priority -> (quality settings, resize factor)
+QUALITY_PROFILES = {
+    'urgent': ({'quality': 85, 'optimize': True}, 0.8),
+    'high': ({'quality': 90, 'optimize': True}, 0.9),
+    'medium': ({'quality': 85, 'optimize': True}, 0.8),
+    'low': ({'quality': 80, 'optimize': True}, 0.7),
+}
+
+# Output name, medication field and Pillow format, in encoding order
+IMAGE_OUTPUTS = (
+    ('thumbnail', 'medication_image_thumbnail', 'JPEG'),
+    ('webp', 'medication_image_webp', 'WEBP'),
+    ('jpeg', 'medication_image', 'JPEG'),
+    ('avif', 'medication_image_avif', 'AVIF'),
+    ('jxl', 'medication_image_jpeg_xl', 'JPEG_XL'),
+)
+
+FILE_EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'AVIF': 'avif', 'JPEG_XL': 'jxl'}
+
+
 def process_image_with_pillow(source_image, medication: Medication) -> Dict[str, Any]:
     """
     Process medication image using Pillow with optimization.
     
+    The source is skipped when this or another medication has already been
+    processed from identical content at the same priority.
+    
     Args:
-        source_image: Source image field
+        source_image: Source Wagtail image
         medication: Medication instance
     
     Returns:
         Dictionary with processing results
     """
     try:
-        # Open the image
-        with Image.open(source_image.path) as img:
-            # Convert to RGB if necessary
-            if img.mode not in ('RGB', 'RGBA'):
-                img = img.convert('RGB')
-            
-            # Extract metadata
-            metadata = {
-                'original_format': img.format,
-                'original_mode': img.mode,
-                'original_size': img.size,
-                'original_width': img.width,
-                'original_height': img.height,
-                'processed_at': timezone.now().isoformat(),
-            }
-            
-            # Determine optimization level based on priority
-            optimization_level = medication.image_processing_priority
-            if optimization_level == 'urgent':
-                quality_settings = {'quality': 85, 'optimize': True}
-                resize_factor = 0.8
-            elif optimization_level == 'high':
-                quality_settings = {'quality': 90, 'optimize': True}
-                resize_factor = 0.9
-            elif optimization_level == 'medium':
-                quality_settings = {'quality': 85, 'optimize': True}
-                resize_factor = 0.8
-            else:  # low
-                quality_settings = {'quality': 80, 'optimize': True}
-                resize_factor = 0.7
-            
-            # Create optimized versions
-            results = {}
-            
-            # 1. Create thumbnail (150x150)
-            thumbnail = create_thumbnail(img, (150, 150))
-            if thumbnail:
-                thumbnail_path = save_image_to_field(thumbnail, medication, 'medication_image_thumbnail', 'JPEG', quality_settings)
-                results['thumbnail'] = thumbnail_path
-            
-            # 2. Create WebP version
-            webp_image = img.copy()
-            webp_path = save_image_to_field(webp_image, medication, 'medication_image_webp', 'WEBP', quality_settings)
-            results['webp'] = webp_path
-            
-            # 3. Create optimized JPEG
-            optimized_jpeg = img.copy()
-            if resize_factor < 1.0:
-                new_size = (int(img.width * resize_factor), int(img.height * resize_factor))
-                optimized_jpeg = optimized_jpeg.resize(new_size, Resampling.LANCZOS)
-            
-            # Apply basic enhancements
-            optimized_jpeg = enhance_image(optimized_jpeg, optimization_level)
-            
-            jpeg_path = save_image_to_field(optimized_jpeg, medication, 'medication_image', 'JPEG', quality_settings)
-            results['jpeg'] = jpeg_path
-            
-            # 4. Try to create AVIF (if supported)
-            try:
-                avif_path = save_image_to_field(img, medication, 'medication_image_avif', 'AVIF', quality_settings)
-                results['avif'] = avif_path
-            except Exception as e:
-                logger.warning(f"AVIF not supported: {e}")
-                results['avif'] = None
-            
-            # 5. Try to create JPEG XL (if supported)
-            try:
-                jxl_path = save_image_to_field(img, medication, 'medication_image_jpeg_xl', 'JPEG_XL', quality_settings)
-                results['jxl'] = jxl_path
-            except Exception as e:
-                logger.warning(f"JPEG XL not supported: {e}")
-                results['jxl'] = None
-            
-            # Update metadata with results
-            metadata.update({
-                'processed_formats': list(results.keys()),
-                'optimization_level': optimization_level,
-                'quality_settings': quality_settings,
-                'resize_factor': resize_factor,
-            })
-            
-            return {
-                'success': True,
-                'metadata': metadata,
-                'optimization_level': optimization_level,
-                'results': results
-            }
-            
+        data = read_image_bytes(source_image)
+        content_hash = hashlib.sha256(data).hexdigest()
+        
+        reused = reuse_processed_image(medication, content_hash)
+        if reused is not None:
+            return reused
+        
+        rendered = render_image_variants(data, medication.image_processing_priority)
+        return store_image_variants(medication, source_image, content_hash, rendered)
+        
     except Exception as e:
         logger.error(f"Error processing image for {medication.name}: {e}")
         return {
@@ -340,21 +296,106 @@ def process_image_with_pillow(source_image, medication: Medication) -> Dict[str,
         }
 
 
+def read_image_bytes(source_image) -> bytes:
+    """Read the stored file of a Wagtail image."""
+    with source_image.open_file() as f:
+        return f.read()
+
+
+def render_image_variants(data: bytes, optimization_level: str) -> Dict[str, Any]:
+    """
+    Decode an image once and encode every output from one working raster.
+    
+    JPEG sources are decoded straight at a reduced scale with
+    ``Image.draft``; other sources are shrunk with ``reduce`` before the
+    final resample. The working raster is shared by the encoders, and only
+    the thumbnail and the enhanced JPEG allocate another raster. Runs
+    without Django, so it can be used in a process pool.
+    
+    Args:
+        data: Encoded source image
+        optimization_level: Processing priority, selecting quality and size
+    
+    Returns:
+        Dictionary with metadata and the encoded bytes of each output
+        (None for formats this Pillow build cannot write)
+    """
+    quality_settings, resize_factor = QUALITY_PROFILES.get(optimization_level, QUALITY_PROFILES['low'])
+    
+    with Image.open(BytesIO(data)) as img:
+        metadata = {
+            'original_format': img.format,
+            'original_mode': img.mode,
+            'original_size': img.size,
+            'original_width': img.width,
+            'original_height': img.height,
+        }
+        
+        target_size = working_size(img.size, resize_factor)
+        if img.format == 'JPEG':
+            # The decoder scales by 1/2, 1/4 or 1/8 while decoding
+            img.draft('RGB', target_size)
+        
+        working = img if img.mode in ('RGB', 'RGBA') else img.convert('RGB')
+        if working.size != target_size:
+            working = working.resize(target_size, Resampling.LANCZOS, reducing_gap=2.0)
+        working.load()
+    
+    outputs = {}
+    for name, _, format in IMAGE_OUTPUTS:
+        if name == 'thumbnail':
+            source = create_thumbnail(working, THUMBNAIL_SIZE)
+        elif name == 'jpeg':
+            source = enhance_image(working, optimization_level)
+        else:
+            source = working
+        
+        try:
+            outputs[name] = encode_image(source, format, quality_settings) if source is not None else None
+        except (KeyError, OSError) as e:
+            logger.warning(f"{format} not supported: {e}")
+            outputs[name] = None
+    
+    metadata.update({
+        'working_size': working.size,
+        'processed_formats': [name for name, encoded in outputs.items() if encoded is not None],
+        'optimization_level': optimization_level,
+        'quality_settings': quality_settings,
+        'resize_factor': resize_factor,
+    })
+    return {'metadata': metadata, 'outputs': outputs}
+
+
+def _render_image_variants_safely(data: bytes, optimization_level: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Render in a worker process, returning the error rather than raising it."""
+    try:
+        return render_image_variants(data, optimization_level), None
+    except Exception as e:
+        return None, str(e)
+
+
+def working_size(size: Tuple[int, int], resize_factor: float) -> Tuple[int, int]:
+    """Size of the working raster: scaled by resize_factor and within WORKING_MAX_SIZE."""
+    width, height = size
+    scale = min(resize_factor, WORKING_MAX_SIZE[0] / width, WORKING_MAX_SIZE[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
 def create_thumbnail(img: Image.Image, size: Tuple[int, int]) -> Optional[Image.Image]:
-    """Create a thumbnail from the image."""
+    """Create a thumbnail from the image, leaving the image itself untouched."""
     try:
-        thumbnail = img.copy()
-        thumbnail.thumbnail(size, Resampling.LANCZOS)
-        return thumbnail
+        scale = min(size[0] / img.width, size[1] / img.height, 1.0)
+        thumbnail_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        return img.resize(thumbnail_size, Resampling.LANCZOS, reducing_gap=2.0)
     except Exception as e:
         logger.error(f"Error creating thumbnail: {e}")
         return None
 
 
 def enhance_image(img: Image.Image, optimization_level: str) -> Image.Image:
-    """Apply image enhancements based on optimization level."""
+    """Apply image enhancements based on optimization level; the image itself is left untouched."""
     try:
-        enhanced = img.copy()
+        enhanced = img
         
         if optimization_level in ['high', 'urgent']:
             # Apply sharpening
@@ -375,36 +416,100 @@ def enhance_image(img: Image.Image, optimization_level: str) -> Image.Image:
         return img
 
 
-def save_image_to_field(img: Image.Image, medication: Medication, field_name: str, 
-                       format: str, quality_settings: Dict[str, Any]) -> Optional[str]:
-    """Save image to a specific field of the medication model."""
+def encode_image(img: Image.Image, format: str, quality_settings: Dict[str, Any]) -> bytes:
+    """Encode an image, dropping transparency for formats without it."""
+    if format == 'JPEG' and img.mode != 'RGB':
+        img = img.convert('RGB')
+    buffer = BytesIO()
+    img.save(buffer, format=format, **quality_settings)
+    return buffer.getvalue()
+
+
+def reuse_processed_image(medication: Medication, content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Reuse earlier outputs rendered from identical content, if there are any.
+    
+    The medication may itself have been processed from this content: its
+    source, or the JPEG written back into its primary image. Otherwise the
+    outputs of another medication processed from the same upload at the
+    same priority are shared.
+    
+    Returns:
+        Processing result, or None if the image has to be rendered
+    """
+    level = medication.image_processing_priority
+    metadata = medication.image_metadata or {}
+    if (content_hash in (metadata.get('content_hash'), metadata.get('processed_hash'))
+            and metadata.get('optimization_level') == level and medication.medication_image_webp_id):
+        return {'success': True, 'skipped': True, 'metadata': metadata, 'optimization_level': level, 'results': {}}
+    
+    processed = Medication.objects.filter(
+        image_metadata__content_hash=content_hash,
+        image_metadata__optimization_level=level,
+        image_processing_status='completed',
+    ).exclude(pk=medication.pk).exclude(medication_image_webp=None).first()
+    if processed is None:
+        return None
+    
+    if medication.medication_image_original_id is None:
+        medication.medication_image_original_id = medication.medication_image_id
+    for _, field_name, _ in IMAGE_OUTPUTS:
+        setattr(medication, f"{field_name}_id", getattr(processed, f"{field_name}_id"))
+    
+    return {
+        'success': True,
+        'reused_from': processed.pk,
+        'metadata': processed.image_metadata,
+        'optimization_level': level,
+        'results': {}
+    }
+
+
+def store_image_variants(medication: Medication, source_image, content_hash: str,
+                         rendered: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Save rendered outputs as Wagtail images and point the medication at them.
+    
+    The source stays available as the original image, since the processed
+    JPEG replaces the primary image. The medication itself is saved by the caller.
+    """
+    if medication.medication_image_original_id is None:
+        medication.medication_image_original = source_image
+    
+    results = {}
+    for name, field_name, format in IMAGE_OUTPUTS:
+        encoded = rendered['outputs'].get(name)
+        results[name] = save_image_to_field(encoded, medication, field_name, format) if encoded else None
+    
+    metadata = dict(rendered['metadata'])
+    metadata['processed_at'] = timezone.now().isoformat()
+    metadata['content_hash'] = content_hash
+    if rendered['outputs'].get('jpeg'):
+        metadata['processed_hash'] = hashlib.sha256(rendered['outputs']['jpeg']).hexdigest()
+    
+    return {
+        'success': True,
+        'metadata': metadata,
+        'optimization_level': metadata['optimization_level'],
+        'results': results
+    }
+
+
+def save_image_to_field(data: bytes, medication: Medication, field_name: str, format: str) -> Optional[str]:
+    """Save encoded image bytes as a Wagtail image and assign it to a field of the medication."""
     try:
-        # Create a BytesIO buffer
-        buffer = BytesIO()
-        
-        # Save image to buffer
-        if format == 'JPEG':
-            img.save(buffer, format='JPEG', **quality_settings)
-        elif format == 'WEBP':
-            img.save(buffer, format='WEBP', **quality_settings)
-        elif format == 'AVIF':
-            img.save(buffer, format='AVIF', **quality_settings)
-        elif format == 'JPEG_XL':
-            img.save(buffer, format='JPEG_XL', **quality_settings)
-        else:
-            img.save(buffer, format=format, **quality_settings)
-        
-        # Reset buffer position
-        buffer.seek(0)
+        image_model = Medication._meta.get_field(field_name).related_model
+        filename = f"{medication.id}_{field_name}.{FILE_EXTENSIONS.get(format, format.lower())}"
         
-        # Create filename
-        filename = f"{medication.id}_{field_name}_{format.lower()}.{format.lower()}"
-        
-        # Save to field
-        field = getattr(medication, field_name)
-        field.save(filename, ContentFile(buffer.getvalue()), save=False)
+        image = image_model(
+            title=f"{medication.name} ({field_name.replace('_', ' ')})",
+            file=ContentFile(data, name=filename)
+        )
+        image._set_image_file_metadata()
+        image.save()
         
-        return field.name
+        setattr(medication, field_name, image)
+        return image.file.name
         
     except Exception as e:
         logger.error(f"Error saving {format} image for {medication.name}: {e}")
@@ -453,16 +558,34 @@ def extract_image_metadata_task(self, medication_id: int):
         raise
 
 
+# Distinct sources rendered per chunk task when a batch is fanned out
+IMAGE_CHUNK_SIZE = 4
+
+
 @shared_task(bind=True, name='medications.batch_image_processing')
-def batch_image_processing_task(self, medication_ids: list = None, priority: str = 'medium'):
+def batch_image_processing_task(self, medication_ids: list = None, priority: str = 'medium',
+                                chunk_size: int = IMAGE_CHUNK_SIZE, workers: Optional[int] = 0):
     """
     Process multiple medication images in batch.
     
+    Sources are read and hashed here. Identical uploads are rendered once
+    and sources processed before are reused. When more than chunk_size
+    distinct sources remain, they are split into chunks rendered in
+    parallel as a group of ``render_medication_images_task`` tasks, with
+    identical uploads kept in the same chunk; smaller batches are rendered
+    here.
+    
     Args:
         medication_ids: List of medication IDs to process
         priority: Processing priority level
+        chunk_size: Distinct sources per chunk task; 0 renders the whole batch here
+        workers: Rendering processes for batches rendered here; 0 renders in
+            this process, None uses up to four cores. Prefork Celery workers
+            are daemonic and cannot start a pool, so only direct callers
+            should pass anything else.
     """
     try:
+        started = time.monotonic()
         if medication_ids:
             medications = Medication.objects.filter(id__in=medication_ids)
         else:
@@ -470,28 +593,148 @@ def batch_image_processing_task(self, medication_ids: list = None, priority: str
             medications = Medication.objects.filter(
                 image_processing_status='pending'
             ).order_by('-image_processing_priority', 'created_at')[:50]  # Limit batch size
+        medications = list(medications)
         
         # Update priorities if specified
         if priority != 'medium':
-            medications.update(image_processing_priority=priority)
+            Medication.objects.filter(id__in=[medication.id for medication in medications]).update(
+                image_processing_priority=priority
+            )
+            for medication in medications:
+                medication.image_processing_priority = priority
+        
+        stats = {'total': len(medications), 'processed': 0, 'reused': 0, 'failed': 0}
+        pending = _collect_image_sources(medications, stats)
+        keys = list(pending)
+        
+        if chunk_size and len(keys) > chunk_size:
+            chunks = [
+                [medication.id for key in keys[offset:offset + chunk_size] for medication in pending[key][2]]
+                for offset in range(0, len(keys), chunk_size)
+            ]
+            group_result = group(render_medication_images_task.s(chunk) for chunk in chunks).apply_async()
+            stats['queued'] = sum(len(chunk) for chunk in chunks)
+            logger.info(
+                f"Batch image processing: {len(keys)} sources queued in {len(chunks)} chunks, "
+                f"{stats['reused']} reused, {stats['failed']} failed"
+            )
+            return {
+                'status': 'queued', 'priority': priority, 'chunks': len(chunks),
+                'task_ids': [result.id for result in group_result.results], **stats
+            }
         
-        # Queue processing tasks
-        for medication in medications:
-            if priority == 'urgent':
-                process_urgent_images_task.delay()
-            elif priority == 'high':
-                process_high_priority_images_task.delay()
-            elif priority == 'low':
-                process_low_priority_images_task.delay()
-            else:
-                process_standard_images_task.delay()
+        _render_image_sources(pending, workers, stats)
         
-        return {
-            'status': 'success',
-            'medications_queued': len(medications),
-            'priority': priority
-        }
+        elapsed = time.monotonic() - started
+        stats['rendered'] = len(keys)
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['images_per_second'] = round(len(medications) / elapsed, 2) if elapsed > 0 else None
+        logger.info(
+            f"Batch image processing: {stats['processed']} processed, {stats['reused']} reused, "
+            f"{stats['failed']} failed in {elapsed:.2f}s"
+        )
+        return {'status': 'success', 'priority': priority, **stats}
         
     except Exception as e:
         logger.error(f"Error in batch_image_processing_task: {e}")
-        raise 
\ No newline at end of file
+        raise
+
+
+@shared_task(bind=True, name='medications.render_medication_images')
+def render_medication_images_task(self, medication_ids: list):
+    """
+    Render one chunk of a fanned-out image batch in this worker process.
+    
+    Args:
+        medication_ids: Medications whose sources belong to this chunk
+    """
+    try:
+        medications = list(Medication.objects.filter(id__in=medication_ids))
+        stats = {'total': len(medications), 'processed': 0, 'reused': 0, 'failed': 0}
+        pending = _collect_image_sources(medications, stats)
+        _render_image_sources(pending, 0, stats)
+        stats['rendered'] = len(pending)
+        return {'status': 'success', **stats}
+        
+    except Exception as e:
+        logger.error(f"Error in render_medication_images_task: {e}")
+        raise
+
+
+def _collect_image_sources(medications, stats: Dict[str, int]) -> Dict[Tuple[str, str], Tuple[bytes, Any, list]]:
+    """
+    Read and hash each medication's source, finishing those that need no rendering.
+    
+    Returns:
+        Dict mapping (content hash, priority) to the source bytes, the source
+        image and the medications sharing it
+    """
+    pending = {}
+    for medication in medications:
+        source_image = medication.medication_image or medication.medication_image_original
+        if not source_image:
+            _finish_image_processing(medication, {'success': False, 'error': 'No source image found'}, stats)
+            continue
+        try:
+            data = read_image_bytes(source_image)
+            content_hash = hashlib.sha256(data).hexdigest()
+            reused = reuse_processed_image(medication, content_hash)
+        except Exception as e:
+            _finish_image_processing(medication, {'success': False, 'error': str(e)}, stats)
+            continue
+        if reused is not None:
+            _finish_image_processing(medication, reused, stats)
+            continue
+        
+        # Medications sharing a source and priority are rendered once
+        key = (content_hash, medication.image_processing_priority)
+        if key not in pending:
+            pending[key] = (data, source_image, [])
+        pending[key][2].append(medication)
+    return pending
+
+
+def _render_image_sources(pending: Dict[Tuple[str, str], Tuple[bytes, Any, list]],
+                          workers: Optional[int], stats: Dict[str, int]) -> None:
+    """Render each distinct source once and save the outputs for every medication sharing it."""
+    keys = list(pending)
+    args = ([pending[key][0] for key in keys], [key[1] for key in keys])
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+    if workers > 0 and len(keys) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(_render_image_variants_safely, *args))
+    else:
+        rendered = list(map(_render_image_variants_safely, *args))
+    
+    for key, (variants, error) in zip(keys, rendered):
+        data, source_image, group_medications = pending[key]
+        first = group_medications[0]
+        if error is not None:
+            result = {'success': False, 'error': error}
+        else:
+            result = store_image_variants(first, source_image, key[0], variants)
+        _finish_image_processing(first, result, stats)
+        
+        # Identical uploads point at the images just saved
+        for medication in group_medications[1:]:
+            reused = reuse_processed_image(medication, key[0]) if result['success'] else None
+            _finish_image_processing(medication, reused or result, stats)
+
+
+def _finish_image_processing(medication: Medication, result: Dict[str, Any], stats: Dict[str, int]) -> None:
+    """Record the outcome of processing a medication's image."""
+    medication.image_processing_last_attempt = timezone.now()
+    medication.image_processing_attempts += 1
+    if result['success']:
+        medication.image_processing_status = 'completed'
+        medication.image_processing_error = ''
+        medication.image_metadata = result['metadata']
+        medication.image_optimization_level = result['optimization_level']
+        stats['reused' if result.get('skipped') or result.get('reused_from') else 'processed'] += 1
+    else:
+        medication.image_processing_status = 'failed'
+        medication.image_processing_error = result['error']
+        stats['failed'] += 1
+        logger.error(f"Failed to process image for {medication.name}: {result['error']}")
+    medication.save()
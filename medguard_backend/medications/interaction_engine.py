@@ -0,0 +1,150 @@
+"""
+Set-based drug interaction and contraindication checks.
+
+Medication names are tokenized into the ingredient keywords they contain
+with one precompiled ``KeywordAutomaton`` pass, and the resulting ingredient
+sets are cached per name. Interaction and contraindication lookups are then
+set intersections against tables compiled once from
+``MedicationInteractionValidator``'s dictionaries.
+
+``PatientMedicationProfile`` holds a patient's active medications and their
+ingredient sets. Serializers build it once per request and keep it in their
+context, so serializing a list of medications does not query the patient's
+schedules for every object.
+"""
+
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .text_matching import KeywordAutomaton
+
+PATIENT_PROFILE_CONTEXT_KEY = '_patient_medication_profile'
+
+
+class InteractionEngine:
+    """
+    Interaction and contraindication checks compiled from keyword tables.
+
+    Args:
+        known_interactions: Drug keyword to its interacting keywords,
+            severity and description
+        contraindications: Condition to contraindicated keywords, severity
+            and description
+    """
+
+    def __init__(self, known_interactions: Mapping[str, Dict], contraindications: Mapping[str, Dict]):
+        self.interacting: Dict[str, FrozenSet[str]] = {
+            drug: frozenset(data['interactions']) for drug, data in known_interactions.items()
+        }
+        self.interaction_data = dict(known_interactions)
+        self.contraindicated: Dict[str, Tuple[str, ...]] = {
+            condition: tuple(dict.fromkeys(data['medications'])) for condition, data in contraindications.items()
+        }
+        self.contraindication_data = dict(contraindications)
+
+        keywords = set(self.interacting)
+        for interacting in self.interacting.values():
+            keywords.update(interacting)
+        for medications in self.contraindicated.values():
+            keywords.update(medications)
+        self.automaton = KeywordAutomaton(keywords)
+        self.ingredients = lru_cache(maxsize=4096)(self._ingredients)
+
+    def _ingredients(self, medication_name: str) -> FrozenSet[str]:
+        """Keywords contained in a medication name."""
+        return frozenset(self.automaton.find_all(medication_name.lower()))
+
+    def check_interactions(self, medication_name: str, existing_medications: Sequence[str]) -> List[Dict]:
+        """Interactions between a medication and each existing medication."""
+        ingredients = self.ingredients(medication_name)
+        drugs = [drug for drug in self.interacting if drug in ingredients]
+        if not drugs:
+            return []
+
+        existing = [(name, self.ingredients(name)) for name in existing_medications]
+        interactions = []
+        for drug in drugs:
+            interacting = self.interacting[drug]
+            data = self.interaction_data[drug]
+            for existing_med, existing_ingredients in existing:
+                if not interacting.isdisjoint(existing_ingredients):
+                    interactions.append({
+                        'medication1': medication_name,
+                        'medication2': existing_med,
+                        'severity': data['severity'],
+                        'description': data['description'],
+                        'recommendation': f"Monitor for {data['description'].lower()}"
+                    })
+        return interactions
+
+    def check_contraindications(self, medication_name: str,
+                                patient_conditions: Union[str, Iterable[str]]) -> List[Dict]:
+        """Contraindications of a medication for the patient's conditions."""
+        ingredients = self.ingredients(medication_name)
+        if not ingredients or not patient_conditions:
+            return []
+
+        if not isinstance(patient_conditions, (str, set, frozenset)):
+            patient_conditions = set(patient_conditions)
+
+        contraindications = []
+        for condition, medications in self.contraindicated.items():
+            if condition not in patient_conditions:
+                continue
+            data = self.contraindication_data[condition]
+            for drug in medications:
+                if drug in ingredients:
+                    contraindications.append({
+                        'medication': medication_name,
+                        'condition': condition,
+                        'severity': data['severity'],
+                        'description': data['description'],
+                        'recommendation': "Consult healthcare provider before use"
+                    })
+        return contraindications
+
+
+class PatientMedicationProfile:
+    """
+    A patient's active medications and conditions, loaded once.
+
+    Args:
+        medication_names: Names of the patient's active medications
+        conditions: Patient conditions, as a list or free text
+    """
+
+    def __init__(self, medication_names: Sequence[str], conditions: Union[str, Iterable[str], None] = None):
+        self.medication_names = list(medication_names)
+        self.conditions = conditions or []
+
+    @classmethod
+    def for_user(cls, user) -> 'PatientMedicationProfile':
+        """Load a user's active schedules in a single query."""
+        from .models import MedicationSchedule
+
+        names = MedicationSchedule.objects.filter(
+            patient=user, status=MedicationSchedule.Status.ACTIVE
+        ).values_list('medication__name', flat=True)
+        return cls(list(names), getattr(user, 'medical_conditions', None))
+
+    def other_medications(self, medication_name: str) -> List[str]:
+        """Active medications other than the named one."""
+        return [name for name in self.medication_names if name != medication_name]
+
+
+def get_patient_profile(context: Dict) -> Optional[PatientMedicationProfile]:
+    """
+    Get the requesting patient's profile from serializer context.
+
+    The profile is built on first use and stored in the context, which DRF
+    shares between a list serializer and its children.
+    """
+    profile = context.get(PATIENT_PROFILE_CONTEXT_KEY)
+    if profile is None:
+        request = context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not getattr(user, 'is_authenticated', False):
+            return None
+        profile = PatientMedicationProfile.for_user(user)
+        context[PATIENT_PROFILE_CONTEXT_KEY] = profile
+    return profile
@@ -0,0 +1,55 @@
+"""
+Django management command to backfill daily stock rollups.
+
+Recomputes StockDailyRollup rows from the stock transactions on record. Run
+it once after deploying the rollup table, and after importing or editing
+transactions outside the normal recording paths.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from medications.stock_rollups import rebuild_stock_rollups
+
+
+class Command(BaseCommand):
+    help = 'Backfill daily stock rollups from recorded stock transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only rebuild the last N days (default: all transactions on record)',
+        )
+        parser.add_argument(
+            '--medication',
+            type=int,
+            action='append',
+            dest='medication_ids',
+            help='Only rebuild this medication ID (may be repeated)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of medications to rebuild per transaction',
+        )
+
+    def handle(self, *args, **options):
+        start_day = None
+        if options['days'] is not None:
+            start_day = timezone.localdate() - timedelta(days=options['days'])
+
+        self.stdout.write('Backfilling daily stock rollups...')
+        stats = rebuild_stock_rollups(
+            start_day=start_day,
+            medication_ids=options['medication_ids'],
+            chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Stock rollups rebuilt: {stats['rollups']} rows from {stats['transactions']} "
+            f"transactions across {stats['medications']} medications"
+        ))
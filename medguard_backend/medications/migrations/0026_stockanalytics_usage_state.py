@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2025-08-12 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0025_enhancedprescription_prescriptionworkflow_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockanalytics',
+            name='usage_state',
+            field=models.JSONField(blank=True, default=dict, help_text='Running daily usage aggregates for incremental analytics updates'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2025-08-14 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0026_stockanalytics_usage_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationschedule',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, help_text='Next dose time a reminder is due for (empty when no dose is due)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='medicationschedule',
+            index=models.Index(fields=['next_reminder_at'], name='med_schedule_next_reminder_idx'),
+        ),
+    ]
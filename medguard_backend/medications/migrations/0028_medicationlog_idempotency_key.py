@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2025-08-14 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0027_medicationschedule_next_reminder_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationlog',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Unique key identifying this dose event for the patient', max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='medicationlog',
+            constraint=models.UniqueConstraint(fields=('patient', 'idempotency_key'), name='unique_medication_log_idempotency_key'),
+        ),
+    ]
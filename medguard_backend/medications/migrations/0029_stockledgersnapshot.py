@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2025-08-15 09:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0028_medicationlog_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLedgerSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.IntegerField(help_text='Ledger balance after the last folded transaction')),
+                ('last_transaction_id', models.PositiveBigIntegerField(default=0, help_text='ID of the last stock transaction included in the balance')),
+                ('transactions_folded', models.PositiveIntegerField(default=0, help_text='Number of transactions folded into this snapshot since the previous one')),
+                ('drift', models.IntegerField(default=0, help_text='Difference between the medication stock and the ledger balance when taken')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When this snapshot was taken')),
+                ('medication', models.ForeignKey(help_text='Medication this snapshot belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='medications.medication')),
+            ],
+            options={
+                'verbose_name': 'Stock Ledger Snapshot',
+                'verbose_name_plural': 'Stock Ledger Snapshots',
+                'db_table': 'stock_ledger_snapshots',
+                'ordering': ['-last_transaction_id'],
+                'indexes': [models.Index(fields=['medication', '-last_transaction_id'], name='stock_ledge_medicat_387a5c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2025-08-16 10:05
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0029_stockledgersnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Local date of the transactions')),
+                ('transaction_type', models.CharField(choices=[('purchase', 'Purchase'), ('sale', 'Sale'), ('adjustment', 'Adjustment'), ('transfer', 'Transfer'), ('expiry', 'Expiry'), ('damage', 'Damage'), ('return', 'Return'), ('prescription_filled', 'Prescription Filled'), ('dose_taken', 'Dose Taken')], help_text='Type of stock transaction', max_length=30)),
+                ('quantity', models.IntegerField(default=0, help_text='Net quantity of the transactions (negative for removals)')),
+                ('transaction_count', models.PositiveIntegerField(default=0, help_text='Number of transactions')),
+                ('total_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Total amount of the transactions', max_digits=14)),
+                ('hourly_quantity', models.JSONField(blank=True, default=dict, help_text='Net quantity per hour of the day')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When these totals were last updated')),
+                ('medication', models.ForeignKey(help_text='Medication these totals belong to', on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='medications.medication')),
+            ],
+            options={
+                'verbose_name': 'Stock Daily Rollup',
+                'verbose_name_plural': 'Stock Daily Rollups',
+                'db_table': 'stock_daily_rollups',
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['day'], name='stock_daily_day_4971da_idx')],
+                'constraints': [models.UniqueConstraint(fields=('medication', 'day', 'transaction_type'), name='unique_stock_daily_rollup')],
+            },
+        ),
+    ]
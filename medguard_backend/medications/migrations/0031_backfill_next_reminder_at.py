@@ -0,0 +1,96 @@
+# Generated by Django 5.2.4 on 2025-08-16 12:00
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+BACKFILL_CHUNK_SIZE = 2000
+
+# Frozen copy of MedicationSchedule.TIMING_TIMES and compute_next_due(), since
+# historical models have no methods
+TIMING_TIMES = {
+    'morning': time(8, 0),
+    'noon': time(12, 0),
+    'night': time(20, 0),
+}
+
+
+def next_due(schedule, after):
+    """Next dose time of an active schedule strictly after ``after``, or None."""
+    day_flags = [
+        schedule.monday, schedule.tuesday, schedule.wednesday, schedule.thursday,
+        schedule.friday, schedule.saturday, schedule.sunday
+    ]
+    if schedule.status != 'active' or not any(day_flags):
+        return None
+
+    start_date = schedule.start_date
+    if isinstance(start_date, datetime):
+        start_date = timezone.localtime(start_date).date() if timezone.is_aware(start_date) else start_date.date()
+
+    dose_time = schedule.custom_time or TIMING_TIMES.get(schedule.timing, time(8, 0))
+    day = max(timezone.localtime(after).date(), start_date)
+
+    # A selected weekday is always found within eight days
+    for _offset in range(8):
+        if schedule.end_date and day > schedule.end_date:
+            return None
+        if day_flags[day.weekday()]:
+            due = timezone.make_aware(datetime.combine(day, dose_time))
+            if due > after:
+                return due
+        day += timedelta(days=1)
+
+    return None
+
+
+def fill_next_reminder_at(MedicationSchedule, now, chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Index the next reminder of every active schedule that has none.
+
+    Returns:
+        Number of schedules given a next reminder
+    """
+    indexed = 0
+    batch = []
+
+    queryset = MedicationSchedule.objects.filter(status='active', next_reminder_at__isnull=True).only(
+        'id', 'status', 'timing', 'custom_time', 'start_date', 'end_date',
+        'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+        'next_reminder_at'
+    ).order_by('pk')
+
+    for schedule in queryset.iterator(chunk_size=chunk_size):
+        schedule.next_reminder_at = next_due(schedule, now)
+        if schedule.next_reminder_at is None:
+            continue
+        batch.append(schedule)
+
+        if len(batch) >= chunk_size:
+            MedicationSchedule.objects.bulk_update(batch, ['next_reminder_at'])
+            indexed += len(batch)
+            batch = []
+
+    if batch:
+        MedicationSchedule.objects.bulk_update(batch, ['next_reminder_at'])
+        indexed += len(batch)
+
+    return indexed
+
+
+def backfill_next_reminder_at(apps, schema_editor):
+    """Index existing schedules so the reminder dispatcher picks them up."""
+    MedicationSchedule = apps.get_model('medications', 'MedicationSchedule')
+    fill_next_reminder_at(MedicationSchedule, timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0030_stockdailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_next_reminder_at, migrations.RunPython.noop),
+    ]
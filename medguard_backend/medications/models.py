@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
@@ -6,7 +6,7 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.shortcuts import render
 from decimal import Decimal
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 import uuid
 
 # Wagtail imports - Enhanced for 7.0.2
@@ -1795,6 +1795,13 @@ class MedicationSchedule(models.Model):
         PAUSED = 'paused', _('Paused')
         COMPLETED = 'completed', _('Completed')
     
+    # Default dose times for the fixed timing slots
+    TIMING_TIMES = {
+        Timing.MORNING: time(8, 0),
+        Timing.NOON: time(12, 0),
+        Timing.NIGHT: time(20, 0),
+    }
+    
     # Relationships
     patient = models.ForeignKey(
         User,
@@ -1893,6 +1900,13 @@ class MedicationSchedule(models.Model):
         help_text=_('Special instructions for taking the medication')
     )
     
+    # Reminder dispatch index
+    next_reminder_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_('Next dose time a reminder is due for (empty when no dose is due)')
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -1964,6 +1978,7 @@ class MedicationSchedule(models.Model):
             models.Index(fields=['timing']),
             models.Index(fields=['status']),
             models.Index(fields=['start_date', 'end_date']),
+            models.Index(fields=['next_reminder_at'], name='med_schedule_next_reminder_idx'),
         ]
         ordering = ['patient', 'timing', 'start_date']
     
@@ -1994,6 +2009,49 @@ class MedicationSchedule(models.Model):
         day_fields = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
         return getattr(self, day_fields[weekday])
     
+    def get_dose_time(self):
+        """Get the local time of day the dose should be taken."""
+        if self.custom_time:
+            return self.custom_time
+        return self.TIMING_TIMES.get(self.timing, time(8, 0))
+    
+    def compute_next_due(self, after=None):
+        """
+        Compute the next dose time strictly after ``after``.
+        
+        Returns None if the schedule is not active, has no days selected or
+        ends before another dose is due.
+        """
+        if self.status != self.Status.ACTIVE:
+            return None
+        
+        day_flags = [
+            self.monday, self.tuesday, self.wednesday, self.thursday,
+            self.friday, self.saturday, self.sunday
+        ]
+        if not any(day_flags):
+            return None
+        
+        after = after or timezone.now()
+        start_date = self.start_date
+        if isinstance(start_date, datetime):
+            start_date = timezone.localtime(start_date).date() if timezone.is_aware(start_date) else start_date.date()
+        
+        dose_time = self.get_dose_time()
+        day = max(timezone.localtime(after).date(), start_date)
+        
+        # A selected weekday is always found within eight days
+        for _offset in range(8):
+            if self.end_date and day > self.end_date:
+                return None
+            if day_flags[day.weekday()]:
+                due = timezone.make_aware(datetime.combine(day, dose_time))
+                if due > after:
+                    return due
+            day += timedelta(days=1)
+        
+        return None
+    
     def clean(self):
         """Custom validation for the model."""
         # Validate custom time is provided when timing is custom
@@ -2092,6 +2150,14 @@ class MedicationLog(models.Model):
         help_text=_('Any side effects experienced')
     )
     
+    # Client-supplied key making offline dose syncs safe to retry
+    idempotency_key = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        help_text=_('Unique key identifying this dose event for the patient')
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -2112,6 +2178,12 @@ class MedicationLog(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['actual_time']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['patient', 'idempotency_key'],
+                name='unique_medication_log_idempotency_key'
+            ),
+        ]
         ordering = ['-scheduled_time']
     
     def __str__(self):
@@ -2459,20 +2531,31 @@ class StockTransaction(models.Model):
         return f"{self.medication.name} - {self.get_transaction_type_display()} ({self.quantity})"
     
     def save(self, *args, **kwargs):
-        """Override save to update medication stock and calculate totals."""
-        if not self.pk:  # New transaction
-            self.stock_before = self.medication.pill_count
-            self.stock_after = self.stock_before + self.quantity
-            
-            # Calculate total amount if unit price is provided
-            if self.unit_price and not self.total_amount:
-                self.total_amount = self.unit_price * abs(self.quantity)
+        """
+        Override save to apply the transaction to medication stock.
         
-        super().save(*args, **kwargs)
+        New transactions are appended to the stock ledger: the quantity is
+        applied to the medication with an atomic in-database increment and
+        stock_before/stock_after are derived from the balance it returns, so
+        concurrent transactions never overwrite each other's stock changes.
+        """
+        if self.pk:
+            super().save(*args, **kwargs)
+            return
+        
+        from .stock_ledger import apply_stock_delta
         
-        # Update medication stock
+        # Calculate total amount if unit price is provided
+        if self.unit_price and not self.total_amount:
+            self.total_amount = self.unit_price * abs(self.quantity)
+        
+        with transaction.atomic():
+            self.stock_after = apply_stock_delta(self.medication_id, self.quantity)
+            self.stock_before = self.stock_after - self.quantity
+            super().save(*args, **kwargs)
+        
+        # Keep the in-memory medication in step with the database
         self.medication.pill_count = self.stock_after
-        self.medication.save(update_fields=['pill_count'])
     
     @property
     def is_addition(self):
@@ -2485,6 +2568,133 @@ class StockTransaction(models.Model):
         return self.quantity < 0
 
 
+class StockLedgerSnapshot(models.Model):
+    """
+    Periodic snapshot of a medication's stock ledger.
+    
+    Each snapshot folds every stock transaction up to last_transaction_id into
+    a balance, so the ledger balance is always the latest snapshot plus the
+    few transactions recorded since, never a sum over the full history.
+    """
+    
+    medication = models.ForeignKey(
+        Medication,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        help_text=_('Medication this snapshot belongs to')
+    )
+    
+    balance = models.IntegerField(
+        help_text=_('Ledger balance after the last folded transaction')
+    )
+    
+    last_transaction_id = models.PositiveBigIntegerField(
+        default=0,
+        help_text=_('ID of the last stock transaction included in the balance')
+    )
+    
+    transactions_folded = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Number of transactions folded into this snapshot since the previous one')
+    )
+    
+    drift = models.IntegerField(
+        default=0,
+        help_text=_('Difference between the medication stock and the ledger balance when taken')
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text=_('When this snapshot was taken')
+    )
+    
+    class Meta:
+        verbose_name = _('Stock Ledger Snapshot')
+        verbose_name_plural = _('Stock Ledger Snapshots')
+        db_table = 'stock_ledger_snapshots'
+        indexes = [
+            models.Index(fields=['medication', '-last_transaction_id']),
+        ]
+        ordering = ['-last_transaction_id']
+    
+    def __str__(self):
+        return f"{self.medication.name} - {self.balance} (up to #{self.last_transaction_id})"
+
+
+class StockDailyRollup(models.Model):
+    """
+    Pre-aggregated stock movements per medication, day and transaction type.
+    
+    Rollups are kept current as each transaction is recorded, so charts and
+    usage pattern analysis read one row per day instead of every transaction.
+    Days are local dates; hourly_quantity holds the net quantity per local
+    hour of the day, keyed by hour.
+    """
+    
+    medication = models.ForeignKey(
+        Medication,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        help_text=_('Medication these totals belong to')
+    )
+    
+    day = models.DateField(
+        help_text=_('Local date of the transactions')
+    )
+    
+    transaction_type = models.CharField(
+        max_length=30,
+        choices=StockTransaction.TransactionType.choices,
+        help_text=_('Type of stock transaction')
+    )
+    
+    quantity = models.IntegerField(
+        default=0,
+        help_text=_('Net quantity of the transactions (negative for removals)')
+    )
+    
+    transaction_count = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Number of transactions')
+    )
+    
+    total_value = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text=_('Total amount of the transactions')
+    )
+    
+    hourly_quantity = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text=_('Net quantity per hour of the day')
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text=_('When these totals were last updated')
+    )
+    
+    class Meta:
+        verbose_name = _('Stock Daily Rollup')
+        verbose_name_plural = _('Stock Daily Rollups')
+        db_table = 'stock_daily_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['medication', 'day', 'transaction_type'],
+                name='unique_stock_daily_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+        ordering = ['day']
+    
+    def __str__(self):
+        return f"{self.medication.name} - {self.day} {self.get_transaction_type_display()} ({self.quantity})"
+
+
 class StockAnalytics(models.Model):
     """
     Stock analytics model for storing calculated metrics and predictions.
@@ -2568,6 +2778,13 @@ class StockAnalytics(models.Model):
         help_text=_('Number of days to use for calculations')
     )
     
+    # Incremental calculation state
+    usage_state = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text=_('Running daily usage aggregates for incremental analytics updates')
+    )
+    
     class Meta:
         verbose_name = _('Stock Analytics')
         verbose_name_plural = _('Stock Analytics')
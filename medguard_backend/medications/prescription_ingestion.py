@@ -0,0 +1,367 @@
+"""
+Batch ingestion of prescription backlogs.
+
+A clinic's backlog of scanned prescriptions is ingested in chunks. The text
+of each chunk is parsed in a process pool: ``PrescriptionParser`` extracts
+the prescription and ``serializers.PrescriptionParser.parse_instructions``
+each medication's schedule. Parsed chunks are written as they arrive with
+``bulk_create``, so parsing scales with the worker processes while the
+database writes stay in the calling process.
+
+Every prescription is its own unit of failure. A prescription that cannot
+be parsed is reported and skipped, and when a chunk's bulk write fails the
+chunk is written again one prescription per savepoint, so one bad script
+does not hold up the rest of the backlog.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache_tags import invalidate_tags_on_commit, model_tag, user_tag
+
+from .models import Medication, MedicationSchedule, PrescriptionRenewal, StockTransaction
+from .prescription_parser import PrescriptionParser
+from .services import MedicationCacheService
+from .stock_rollups import record_stock_rollups
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+PRESCRIPTION_DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y')
+MEDICATION_TYPES = set(Medication.MedicationType.values)
+SCHEDULE_TIMINGS = set(MedicationSchedule.Timing.values)
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _parse_prescription_date(value: Optional[str]) -> Optional[date]:
+    """Parse a day-first prescription date as written on South African scripts."""
+    for date_format in PRESCRIPTION_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _dosage_unit(strength: str, default: str) -> str:
+    """Unit of a strength such as '500mg' or '10 mg/ml'."""
+    unit = strength.lstrip('0123456789., ')
+    return unit[:20] if unit else default
+
+
+def parse_prescription_record(text: str) -> Dict[str, Any]:
+    """
+    Parse prescription text into a plain record ready to be written.
+
+    Raises:
+        ValueError: If the text cannot be parsed or names no medication
+    """
+    from .serializers import PrescriptionParser as InstructionParser
+
+    parsed = PrescriptionParser.parse_prescription(text)
+    if parsed.get('error'):
+        raise ValueError(parsed['error'])
+
+    medications = []
+    for medication_field in parsed['medications']:
+        data = medication_field.value
+        if not data or not data['name'].value:
+            continue
+
+        strength = data['strength'].value or ''
+        medication_type = data['medication_type'].value
+        schedule = None
+        # The extracted instruction drops its leading verb, which the
+        # instruction parser's dosage patterns need
+        instructions = data['instructions'].source_text if data['instructions'].value else ''
+        if instructions:
+            parsed_instructions = InstructionParser.parse_instructions(instructions)
+            if parsed_instructions:
+                timing = parsed_instructions.get('timing')
+                schedule = {
+                    'timing': timing if timing in SCHEDULE_TIMINGS else MedicationSchedule.Timing.MORNING,
+                    'custom_time': parsed_instructions.get('custom_time'),
+                    'dosage_amount': parsed_instructions.get('dosage_amount') or 1,
+                    'frequency': parsed_instructions.get('frequency') or 'daily',
+                    'instructions': instructions,
+                }
+
+        medications.append({
+            'name': data['name'].value,
+            'generic_name': data['generic_name'].value or '',
+            'strength': strength,
+            'dosage_unit': _dosage_unit(strength, medication_type or 'unit'),
+            'medication_type': medication_type if medication_type in MEDICATION_TYPES else 'other',
+            'quantity': data['quantity'].value or 0,
+            'repeats': data['repeats'].value or 0,
+            'schedule': schedule,
+        })
+
+    if not medications:
+        raise ValueError("No medications found in prescription")
+
+    metadata = parsed['prescription_metadata'].value or {}
+    return {
+        'prescription_number': metadata.get('prescription_number', ''),
+        'prescribed_by': parsed['doctor_info'].value or '',
+        'prescribed_date': _parse_prescription_date(metadata.get('prescription_date')),
+        'confidence': parsed['overall_confidence'],
+        'medications': medications,
+    }
+
+
+def _init_worker() -> None:
+    # Forked workers inherit a configured Django; spawned ones set it up
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+def _parse_items(items: List[Tuple[int, str]]) -> List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Parse (index, text) prescriptions.
+
+    Returns:
+        (index, record or None, error or None) tuples
+    """
+    results = []
+    for index, text in items:
+        try:
+            results.append((index, parse_prescription_record(text), None))
+        except Exception as e:
+            results.append((index, None, str(e) or e.__class__.__name__))
+    return results
+
+
+class PrescriptionBatchIngestion:
+    """
+    Parse and store a batch of prescriptions.
+
+    Each item is a dict with the prescription ``text`` and the ``patient_id``
+    it belongs to. ``prescription_number``, ``prescribed_by`` and
+    ``prescribed_date`` override what the parser reads from the text.
+
+    Args:
+        workers: Worker processes for parsing; 0 parses in this process
+        chunk_size: Prescriptions parsed and written together
+        progress_callback: Called with (processed, total) after every chunk
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 50,
+                 progress_callback: Optional[ProgressCallback] = None):
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = max(1, chunk_size)
+        self.progress_callback = progress_callback
+
+    def run(self, items: Sequence[Dict[str, Any]], user) -> Dict[str, Any]:
+        """
+        Ingest every item, isolating failures per prescription.
+
+        Args:
+            items: Prescriptions to ingest
+            user: User recorded on the initial stock transactions
+
+        Returns:
+            Dict with counts of what was created and a result per item, in
+            item order
+        """
+        items = list(items)
+        patients = User.objects.in_bulk(
+            {item.get('patient_id') for item in items if item.get('patient_id') is not None}
+        )
+        patients = {pk: patient for pk, patient in patients.items() if patient.user_type == 'PATIENT'}
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        stats = {
+            'total': len(items),
+            'processed': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'medications': 0,
+            'schedules': 0,
+            'transactions': 0,
+            'renewals': 0,
+        }
+
+        pending = []
+        for index, item in enumerate(items):
+            if item.get('patient_id') not in patients:
+                results[index] = {'index': index, 'status': 'failed', 'error': 'Patient not found'}
+            elif not (item.get('text') or '').strip():
+                results[index] = {'index': index, 'status': 'failed', 'error': 'No prescription text provided'}
+            else:
+                pending.append((index, item['text']))
+        stats['processed'] = stats['failed'] = len(items) - len(pending)
+
+        chunks = [pending[offset:offset + self.chunk_size] for offset in range(0, len(pending), self.chunk_size)]
+        pool = None
+        if self.workers > 0 and len(chunks) > 1:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+        try:
+            # map() yields chunks in order as they finish, so the workers keep
+            # parsing while earlier chunks are written here
+            parsed_chunks = pool.map(_parse_items, chunks) if pool else map(_parse_items, chunks)
+            for parsed in parsed_chunks:
+                entries = []
+                for index, record, error in parsed:
+                    if error is not None:
+                        results[index] = {'index': index, 'status': 'failed', 'error': error}
+                        continue
+                    item = items[index]
+                    for field in ('prescription_number', 'prescribed_by', 'prescribed_date'):
+                        if item.get(field):
+                            record[field] = item[field]
+                    if isinstance(record['prescribed_date'], str):
+                        record['prescribed_date'] = _parse_prescription_date(record['prescribed_date'])
+                    entries.append((index, record, patients[item['patient_id']]))
+
+                for index, outcome in self._write_chunk(entries, user).items():
+                    results[index] = outcome
+                    if outcome['status'] == 'created':
+                        for key in ('medications', 'schedules', 'transactions', 'renewals'):
+                            stats[key] += outcome[key]
+
+                stats['processed'] += len(parsed)
+                self._report_progress(stats['processed'], stats['total'])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        stats['succeeded'] = sum(1 for result in results if result['status'] == 'created')
+        stats['failed'] = stats['total'] - stats['succeeded']
+        logger.info(
+            f"Ingested {stats['succeeded']} of {stats['total']} prescriptions: "
+            f"{stats['medications']} medications, {stats['schedules']} schedules"
+        )
+        return {**stats, 'results': results}
+
+    def _report_progress(self, processed: int, total: int) -> None:
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(processed, total)
+        except Exception as e:
+            logger.error(f"Error reporting prescription ingestion progress: {e}")
+
+    def _write_chunk(self, entries: List[Tuple[int, Dict[str, Any], Any]], user) -> Dict[int, Dict[str, Any]]:
+        """Write a chunk in bulk, falling back to one savepoint per prescription."""
+        if not entries:
+            return {}
+        try:
+            with transaction.atomic():
+                return self._write(entries, user)
+        except Exception as e:
+            if len(entries) == 1:
+                index = entries[0][0]
+                logger.error(f"Error writing ingested prescription {index}: {e}")
+                return {index: {'index': index, 'status': 'failed', 'error': str(e)}}
+            logger.warning(f"Bulk write of {len(entries)} prescriptions failed, writing them one by one: {e}")
+
+        outcomes = {}
+        for entry in entries:
+            outcomes.update(self._write_chunk([entry], user))
+        return outcomes
+
+    def _write(self, entries: List[Tuple[int, Dict[str, Any], Any]], user) -> Dict[int, Dict[str, Any]]:
+        today = timezone.now().date()
+        medications, schedules, stock_transactions, renewals = [], [], [], []
+        created = {}
+
+        for index, record, patient in entries:
+            outcome = created[index] = {
+                'index': index,
+                'status': 'created',
+                'patient_id': patient.pk,
+                'prescription_number': record['prescription_number'],
+                'confidence': record['confidence'],
+                'medications': 0,
+                'schedules': 0,
+                'transactions': 0,
+                'renewals': 0,
+                'medication_ids': [],
+            }
+            renew = bool(record['prescription_number'] and record['prescribed_by'] and record['prescribed_date'])
+
+            for number, data in enumerate(record['medications'], start=1):
+                medication = Medication(
+                    name=data['name'],
+                    generic_name=data['generic_name'],
+                    strength=data['strength'],
+                    dosage_unit=data['dosage_unit'],
+                    medication_type=data['medication_type'],
+                    prescription_type=Medication.PrescriptionType.PRESCRIPTION,
+                    pill_count=data['quantity'],
+                )
+                medications.append((outcome, medication))
+                outcome['medications'] += 1
+
+                if data['quantity'] > 0:
+                    # The medication is created with its stock, so the
+                    # transaction records the balance rather than applying it
+                    stock_transactions.append(StockTransaction(
+                        medication=medication,
+                        user=user,
+                        transaction_type=StockTransaction.TransactionType.PURCHASE,
+                        quantity=data['quantity'],
+                        stock_before=0,
+                        stock_after=data['quantity'],
+                        notes=f"Initial stock from prescription {record['prescription_number']}",
+                        reference_number=f"INGEST_{record['prescription_number']}_{number}",
+                        batch_number=f"BATCH_{record['prescription_number']}_{number}",
+                    ))
+                    outcome['transactions'] += 1
+
+                if data['schedule']:
+                    schedule = MedicationSchedule(
+                        patient=patient,
+                        medication=medication,
+                        start_date=today,
+                        **data['schedule']
+                    )
+                    # bulk_create skips the pre_save signal that indexes reminders
+                    schedule.next_reminder_at = schedule.compute_next_due()
+                    schedules.append(schedule)
+                    outcome['schedules'] += 1
+
+                if renew:
+                    renewals.append(PrescriptionRenewal(
+                        patient=patient,
+                        medication=medication,
+                        prescription_number=record['prescription_number'],
+                        prescribed_by=record['prescribed_by'],
+                        prescribed_date=record['prescribed_date'],
+                        expiry_date=record['prescribed_date'] + timedelta(days=365)  # Default 1 year
+                    ))
+                    outcome['renewals'] += 1
+
+        Medication.objects.bulk_create([medication for _, medication in medications])
+        for outcome, medication in medications:
+            outcome['medication_ids'].append(medication.pk)
+
+        # Related objects pick up the medications' new primary keys on insert
+        created_transactions = StockTransaction.objects.bulk_create(stock_transactions)
+        MedicationSchedule.objects.bulk_create(schedules)
+        PrescriptionRenewal.objects.bulk_create(renewals)
+
+        # bulk_create skips post_save, so roll the initial stock up and
+        # retire the cached lists and API entries here. Stock analytics for a
+        # new medication are seeded from its transactions on first use, so
+        # they need no update.
+        record_stock_rollups(created_transactions)
+        MedicationCacheService.invalidate_medication_lists()
+        tags = [model_tag(Medication), model_tag(MedicationSchedule), model_tag(StockTransaction)]
+        tags.extend(user_tag(patient_id) for patient_id in {schedule.patient_id for schedule in schedules})
+        invalidate_tags_on_commit(tags)
+        return created
+
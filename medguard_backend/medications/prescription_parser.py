@@ -17,12 +17,17 @@ This service handles South African prescription formats with:
 
 import re
 import logging
-from typing import Dict, List, Optional, Tuple, Any, Union
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Any, Union
 from datetime import datetime, date, time
 from decimal import Decimal
 from dataclasses import dataclass
 from enum import Enum
 
+try:
+    from .text_matching import KeywordAutomaton
+except ImportError:  # Imported as a top-level module by standalone scripts
+    from text_matching import KeywordAutomaton
+
 logger = logging.getLogger(__name__)
 
 
@@ -61,6 +66,187 @@ class MedicationType(Enum):
     LIQUID = "liquid" 
 
 
+HIGH = ConfidenceLevel.HIGH.value
+MEDIUM = ConfidenceLevel.MEDIUM.value
+LOW = ConfidenceLevel.LOW.value
+VERY_LOW = ConfidenceLevel.VERY_LOW.value
+
+# Patterns used by the extractors, compiled once
+DOCTOR_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'dr\.?\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
+    r'doctor\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
+    r'prescribed\s+by\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
+    r'physician\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
+)]
+
+PATIENT_PATTERNS = [(field, re.compile(pattern, re.IGNORECASE)) for field, pattern in (
+    ('name', r'name\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)'),
+    ('id', r'id\s*:\s*(\d+)'),
+    ('date_of_birth', r'date\s+of\s+birth\s*:\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'),
+)]
+
+NUMBERED_SECTION_RE = re.compile(r'\n\s*(\d+)\.\s*')
+BULLET_SECTION_RE = re.compile(r'\n\s*[-*]\s*')
+CAPS_NAME_LINE_RE = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n')
+CAPS_NAME_SPLIT_RE = re.compile(r'\n\s*[A-Z][A-Z\s]+\s*\n')
+
+NAME_PATTERNS = [re.compile(pattern) for pattern in (
+    r'([A-Z][A-Z\s]+)',  # All caps names
+    r'([A-Z][a-z]+\s+[A-Z][a-z]+)',  # Title case names
+    r'([A-Z][a-z]+)',  # Single word names
+)]
+
+GENERIC_PATTERNS = [re.compile(pattern) for pattern in (
+    r'generic\s*:\s*([A-Z][a-z\s]+)',
+    r'\(([A-Z][a-z\s]+)\)',  # Parenthetical generic names
+    r'([A-Z][a-z]+\s+[A-Z][a-z]+)\s+\(generic\)',
+)]
+
+STRENGTH_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(\d+(?:\.\d+)?)\s*(mg|mcg|ml|units?|g|mcg/ml|mg/ml|units/ml)',
+    r'strength\s*:\s*(\d+(?:\.\d+)?)\s*(mg|mcg|ml|units?|g)',
+    r'(\d+(?:\.\d+)?)\s*(mg|mcg|ml|units?|g)\s*(tablets?|capsules?|drops?|units?)',
+)]
+
+INSTRUCTION_PATTERNS = [(cue, re.compile(pattern, re.IGNORECASE)) for cue, pattern in (
+    ('TAKE', r'take\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)'),
+    ('USE', r'use\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)'),
+    ('APPLY', r'apply\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)'),
+    ('INJECT', r'inject\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)'),
+    ('INSTRUCTION', r'instructions?\s*:\s*([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)'),
+)]
+
+WHITESPACE_RE = re.compile(r'\s+')
+INSTRUCTION_QUANTITY_RE = re.compile(r'quantity:\s*x?\s*\d+', re.IGNORECASE)
+INSTRUCTION_REPEATS_RE = re.compile(r'\+?\s*\d+\s*repeats?', re.IGNORECASE)
+CUSTOM_TIME_RE = re.compile(r'(\d{1,2})h(\d{2})?|(\d{1,2}):(\d{2})')
+
+AS_NEEDED_PATTERNS = [
+    ('AS NEEDED', r'as\s+needed'),
+    ('AS REQUIRED', r'as\s+required'),
+    ('PRN', r'prn'),
+    ('WHEN NEEDED', r'when\s+needed'),
+    ('WHEN REQUIRED', r'when\s+required'),
+]
+
+ICD10_CODE_RE = re.compile(r'[A-Z]\d{2}(?:\.\d{1,2})?')
+
+ICD10_CATEGORIES = {
+    'E': 'Endocrine, nutritional and metabolic diseases',
+    'F': 'Mental and behavioural disorders',
+    'I': 'Diseases of the circulatory system',
+    'J': 'Diseases of the respiratory system',
+    'M': 'Diseases of the musculoskeletal system and connective tissue',
+    'N': 'Diseases of the genitourinary system',
+    'A': 'Certain infectious and parasitic diseases',
+    'Z': 'Factors influencing health status and contact with health services',
+}
+
+PRESCRIPTION_DATE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'date\s*:\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+    r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+)]
+
+PRESCRIPTION_NUMBER_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'rx\s*#?\s*:?\s*(\w+)',
+    r'prescription\s*#?\s*:?\s*(\w+)',
+    r'(\w{2,10}-\d{4}-\d{3,6})',  # Common prescription number format
+)]
+
+# Keyword cues, upper case with single spaces, that text must contain for
+# an extractor's patterns to match it. They are found in one automaton pass
+# per medication section, so extractors whose cues are absent skip their
+# regexes entirely.
+INSTRUCTION_CUES = frozenset(cue for cue, _ in INSTRUCTION_PATTERNS)
+REPEAT_CUES = {
+    r'\+?\s*(\d+)\s*repeats?': ('REPEAT',),
+    r'repeat\s*(\d+)\s*times?': ('REPEAT',),
+    r'(\d+)\s*refills?': ('REFILL',),
+    r'refill\s*(\d+)\s*times?': ('REFILL',),
+}
+TIMING_CUES = {
+    'morning': ('MORNING', 'AM', 'BEFORE BREAKFAST', 'WITH BREAKFAST'),
+    'noon': ('NOON', 'MIDDAY', '12H00', '12:00', 'WITH LUNCH'),
+    'night': ('EVENING', 'PM', 'BEFORE BED', 'NIGHT', 'AT BEDTIME', 'WITH DINNER'),
+    'twice_daily': ('TWICE DAILY', 'TWO TIMES DAILY', '2X DAILY', 'BID'),
+    'three_times_daily': ('THREE TIMES DAILY', 'THRICE DAILY', '3X DAILY', 'TID'),
+    'four_times_daily': ('FOUR TIMES DAILY', '4X DAILY', 'QID'),
+    'as_needed': tuple(cue for cue, _ in AS_NEEDED_PATTERNS),
+}
+MEDICATION_TYPE_CUES = {
+    r'flexpen|flex\s*pen': ('FLEXPEN', 'FLEX PEN'),
+    r'solarstar\s*pen|solar\s*star\s*pen': ('SOLARSTARPEN', 'SOLARSTAR PEN', 'SOLAR STARPEN', 'SOLAR STAR PEN'),
+    r'tablets?': ('TABLET',),
+    r'capsules?': ('CAPSULE',),
+    r'cream|ointment': ('CREAM', 'OINTMENT'),
+    r'injection|inject': ('INJECT',),
+    r'inhaler|puffer': ('INHALER', 'PUFFER'),
+    r'drops?': ('DROP',),
+    r'patch|patches': ('PATCH',),
+    r'liquid|syrup': ('LIQUID', 'SYRUP'),
+}
+
+
+class ScannedText:
+    """
+    A text with the brand names and keyword cues it contains.
+
+    Built once per medication section by ``PrescriptionParser.scan`` and
+    shared by all extractors.
+    """
+
+    __slots__ = ('text', 'keywords')
+
+    def __init__(self, text: str, keywords: Set[str]):
+        self.text = text
+        self.keywords = keywords
+
+    def has_any(self, cues: Iterable[str]) -> bool:
+        return not self.keywords.isdisjoint(cues)
+
+
+class PrescriptionMatcher:
+    """
+    Compiled patterns and keyword automaton for a parser class.
+
+    Built lazily from the parser's pattern tables, so subclasses that extend
+    the tables get their own matcher.
+    """
+
+    def __init__(self, parser: type):
+        self.brand_rank = {brand: rank for rank, brand in enumerate(parser.BRAND_TO_GENERIC)}
+        self.quantity_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in parser.QUANTITY_PATTERNS]
+        self.complex_instruction_patterns = [
+            re.compile(pattern, re.IGNORECASE) for pattern in parser.COMPLEX_INSTRUCTION_PATTERNS
+        ]
+        self.timing_patterns = [
+            (re.compile(pattern, re.IGNORECASE), timing_type, TIMING_CUES.get(timing_type))
+            for pattern, timing_type in parser.TIMING_PATTERNS
+        ]
+        self.repeat_patterns = [
+            (re.compile(pattern, re.IGNORECASE), REPEAT_CUES.get(pattern)) for pattern in parser.REPEAT_PATTERNS
+        ]
+        self.medication_type_patterns = [
+            (pattern, med_type, MEDICATION_TYPE_CUES.get(pattern)) for pattern, med_type in parser.MEDICATION_TYPE_PATTERNS
+        ]
+
+        keywords = set(self.brand_rank) | INSTRUCTION_CUES
+        for cues in [*REPEAT_CUES.values(), *TIMING_CUES.values(), *MEDICATION_TYPE_CUES.values()]:
+            keywords.update(cues)
+        self.automaton = KeywordAutomaton(keywords)
+
+    def scan(self, text: str) -> ScannedText:
+        # Collapsing whitespace lets one cue stand for a pattern's \s+
+        return ScannedText(text, self.automaton.find_all(' '.join(text.upper().split())))
+
+    def find_brand(self, scanned: ScannedText) -> Optional[str]:
+        """The first brand in BRAND_TO_GENERIC order that occurs in the text."""
+        brands = [keyword for keyword in scanned.keywords if keyword in self.brand_rank]
+        if not brands:
+            return None
+        return min(brands, key=self.brand_rank.__getitem__)
+
+
 class PrescriptionParser:
     """
     Comprehensive prescription parser for South African healthcare.
@@ -279,6 +465,24 @@ class PrescriptionParser:
         (r'liquid|syrup', MedicationType.LIQUID),
     ] 
     
+    _matcher = None
+    
+    @classmethod
+    def get_matcher(cls) -> PrescriptionMatcher:
+        """Get the compiled matcher for this parser's pattern tables."""
+        matcher = cls.__dict__.get('_matcher')
+        if matcher is None:
+            matcher = PrescriptionMatcher(cls)
+            cls._matcher = matcher
+        return matcher
+    
+    @classmethod
+    def scan(cls, text: Union[str, ScannedText]) -> ScannedText:
+        """Tokenize text once for all extractors."""
+        if isinstance(text, ScannedText):
+            return text
+        return cls.get_matcher().scan(text)
+    
     @classmethod
     def parse_prescription(cls, prescription_text: str) -> Dict[str, Any]:
         """
@@ -329,25 +533,18 @@ class PrescriptionParser:
     @classmethod
     def _extract_doctor_info(cls, text: str) -> ExtractedField:
         """Extract doctor information from prescription text."""
-        doctor_patterns = [
-            r'dr\.?\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
-            r'doctor\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
-            r'prescribed\s+by\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
-            r'physician\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
-        ]
-        
-        for pattern in doctor_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in DOCTOR_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return ExtractedField(
                     value=match.group(1).strip(),
-                    confidence=ConfidenceLevel.HIGH.value,
+                    confidence=HIGH,
                     source_text=match.group(0)
                 )
         
         return ExtractedField(
             value=None,
-            confidence=ConfidenceLevel.VERY_LOW.value,
+            confidence=VERY_LOW,
             source_text="",
             validation_errors=["No doctor information found"]
         )
@@ -355,36 +552,23 @@ class PrescriptionParser:
     @classmethod
     def _extract_patient_info(cls, text: str) -> ExtractedField:
         """Extract patient information from prescription text."""
-        patient_patterns = [
-            r'patient\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
-            r'name\s*:\s*([A-Z][a-z]+\s+[A-Z][a-z]+)',
-            r'id\s*:\s*(\d+)',
-            r'date\s+of\s+birth\s*:\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        ]
-        
         patient_info = {}
-        confidence = ConfidenceLevel.MEDIUM.value
         
-        for pattern in patient_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for field, pattern in PATIENT_PATTERNS:
+            match = pattern.search(text)
             if match:
-                if 'name' in pattern.lower():
-                    patient_info['name'] = match.group(1).strip()
-                elif 'id' in pattern.lower():
-                    patient_info['id'] = match.group(1).strip()
-                elif 'birth' in pattern.lower():
-                    patient_info['date_of_birth'] = match.group(1).strip()
+                patient_info[field] = match.group(1).strip()
         
         if patient_info:
             return ExtractedField(
                 value=patient_info,
-                confidence=confidence,
+                confidence=MEDIUM,
                 source_text=text[:200]  # First 200 chars as source
             )
         
         return ExtractedField(
             value={},
-            confidence=ConfidenceLevel.VERY_LOW.value,
+            confidence=VERY_LOW,
             source_text="",
             validation_errors=["No patient information found"]
         )
@@ -411,7 +595,7 @@ class PrescriptionParser:
     def _split_into_medication_sections(cls, text: str) -> List[str]:
         """Split prescription text into individual medication sections."""
         # Split by numbered medication sections (1., 2., 3., etc.)
-        sections = re.split(r'\n\s*(\d+)\.\s*', text)
+        sections = NUMBERED_SECTION_RE.split(text)
         
         medication_sections = []
         for i in range(1, len(sections), 2):  # Skip the first empty section and take every other section
@@ -423,16 +607,15 @@ class PrescriptionParser:
         # If no numbered sections found, try other patterns
         if not medication_sections:
             # Try bullet points
-            sections = re.split(r'\n\s*[-*]\s*', text)
+            sections = BULLET_SECTION_RE.split(text)
             medication_sections = [s.strip() for s in sections if s.strip()]
         
         # If still no sections, try medication name patterns
         if not medication_sections:
             # Look for medication names in all caps
-            medication_names = re.findall(r'\n\s*([A-Z][A-Z\s]+)\s*\n', text)
-            if medication_names:
+            if CAPS_NAME_LINE_RE.search(text):
                 # Split by medication names
-                sections = re.split(r'\n\s*[A-Z][A-Z\s]+\s*\n', text)
+                sections = CAPS_NAME_SPLIT_RE.split(text)
                 medication_sections = [s.strip() for s in sections if s.strip()]
         
         return medication_sections
@@ -441,17 +624,18 @@ class PrescriptionParser:
     def _parse_single_medication(cls, section: str, medication_number: int) -> ExtractedField:
         """Parse a single medication section."""
         try:
+            scanned = cls.scan(section)
             medication_data = {
                 'medication_number': medication_number,
-                'name': cls._extract_medication_name(section),
-                'generic_name': cls._extract_generic_name(section),
-                'strength': cls._extract_strength(section),
-                'quantity': cls._extract_quantity(section),
-                'instructions': cls._extract_instructions(section),
-                'medication_type': cls._extract_medication_type(section),
-                'timing': cls._extract_timing(section),
-                'repeats': cls._extract_repeats(section),
-                'as_needed': cls._extract_as_needed(section),
+                'name': cls._extract_medication_name(scanned),
+                'generic_name': cls._extract_generic_name(scanned),
+                'strength': cls._extract_strength(scanned),
+                'quantity': cls._extract_quantity(scanned),
+                'instructions': cls._extract_instructions(scanned),
+                'medication_type': cls._extract_medication_type(scanned),
+                'timing': cls._extract_timing(scanned),
+                'repeats': cls._extract_repeats(scanned),
+                'as_needed': cls._extract_as_needed(scanned),
             }
             
             # Calculate confidence for this medication
@@ -460,7 +644,7 @@ class PrescriptionParser:
                 if isinstance(field_value, ExtractedField):
                     confidence_scores.append(field_value.confidence)
                 elif field_value is not None:
-                    confidence_scores.append(ConfidenceLevel.MEDIUM.value)
+                    confidence_scores.append(MEDIUM)
             
             overall_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.0
             
@@ -474,116 +658,104 @@ class PrescriptionParser:
             logger.error(f"Error parsing medication {medication_number}: {e}")
             return ExtractedField(
                 value=None,
-                confidence=ConfidenceLevel.VERY_LOW.value,
+                confidence=VERY_LOW,
                 source_text=section,
                 validation_errors=[str(e)]
             ) 
     
     @classmethod
-    def _extract_medication_name(cls, text: str) -> ExtractedField:
+    def _extract_medication_name(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract medication name from text."""
+        scanned = cls.scan(text)
+        
         # Look for brand names in our mapping
-        text_upper = text.upper()
-        for brand_name in cls.BRAND_TO_GENERIC.keys():
-            if brand_name in text_upper:
-                return ExtractedField(
-                    value=brand_name.title(),
-                    confidence=ConfidenceLevel.HIGH.value,
-                    source_text=brand_name
-                )
+        brand_name = cls.get_matcher().find_brand(scanned)
+        if brand_name:
+            return ExtractedField(
+                value=brand_name.title(),
+                confidence=HIGH,
+                source_text=brand_name
+            )
         
         # Look for common medication name patterns
-        name_patterns = [
-            r'([A-Z][A-Z\s]+)',  # All caps names
-            r'([A-Z][a-z]+\s+[A-Z][a-z]+)',  # Title case names
-            r'([A-Z][a-z]+)',  # Single word names
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, text)
+        for pattern in NAME_PATTERNS:
+            match = pattern.search(scanned.text)
             if match:
                 name = match.group(1).strip()
                 if len(name) > 2:  # Avoid very short matches
                     return ExtractedField(
                         value=name,
-                        confidence=ConfidenceLevel.MEDIUM.value,
+                        confidence=MEDIUM,
                         source_text=name
                     )
         
         return ExtractedField(
             value=None,
-            confidence=ConfidenceLevel.VERY_LOW.value,
+            confidence=VERY_LOW,
             source_text="",
             validation_errors=["No medication name found"]
         )
     
     @classmethod
-    def _extract_generic_name(cls, text: str) -> ExtractedField:
+    def _extract_generic_name(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract generic name from text."""
+        scanned = cls.scan(text)
+        
         # First check if we can map from brand name
-        text_upper = text.upper()
-        for brand_name, generic_name in cls.BRAND_TO_GENERIC.items():
-            if brand_name in text_upper:
-                return ExtractedField(
-                    value=generic_name,
-                    confidence=ConfidenceLevel.HIGH.value,
-                    source_text=brand_name
-                )
+        brand_name = cls.get_matcher().find_brand(scanned)
+        if brand_name:
+            return ExtractedField(
+                value=cls.BRAND_TO_GENERIC[brand_name],
+                confidence=HIGH,
+                source_text=brand_name
+            )
         
         # Look for generic name patterns
-        generic_patterns = [
-            r'generic\s*:\s*([A-Z][a-z\s]+)',
-            r'\(([A-Z][a-z\s]+)\)',  # Parenthetical generic names
-            r'([A-Z][a-z]+\s+[A-Z][a-z]+)\s+\(generic\)',
-        ]
-        
-        for pattern in generic_patterns:
-            match = re.search(pattern, text)
+        for pattern in GENERIC_PATTERNS:
+            match = pattern.search(scanned.text)
             if match:
                 return ExtractedField(
                     value=match.group(1).strip(),
-                    confidence=ConfidenceLevel.MEDIUM.value,
+                    confidence=MEDIUM,
                     source_text=match.group(0)
                 )
         
         return ExtractedField(
             value=None,
-            confidence=ConfidenceLevel.LOW.value,
+            confidence=LOW,
             source_text="",
             validation_errors=["No generic name found"]
         )
     
     @classmethod
-    def _extract_strength(cls, text: str) -> ExtractedField:
+    def _extract_strength(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract medication strength from text."""
-        strength_patterns = [
-            r'(\d+(?:\.\d+)?)\s*(mg|mcg|ml|units?|g|mcg/ml|mg/ml|units/ml)',
-            r'strength\s*:\s*(\d+(?:\.\d+)?)\s*(mg|mcg|ml|units?|g)',
-            r'(\d+(?:\.\d+)?)\s*(mg|mcg|ml|units?|g)\s*(tablets?|capsules?|drops?|units?)',
-        ]
+        text = cls.scan(text).text
         
-        for pattern in strength_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in STRENGTH_PATTERNS:
+            match = pattern.search(text)
             if match:
                 strength = f"{match.group(1)}{match.group(2)}"
                 return ExtractedField(
                     value=strength,
-                    confidence=ConfidenceLevel.HIGH.value,
+                    confidence=HIGH,
                     source_text=match.group(0)
                 )
         
         return ExtractedField(
             value=None,
-            confidence=ConfidenceLevel.VERY_LOW.value,
+            confidence=VERY_LOW,
             source_text="",
             validation_errors=["No strength information found"]
         )
     
     @classmethod
-    def _extract_quantity(cls, text: str) -> ExtractedField:
+    def _extract_quantity(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract quantity from text with validation."""
-        for pattern in cls.QUANTITY_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+        text = cls.scan(text).text
+        
+        for pattern in cls.get_matcher().quantity_patterns:
+            match = pattern.search(text)
             if match:
                 quantity = int(match.group(1))
                 
@@ -594,9 +766,9 @@ class PrescriptionParser:
                 elif quantity > 1000:
                     validation_errors.append("Quantity seems unusually high")
                 
-                confidence = ConfidenceLevel.HIGH.value
+                confidence = HIGH
                 if validation_errors:
-                    confidence = ConfidenceLevel.MEDIUM.value
+                    confidence = MEDIUM
                 
                 return ExtractedField(
                     value=quantity,
@@ -607,125 +779,140 @@ class PrescriptionParser:
         
         return ExtractedField(
             value=None,
-            confidence=ConfidenceLevel.VERY_LOW.value,
+            confidence=VERY_LOW,
             source_text="",
             validation_errors=["No quantity found"]
         )
     
     @classmethod
-    def _extract_instructions(cls, text: str) -> ExtractedField:
+    def _extract_instructions(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract medication instructions from text."""
+        scanned = cls.scan(text)
+        if not scanned.has_any(INSTRUCTION_CUES):
+            return ExtractedField(
+                value=None,
+                confidence=VERY_LOW,
+                source_text="",
+                validation_errors=["No instructions found"]
+            )
+        text = scanned.text
+        
         # First try complex instruction patterns
-        for pattern in cls.COMPLEX_INSTRUCTION_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in cls.get_matcher().complex_instruction_patterns:
+            match = pattern.search(text)
             if match:
                 # Clean up the instruction text
                 instruction = match.group(0).strip()
                 # Remove extra whitespace and newlines
-                instruction = re.sub(r'\s+', ' ', instruction)
+                instruction = WHITESPACE_RE.sub(' ', instruction)
                 return ExtractedField(
                     value=instruction,
-                    confidence=ConfidenceLevel.HIGH.value,
+                    confidence=HIGH,
                     source_text=match.group(0)
                 )
         
         # Look for general instruction patterns
-        instruction_patterns = [
-            r'take\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)',
-            r'use\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)',
-            r'apply\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)',
-            r'inject\s+([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)',
-            r'instructions?\s*:\s*([^.\n]*(?:[^.\n]*\n[^.\n]*)*?)(?=\n|$)',
-        ]
-        
-        for pattern in instruction_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for cue, pattern in INSTRUCTION_PATTERNS:
+            if cue not in scanned.keywords:
+                continue
+            match = pattern.search(text)
             if match:
                 instruction = match.group(1).strip()
                 # Clean up the instruction text
-                instruction = re.sub(r'\s+', ' ', instruction)
+                instruction = WHITESPACE_RE.sub(' ', instruction)
                 # Remove quantity and repeat information from instructions
-                instruction = re.sub(r'quantity:\s*x?\s*\d+', '', instruction, flags=re.IGNORECASE)
-                instruction = re.sub(r'\+?\s*\d+\s*repeats?', '', instruction, flags=re.IGNORECASE)
+                instruction = INSTRUCTION_QUANTITY_RE.sub('', instruction)
+                instruction = INSTRUCTION_REPEATS_RE.sub('', instruction)
                 instruction = instruction.strip()
                 
                 if instruction:
                     return ExtractedField(
                         value=instruction,
-                        confidence=ConfidenceLevel.MEDIUM.value,
+                        confidence=MEDIUM,
                         source_text=match.group(0)
                     )
         
         return ExtractedField(
             value=None,
-            confidence=ConfidenceLevel.VERY_LOW.value,
+            confidence=VERY_LOW,
             source_text="",
             validation_errors=["No instructions found"]
         )
     
     @classmethod
-    def _extract_medication_type(cls, text: str) -> ExtractedField:
+    def _extract_medication_type(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract medication type from text."""
-        text_lower = text.lower()
-        
-        for pattern, med_type in cls.MEDICATION_TYPE_PATTERNS:
-            if re.search(pattern, text_lower):
+        scanned = cls.scan(text)
+        
+        for pattern, med_type, cues in cls.get_matcher().medication_type_patterns:
+            if cues is None:
+                found = re.search(pattern, scanned.text.lower())
+            else:
+                found = scanned.has_any(cues)
+            if found:
                 return ExtractedField(
                     value=med_type.value,
-                    confidence=ConfidenceLevel.HIGH.value,
+                    confidence=HIGH,
                     source_text=pattern
                 )
         
         return ExtractedField(
             value=MedicationType.TABLET.value,  # Default to tablet
-            confidence=ConfidenceLevel.LOW.value,
+            confidence=LOW,
             source_text="",
             validation_errors=["No medication type found, defaulting to tablet"]
         )
     
     @classmethod
-    def _extract_timing(cls, text: str) -> ExtractedField:
+    def _extract_timing(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract timing information from text."""
+        scanned = cls.scan(text)
+        text = scanned.text
         timing_info = []
         
-        for pattern, timing_type in cls.TIMING_PATTERNS:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
+        for pattern, timing_type, cues in cls.get_matcher().timing_patterns:
+            if cues is not None and not scanned.has_any(cues):
+                continue
+            for match in pattern.finditer(text):
                 if timing_type == 'custom_time':
                     # Extract the actual time
-                    time_match = re.search(r'(\d{1,2})h(\d{2})?|(\d{1,2}):(\d{2})', match.group(0))
+                    time_match = CUSTOM_TIME_RE.search(match.group(0))
                     if time_match:
                         timing_info.append({
                             'type': timing_type,
                             'value': time_match.group(0),
-                            'confidence': ConfidenceLevel.HIGH.value
+                            'confidence': HIGH
                         })
                 else:
                     timing_info.append({
                         'type': timing_type,
                         'value': match.group(0),
-                        'confidence': ConfidenceLevel.HIGH.value
+                        'confidence': HIGH
                     })
         
         if timing_info:
             return ExtractedField(
                 value=timing_info,
-                confidence=ConfidenceLevel.HIGH.value,
+                confidence=HIGH,
                 source_text=text
             )
         
         return ExtractedField(
             value=[],
-            confidence=ConfidenceLevel.LOW.value,
+            confidence=LOW,
             source_text="",
             validation_errors=["No timing information found"]
         )
     
     @classmethod
-    def _extract_repeats(cls, text: str) -> ExtractedField:
+    def _extract_repeats(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract repeat information from text."""
-        for pattern in cls.REPEAT_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+        scanned = cls.scan(text)
+        
+        for pattern, cues in cls.get_matcher().repeat_patterns:
+            if cues is not None and not scanned.has_any(cues):
+                continue
+            match = pattern.search(scanned.text)
             if match:
                 repeats = int(match.group(1))
                 
@@ -736,9 +923,9 @@ class PrescriptionParser:
                 elif repeats > 12:
                     validation_errors.append("Repeats seem unusually high")
                 
-                confidence = ConfidenceLevel.HIGH.value
+                confidence = HIGH
                 if validation_errors:
-                    confidence = ConfidenceLevel.MEDIUM.value
+                    confidence = MEDIUM
                 
                 return ExtractedField(
                     value=repeats,
@@ -749,33 +936,27 @@ class PrescriptionParser:
         
         return ExtractedField(
             value=0,
-            confidence=ConfidenceLevel.LOW.value,
+            confidence=LOW,
             source_text="",
             validation_errors=["No repeat information found"]
         )
     
     @classmethod
-    def _extract_as_needed(cls, text: str) -> ExtractedField:
+    def _extract_as_needed(cls, text: Union[str, ScannedText]) -> ExtractedField:
         """Extract 'as needed' information from text."""
-        as_needed_patterns = [
-            r'as\s+needed',
-            r'as\s+required',
-            r'prn',
-            r'when\s+needed',
-            r'when\s+required',
-        ]
+        scanned = cls.scan(text)
         
-        for pattern in as_needed_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
+        for cue, pattern in AS_NEEDED_PATTERNS:
+            if cue in scanned.keywords:
                 return ExtractedField(
                     value=True,
-                    confidence=ConfidenceLevel.HIGH.value,
+                    confidence=HIGH,
                     source_text=pattern
                 )
         
         return ExtractedField(
             value=False,
-            confidence=ConfidenceLevel.MEDIUM.value,
+            confidence=MEDIUM,
             source_text="",
             validation_errors=["No 'as needed' information found"]
         ) 
@@ -783,11 +964,8 @@ class PrescriptionParser:
     @classmethod
     def _extract_icd10_codes(cls, text: str) -> List[ExtractedField]:
         """Extract ICD-10 codes from text."""
-        icd10_pattern = r'[A-Z]\d{2}(?:\.\d{1,2})?'
-        matches = re.finditer(icd10_pattern, text)
-        
         icd10_codes = []
-        for match in matches:
+        for match in ICD10_CODE_RE.finditer(text):
             code = match.group(0)
             description = cls.ICD10_MAPPINGS.get(code, "Unknown condition")
             
@@ -797,7 +975,7 @@ class PrescriptionParser:
                     'description': description,
                     'category': cls._get_icd10_category(code)
                 },
-                confidence=ConfidenceLevel.HIGH.value,
+                confidence=HIGH,
                 source_text=match.group(0)
             ))
         
@@ -806,24 +984,7 @@ class PrescriptionParser:
     @classmethod
     def _get_icd10_category(cls, code: str) -> str:
         """Get category for ICD-10 code."""
-        if code.startswith('E'):
-            return 'Endocrine, nutritional and metabolic diseases'
-        elif code.startswith('F'):
-            return 'Mental and behavioural disorders'
-        elif code.startswith('I'):
-            return 'Diseases of the circulatory system'
-        elif code.startswith('J'):
-            return 'Diseases of the respiratory system'
-        elif code.startswith('M'):
-            return 'Diseases of the musculoskeletal system and connective tissue'
-        elif code.startswith('N'):
-            return 'Diseases of the genitourinary system'
-        elif code.startswith('A'):
-            return 'Certain infectious and parasitic diseases'
-        elif code.startswith('Z'):
-            return 'Factors influencing health status and contact with health services'
-        else:
-            return 'Other conditions'
+        return ICD10_CATEGORIES.get(code[:1], 'Other conditions')
     
     @classmethod
     def _extract_prescription_metadata(cls, text: str) -> ExtractedField:
@@ -831,31 +992,20 @@ class PrescriptionParser:
         metadata = {}
         
         # Extract prescription date
-        date_patterns = [
-            r'date\s*:\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
+        for pattern in PRESCRIPTION_DATE_PATTERNS:
+            match = pattern.search(text)
             if match:
                 metadata['prescription_date'] = match.group(1)
                 break
         
         # Extract prescription number
-        number_patterns = [
-            r'rx\s*#?\s*:?\s*(\w+)',
-            r'prescription\s*#?\s*:?\s*(\w+)',
-            r'(\w{2,10}-\d{4}-\d{3,6})',  # Common prescription number format
-        ]
-        
-        for pattern in number_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in PRESCRIPTION_NUMBER_PATTERNS:
+            match = pattern.search(text)
             if match:
                 metadata['prescription_number'] = match.group(1)
                 break
         
-        confidence = ConfidenceLevel.MEDIUM.value if metadata else ConfidenceLevel.VERY_LOW.value
+        confidence = MEDIUM if metadata else VERY_LOW
         
         return ExtractedField(
             value=metadata,
@@ -24,6 +24,7 @@ from .models import (
     StockAnalytics, StockVisualization, PharmacyIntegration,
     StockTransaction, PrescriptionRenewal
 )
+from .interaction_engine import InteractionEngine, get_patient_profile
 
 # Import audit logging
 try:
@@ -659,45 +660,24 @@ class MedicationInteractionValidator:
         },
     }
     
+    _engine = None
+    
+    @classmethod
+    def get_engine(cls) -> InteractionEngine:
+        """Get the interaction engine compiled from the tables above."""
+        if cls._engine is None:
+            cls._engine = InteractionEngine(cls.KNOWN_INTERACTIONS, cls.CONTRAINDICATIONS)
+        return cls._engine
+    
     @classmethod
     def check_interactions(cls, medication_name: str, existing_medications: List[str]) -> List[Dict]:
         """Check for potential drug interactions."""
-        interactions = []
-        medication_lower = medication_name.lower()
-        
-        for drug, interaction_data in cls.KNOWN_INTERACTIONS.items():
-            if drug in medication_lower:
-                for existing_med in existing_medications:
-                    if any(interacting_drug in existing_med.lower() for interacting_drug in interaction_data['interactions']):
-                        interactions.append({
-                            'medication1': medication_name,
-                            'medication2': existing_med,
-                            'severity': interaction_data['severity'],
-                            'description': interaction_data['description'],
-                            'recommendation': f"Monitor for {interaction_data['description'].lower()}"
-                        })
-        
-        return interactions
+        return cls.get_engine().check_interactions(medication_name, existing_medications)
     
     @classmethod
     def check_contraindications(cls, medication_name: str, patient_conditions: List[str]) -> List[Dict]:
         """Check for contraindications based on patient conditions."""
-        contraindications = []
-        medication_lower = medication_name.lower()
-        
-        for condition, contraindication_data in cls.CONTRAINDICATIONS.items():
-            if condition in patient_conditions:
-                for drug in contraindication_data['medications']:
-                    if drug in medication_lower:
-                        contraindications.append({
-                            'medication': medication_name,
-                            'condition': condition,
-                            'severity': contraindication_data['severity'],
-                            'description': contraindication_data['description'],
-                            'recommendation': f"Consult healthcare provider before use"
-                        })
-        
-        return contraindications
+        return cls.get_engine().check_contraindications(medication_name, patient_conditions)
 
 
 class PrescriptionRenewalCalculator:
@@ -1701,33 +1681,24 @@ class EnhancedMedicationSerializer(serializers.ModelSerializer):
         if not obj.name:
             return []
         
-        # Get existing medications for the current user
-        user = self.context.get('request').user if self.context.get('request') else None
-        if not user:
+        # Active medications of the current user, loaded once per request
+        profile = get_patient_profile(self.context)
+        if profile is None:
             return []
         
-        existing_medications = []
-        if hasattr(user, 'medication_schedules'):
-            existing_medications = [
-                schedule.medication.name 
-                for schedule in user.medication_schedules.filter(status='active')
-                if schedule.medication.name != obj.name
-            ]
-        
-        return MedicationInteractionValidator.check_interactions(obj.name, existing_medications)
+        return MedicationInteractionValidator.check_interactions(obj.name, profile.other_medications(obj.name))
     
     def get_contraindication_warnings(self, obj):
         """Get contraindication warnings."""
         if not obj.name:
             return []
         
-        # Get patient conditions from context or user profile
-        patient_conditions = []
-        user = self.context.get('request').user if self.context.get('request') else None
-        if user and hasattr(user, 'medical_conditions'):
-            patient_conditions = user.medical_conditions
+        # Get patient conditions from the user profile
+        profile = get_patient_profile(self.context)
+        if profile is None:
+            return []
         
-        return MedicationInteractionValidator.check_contraindications(obj.name, patient_conditions)
+        return MedicationInteractionValidator.check_contraindications(obj.name, profile.conditions)
     
     def get_renewal_date(self, obj):
         """Get calculated renewal date."""
@@ -2021,6 +1992,61 @@ class MedicationLogSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class DoseEventSerializer(serializers.Serializer):
+    """Serializer for one dose event in a bulk mark-taken request."""
+    
+    schedule_id = serializers.IntegerField(help_text=_('Medication schedule ID'))
+    scheduled_time = serializers.DateTimeField(
+        required=False,
+        help_text=_('When the dose was scheduled (defaults to today\'s dose time)')
+    )
+    actual_time = serializers.DateTimeField(
+        required=False,
+        help_text=_('When the dose was taken (defaults to now)')
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    idempotency_key = serializers.CharField(
+        max_length=100,
+        required=False,
+        help_text=_('Client key making the event safe to resend')
+    )
+    
+    def validate_actual_time(self, value):
+        """Validate actual time is not in the future."""
+        if value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError(_('Actual time cannot be in the future'))
+        return value
+
+
+class MarkTakenBulkSerializer(serializers.Serializer):
+    """Serializer for recording many taken doses at once."""
+    
+    MAX_EVENTS = 500
+    
+    events = DoseEventSerializer(many=True, allow_empty=False)
+    
+    def validate_events(self, value):
+        """Limit the batch size."""
+        if len(value) > self.MAX_EVENTS:
+            raise serializers.ValidationError(
+                _('At most %(count)d dose events can be recorded at once') % {'count': self.MAX_EVENTS}
+            )
+        return value
+
+
+class BatchPrescriptionUploadSerializer(serializers.Serializer):
+    """Serializer for the options of a batch prescription upload."""
+    
+    MAX_CHUNK_SIZE = 1000
+    
+    chunk_size = serializers.IntegerField(
+        min_value=1,
+        max_value=MAX_CHUNK_SIZE,
+        default=100,
+        help_text=_('Prescriptions per queued chunk task')
+    )
+
+
 class MedicationLogDetailSerializer(MedicationLogSerializer):
     """Detailed serializer for MedicationLog model."""
     
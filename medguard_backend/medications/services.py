@@ -18,19 +18,30 @@ import logging
 from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Q, Sum, Avg, Count, F
+from django.db.models import Q, Sum, Avg, Count, F, prefetch_related_objects
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.conf import settings
 from PIL import Image, ImageOps
+import hashlib
 import io
+import json
 import os
 from celery import shared_task
 
+from api.cache_tags import invalidate_tags_on_commit, model_tag, object_tag, user_tag
+from medguard_backend.cache import read_through
+
 from .models import (
     Medication, StockTransaction, StockAnalytics, PharmacyIntegration,
-    PrescriptionRenewal, StockVisualization, MedicationLog, MedicationSchedule
+    PrescriptionRenewal, StockVisualization, MedicationLog, MedicationSchedule,
+    StockDailyRollup
+)
+from .stock_analytics_engine import (
+    IncrementalStockAnalytics, apply_prediction, build_basic_prediction,
+    build_prediction, calculate_confidence
 )
+from .stock_rollups import record_stock_rollups
 from medguard_notifications.services import NotificationService
 
 User = get_user_model()
@@ -44,6 +55,7 @@ class IntelligentStockService:
     
     def __init__(self):
         self.notification_service = NotificationService()
+        self.analytics_engine = IncrementalStockAnalytics()
     
     def record_dose_taken(self, patient: User, medication: Medication, 
                          dosage_amount: Decimal, schedule: Optional[MedicationSchedule] = None,
@@ -85,8 +97,8 @@ class IntelligentStockService:
                     notes=notes
                 )
                 
-                # Update analytics
-                self.update_stock_analytics(medication)
+                # Analytics are folded in incrementally by the StockTransaction
+                # post_save signal; the full recompute runs as a periodic job.
                 
                 # Check for low stock and send alerts
                 if medication.is_low_stock:
@@ -98,7 +110,230 @@ class IntelligentStockService:
         except Exception as e:
             logger.error(f"Error recording dose taken: {e}")
             raise
-    
+
+    def record_doses_bulk(self, user: User, schedules: List[MedicationSchedule],
+                          events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Record many taken doses in one transaction.
+
+        Logs and stock transactions are inserted with ``bulk_create``, each
+        medication's pill count is decremented by a single ``F()`` update and
+        low stock alerts are evaluated once per medication. Events are
+        identified by an idempotency key (derived from the schedule and
+        scheduled time when the client sends none), so re-sending a batch
+        records nothing twice. A key already used for a different schedule
+        or scheduled time is reported as a ``conflict`` and records nothing.
+
+        Args:
+            user: The user recording the doses (patient or caregiver)
+            schedules: Schedules the events refer to (already permission checked)
+            events: Dose events with ``schedule_id`` and optional
+                ``scheduled_time``, ``actual_time``, ``notes`` and ``idempotency_key``
+
+        Returns:
+            List with one result per event, in input order
+        """
+        from .models import StockAlert
+
+        schedule_map = {schedule.id: schedule for schedule in schedules}
+        now = timezone.now()
+        today = timezone.localdate()
+
+        results = [None] * len(events)
+        pending = []
+        for index, event in enumerate(events):
+            schedule = schedule_map.get(event['schedule_id'])
+            if schedule is None:
+                results[index] = {'schedule_id': event['schedule_id'], 'status': 'not_found'}
+                continue
+
+            scheduled_time = event.get('scheduled_time') or timezone.make_aware(
+                datetime.combine(today, schedule.get_dose_time())
+            )
+            key = event.get('idempotency_key') or f"schedule:{schedule.id}:{scheduled_time.isoformat()}"
+            pending.append((index, schedule, scheduled_time, key, event))
+
+        if not pending:
+            return results
+
+        with transaction.atomic():
+            # Lock the medications in a stable order; this serialises concurrent
+            # syncs touching the same stock and makes the key check below safe
+            medication_ids = sorted({schedule.medication_id for _, schedule, _, _, _ in pending})
+            medications = {
+                medication.id: medication
+                for medication in Medication.objects.select_for_update().filter(
+                    id__in=medication_ids
+                ).order_by('id')
+            }
+
+            existing_logs = MedicationLog.objects.filter(
+                Q(idempotency_key__in=[key for _, _, _, key, _ in pending]) |
+                Q(schedule_id__in={schedule.id for _, schedule, _, _, _ in pending},
+                  scheduled_time__in={scheduled_time for _, _, scheduled_time, _, _ in pending}),
+                patient_id__in={schedule.patient_id for _, schedule, _, _, _ in pending}
+            )
+            logs_by_key = {}
+            logs_by_slot = {}
+            for log in existing_logs:
+                if log.idempotency_key:
+                    logs_by_key[(log.patient_id, log.idempotency_key)] = log
+                logs_by_slot[(log.schedule_id, log.scheduled_time)] = log
+
+            stock = {medication_id: medication.pill_count for medication_id, medication in medications.items()}
+            new_logs = []
+            updated_logs = []
+            new_transactions = []
+            # Dose each key was used for earlier in this batch
+            seen = {}
+
+            for index, schedule, scheduled_time, key, event in pending:
+                medication = medications[schedule.medication_id]
+                dose = (schedule.id, scheduled_time)
+                log = logs_by_key.get((schedule.patient_id, key))
+                if log is not None and (log.schedule_id, log.scheduled_time) != dose:
+                    # The key belongs to another dose; never touch that dose's log
+                    results[index] = {'schedule_id': schedule.id, 'status': 'conflict',
+                                      'idempotency_key': key}
+                    continue
+                if log is None:
+                    log = logs_by_slot.get(dose)
+
+                seen_dose = seen.get((schedule.patient_id, key))
+                if seen_dose is not None and seen_dose != dose:
+                    results[index] = {'schedule_id': schedule.id, 'status': 'conflict',
+                                      'idempotency_key': key}
+                    continue
+                if seen_dose is not None or (log is not None and log.status == MedicationLog.Status.TAKEN):
+                    results[index] = {'schedule_id': schedule.id, 'status': 'duplicate',
+                                      'idempotency_key': key}
+                    continue
+
+                dosage_to_deduct = int(schedule.dosage_amount)
+                if stock[medication.id] < dosage_to_deduct:
+                    results[index] = {'schedule_id': schedule.id, 'status': 'insufficient_stock',
+                                      'idempotency_key': key, 'current_stock': stock[medication.id],
+                                      'required': dosage_to_deduct}
+                    continue
+
+                seen[(schedule.patient_id, key)] = dose
+                actual_time = event.get('actual_time') or now
+                notes = event.get('notes', '')
+                if log is None:
+                    new_logs.append(MedicationLog(
+                        patient_id=schedule.patient_id,
+                        medication=medication,
+                        schedule=schedule,
+                        scheduled_time=scheduled_time,
+                        actual_time=actual_time,
+                        status=MedicationLog.Status.TAKEN,
+                        dosage_taken=schedule.dosage_amount,
+                        notes=notes,
+                        idempotency_key=key
+                    ))
+                else:
+                    # A missed or skipped dose that was taken after all
+                    log.status = MedicationLog.Status.TAKEN
+                    log.actual_time = actual_time
+                    log.dosage_taken = schedule.dosage_amount
+                    log.idempotency_key = log.idempotency_key or key
+                    if notes:
+                        log.notes = notes
+                    log.updated_at = now
+                    updated_logs.append(log)
+
+                stock_before = stock[medication.id]
+                stock[medication.id] = stock_before - dosage_to_deduct
+                new_transactions.append(StockTransaction(
+                    medication=medication,
+                    user=user,
+                    transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+                    quantity=-dosage_to_deduct,
+                    stock_before=stock_before,
+                    stock_after=stock[medication.id],
+                    notes=f"Dose taken for schedule {schedule.id} - {medication.name}",
+                    reference_number=f"SCH_{schedule.id}_{timezone.localtime(scheduled_time).date()}",
+                ))
+                results[index] = {'schedule_id': schedule.id, 'status': 'recorded',
+                                  'idempotency_key': key, 'remaining_stock': stock[medication.id]}
+
+            MedicationLog.objects.bulk_create(new_logs)
+            if updated_logs:
+                MedicationLog.objects.bulk_update(
+                    updated_logs, ['status', 'actual_time', 'dosage_taken', 'idempotency_key', 'notes', 'updated_at']
+                )
+            created_transactions = StockTransaction.objects.bulk_create(new_transactions)
+
+            # One relative update per medication
+            deducted = {}
+            transactions_by_medication = {}
+            for stock_transaction in created_transactions:
+                deducted[stock_transaction.medication_id] = (
+                    deducted.get(stock_transaction.medication_id, 0) - stock_transaction.quantity
+                )
+                transactions_by_medication.setdefault(stock_transaction.medication_id, []).append(stock_transaction)
+
+            for medication_id, amount in deducted.items():
+                Medication.objects.filter(id=medication_id).update(pill_count=F('pill_count') - amount)
+                medications[medication_id].pill_count = stock[medication_id]
+
+            # bulk_create skips post_save, so roll the doses up and retire
+            # the cached lists here
+            record_stock_rollups(created_transactions)
+            MedicationCacheService.invalidate_medication_lists()
+
+            # Low stock alerts, evaluated once per medication
+            low_stock = [medications[medication_id] for medication_id in deducted
+                         if medications[medication_id].pill_count <= medications[medication_id].low_stock_threshold]
+            if low_stock:
+                alerted = set(StockAlert.objects.filter(
+                    medication__in=low_stock,
+                    alert_type__in=[StockAlert.AlertType.LOW_STOCK, StockAlert.AlertType.OUT_OF_STOCK],
+                    status=StockAlert.Status.ACTIVE
+                ).values_list('medication_id', flat=True))
+
+                new_alerts = []
+                for medication in low_stock:
+                    if medication.id in alerted:
+                        continue
+                    out_of_stock = medication.pill_count == 0
+                    alert_type = StockAlert.AlertType.OUT_OF_STOCK if out_of_stock else StockAlert.AlertType.LOW_STOCK
+                    new_alerts.append(StockAlert(
+                        medication=medication,
+                        created_by=user,
+                        alert_type=alert_type,
+                        priority=StockAlert.Priority.CRITICAL if out_of_stock else StockAlert.Priority.HIGH,
+                        title=f"{alert_type.replace('_', ' ').title()} Alert - {medication.name}",
+                        message=f"{medication.name} stock is now at {medication.pill_count} units. Threshold is {medication.low_stock_threshold}.",
+                        current_stock=medication.pill_count,
+                        threshold_level=medication.low_stock_threshold
+                    ))
+                StockAlert.objects.bulk_create(new_alerts)
+
+            # Bulk writes skip the post_save signals that retire API cache entries
+            if new_logs or updated_logs:
+                api_tags = [model_tag(Medication), model_tag(MedicationLog), model_tag(StockTransaction)]
+                api_tags.extend(object_tag(model=Medication, pk=medication_id) for medication_id in deducted)
+                api_tags.extend(user_tag(patient_id) for patient_id in {user.id, *(schedule.patient_id for schedule in schedules)})
+                if low_stock:
+                    api_tags.append(model_tag(StockAlert))
+                invalidate_tags_on_commit(api_tags)
+
+            # bulk_create skips the post_save signal that keeps analytics current
+            for medication_id, stock_transactions in transactions_by_medication.items():
+                try:
+                    self.analytics_engine.record_transactions(
+                        medications[medication_id], stock_transactions, stock[medication_id]
+                    )
+                except Exception as e:
+                    logger.error(f"Error updating stock analytics for medication {medication_id}: {e}")
+
+        logger.info(
+            f"Bulk dose recording: {len(created_transactions)} doses recorded "
+            f"for {len(deducted)} medications by {user.username}"
+        )
+        return results
+
     def predict_stock_depletion(self, medication: Medication, 
                                days_ahead: int = 90) -> Dict[str, Any]:
         """
@@ -131,42 +366,28 @@ class IntelligentStockService:
             # Calculate usage patterns
             daily_usage = abs(df_daily['quantity'].mean())
             usage_std = df_daily['quantity'].std()
+            if pd.isna(usage_std):
+                usage_std = 0.0
             
             # Calculate seasonal patterns (weekly)
             df_daily['day_of_week'] = df_daily.index.dayofweek
             weekly_pattern = df_daily.groupby('day_of_week')['quantity'].mean()
             
-            # Predict future usage
-            current_stock = medication.pill_count
-            days_until_stockout = int(current_stock / daily_usage) if daily_usage > 0 else float('inf')
+            if daily_usage == 0:
+                return self._get_basic_prediction(medication, days_ahead)
             
             # Calculate confidence interval
             confidence = self._calculate_prediction_confidence(df_daily, daily_usage)
             
-            # Generate prediction dates
-            predicted_stockout_date = timezone.now().date() + timedelta(days=days_until_stockout)
-            
-            # Calculate recommended order quantity
-            safety_stock = max(7 * daily_usage, medication.low_stock_threshold)
-            recommended_quantity = int(safety_stock * 1.5)  # 50% buffer
-            
-            # Calculate recommended order date
-            lead_time_days = 3  # Default lead time
-            order_date = predicted_stockout_date - timedelta(days=lead_time_days)
-            
-            return {
-                'current_stock': current_stock,
-                'daily_usage_rate': daily_usage,
-                'usage_volatility': usage_std,
-                'days_until_stockout': days_until_stockout,
-                'predicted_stockout_date': predicted_stockout_date,
-                'recommended_order_quantity': recommended_quantity,
-                'recommended_order_date': order_date,
-                'confidence_level': confidence,
-                'weekly_pattern': weekly_pattern.to_dict(),
-                'data_points': len(df_daily),
-                'prediction_method': 'time_series_analysis'
-            }
+            return build_prediction(
+                medication,
+                daily_usage=daily_usage,
+                usage_std=usage_std,
+                confidence=confidence,
+                weekly_pattern=weekly_pattern.to_dict(),
+                data_points=len(df_daily),
+                method='time_series_analysis'
+            )
             
         except Exception as e:
             logger.error(f"Error predicting stock depletion for {medication.name}: {e}")
@@ -185,15 +406,14 @@ class IntelligentStockService:
             Dict containing usage pattern analysis
         """
         try:
-            transactions = self._get_historical_transactions(medication, days)
+            rollups = self._get_daily_rollups(medication, days)
             
-            if not transactions:
+            if not rollups:
                 return {'error': 'No transaction data available'}
             
-            df = pd.DataFrame(transactions)
-            df['date'] = pd.to_datetime(df['created_at'])
+            df = pd.DataFrame(rollups)
+            df['date'] = pd.to_datetime(df['day'])
             df['day_of_week'] = df['date'].dt.dayofweek
-            df['hour'] = df['date'].dt.hour
             df['month'] = df['date'].dt.month
             
             # Daily patterns
@@ -203,11 +423,17 @@ class IntelligentStockService:
             weekly_usage = abs(df.groupby('day_of_week')['quantity'].sum())
             
             # Hourly patterns
-            hourly_usage = abs(df.groupby('hour')['quantity'].sum())
+            hourly_totals = {}
+            for hourly in df['hourly_quantity']:
+                for hour, quantity in hourly.items():
+                    hourly_totals[int(hour)] = hourly_totals.get(int(hour), 0) + quantity
+            hourly_usage = abs(pd.Series(hourly_totals, dtype='int64').sort_index())
             
             # Monthly patterns
             monthly_usage = abs(df.groupby('month')['quantity'].sum())
             
+            transaction_count = int(df['transaction_count'].sum())
+            
             # Statistical measures
             stats = {
                 'mean_daily_usage': daily_usage.mean(),
@@ -215,9 +441,9 @@ class IntelligentStockService:
                 'std_daily_usage': daily_usage.std(),
                 'min_daily_usage': daily_usage.min(),
                 'max_daily_usage': daily_usage.max(),
-                'total_transactions': len(df),
+                'total_transactions': transaction_count,
                 'unique_days': len(daily_usage),
-                'avg_transactions_per_day': len(df) / len(daily_usage) if len(daily_usage) > 0 else 0
+                'avg_transactions_per_day': transaction_count / len(daily_usage) if len(daily_usage) > 0 else 0
             }
             
             return {
@@ -259,16 +485,11 @@ class IntelligentStockService:
             )
             
             # Update analytics with prediction data
-            analytics.daily_usage_rate = prediction.get('daily_usage_rate', 0.0)
-            analytics.weekly_usage_rate = prediction.get('daily_usage_rate', 0.0) * 7
-            analytics.monthly_usage_rate = prediction.get('daily_usage_rate', 0.0) * 30
-            analytics.days_until_stockout = prediction.get('days_until_stockout')
-            analytics.predicted_stockout_date = prediction.get('predicted_stockout_date')
-            analytics.recommended_order_quantity = prediction.get('recommended_order_quantity', 0)
-            analytics.recommended_order_date = prediction.get('recommended_order_date')
-            analytics.usage_volatility = prediction.get('usage_volatility', 0.0)
-            analytics.stockout_confidence = prediction.get('confidence_level', 0.0)
-            analytics.last_calculated = timezone.now()
+            apply_prediction(analytics, prediction)
+            
+            # Reseed the incremental state so per-transaction updates
+            # continue from the reconciled figures
+            analytics.usage_state = self.analytics_engine.build_state(medication)
             
             analytics.save()
             
@@ -294,26 +515,30 @@ class IntelligentStockService:
             StockVisualization: Generated visualization object
         """
         try:
-            # Get transaction data
-            transactions = self._get_historical_transactions(medication, days)
+            # Net stock movement per day, from the daily rollups
+            rollups = self._get_daily_rollups(medication, days)
             
-            if not transactions:
+            if not rollups:
                 return None
             
-            df = pd.DataFrame(transactions)
-            df['date'] = pd.to_datetime(df['created_at'])
-            df = df.sort_values('date')
+            end_date = timezone.localdate()
+            start_date = end_date - timedelta(days=days)
+            df = pd.DataFrame(rollups)
+            net_by_day = df.groupby('day')['quantity'].sum()
+            net_by_day.index = pd.to_datetime(net_by_day.index)
+            net_by_day = net_by_day.reindex(pd.date_range(start_date, end_date), fill_value=0)
             
-            # Calculate cumulative stock levels
-            df['cumulative_quantity'] = df['quantity'].cumsum()
-            df['stock_level'] = medication.pill_count - df['cumulative_quantity']
+            # Walk back from the current stock: the level at the end of a
+            # day is today's stock minus everything recorded after that day
+            movement_after = net_by_day[::-1].cumsum()[::-1] - net_by_day
+            stock_level = medication.pill_count - movement_after
             
             # Prepare chart data
             chart_data = {
-                'labels': df['date'].dt.strftime('%Y-%m-%d').tolist(),
+                'labels': stock_level.index.strftime('%Y-%m-%d').tolist(),
                 'datasets': [{
                     'label': 'Stock Level',
-                    'data': df['stock_level'].tolist(),
+                    'data': [int(level) for level in stock_level],
                     'borderColor': '#2563EB',
                     'backgroundColor': 'rgba(37, 99, 235, 0.1)',
                     'fill': True
@@ -353,8 +578,8 @@ class IntelligentStockService:
                 defaults={
                     'title': f'Stock Level Trend - {medication.name}',
                     'description': f'Stock level trend over the last {days} days',
-                    'start_date': timezone.now().date() - timedelta(days=days),
-                    'end_date': timezone.now().date(),
+                    'start_date': start_date,
+                    'end_date': end_date,
                     'chart_data': chart_data,
                     'chart_options': chart_options
                 }
@@ -363,6 +588,8 @@ class IntelligentStockService:
             if not created:
                 visualization.chart_data = chart_data
                 visualization.chart_options = chart_options
+                visualization.start_date = start_date
+                visualization.end_date = end_date
                 visualization.last_generated = timezone.now()
                 visualization.save()
             
@@ -475,41 +702,26 @@ class IntelligentStockService:
         
         return list(transactions)
     
-    def _get_basic_prediction(self, medication: Medication, days_ahead: int) -> Dict[str, Any]:
-        """Get basic prediction when insufficient data is available."""
-        current_stock = medication.pill_count
-        estimated_daily_usage = 1.0  # Default estimate
+    def _get_daily_rollups(self, medication: Medication, days: int) -> List[Dict]:
+        """Get daily stock rollups for analysis and charts."""
+        start_date = timezone.localdate() - timedelta(days=days)
         
-        days_until_stockout = int(current_stock / estimated_daily_usage) if estimated_daily_usage > 0 else float('inf')
-        predicted_stockout_date = timezone.now().date() + timedelta(days=days_until_stockout)
+        rollups = StockDailyRollup.objects.filter(
+            medication=medication,
+            day__gte=start_date
+        ).values('day', 'transaction_type', 'quantity', 'transaction_count', 'hourly_quantity')
         
-        return {
-            'current_stock': current_stock,
-            'daily_usage_rate': estimated_daily_usage,
-            'usage_volatility': 0.0,
-            'days_until_stockout': days_until_stockout,
-            'predicted_stockout_date': predicted_stockout_date,
-            'recommended_order_quantity': medication.low_stock_threshold * 2,
-            'recommended_order_date': predicted_stockout_date - timedelta(days=7),
-            'confidence_level': 0.3,  # Low confidence for basic prediction
-            'prediction_method': 'basic_estimate'
-        }
+        return list(rollups)
+    
+    def _get_basic_prediction(self, medication: Medication, days_ahead: int) -> Dict[str, Any]:
+        """Get basic prediction when insufficient data is available."""
+        return build_basic_prediction(medication)
     
     def _calculate_prediction_confidence(self, df: pd.DataFrame, daily_usage: float) -> float:
         """Calculate confidence level for prediction."""
-        if len(df) < 7:
-            return 0.3
-        
-        # Calculate coefficient of variation
-        cv = df['quantity'].std() / abs(df['quantity'].mean()) if df['quantity'].mean() != 0 else 1.0
-        
-        # Higher CV means lower confidence
-        confidence = max(0.1, 1.0 - cv)
-        
-        # Adjust based on data points
-        data_factor = min(1.0, len(df) / 30)  # More data = higher confidence
-        
-        return confidence * data_factor
+        mean = df['quantity'].mean()
+        std = df['quantity'].std()
+        return calculate_confidence(len(df), mean, 0.0 if pd.isna(std) else std)
     
     def _send_low_stock_alert(self, medication: Medication):
         """Send low stock alert notification."""
@@ -615,7 +827,15 @@ class StockAnalyticsService:
         """
         try:
             if medications is None:
-                medications = Medication.objects.all()
+                medications = list(Medication.objects.all())
+                medication_filter = None
+            else:
+                medications = list(medications)
+                medication_filter = [medication.id for medication in medications]
+            
+            # One query for analytics, one grouped query for every transaction total
+            prefetch_related_objects(medications, 'stock_analytics')
+            type_totals = self._get_transaction_type_totals(start_date, end_date, medication_filter)
             
             report_data = {
                 'period': {
@@ -634,7 +854,10 @@ class StockAnalyticsService:
             
             for medication in medications:
                 # Get medication data
-                medication_data = self._get_medication_report_data(medication, start_date, end_date)
+                medication_data = self._get_medication_report_data(
+                    medication, start_date, end_date,
+                    type_totals=type_totals.get(medication.id, {})
+                )
                 report_data['medications'].append(medication_data)
                 
                 total_transactions += medication_data['total_transactions']
@@ -674,27 +897,58 @@ class StockAnalyticsService:
             logger.error(f"Error generating stock report: {e}")
             return {'error': str(e)}
     
-    def _get_medication_report_data(self, medication: Medication, 
-                                  start_date: date, end_date: date) -> Dict[str, Any]:
-        """Get report data for a specific medication."""
-        transactions = StockTransaction.objects.filter(
-            medication=medication,
-            created_at__date__range=[start_date, end_date]
+    def _get_transaction_type_totals(self, start_date: date, end_date: date,
+                                     medication_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, Dict]]:
+        """
+        Get transaction count, quantity and value per medication and type.
+        
+        Read from the daily rollups, so the cost follows the number of days
+        in the period rather than the number of transactions.
+        
+        Returns:
+            Dict mapping medication ID to {transaction_type: totals}
+        """
+        rollups = StockDailyRollup.objects.filter(day__range=[start_date, end_date])
+        if medication_ids is not None:
+            rollups = rollups.filter(medication_id__in=medication_ids)
+        
+        rows = rollups.order_by().values('medication_id', 'transaction_type').annotate(
+            count=Sum('transaction_count'),
+            quantity=Sum('quantity'),
+            value=Sum('total_value')
         )
         
-        # Calculate metrics
-        total_quantity = transactions.aggregate(total=Sum('quantity'))['total'] or 0
-        total_value = transactions.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+        totals = {}
+        for row in rows:
+            totals.setdefault(row['medication_id'], {})[row['transaction_type']] = {
+                'count': row['count'],
+                'quantity': row['quantity'] or 0,
+                'value': row['value'] or Decimal('0.00')
+            }
+        return totals
+    
+    def _get_medication_report_data(self, medication: Medication, 
+                                  start_date: date, end_date: date,
+                                  type_totals: Optional[Dict[str, Dict]] = None) -> Dict[str, Any]:
+        """Get report data for a specific medication."""
+        if type_totals is None:
+            type_totals = self._get_transaction_type_totals(
+                start_date, end_date, [medication.id]
+            ).get(medication.id, {})
         
         # Usage by type
         usage_by_type = {}
         for transaction_type, _ in StockTransaction.TransactionType.choices:
-            type_transactions = transactions.filter(transaction_type=transaction_type)
-            usage_by_type[transaction_type] = {
-                'count': type_transactions.count(),
-                'quantity': type_transactions.aggregate(total=Sum('quantity'))['total'] or 0,
-                'value': type_transactions.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-            }
+            usage_by_type[transaction_type] = type_totals.get(transaction_type, {
+                'count': 0,
+                'quantity': 0,
+                'value': Decimal('0.00')
+            })
+        
+        # Calculate metrics
+        total_transactions = sum(totals['count'] for totals in type_totals.values())
+        total_quantity = sum(totals['quantity'] for totals in type_totals.values())
+        total_value = sum((totals['value'] for totals in type_totals.values()), Decimal('0.00'))
         
         return {
             'id': medication.id,
@@ -704,7 +958,7 @@ class StockAnalyticsService:
             'is_low_stock': medication.is_low_stock,
             'is_expiring_soon': medication.is_expiring_soon,
             'expiration_date': medication.expiration_date,
-            'total_transactions': transactions.count(),
+            'total_transactions': total_transactions,
             'total_quantity': total_quantity,
             'total_value': total_value,
             'usage_by_type': usage_by_type,
@@ -853,10 +1107,23 @@ class ImageOptimizationService:
 class MedicationCacheService:
     """
     Service for caching medication data efficiently.
+    
+    List entries are keyed by a hash of the normalized filters and by the
+    list generation, a counter bumped whenever any medication changes.
+    Equivalent filters share an entry, keys stay short whatever the input,
+    and a change retires every list at once without scanning for keys.
     """
     
     CACHE_TIMEOUT = 1800  # 30 minutes
     CACHE_PREFIX = 'medication'
+    # Outside CACHE_PREFIX so delete_pattern never resets it
+    LIST_GENERATION_KEY = 'medication_list_generation'
+    
+    # Filters understood by _apply_filters and how their values are compared
+    CHOICE_FILTERS = ('medication_type', 'prescription_type')
+    TEXT_FILTERS = ('manufacturer', 'search')
+    FLAG_FILTERS = ('low_stock', 'expiring_soon')
+    FALSE_VALUES = ('', '0', 'false', 'no', 'off')
     
     @classmethod
     def get_medication_list(cls, filters: Dict[str, Any] = None) -> List[Dict]:
@@ -869,20 +1136,71 @@ class MedicationCacheService:
         Returns:
             List of medication dictionaries
         """
-        cache_key = cls._get_cache_key('list', filters)
-        cached_data = cache.get(cache_key)
+        filters = cls.normalize_filters(filters)
         
-        if cached_data is None:
+        def build_list():
             from .models import Medication
             queryset = Medication.objects.all()
             
             if filters:
                 queryset = cls._apply_filters(queryset, filters)
             
-            cached_data = list(queryset.values())
-            cache.set(cache_key, cached_data, cls.CACHE_TIMEOUT)
+            return list(queryset.values())
         
-        return cached_data
+        # Refreshed by one worker, slightly ahead of expiry, instead of by
+        # every worker that misses once it expires
+        return read_through(cls._get_list_cache_key(filters), build_list, cls.CACHE_TIMEOUT)
+    
+    @classmethod
+    def normalize_filters(cls, filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Reduce filters to a canonical form that selects the same medications.
+        
+        Unknown and blank filters are dropped, text is trimmed and lowercased
+        (choice values are lowercase and text filters are case-insensitive),
+        and flags become True or are dropped.
+        
+        Args:
+            filters: Filters as given by the caller, e.g. request query parameters
+            
+        Returns:
+            Dict of the filters that affect the result
+        """
+        normalized = {}
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            if name in cls.FLAG_FILTERS:
+                if isinstance(value, str):
+                    value = value.strip().lower() not in cls.FALSE_VALUES
+                if value:
+                    normalized[name] = True
+            elif name in cls.CHOICE_FILTERS or name in cls.TEXT_FILTERS:
+                value = str(value).strip().lower()
+                if value:
+                    normalized[name] = value
+        return normalized
+    
+    @classmethod
+    def get_list_generation(cls) -> int:
+        """Get the current list generation, shared by every worker."""
+        generation = cache.get(cls.LIST_GENERATION_KEY)
+        if generation is None:
+            cache.add(cls.LIST_GENERATION_KEY, 1, None)
+            generation = cache.get(cls.LIST_GENERATION_KEY, 1)
+        return generation
+    
+    @classmethod
+    def invalidate_medication_lists(cls):
+        """Retire every cached medication list once the current transaction commits."""
+        def bump_generation():
+            if not cache.add(cls.LIST_GENERATION_KEY, 1, None):
+                try:
+                    cache.incr(cls.LIST_GENERATION_KEY)
+                except ValueError:
+                    cache.set(cls.LIST_GENERATION_KEY, 1, None)
+        
+        transaction.on_commit(bump_generation)
     
     @classmethod
     def get_medication_detail(cls, medication_id: int) -> Optional[Dict]:
@@ -950,12 +1268,27 @@ class MedicationCacheService:
         else:
             # Invalidate all medication caches
             cache.delete_pattern(f"{cls.CACHE_PREFIX}:*")
+        
+        # Any list may contain the medication
+        cls.invalidate_medication_lists()
     
     @classmethod
     def _get_cache_key(cls, key_type: str, identifier: Any) -> str:
         """Generate cache key."""
         return f"{cls.CACHE_PREFIX}:{key_type}:{identifier}"
     
+    @classmethod
+    def _get_list_cache_key(cls, filters: Dict[str, Any]) -> str:
+        """
+        Generate a fixed-length list cache key from normalized filters.
+        
+        The filters are encoded as sorted, compact JSON and hashed, so the
+        key depends only on their content and never on user-supplied text.
+        """
+        encoded = json.dumps(filters, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        digest = hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+        return cls._get_cache_key('list', f"v{cls.get_list_generation()}:{digest}")
+    
     @classmethod
     def _apply_filters(cls, queryset, filters: Dict[str, Any]):
         """Apply filters to queryset."""
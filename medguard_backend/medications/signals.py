@@ -0,0 +1,79 @@
+"""
+Django signals for the medications app.
+"""
+import logging
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Medication, MedicationSchedule, StockTransaction
+from .services import MedicationCacheService
+from .stock_analytics_engine import IncrementalStockAnalytics
+from .stock_rollups import record_stock_rollup
+
+logger = logging.getLogger(__name__)
+
+analytics_engine = IncrementalStockAnalytics()
+
+
+@receiver(post_save, sender=StockTransaction)
+def update_incremental_stock_analytics(sender, instance, created, **kwargs):
+    """Fold new stock transactions into the medication's running analytics."""
+    if not created or kwargs.get('raw'):
+        return
+
+    try:
+        analytics_engine.record_transaction(instance)
+    except Exception as e:
+        logger.error(f"Error updating incremental analytics for {instance.medication_id}: {e}")
+
+
+@receiver(post_save, sender=StockTransaction)
+def update_daily_stock_rollup(sender, instance, created, **kwargs):
+    """Add new stock transactions to the medication's daily rollup."""
+    if not created or kwargs.get('raw'):
+        return
+
+    try:
+        record_stock_rollup(instance)
+    except Exception as e:
+        # The rollup runs in its own savepoint; rebuild_stock_rollups repairs it
+        logger.error(f"Error updating daily stock rollup for {instance.medication_id}: {e}")
+
+
+@receiver(pre_save, sender=MedicationSchedule)
+def update_next_reminder(sender, instance, **kwargs):
+    """Keep the schedule's reminder index entry in step with its definition."""
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('raw') or update_fields is not None:
+        # Partial saves are left to the dispatcher, which re-validates on claim,
+        # and to the rebuild_reminder_index command
+        return
+
+    instance.next_reminder_at = instance.compute_next_due()
+
+
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+def invalidate_medication_cache(sender, instance, **kwargs):
+    """Drop the medication's cached detail and every cached medication list."""
+    if kwargs.get('raw'):
+        return
+
+    try:
+        MedicationCacheService.invalidate_medication_cache(instance.id)
+    except Exception as e:
+        # Never fail a write because the cache is unavailable
+        logger.warning(f"Error invalidating medication cache for {instance.id}: {e}")
+
+
+@receiver(post_save, sender=StockTransaction)
+def invalidate_stock_lists(sender, instance, created, **kwargs):
+    """Retire cached medication lists, which include stock levels."""
+    if not created or kwargs.get('raw'):
+        return
+
+    try:
+        # Stock is updated in the database, not through Medication.save()
+        MedicationCacheService.invalidate_medication_cache(instance.medication_id)
+    except Exception as e:
+        logger.warning(f"Error invalidating medication cache for {instance.medication_id}: {e}")
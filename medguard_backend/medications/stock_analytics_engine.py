@@ -0,0 +1,621 @@
+"""
+Incremental Stock Analytics Engine
+
+This module keeps stock analytics current without re-reading transaction
+history on every dose. Each medication carries a small running state on its
+``StockAnalytics`` row:
+
+- Daily net quantity and transaction count buckets for the analytics window
+- Running sum and sum of squares of daily totals (mean/variance)
+- Day-of-week sums for the weekly usage pattern
+- An EWMA of completed days for short-term trend tracking
+
+Applying a transaction touches one bucket and a handful of counters, so the
+cost is constant per transaction. The full pandas recompute in
+``IntelligentStockService.update_stock_analytics`` remains the reference
+implementation; the periodic reconciliation job uses ``BatchStockAnalytics``,
+which recomputes many medications per query and reseeds this state.
+"""
+
+import logging
+import math
+import time
+from datetime import date, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Medication, StockAnalytics, StockTransaction
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+WINDOW_DAYS = 90
+MIN_TRANSACTIONS = 7
+EWMA_ALPHA = 0.3
+DEFAULT_LEAD_TIME_DAYS = 3
+
+
+def empty_state(window_days: int = WINDOW_DAYS) -> Dict[str, Any]:
+    """Return a fresh incremental usage state."""
+    return {
+        'version': STATE_VERSION,
+        'window_days': window_days,
+        'days': {},
+        'sum': 0.0,
+        'sumsq': 0.0,
+        'tx_count': 0,
+        'dow_sums': [0.0] * 7,
+        'ewma': None,
+        'ewma_day': None,
+    }
+
+
+def apply_quantity(state: Dict[str, Any], day: date, quantity: float,
+                   tx_count: int = 1, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Fold a transaction quantity into the usage state.
+
+    Args:
+        state: Incremental usage state (mutated in place)
+        day: Day the transaction belongs to
+        quantity: Signed transaction quantity
+        tx_count: Number of transactions represented by ``quantity``
+        today: Reference day for window eviction (defaults to today)
+
+    Returns:
+        The updated state
+    """
+    today = today or timezone.now().date()
+    _advance_ewma(state, today)
+    _add_to_bucket(state, day, quantity, tx_count)
+    evict_expired(state, today)
+    return state
+
+
+def _add_to_bucket(state: Dict[str, Any], day: date, quantity: float, tx_count: int):
+    """Add a quantity to a day bucket and the running aggregates."""
+    key = day.isoformat()
+    bucket = state['days'].get(key)
+    previous = bucket[0] if bucket else 0.0
+    current = previous + quantity
+
+    state['days'][key] = [current, (bucket[1] if bucket else 0) + tx_count]
+    state['sum'] += quantity
+    state['sumsq'] += current * current - previous * previous
+    state['tx_count'] += tx_count
+    state['dow_sums'][day.weekday()] += quantity
+
+
+def evict_expired(state: Dict[str, Any], today: Optional[date] = None) -> Dict[str, Any]:
+    """Drop day buckets that have fallen out of the analytics window."""
+    today = today or timezone.now().date()
+    cutoff = (today - timedelta(days=state['window_days'])).isoformat()
+
+    # The window holds at most ``window_days + 1`` buckets, so this scan is bounded
+    for key in [key for key in state['days'] if key < cutoff]:
+        quantity, count = state['days'].pop(key)
+        state['sum'] -= quantity
+        state['sumsq'] -= quantity * quantity
+        state['tx_count'] -= count
+        state['dow_sums'][date.fromisoformat(key).weekday()] -= quantity
+
+    return state
+
+
+def _advance_ewma(state: Dict[str, Any], today: date):
+    """Fold every completed day since the last update into the EWMA."""
+    yesterday = today - timedelta(days=1)
+    last = state.get('ewma_day')
+
+    if last is not None:
+        day = date.fromisoformat(last) + timedelta(days=1)
+    elif state['days']:
+        day = date.fromisoformat(min(state['days']))
+    else:
+        return
+
+    if day > yesterday:
+        return
+
+    # Days older than the window carry no data, so never fold more than a window
+    ewma = state.get('ewma')
+    window_start = yesterday - timedelta(days=state['window_days'] - 1)
+    if day < window_start:
+        ewma = None
+        day = window_start
+
+    while day <= yesterday:
+        bucket = state['days'].get(day.isoformat())
+        value = abs(bucket[0]) if bucket else 0.0
+        ewma = value if ewma is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * ewma
+        day += timedelta(days=1)
+
+    state['ewma'] = ewma
+    state['ewma_day'] = yesterday.isoformat()
+
+
+def summarize_state(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Derive daily usage statistics from the usage state.
+
+    The statistics match the resampled daily series used by the pandas
+    recompute: the series spans the first to the last active day, with
+    empty days counted as zero usage.
+
+    Returns:
+        Dict of statistics, or None when there is no data in the window
+    """
+    if not state['days']:
+        return None
+
+    first = date.fromisoformat(min(state['days']))
+    last = date.fromisoformat(max(state['days']))
+    n_days = (last - first).days + 1
+
+    mean = state['sum'] / n_days
+    if n_days > 1:
+        variance = (state['sumsq'] - state['sum'] * state['sum'] / n_days) / (n_days - 1)
+        std = math.sqrt(max(variance, 0.0))
+    else:
+        std = 0.0
+
+    weekly_pattern = {}
+    full_weeks, remainder = divmod(n_days, 7)
+    for offset in range(7):
+        dow = (first.weekday() + offset) % 7
+        occurrences = full_weeks + (1 if offset < remainder else 0)
+        if occurrences:
+            weekly_pattern[dow] = state['dow_sums'][dow] / occurrences
+
+    return {
+        'mean': mean,
+        'std': std,
+        'data_points': n_days,
+        'transaction_count': state['tx_count'],
+        'weekly_pattern': dict(sorted(weekly_pattern.items())),
+        'ewma_daily_usage': state.get('ewma'),
+    }
+
+
+def calculate_confidence(data_points: int, mean: float, std: float) -> float:
+    """Calculate confidence for a prediction from daily usage statistics."""
+    if data_points < 7:
+        return 0.3
+
+    # Higher coefficient of variation means lower confidence
+    cv = std / abs(mean) if mean != 0 else 1.0
+    confidence = max(0.1, 1.0 - cv)
+
+    # More data = higher confidence
+    data_factor = min(1.0, data_points / 30)
+
+    return confidence * data_factor
+
+
+def build_prediction(medication: Medication, daily_usage: float, usage_std: float,
+                     confidence: float, weekly_pattern: Dict[int, float],
+                     data_points: int, method: str,
+                     current_stock: Optional[int] = None) -> Dict[str, Any]:
+    """Build a stock depletion prediction from daily usage statistics."""
+    if current_stock is None:
+        current_stock = medication.pill_count
+    days_until_stockout = int(current_stock / daily_usage)
+    predicted_stockout_date = timezone.now().date() + timedelta(days=days_until_stockout)
+
+    # Calculate recommended order quantity
+    safety_stock = max(7 * daily_usage, medication.low_stock_threshold)
+    recommended_quantity = int(safety_stock * 1.5)  # 50% buffer
+
+    order_date = predicted_stockout_date - timedelta(days=DEFAULT_LEAD_TIME_DAYS)
+
+    return {
+        'current_stock': current_stock,
+        'daily_usage_rate': daily_usage,
+        'usage_volatility': usage_std,
+        'days_until_stockout': days_until_stockout,
+        'predicted_stockout_date': predicted_stockout_date,
+        'recommended_order_quantity': recommended_quantity,
+        'recommended_order_date': order_date,
+        'confidence_level': confidence,
+        'weekly_pattern': weekly_pattern,
+        'data_points': data_points,
+        'prediction_method': method
+    }
+
+
+def build_basic_prediction(medication: Medication,
+                           current_stock: Optional[int] = None) -> Dict[str, Any]:
+    """Get basic prediction when insufficient data is available."""
+    if current_stock is None:
+        current_stock = medication.pill_count
+    estimated_daily_usage = 1.0  # Default estimate
+
+    days_until_stockout = int(current_stock / estimated_daily_usage)
+    predicted_stockout_date = timezone.now().date() + timedelta(days=days_until_stockout)
+
+    return {
+        'current_stock': current_stock,
+        'daily_usage_rate': estimated_daily_usage,
+        'usage_volatility': 0.0,
+        'days_until_stockout': days_until_stockout,
+        'predicted_stockout_date': predicted_stockout_date,
+        'recommended_order_quantity': medication.low_stock_threshold * 2,
+        'recommended_order_date': predicted_stockout_date - timedelta(days=7),
+        'confidence_level': 0.3,  # Low confidence for basic prediction
+        'prediction_method': 'basic_estimate'
+    }
+
+
+def apply_prediction(analytics: StockAnalytics, prediction: Dict[str, Any]) -> StockAnalytics:
+    """Copy prediction results onto a ``StockAnalytics`` instance."""
+    daily_usage_rate = prediction.get('daily_usage_rate', 0.0)
+
+    analytics.daily_usage_rate = daily_usage_rate
+    analytics.weekly_usage_rate = daily_usage_rate * 7
+    analytics.monthly_usage_rate = daily_usage_rate * 30
+    analytics.days_until_stockout = prediction.get('days_until_stockout')
+    analytics.predicted_stockout_date = prediction.get('predicted_stockout_date')
+    analytics.recommended_order_quantity = prediction.get('recommended_order_quantity', 0)
+    analytics.recommended_order_date = prediction.get('recommended_order_date')
+    analytics.usage_volatility = prediction.get('usage_volatility', 0.0)
+    analytics.stockout_confidence = prediction.get('confidence_level', 0.0)
+    analytics.last_calculated = timezone.now()
+    return analytics
+
+
+class IncrementalStockAnalytics:
+    """
+    Constant-time stock analytics updates driven by individual transactions.
+    """
+
+    def __init__(self, window_days: int = WINDOW_DAYS):
+        self.window_days = window_days
+
+    def record_transaction(self, stock_transaction: StockTransaction) -> StockAnalytics:
+        """
+        Fold a newly created stock transaction into the medication analytics.
+
+        Args:
+            stock_transaction: The saved transaction
+
+        Returns:
+            StockAnalytics: Updated analytics object
+        """
+        return self.record_transactions(
+            stock_transaction.medication, [stock_transaction], stock_transaction.stock_after
+        )
+
+    def record_transactions(self, medication: Medication,
+                            stock_transactions: List[StockTransaction],
+                            current_stock: Optional[int] = None) -> StockAnalytics:
+        """
+        Fold newly created transactions for one medication into its analytics.
+
+        Used directly for transactions inserted with ``bulk_create``, which
+        bypasses the post_save signal.
+
+        Args:
+            medication: The medication the transactions belong to
+            stock_transactions: The saved transactions
+            current_stock: Stock level after the last transaction
+
+        Returns:
+            StockAnalytics: Updated analytics object
+        """
+        with transaction.atomic():
+            analytics = self._get_locked_analytics(medication)
+            state = analytics.usage_state
+
+            if not state or state.get('version') != STATE_VERSION:
+                # First incremental update: seed from the database once.
+                # The seed already includes these transactions.
+                state = self.build_state(medication)
+            else:
+                for stock_transaction in stock_transactions:
+                    created_at = stock_transaction.created_at or timezone.now()
+                    apply_quantity(state, created_at.date(), stock_transaction.quantity)
+
+            analytics.usage_state = state
+            # The transaction's stock_after is authoritative; the medication
+            # instance may not have been refreshed yet.
+            prediction = self.predict(medication, state, current_stock=current_stock)
+            apply_prediction(analytics, prediction)
+            analytics.save()
+
+        return analytics
+
+    def predict(self, medication: Medication, state: Dict[str, Any],
+                current_stock: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Predict stock depletion from the incremental usage state.
+
+        Produces the same result as ``IntelligentStockService.predict_stock_depletion``
+        for the same window of transactions.
+
+        Args:
+            medication: The medication to analyze
+            state: Incremental usage state
+            current_stock: Stock level to predict from (defaults to pill_count)
+        """
+        evict_expired(state)
+        summary = summarize_state(state)
+
+        if summary is None or summary['transaction_count'] < MIN_TRANSACTIONS:
+            return build_basic_prediction(medication, current_stock)
+
+        daily_usage = abs(summary['mean'])
+        if daily_usage == 0:
+            return build_basic_prediction(medication, current_stock)
+
+        prediction = build_prediction(
+            medication,
+            daily_usage=daily_usage,
+            usage_std=summary['std'],
+            confidence=calculate_confidence(summary['data_points'], summary['mean'], summary['std']),
+            weekly_pattern=summary['weekly_pattern'],
+            data_points=summary['data_points'],
+            method='incremental',
+            current_stock=current_stock
+        )
+        prediction['ewma_daily_usage'] = summary['ewma_daily_usage']
+        return prediction
+
+    def build_state(self, medication: Medication) -> Dict[str, Any]:
+        """
+        Rebuild the usage state for a medication from its transactions.
+
+        Uses a single grouped query returning one row per active day.
+        """
+        today = timezone.now().date()
+        start = timezone.now() - timedelta(days=self.window_days)
+
+        daily_rows = StockTransaction.objects.filter(
+            medication=medication,
+            created_at__gte=start
+        ).annotate(
+            day=TruncDate('created_at', tzinfo=dt_timezone.utc)
+        ).values('day').annotate(
+            total=Sum('quantity'),
+            count=Count('id')
+        ).order_by('day')
+
+        state = empty_state(self.window_days)
+        for row in daily_rows:
+            _add_to_bucket(state, row['day'], row['total'] or 0, row['count'])
+
+        _advance_ewma(state, today)
+        return evict_expired(state, today)
+
+    def _get_locked_analytics(self, medication: Medication) -> StockAnalytics:
+        """Fetch the analytics row for update, creating it if needed."""
+        analytics, _ = StockAnalytics.objects.select_for_update().get_or_create(
+            medication=medication,
+            defaults={
+                'daily_usage_rate': 0.0,
+                'weekly_usage_rate': 0.0,
+                'monthly_usage_rate': 0.0,
+                'calculation_window_days': self.window_days
+            }
+        )
+        return analytics
+
+
+class BatchStockAnalytics:
+    """
+    Vectorized analytics recompute for many medications at once.
+
+    Used by the periodic reconciliation job. For each chunk of medications
+    the transaction window is read with a single ``values_list`` query, the
+    daily usage statistics of every medication are computed in one grouped
+    pandas pass and the results are written back with ``bulk_update`` and
+    ``bulk_create``. Figures match ``IntelligentStockService.predict_stock_depletion``.
+    """
+
+    CHUNK_SIZE = 500
+    UPDATE_FIELDS = [
+        'daily_usage_rate', 'weekly_usage_rate', 'monthly_usage_rate', 'days_until_stockout',
+        'predicted_stockout_date', 'recommended_order_quantity', 'recommended_order_date',
+        'usage_volatility', 'stockout_confidence', 'calculation_window_days',
+        'last_calculated', 'usage_state',
+    ]
+
+    def __init__(self, window_days: int = WINDOW_DAYS, chunk_size: int = CHUNK_SIZE):
+        self.window_days = window_days
+        self.chunk_size = chunk_size
+
+    def run(self, medication_ids: Optional[List[int]] = None,
+            active_since_days: int = 7) -> Dict[str, Any]:
+        """
+        Recompute analytics for the given medications.
+
+        Args:
+            medication_ids: Medications to update (defaults to every medication
+                with transactions in the last ``active_since_days`` days)
+            active_since_days: Activity window used to pick medications
+
+        Returns:
+            Dict with run statistics, including rows processed per second
+        """
+        started = time.monotonic()
+
+        if medication_ids is None:
+            since = timezone.now() - timedelta(days=active_since_days)
+            medication_ids = list(
+                StockTransaction.objects.filter(created_at__gte=since)
+                .order_by().values_list('medication_id', flat=True).distinct()
+            )
+        medication_ids = sorted(set(medication_ids))
+
+        stats = {'medications_updated': 0, 'analytics_created': 0, 'transactions': 0}
+        for offset in range(0, len(medication_ids), self.chunk_size):
+            chunk = medication_ids[offset:offset + self.chunk_size]
+            rows, updated, created = self._process_chunk(chunk)
+            stats['transactions'] += rows
+            stats['medications_updated'] += updated
+            stats['analytics_created'] += created
+
+        elapsed = time.monotonic() - started
+        stats['seconds'] = round(elapsed, 3)
+        stats['rows_per_second'] = round(stats['transactions'] / elapsed, 1) if elapsed > 0 else 0.0
+
+        logger.info(
+            f"Batch stock analytics: {stats['medications_updated']} medications, "
+            f"{stats['transactions']} transactions in {stats['seconds']}s "
+            f"({stats['rows_per_second']} rows/s)"
+        )
+        return stats
+
+    def _process_chunk(self, medication_ids: List[int]):
+        """Recompute and store analytics for one chunk of medications."""
+        now = timezone.now()
+        today = now.date()
+
+        medications = {
+            medication_id: (pill_count, threshold)
+            for medication_id, pill_count, threshold in Medication.objects.filter(
+                id__in=medication_ids
+            ).values_list('id', 'pill_count', 'low_stock_threshold')
+        }
+        if not medications:
+            return 0, 0, 0
+
+        rows = StockTransaction.objects.filter(
+            medication_id__in=medication_ids,
+            created_at__gte=now - timedelta(days=self.window_days)
+        ).order_by().values_list('medication_id', 'created_at', 'quantity')
+        transactions = pd.DataFrame.from_records(
+            rows.iterator(chunk_size=5000), columns=['medication_id', 'created_at', 'quantity']
+        )
+
+        daily = self._daily_totals(transactions)
+        summary = self._summarize(daily, medications)
+
+        analytics_by_medication = {
+            analytics.medication_id: analytics
+            for analytics in StockAnalytics.objects.filter(medication_id__in=list(medications))
+        }
+        states = self._build_states(daily, today)
+
+        to_update, to_create = [], []
+        for medication_id, row in summary.iterrows():
+            analytics = analytics_by_medication.get(medication_id)
+            if analytics is None:
+                analytics = StockAnalytics(medication_id=medication_id)
+                to_create.append(analytics)
+            else:
+                to_update.append(analytics)
+
+            analytics.daily_usage_rate = float(row['daily_usage'])
+            analytics.weekly_usage_rate = float(row['daily_usage']) * 7
+            analytics.monthly_usage_rate = float(row['daily_usage']) * 30
+            analytics.days_until_stockout = int(row['days_until_stockout'])
+            analytics.predicted_stockout_date = today + timedelta(days=int(row['days_until_stockout']))
+            analytics.recommended_order_quantity = int(row['recommended_order_quantity'])
+            analytics.recommended_order_date = analytics.predicted_stockout_date - timedelta(
+                days=int(row['order_lead_days'])
+            )
+            analytics.usage_volatility = float(row['volatility'])
+            analytics.stockout_confidence = float(row['confidence'])
+            analytics.calculation_window_days = self.window_days
+            analytics.last_calculated = now
+            analytics.usage_state = states.get(medication_id) or empty_state(self.window_days)
+
+        with transaction.atomic():
+            StockAnalytics.objects.bulk_update(to_update, self.UPDATE_FIELDS, batch_size=self.chunk_size)
+            StockAnalytics.objects.bulk_create(to_create, batch_size=self.chunk_size)
+
+        return len(transactions), len(to_update) + len(to_create), len(to_create)
+
+    @staticmethod
+    def _daily_totals(transactions: pd.DataFrame) -> pd.DataFrame:
+        """Group transactions into per-medication UTC day totals."""
+        if transactions.empty:
+            return pd.DataFrame(columns=['medication_id', 'day', 'total', 'count'])
+
+        transactions['day'] = pd.to_datetime(transactions['created_at'], utc=True).dt.tz_localize(None).dt.floor('D')
+        return (
+            transactions.groupby(['medication_id', 'day'], sort=True)['quantity']
+            .agg(total='sum', count='size')
+            .reset_index()
+        )
+
+    def _summarize(self, daily: pd.DataFrame, medications: Dict[int, tuple]) -> pd.DataFrame:
+        """
+        Compute usage statistics and stockout figures for every medication.
+
+        The daily series of each medication spans its first to last active
+        day with empty days counted as zero, as in the resampled pandas
+        recompute, so mean and sample variance follow from the day totals.
+        """
+        stock = pd.DataFrame.from_dict(
+            medications, orient='index', columns=['pill_count', 'threshold']
+        ).astype(float)
+
+        if daily.empty:
+            per_med = pd.DataFrame(index=stock.index, columns=['n_days', 'total', 'sumsq', 'tx_count'], dtype=float)
+        else:
+            daily = daily.assign(sq=daily['total'].astype(float) ** 2)
+            per_med = daily.groupby('medication_id').agg(
+                first=('day', 'min'), last=('day', 'max'), total=('total', 'sum'),
+                sumsq=('sq', 'sum'), tx_count=('count', 'sum')
+            )
+            per_med['n_days'] = (per_med['last'] - per_med['first']).dt.days + 1
+            per_med = per_med[['n_days', 'total', 'sumsq', 'tx_count']].astype(float)
+
+        frame = stock.join(per_med, how='left').fillna({'n_days': 0, 'total': 0.0, 'sumsq': 0.0, 'tx_count': 0})
+        n_days = frame['n_days'].to_numpy()
+        total = frame['total'].to_numpy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n_days > 0, total / n_days, 0.0)
+            variance = np.where(
+                n_days > 1, (frame['sumsq'].to_numpy() - total * total / n_days) / (n_days - 1), 0.0
+            )
+            std = np.sqrt(np.clip(variance, 0.0, None))
+            daily_usage = np.abs(mean)
+            cv = np.where(mean != 0, std / np.abs(mean), 1.0)
+            confidence = np.where(
+                n_days < 7, 0.3, np.maximum(0.1, 1.0 - cv) * np.minimum(1.0, n_days / 30)
+            )
+
+            # Too little history: fall back to the basic one-unit-a-day estimate
+            timeseries = (frame['tx_count'].to_numpy() >= MIN_TRANSACTIONS) & (daily_usage > 0)
+            pill_count = frame['pill_count'].to_numpy()
+            threshold = frame['threshold'].to_numpy()
+
+            rate = np.where(timeseries, daily_usage, 1.0)
+            days_until_stockout = np.floor(pill_count / rate)
+            recommended = np.where(
+                timeseries,
+                np.trunc(np.maximum(7 * daily_usage, threshold) * 1.5),
+                threshold * 2
+            )
+
+        return pd.DataFrame({
+            'daily_usage': rate,
+            'volatility': np.where(timeseries, std, 0.0),
+            'confidence': np.where(timeseries, confidence, 0.3),
+            'days_until_stockout': days_until_stockout,
+            'recommended_order_quantity': recommended,
+            'order_lead_days': np.where(timeseries, DEFAULT_LEAD_TIME_DAYS, 7),
+        }, index=frame.index)
+
+    def _build_states(self, daily: pd.DataFrame, today: date) -> Dict[int, Dict[str, Any]]:
+        """Rebuild the incremental usage state of each medication from its day totals."""
+        states = {}
+        for medication_id, day, total, count in daily.itertuples(index=False, name=None):
+            state = states.get(medication_id)
+            if state is None:
+                state = states[medication_id] = empty_state(self.window_days)
+            _add_to_bucket(state, day.date(), float(total), int(count))
+
+        for state in states.values():
+            _advance_ewma(state, today)
+            evict_expired(state, today)
+        return states
@@ -0,0 +1,175 @@
+"""
+Append-only stock ledger for MedGuard SA.
+
+Every stock movement is a ``StockTransaction`` row. The running balance in
+``Medication.pill_count`` is only ever changed with an in-database increment
+that returns the new value, so concurrent doses and restocks are serialised
+by the row lock the database takes for the update rather than by
+read-modify-write in Python.
+
+Periodic compaction folds the transactions recorded since the previous
+``StockLedgerSnapshot`` into a new snapshot. The ledger balance is then the
+latest snapshot plus a handful of recent transactions. Any drift between
+the ledger and ``pill_count`` (e.g. from direct edits) is recorded on the
+snapshot, which is then anchored on ``pill_count`` so the drift is only
+reported once.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum
+
+from .models import Medication, StockLedgerSnapshot, StockTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def _supports_update_returning() -> bool:
+    """Return whether the database supports ``UPDATE ... RETURNING``."""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def apply_stock_delta(medication_id: int, quantity: int) -> int:
+    """
+    Atomically add ``quantity`` to a medication's stock.
+
+    Must be called inside a transaction: the updated row stays locked until
+    it commits, so the returned balance is exact for this change.
+
+    Args:
+        medication_id: Medication to update
+        quantity: Signed change (negative for removals)
+
+    Returns:
+        int: Stock level after the change
+
+    Raises:
+        Medication.DoesNotExist: If the medication does not exist
+    """
+    if _supports_update_returning():
+        table = connection.ops.quote_name(Medication._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET pill_count = pill_count + %s WHERE id = %s RETURNING pill_count",
+                [quantity, medication_id]
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Medication.DoesNotExist(f"Medication {medication_id} does not exist")
+        return row[0]
+
+    # Fallback: lock the row, increment it and read it back under the lock
+    updated = Medication.objects.filter(id=medication_id).update(pill_count=F('pill_count') + quantity)
+    if not updated:
+        raise Medication.DoesNotExist(f"Medication {medication_id} does not exist")
+    return Medication.objects.select_for_update().values_list('pill_count', flat=True).get(id=medication_id)
+
+
+def get_latest_snapshot(medication_id: int) -> Optional[StockLedgerSnapshot]:
+    """Return the most recent ledger snapshot for a medication."""
+    return StockLedgerSnapshot.objects.filter(medication_id=medication_id).order_by('-last_transaction_id').first()
+
+
+def get_ledger_balance(medication_id: int) -> Optional[int]:
+    """
+    Return the ledger balance: latest snapshot plus transactions since.
+
+    Returns None if the medication has never been snapshotted.
+    """
+    snapshot = get_latest_snapshot(medication_id)
+    if snapshot is None:
+        return None
+
+    delta = StockTransaction.objects.filter(
+        medication_id=medication_id,
+        id__gt=snapshot.last_transaction_id
+    ).aggregate(total=Sum('quantity'))['total'] or 0
+    return snapshot.balance + delta
+
+
+def compact_medication_ledger(medication_id: int) -> Optional[StockLedgerSnapshot]:
+    """
+    Fold a medication's recent transactions into a new snapshot.
+
+    The medication row is locked while the snapshot is taken, so no stock
+    change can commit between reading the transactions and pill_count. A
+    snapshot whose ledger balance has drifted from pill_count is anchored
+    on pill_count, so the next compaction starts from the actual stock.
+
+    Returns:
+        The new snapshot, or None if nothing changed since the last one
+    """
+    with transaction.atomic():
+        pill_count = Medication.objects.select_for_update().values_list(
+            'pill_count', flat=True
+        ).get(id=medication_id)
+        previous = get_latest_snapshot(medication_id)
+        last_id = previous.last_transaction_id if previous else 0
+
+        recent = StockTransaction.objects.filter(
+            medication_id=medication_id, id__gt=last_id
+        ).aggregate(total=Sum('quantity'), count=Count('id'), last_id=Max('id'))
+
+        if previous is not None and not recent['count'] and previous.balance == pill_count:
+            return None
+
+        if previous is None:
+            # First snapshot: the opening balance predates the ledger, so
+            # anchor it on the current stock level
+            balance = pill_count
+            drift = 0
+        else:
+            balance = previous.balance + (recent['total'] or 0)
+            drift = pill_count - balance
+            if drift:
+                logger.warning(
+                    f"Stock ledger drift for medication {medication_id}: "
+                    f"stock {pill_count}, ledger {balance}"
+                )
+                # Re-anchor on the actual stock; the drift stays on record
+                balance = pill_count
+
+        return StockLedgerSnapshot.objects.create(
+            medication_id=medication_id,
+            balance=balance,
+            last_transaction_id=recent['last_id'] or last_id,
+            transactions_folded=recent['count'],
+            drift=drift
+        )
+
+
+def compact_stock_ledger(medication_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    """
+    Snapshot the ledger of every medication (or the given ones).
+
+    Each medication is compacted in its own short transaction so stock
+    changes are only ever blocked for one medication at a time.
+
+    Returns:
+        Dict with compaction statistics
+    """
+    if medication_ids is None:
+        medication_ids = Medication.objects.values_list('id', flat=True).iterator()
+
+    stats = {'medications': 0, 'snapshots': 0, 'drifted': 0}
+    for medication_id in medication_ids:
+        stats['medications'] += 1
+        try:
+            snapshot = compact_medication_ledger(medication_id)
+        except Medication.DoesNotExist:
+            continue
+        if snapshot is not None:
+            stats['snapshots'] += 1
+            stats['drifted'] += bool(snapshot.drift)
+
+    logger.info(
+        f"Stock ledger compaction: {stats['snapshots']} snapshots for "
+        f"{stats['medications']} medications ({stats['drifted']} with drift)"
+    )
+    return stats
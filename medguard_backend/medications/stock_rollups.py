@@ -0,0 +1,200 @@
+"""
+Daily stock rollups for MedGuard SA.
+
+``StockDailyRollup`` holds one row per medication, local day and transaction
+type with the net quantity, transaction count, value and an hourly breakdown.
+Rows are updated as transactions are recorded, so dashboards, charts and
+usage pattern analysis read O(days) rows rather than O(transactions), and
+history survives the pruning of old transactions.
+
+``rebuild_stock_rollups`` recomputes rollups from the transactions still on
+record; it backfills existing data and repairs rows after transactions are
+edited or bulk-loaded without going through the recording paths.
+"""
+
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import Medication, StockDailyRollup, StockTransaction
+
+logger = logging.getLogger(__name__)
+
+RollupKey = Tuple[int, date, str]
+
+UPDATE_FIELDS = ['quantity', 'transaction_count', 'total_value', 'hourly_quantity', 'updated_at']
+
+
+class _Bucket:
+    """Totals accumulated for one rollup row."""
+
+    __slots__ = ('quantity', 'count', 'value', 'hourly')
+
+    def __init__(self):
+        self.quantity = 0
+        self.count = 0
+        self.value = Decimal('0.00')
+        self.hourly = {}
+
+    def add(self, quantity: int, count: int, value: Optional[Decimal], hour: int):
+        self.quantity += quantity
+        self.count += count
+        self.value += value or Decimal('0.00')
+        self.hourly[str(hour)] = self.hourly.get(str(hour), 0) + quantity
+
+    def apply_to(self, rollup: StockDailyRollup):
+        rollup.quantity += self.quantity
+        rollup.transaction_count += self.count
+        rollup.total_value += self.value
+        hourly = dict(rollup.hourly_quantity or {})
+        for hour, quantity in self.hourly.items():
+            hourly[hour] = hourly.get(hour, 0) + quantity
+        rollup.hourly_quantity = hourly
+
+
+def _bucket_transactions(transactions: Iterable[StockTransaction]) -> Dict[RollupKey, _Bucket]:
+    buckets = {}
+    for stock_transaction in transactions:
+        created_at = timezone.localtime(stock_transaction.created_at)
+        key = (stock_transaction.medication_id, created_at.date(), stock_transaction.transaction_type)
+        buckets.setdefault(key, _Bucket()).add(
+            stock_transaction.quantity, 1, stock_transaction.total_amount, created_at.hour
+        )
+    return buckets
+
+
+def _apply_buckets(buckets: Dict[RollupKey, _Bucket]):
+    medication_ids = {key[0] for key in buckets}
+    days = {key[1] for key in buckets}
+    existing = {
+        (rollup.medication_id, rollup.day, rollup.transaction_type): rollup
+        for rollup in StockDailyRollup.objects.select_for_update().filter(
+            medication_id__in=medication_ids, day__in=days
+        ).order_by()
+    }
+
+    now = timezone.now()
+    updated, created = [], []
+    for key, bucket in buckets.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = StockDailyRollup(medication_id=key[0], day=key[1], transaction_type=key[2], hourly_quantity={})
+            created.append(rollup)
+        else:
+            updated.append(rollup)
+        bucket.apply_to(rollup)
+        rollup.updated_at = now
+
+    if updated:
+        StockDailyRollup.objects.bulk_update(updated, UPDATE_FIELDS)
+    if created:
+        StockDailyRollup.objects.bulk_create(created)
+
+
+def record_stock_rollups(transactions: Iterable[StockTransaction]) -> int:
+    """
+    Add newly recorded transactions to their daily rollups.
+
+    Runs in a savepoint with the affected rollup rows locked, so it is safe
+    to call from inside the transaction that records the stock change. A
+    concurrent writer creating the same row first is handled by retrying
+    against the row it created.
+
+    Returns:
+        int: Number of rollup rows touched
+    """
+    buckets = _bucket_transactions(transactions)
+    if not buckets:
+        return 0
+
+    try:
+        with transaction.atomic():
+            _apply_buckets(buckets)
+    except IntegrityError:
+        with transaction.atomic():
+            _apply_buckets(buckets)
+    return len(buckets)
+
+
+def record_stock_rollup(stock_transaction: StockTransaction) -> int:
+    """Add a single newly recorded transaction to its daily rollup."""
+    return record_stock_rollups([stock_transaction])
+
+
+def rebuild_stock_rollups(start_day: Optional[date] = None,
+                          medication_ids: Optional[List[int]] = None,
+                          chunk_size: int = 500) -> Dict[str, int]:
+    """
+    Recompute daily rollups from the recorded transactions.
+
+    Rollups from start_day onwards are replaced; earlier rows are left alone
+    so history for transactions that have since been pruned is kept. By
+    default start_day is the day of the oldest transaction still on record.
+
+    Args:
+        start_day: First local day to rebuild
+        medication_ids: Limit the rebuild to these medications
+        chunk_size: Number of medications rebuilt per transaction
+
+    Returns:
+        Dict with rebuild statistics
+    """
+    if medication_ids is None:
+        medication_ids = list(Medication.objects.order_by('id').values_list('id', flat=True))
+
+    if start_day is None:
+        oldest = StockTransaction.objects.filter(medication_id__in=medication_ids).aggregate(
+            oldest=Min('created_at')
+        )['oldest']
+        if oldest is None:
+            return {'medications': len(medication_ids), 'rollups': 0, 'transactions': 0}
+        start_day = timezone.localtime(oldest).date()
+
+    tzinfo = timezone.get_current_timezone()
+    stats = {'medications': len(medication_ids), 'rollups': 0, 'transactions': 0}
+
+    for offset in range(0, len(medication_ids), chunk_size):
+        chunk = medication_ids[offset:offset + chunk_size]
+        rows = StockTransaction.objects.filter(
+            medication_id__in=chunk,
+            created_at__date__gte=start_day
+        ).order_by().values(
+            'medication_id', 'transaction_type',
+            day=TruncDate('created_at', tzinfo=tzinfo),
+            hour=ExtractHour('created_at', tzinfo=tzinfo)
+        ).annotate(
+            count=Count('id'),
+            total=Sum('quantity'),
+            value=Sum('total_amount')
+        )
+
+        buckets = {}
+        for row in rows.iterator():
+            key = (row['medication_id'], row['day'], row['transaction_type'])
+            buckets.setdefault(key, _Bucket()).add(row['total'] or 0, row['count'], row['value'], row['hour'])
+
+        rollups = []
+        for (medication_id, day, transaction_type), bucket in buckets.items():
+            rollup = StockDailyRollup(
+                medication_id=medication_id, day=day, transaction_type=transaction_type, hourly_quantity={}
+            )
+            bucket.apply_to(rollup)
+            rollups.append(rollup)
+            stats['transactions'] += bucket.count
+
+        with transaction.atomic():
+            StockDailyRollup.objects.filter(medication_id__in=chunk, day__gte=start_day).delete()
+            StockDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+        stats['rollups'] += len(rollups)
+
+    logger.info(
+        f"Rebuilt {stats['rollups']} stock rollups from {stats['transactions']} transactions "
+        f"for {stats['medications']} medications since {start_day}"
+    )
+    return stats
@@ -7,6 +7,7 @@ This module contains background tasks for:
 - Pharmacy integration operations
 - Stock visualization generation
 - Predictive stock depletion calculations
+- Batch prescription ingestion
 """
 
 import logging
@@ -14,16 +15,19 @@ from datetime import datetime, timedelta, date
 from typing import List, Dict, Any
 from decimal import Decimal
 
-from celery import shared_task
+from celery import group, shared_task
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q, F
+from django.db.models import Q, F, OuterRef, Subquery
 
 from .models import (
     Medication, StockTransaction, StockAnalytics, PharmacyIntegration,
-    PrescriptionRenewal, StockVisualization, MedicationLog
+    PrescriptionRenewal, StockVisualization, MedicationLog, StockLedgerSnapshot, User
 )
+from .prescription_ingestion import PrescriptionBatchIngestion
 from .services import IntelligentStockService, StockAnalyticsService
+from .stock_analytics_engine import BatchStockAnalytics
+from .stock_ledger import compact_stock_ledger
 
 logger = logging.getLogger(__name__)
 
@@ -33,36 +37,21 @@ def update_stock_analytics_task(self, medication_id: int = None):
     """
     Update stock analytics for medications.
     
+    Medications are recomputed in batches: one transaction query and one
+    grouped pandas pass per chunk, with bulk writes.
+    
     Args:
         medication_id: Specific medication ID to update (None for all)
     """
     try:
-        service = IntelligentStockService()
-        
-        if medication_id:
-            medications = [Medication.objects.get(id=medication_id)]
-        else:
-            # Update all medications that have had recent transactions
-            recent_date = timezone.now() - timedelta(days=7)
-            medications = Medication.objects.filter(
-                stock_transactions__created_at__gte=recent_date
-            ).distinct()
-        
-        updated_count = 0
-        for medication in medications:
-            try:
-                service.update_stock_analytics(medication)
-                updated_count += 1
-                logger.info(f"Updated analytics for {medication.name}")
-            except Exception as e:
-                logger.error(f"Error updating analytics for {medication.name}: {e}")
-                continue
+        # None selects every medication that has had recent transactions
+        medication_ids = [medication_id] if medication_id else None
+        stats = BatchStockAnalytics().run(medication_ids)
         
-        logger.info(f"Stock analytics update completed. Updated {updated_count} medications.")
+        logger.info(f"Stock analytics update completed. Updated {stats['medications_updated']} medications.")
         return {
             'status': 'success',
-            'medications_updated': updated_count,
-            'total_medications': len(medications)
+            **stats
         }
         
     except Exception as e:
@@ -357,11 +346,16 @@ def cleanup_old_transactions_task(self, days_to_keep: int = 365):
     try:
         cutoff_date = timezone.now() - timedelta(days=days_to_keep)
         
-        # Count transactions to be deleted
+        # Only delete transactions already folded into a ledger snapshot, so
+        # ledger balances never depend on deleted history
+        snapshotted_up_to = StockLedgerSnapshot.objects.filter(
+            medication_id=OuterRef('medication_id')
+        ).order_by('-last_transaction_id').values('last_transaction_id')[:1]
+        
         old_transactions = StockTransaction.objects.filter(
-            created_at__lt=cutoff_date
+            created_at__lt=cutoff_date,
+            id__lte=Subquery(snapshotted_up_to)
         )
-        count_to_delete = old_transactions.count()
         
         # Delete old transactions
         deleted_count, _ = old_transactions.delete()
@@ -378,6 +372,26 @@ def cleanup_old_transactions_task(self, days_to_keep: int = 365):
         raise
 
 
+@shared_task(bind=True, name='medications.compact_stock_ledger')
+def compact_stock_ledger_task(self, medication_ids: List[int] = None):
+    """
+    Fold recent stock transactions into ledger snapshots.
+    
+    Args:
+        medication_ids: Medications to compact (all if not provided)
+    """
+    try:
+        stats = compact_stock_ledger(medication_ids)
+        return {
+            'status': 'success',
+            **stats
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in compact_stock_ledger_task: {e}")
+        raise
+
+
 @shared_task(bind=True, name='medications.monitor_stock_levels')
 def monitor_stock_levels_task(self):
     """
@@ -543,4 +557,79 @@ def refresh_stock_visualizations_task(self):
         
     except Exception as e:
         logger.error(f"Error in refresh_stock_visualizations_task: {e}")
-        raise 
\ No newline at end of file
+        raise 
+
+
+@shared_task(bind=True, name='medications.ingest_prescriptions')
+def ingest_prescriptions_task(self, items: List[Dict[str, Any]], user_id: int, offset: int = 0,
+                              workers: int = 0):
+    """
+    Ingest a chunk of prescriptions, reporting progress after every sub-chunk.
+    
+    Progress is published as the PROGRESS task state with ``processed`` and
+    ``total`` counts.
+    
+    Args:
+        items: Prescriptions with ``text`` and ``patient_id``
+        user_id: User recorded on the initial stock transactions
+        offset: Position of the chunk in the whole batch
+        workers: Parser processes; 0 parses in the Celery worker itself
+    """
+    try:
+        user = User.objects.get(id=user_id)
+        
+        def report_progress(processed, total):
+            self.update_state(state='PROGRESS', meta={'offset': offset, 'processed': processed, 'total': total})
+        
+        stats = PrescriptionBatchIngestion(workers=workers, progress_callback=report_progress).run(items, user)
+        
+        logger.info(
+            f"Prescription ingestion chunk at {offset} completed. "
+            f"Ingested {stats['succeeded']} of {stats['total']} prescriptions."
+        )
+        return {
+            'status': 'success',
+            'offset': offset,
+            **stats
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in ingest_prescriptions_task: {e}")
+        raise
+
+
+@shared_task(bind=True, name='medications.batch_ingest_prescriptions')
+def batch_ingest_prescriptions_task(self, items: List[Dict[str, Any]], user_id: int, chunk_size: int = 100):
+    """
+    Fan a prescription backlog out over the Celery workers.
+    
+    The backlog is split into chunks that are ingested as a group, so the
+    batch is spread over every available worker; each chunk task reports
+    its own progress.
+    
+    Args:
+        items: Prescriptions with ``text`` and ``patient_id``
+        user_id: User recorded on the initial stock transactions
+        chunk_size: Prescriptions per chunk task
+    """
+    chunk_size = max(1, chunk_size)
+    try:
+        offsets = range(0, len(items), chunk_size)
+        result = group(
+            ingest_prescriptions_task.s(items[offset:offset + chunk_size], user_id, offset)
+            for offset in offsets
+        ).apply_async()
+        
+        logger.info(f"Queued {len(items)} prescriptions for ingestion in {len(offsets)} chunks.")
+        return {
+            'status': 'queued',
+            'total': len(items),
+            'chunks': [
+                {'offset': offset, 'task_id': chunk_result.id}
+                for offset, chunk_result in zip(offsets, result.results)
+            ]
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in batch_ingest_prescriptions_task: {e}")
+        raise
@@ -0,0 +1,195 @@
+"""
+Tests for bulk dose recording.
+
+Offline syncs send a whole day's doses at once; they must be recorded in
+one transaction with a bounded number of queries and be safe to resend.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from medications.models import (
+    Medication, MedicationLog, MedicationSchedule, StockAlert, StockTransaction
+)
+from medications.services import IntelligentStockService
+
+User = get_user_model()
+
+
+class BulkDoseRecordingTest(APITestCase):
+    """Test IntelligentStockService.record_doses_bulk and its endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = APIClient()
+        self.patient = User.objects.create_user(
+            username='patient',
+            email='patient@example.com',
+            password='testpass123',
+            user_type='PATIENT'
+        )
+        self.client.force_authenticate(user=self.patient)
+        self.service = IntelligentStockService()
+
+        self.medications = [
+            Medication.objects.create(
+                name=f"Medication {index}",
+                generic_name=f"Generic {index}",
+                medication_type='tablet',
+                strength='10mg',
+                dosage_unit='mg',
+                pill_count=12,
+                low_stock_threshold=10
+            )
+            for index in range(3)
+        ]
+        self.schedules = [
+            MedicationSchedule.objects.create(
+                patient=self.patient,
+                medication=medication,
+                timing=timing,
+                dosage_amount=Decimal('1.00'),
+                start_date=timezone.localdate()
+            )
+            for medication in self.medications
+            for timing in (MedicationSchedule.Timing.MORNING, MedicationSchedule.Timing.NIGHT)
+        ]
+
+    def _events(self, day):
+        return [
+            {
+                'schedule_id': schedule.id,
+                'scheduled_time': timezone.make_aware(datetime.combine(day, schedule.get_dose_time())),
+            }
+            for schedule in self.schedules
+        ]
+
+    def test_records_doses_with_one_update_per_medication(self):
+        """Test a batch costs a fixed number of queries, not one round trip per dose."""
+        today = timezone.localdate()
+        events = self._events(today) + self._events(today - timedelta(days=1))
+
+        results = self.service.record_doses_bulk(self.patient, self.schedules, events)
+
+        self.assertTrue(all(result['status'] == 'recorded' for result in results))
+        self.assertEqual(MedicationLog.objects.filter(status=MedicationLog.Status.TAKEN).count(), 12)
+        self.assertEqual(StockTransaction.objects.count(), 12)
+        for medication in self.medications:
+            medication.refresh_from_db()
+            self.assertEqual(medication.pill_count, 8)
+            self.assertEqual(
+                list(medication.stock_transactions.order_by('stock_before').values_list('stock_after', flat=True)),
+                [8, 9, 10, 11]
+            )
+        # One low stock alert per medication, not per dose
+        self.assertEqual(StockAlert.objects.count(), 3)
+
+    def test_query_count_does_not_grow_with_doses(self):
+        """Test doubling the batch does not add queries."""
+        today = timezone.localdate()
+        # Seed the incremental analytics state
+        self.service.record_doses_bulk(self.patient, self.schedules, self._events(today - timedelta(days=1)))
+
+        def count_queries(events):
+            with CaptureQueriesContext(connection) as context:
+                self.service.record_doses_bulk(self.patient, self.schedules, events)
+            return len(context.captured_queries)
+
+        small = count_queries(self._events(today - timedelta(days=2)))
+        large = count_queries(self._events(today - timedelta(days=3)) + self._events(today - timedelta(days=4)))
+        self.assertEqual(small, large)
+
+    def test_resending_a_batch_is_idempotent(self):
+        """Test the same events recorded twice deduct stock once."""
+        events = self._events(timezone.localdate())
+        for event, key in zip(events, 'abcdef'):
+            event['idempotency_key'] = key
+
+        self.service.record_doses_bulk(self.patient, self.schedules, events)
+        results = self.service.record_doses_bulk(self.patient, self.schedules, events + events)
+
+        self.assertTrue(all(result['status'] == 'duplicate' for result in results))
+        self.assertEqual(StockTransaction.objects.count(), 6)
+        self.medications[0].refresh_from_db()
+        self.assertEqual(self.medications[0].pill_count, 10)
+
+    def test_key_reused_for_another_dose_conflicts(self):
+        """Test a key used for one dose never records or updates a different one."""
+        first, other = self.schedules[0], self.schedules[2]
+        first_time, other_time = [
+            timezone.make_aware(datetime.combine(timezone.localdate(), schedule.get_dose_time()))
+            for schedule in (first, other)
+        ]
+        self.service.record_doses_bulk(
+            self.patient, self.schedules,
+            [{'schedule_id': first.id, 'scheduled_time': first_time, 'idempotency_key': 'sync-1'}]
+        )
+        missed = MedicationLog.objects.create(
+            patient=self.patient, medication=other.medication, schedule=other,
+            scheduled_time=other_time, status=MedicationLog.Status.MISSED
+        )
+
+        results = self.service.record_doses_bulk(self.patient, self.schedules, [
+            {'schedule_id': other.id, 'scheduled_time': other_time, 'idempotency_key': 'sync-1'},
+            {'schedule_id': first.id, 'scheduled_time': first_time - timedelta(days=1), 'idempotency_key': 'sync-1'},
+            {'schedule_id': first.id, 'scheduled_time': first_time - timedelta(days=2), 'idempotency_key': 'sync-2'},
+            {'schedule_id': other.id, 'scheduled_time': other_time - timedelta(days=2), 'idempotency_key': 'sync-2'},
+        ])
+
+        self.assertEqual([result['status'] for result in results], ['conflict', 'conflict', 'recorded', 'conflict'])
+        missed.refresh_from_db()
+        self.assertEqual(missed.status, MedicationLog.Status.MISSED)
+        other.medication.refresh_from_db()
+        self.assertEqual(other.medication.pill_count, 12)
+        self.assertEqual(StockTransaction.objects.count(), 2)
+
+    def test_missed_dose_can_be_marked_taken(self):
+        """Test an existing missed log is updated rather than duplicated."""
+        schedule = self.schedules[0]
+        scheduled_time = timezone.make_aware(datetime.combine(timezone.localdate(), schedule.get_dose_time()))
+        MedicationLog.objects.create(
+            patient=self.patient, medication=schedule.medication, schedule=schedule,
+            scheduled_time=scheduled_time, status=MedicationLog.Status.MISSED
+        )
+
+        results = self.service.record_doses_bulk(
+            self.patient, self.schedules, [{'schedule_id': schedule.id, 'scheduled_time': scheduled_time}]
+        )
+
+        self.assertEqual(results[0]['status'], 'recorded')
+        self.assertEqual(MedicationLog.objects.get().status, MedicationLog.Status.TAKEN)
+
+    def test_insufficient_stock_is_reported_per_event(self):
+        """Test events beyond the available stock are rejected individually."""
+        Medication.objects.filter(pk=self.medications[0].pk).update(pill_count=1)
+        results = self.service.record_doses_bulk(self.patient, self.schedules, self._events(timezone.localdate()))
+
+        self.assertEqual([result['status'] for result in results[:2]], ['recorded', 'insufficient_stock'])
+        self.medications[0].refresh_from_db()
+        self.assertEqual(self.medications[0].pill_count, 0)
+
+    def test_endpoint_only_records_own_schedules(self):
+        """Test the endpoint ignores schedules the user cannot access."""
+        other = User.objects.create_user(username='other', password='testpass123', user_type='PATIENT')
+        foreign = MedicationSchedule.objects.create(
+            patient=other, medication=self.medications[0], timing=MedicationSchedule.Timing.NOON,
+            dosage_amount=Decimal('1.00'), start_date=timezone.localdate()
+        )
+
+        response = self.client.post(
+            reverse('medication-schedule-mark-taken-bulk'),
+            {'events': [{'schedule_id': self.schedules[0].id}, {'schedule_id': foreign.id}]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recorded'], 1)
+        self.assertEqual(response.data['results'][1]['status'], 'not_found')
@@ -0,0 +1,153 @@
+"""
+Tests for the medication image pipeline.
+
+A source is decoded once, at reduced scale for JPEGs, and every output is
+encoded from one working raster. Identical uploads are rendered once.
+"""
+
+import resource
+import shutil
+import tempfile
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings, tag
+from PIL import Image as PILImage
+from PIL.JpegImagePlugin import JpegImageFile
+from wagtail.images import get_image_model
+from wagtail.models import Collection
+
+from medications.image_tasks import (
+    WORKING_MAX_SIZE, batch_image_processing_task, render_image_variants, render_medication_images_task
+)
+from medications.models import Medication
+
+Image = get_image_model()
+
+
+def make_jpeg(size, colour):
+    """Encode a gradient so the image is not trivially compressible."""
+    image = PILImage.linear_gradient('L').resize(size).convert('RGB')
+    image.paste(colour, (0, 0, size[0] // 2, size[1] // 2))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class ImagePipelineTestMixin:
+    """Temporary media storage and medication fixtures."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        if Collection.get_first_root_node() is None:
+            Collection.add_root(name='Root')
+
+    def make_medication(self, name, data):
+        image = Image.objects.create(title=name, file=ContentFile(data, name=f"{name.lower()}.jpg"))
+        return Medication.objects.create(
+            name=name, strength='500mg', dosage_unit='mg', medication_type='tablet', pill_count=30,
+            medication_image=image
+        )
+
+
+class ImagePipelineTest(ImagePipelineTestMixin, TestCase):
+    """Test single-decode rendering and content-hash deduplication."""
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        """Test a large JPEG is decoded once, straight into a downscaled raster."""
+        data = make_jpeg((4000, 3000), (200, 30, 30))
+
+        with mock.patch.object(JpegImageFile, 'draft', autospec=True, side_effect=JpegImageFile.draft) as draft:
+            rendered = render_image_variants(data, 'medium')
+
+        draft.assert_called_once()
+        metadata = rendered['metadata']
+        self.assertEqual(metadata['original_size'], (4000, 3000))
+        self.assertEqual(max(metadata['working_size']), max(WORKING_MAX_SIZE))
+        with PILImage.open(BytesIO(rendered['outputs']['thumbnail'])) as thumbnail:
+            self.assertEqual(thumbnail.size, (150, 112))
+        with PILImage.open(BytesIO(rendered['outputs']['webp'])) as webp:
+            self.assertEqual(list(webp.size), list(metadata['working_size']))
+
+    def test_identical_uploads_are_rendered_once(self):
+        """Test duplicates share one rendering and reprocessing renders nothing."""
+        panado = make_jpeg((800, 600), (200, 30, 30))
+        first = self.make_medication('Panado', panado)
+        duplicate = self.make_medication('Panado Generic', panado)
+        other = self.make_medication('Lipitor', make_jpeg((800, 600), (30, 30, 200)))
+        ids = [first.id, duplicate.id, other.id]
+
+        result = batch_image_processing_task(ids, workers=0)
+
+        self.assertEqual((result['rendered'], result['processed'], result['reused'], result['failed']), (2, 2, 1, 0))
+        first.refresh_from_db()
+        duplicate.refresh_from_db()
+        self.assertEqual(first.image_processing_status, 'completed')
+        self.assertEqual(duplicate.medication_image_webp_id, first.medication_image_webp_id)
+        self.assertEqual(duplicate.image_metadata['content_hash'], first.image_metadata['content_hash'])
+        self.assertIsNotNone(first.medication_image_original_id)
+
+        # The processed JPEG is now the primary image and is recognised as such
+        images = Image.objects.count()
+        result = batch_image_processing_task(ids, workers=0)
+        self.assertEqual((result['rendered'], result['reused']), (0, 3))
+        self.assertEqual(Image.objects.count(), images)
+
+    def test_large_batches_fan_out_by_distinct_source(self):
+        """Test distinct sources are split over chunk tasks, keeping duplicates together."""
+        colours = [(200, 30, 30), (30, 200, 30), (30, 30, 200)]
+        medications = [self.make_medication(f'Source {index}', make_jpeg((400, 300), colour))
+                       for index, colour in enumerate(colours)]
+        duplicate = self.make_medication('Source 0 Generic', make_jpeg((400, 300), colours[0]))
+        ids = [medication.id for medication in medications] + [duplicate.id]
+
+        with mock.patch('medications.image_tasks.group') as celery_group:
+            result = batch_image_processing_task(ids, chunk_size=2)
+
+        self.assertEqual((result['status'], result['chunks'], result['queued']), ('queued', 2, 4))
+        chunks = [signature.args[0] for signature in celery_group.call_args[0][0]]
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(sorted(medication_id for chunk in chunks for medication_id in chunk), sorted(ids))
+        self.assertTrue(any({medications[0].id, duplicate.id} <= set(chunk) for chunk in chunks))
+
+        for chunk in chunks:
+            render_medication_images_task(chunk)
+
+        self.assertEqual(
+            Medication.objects.filter(id__in=ids, image_processing_status='completed').count(), 4
+        )
+        duplicate.refresh_from_db()
+        medications[0].refresh_from_db()
+        self.assertEqual(duplicate.medication_image_webp_id, medications[0].medication_image_webp_id)
+
+
+@tag('benchmark')
+class ImagePipelineBenchmarkTest(ImagePipelineTestMixin, TestCase):
+    """
+    Benchmark batch rendering throughput and memory.
+
+    Timing based, so tagged; slow CI runners can skip them with
+    ``--exclude-tag benchmark``. The numbers are reported, not asserted.
+    """
+
+    def test_batch_throughput_and_peak_rss(self):
+        """Report images/s and peak RSS growth for six large distinct JPEGs."""
+        colours = [(200, 30, 30), (30, 200, 30), (30, 30, 200), (200, 200, 30), (30, 200, 200), (200, 30, 200)]
+        ids = [self.make_medication(f'Large {index}', make_jpeg((4000, 3000), colour)).id
+               for index, colour in enumerate(colours)]
+
+        peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        result = batch_image_processing_task(ids, chunk_size=0, workers=0)
+        elapsed = time.perf_counter() - started
+        # ru_maxrss is in KiB on Linux
+        peak_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_before) / 1024
+
+        print(f"\nImage batch: {len(ids) / elapsed:.2f} images/s, peak RSS +{peak_growth:.0f} MiB")
+        self.assertEqual((result['processed'], result['failed']), (6, 0))
@@ -0,0 +1,114 @@
+"""
+Tests for the set-based interaction and contraindication engine.
+
+Lookups must agree with the substring checks they replace, and serializing
+a list of medications must load the patient's medication profile once.
+"""
+
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from medications.interaction_engine import PatientMedicationProfile
+from medications.models import Medication, MedicationSchedule
+from medications.serializers import EnhancedMedicationSerializer, MedicationInteractionValidator
+from medications.text_matching import KeywordAutomaton
+
+User = get_user_model()
+
+
+def substring_interactions(medication_name, existing_medications):
+    """The nested-loop check the engine replaced."""
+    interactions = []
+    for drug, data in MedicationInteractionValidator.KNOWN_INTERACTIONS.items():
+        if drug in medication_name.lower():
+            for existing_med in existing_medications:
+                if any(interacting in existing_med.lower() for interacting in data['interactions']):
+                    interactions.append((medication_name, existing_med, data['description']))
+    return interactions
+
+
+class KeywordAutomatonTest(SimpleTestCase):
+    """Test the Aho-Corasick keyword automaton."""
+
+    def test_finds_same_keywords_as_substring_checks(self):
+        """Test overlapping and nested keywords are all reported."""
+        keywords = ['he', 'she', 'his', 'hers', 'statin', 'statins', 'nsaids', 'aid']
+        automaton = KeywordAutomaton(keywords)
+
+        for text in ['ushers', 'atorvastatins', 'nsaids and his', '', 'xyz', 'hershe']:
+            self.assertEqual(automaton.find_all(text), {keyword for keyword in keywords if keyword in text})
+
+    def test_reports_match_offsets(self):
+        """Test every occurrence is yielded with its end offset."""
+        automaton = KeywordAutomaton(['ab', 'b'])
+
+        self.assertEqual(list(automaton.iter_matches('abab')), [(2, 'ab'), (2, 'b'), (4, 'ab'), (4, 'b')])
+
+
+class InteractionEngineTest(SimpleTestCase):
+    """Test interaction and contraindication lookups."""
+
+    def test_interactions_match_substring_checks(self):
+        """Test the engine finds the same pairs as the nested loops."""
+        names = ['Warfarin Sodium', 'Aspirin 81mg', 'Ibuprofen', 'Digoxin', 'Furosemide', 'Lithium carbonate',
+                 'Metformin XR', 'Paracetamol', 'Theophylline', 'Ciprofloxacin']
+
+        for name in names:
+            others = [other for other in names if other != name]
+            found = MedicationInteractionValidator.check_interactions(name, others)
+            self.assertEqual(
+                [(item['medication1'], item['medication2'], item['description']) for item in found],
+                substring_interactions(name, others)
+            )
+
+    def test_contraindications_for_condition_lists_and_text(self):
+        """Test conditions given as a list or as free text."""
+        for conditions in (['pregnancy', 'diabetes'], 'pregnancy; diabetes'):
+            found = MedicationInteractionValidator.check_contraindications('Warfarin', conditions)
+            self.assertEqual([item['condition'] for item in found], ['pregnancy'])
+
+        self.assertEqual(MedicationInteractionValidator.check_contraindications('Vitamin D', ['pregnancy']), [])
+        self.assertEqual(MedicationInteractionValidator.check_contraindications('Warfarin', []), [])
+
+
+class PatientProfileSerializationTest(TestCase):
+    """Test warnings are computed from one profile per request."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='patient', password='testpass123')
+        self.user.medical_conditions = 'pregnancy'
+        self.user.save()
+
+        self.medications = Medication.objects.bulk_create([
+            Medication(
+                name=name, generic_name=name, medication_type='tablet', strength='5mg',
+                dosage_unit='mg', pill_count=30
+            )
+            for name in ['Warfarin'] + [f'Aspirin {index}' for index in range(99)]
+        ])
+        for medication in self.medications[:10]:
+            MedicationSchedule.objects.create(
+                patient=self.user, medication=medication, timing='morning',
+                dosage_amount=Decimal('1'), frequency='daily', status='active'
+            )
+        self.context = {'request': SimpleNamespace(user=self.user)}
+
+    def test_profile_is_loaded_once_for_a_list(self):
+        """Test warnings for 100 medications cost a single query."""
+        serializer = EnhancedMedicationSerializer(context=self.context)
+
+        with self.assertNumQueries(1):
+            warnings = [
+                (serializer.get_interaction_warnings(medication), serializer.get_contraindication_warnings(medication))
+                for medication in self.medications
+            ]
+
+        interactions, contraindications = warnings[0]
+        self.assertEqual(len(interactions), 9)
+        self.assertEqual(contraindications[0]['condition'], 'pregnancy')
+        self.assertIsInstance(self.context['_patient_medication_profile'], PatientMedicationProfile)
+        self.assertEqual(warnings[1], ([], []))
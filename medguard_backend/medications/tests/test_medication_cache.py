@@ -0,0 +1,108 @@
+"""
+Tests for the cached medication lists.
+
+Equivalent filters must share one entry, keys must stay bounded whatever
+the input, and any medication or stock change must retire every list.
+"""
+
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from medications.models import Medication, StockTransaction
+from medications.services import MedicationCacheService
+
+User = get_user_model()
+
+
+class MedicationListCacheTest(TestCase):
+    """Test list cache keys, invalidation and hit rate."""
+
+    def setUp(self):
+        cache.clear()
+        self.panado = Medication.objects.create(
+            name='Panado', generic_name='Paracetamol', strength='500mg', dosage_unit='mg',
+            medication_type='tablet', prescription_type='otc', manufacturer='Adcock Ingram', pill_count=100
+        )
+        self.lipitor = Medication.objects.create(
+            name='Lipitor', generic_name='Atorvastatin', strength='20mg', dosage_unit='mg',
+            medication_type='tablet', prescription_type='prescription', manufacturer='Pfizer', pill_count=5
+        )
+
+    def test_equivalent_filters_share_a_key(self):
+        """Test order, case, padding, blanks and unknown filters do not change the key."""
+        key = MedicationCacheService._get_list_cache_key
+        normalize = MedicationCacheService.normalize_filters
+
+        canonical = key(normalize({'medication_type': 'tablet', 'search': 'panado', 'low_stock': True}))
+        self.assertEqual(canonical, key(normalize({
+            'low_stock': 'true', 'search': '  Panado ', 'medication_type': 'TABLET', 'manufacturer': '', 'page': 2,
+        })))
+        self.assertNotEqual(canonical, key(normalize({'medication_type': 'tablet', 'search': 'panado'})))
+        self.assertEqual(key(normalize({'low_stock': 'false'})), key(normalize(None)))
+
+        long_search = key(normalize({'search': 'x' * 10000, 'manufacturer': 'medication:list:*'}))
+        self.assertEqual(len(long_search), len(canonical))
+        self.assertNotIn('*', long_search)
+
+    def test_medication_changes_retire_lists(self):
+        """Test saving a medication or recording stock is reflected in cached lists."""
+        self.assertEqual(len(MedicationCacheService.get_medication_list({'search': 'panado'})), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lipitor.name = 'Panado Extra'
+            self.lipitor.save()
+        self.assertEqual(len(MedicationCacheService.get_medication_list({'search': 'panado'})), 2)
+
+        user = User.objects.create_user(username='pharmacist', email='pharmacist@example.com', password='testpass123')
+        low_stock = MedicationCacheService.get_medication_list({'low_stock': True})
+        self.assertEqual([medication['id'] for medication in low_stock], [self.lipitor.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            StockTransaction.objects.create(
+                medication=self.panado,
+                user=user,
+                transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+                quantity=-95
+            )
+        low_stock = MedicationCacheService.get_medication_list({'low_stock': True})
+        self.assertEqual({medication['id'] for medication in low_stock}, {self.panado.id, self.lipitor.id})
+
+    def test_hit_rate_under_a_realistic_filter_mix(self):
+        """Test request variations of the same few lists are served from the cache."""
+        # Ten logical lists, requested as clients spell them: in any order,
+        # with stray case and padding, blank parameters and string flags
+        lists = [
+            {}, {'medication_type': 'tablet'}, {'prescription_type': 'otc'}, {'search': 'panado'},
+            {'search': 'lipitor'}, {'manufacturer': 'pfizer'}, {'low_stock': True}, {'expiring_soon': True},
+            {'medication_type': 'tablet', 'prescription_type': 'prescription'},
+            {'medication_type': 'tablet', 'low_stock': True},
+        ]
+        rng = random.Random(23)
+        requests = []
+        for _ in range(500):
+            filters = dict(rng.choice(lists))
+            for name, value in list(filters.items()):
+                if value is True:
+                    filters[name] = rng.choice([True, 'true', '1', 'True'])
+                else:
+                    filters[name] = rng.choice([value, value.upper(), f" {value}", value.title()])
+            if rng.random() < 0.3:
+                filters[rng.choice(['search', 'manufacturer', 'low_stock'])] = ''
+            items = list(filters.items())
+            rng.shuffle(items)
+            requests.append(dict(items))
+
+        with CaptureQueriesContext(connection) as queries:
+            for filters in requests:
+                MedicationCacheService.get_medication_list(filters)
+
+        hit_rate = 1 - len(queries) / len(requests)
+        raw_keys = {f"medication:list:{filters}" for filters in requests}
+        raw_hit_rate = 1 - len(raw_keys) / len(requests)
+        self.assertEqual(len(queries), len(lists))
+        self.assertGreaterEqual(hit_rate, 0.95)
+        self.assertGreater(hit_rate, raw_hit_rate)
@@ -0,0 +1,133 @@
+"""
+Tests for batch prescription ingestion.
+
+A backlog is parsed chunk by chunk and written with bulk inserts; a bad
+prescription must only fail itself, and progress is reported per chunk.
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.cache_tags import get_tag_versions, model_tag, user_tag
+from medications.models import Medication, MedicationSchedule, PrescriptionRenewal, StockTransaction
+from medications.prescription_ingestion import PrescriptionBatchIngestion
+from medications.tests.test_prescription_parser import make_prescriptions
+
+User = get_user_model()
+
+
+class PrescriptionBatchIngestionTest(TestCase):
+    """Test parsing and bulk writing of prescription batches."""
+
+    def setUp(self):
+        self.pharmacist = User.objects.create_user(
+            username='pharmacist', email='pharmacist@example.com', password='testpass123',
+            user_type='HEALTHCARE_PROVIDER'
+        )
+        self.patient = User.objects.create_user(
+            username='patient', email='patient@example.com', password='testpass123', user_type='PATIENT'
+        )
+        self.texts = make_prescriptions(12, ['PANADO', 'LIPITOR', 'GLUCOPHAGE', 'ZOCOR'])
+
+    def items(self, texts):
+        return [{'text': text, 'patient_id': self.patient.id} for text in texts]
+
+    def test_ingests_prescriptions_in_bulk(self):
+        """Test every parsed medication gets its stock, schedule and renewal."""
+        progress = []
+        ingestion = PrescriptionBatchIngestion(workers=0, chunk_size=5,
+                                               progress_callback=lambda *counts: progress.append(counts))
+
+        # The patient lookup, then the same ten statements for every chunk:
+        # four inserts, the stock rollup and their savepoints
+        with self.assertNumQueries(1 + 3 * 10):
+            result = ingestion.run(self.items(self.texts), self.pharmacist)
+
+        self.assertEqual(result['succeeded'], 12)
+        self.assertEqual(progress, [(5, 12), (10, 12), (12, 12)])
+        self.assertEqual(Medication.objects.count(), result['medications'])
+        self.assertEqual(MedicationSchedule.objects.filter(patient=self.patient).count(), result['schedules'])
+        self.assertEqual(PrescriptionRenewal.objects.count(), result['medications'])
+
+        stock_transaction = StockTransaction.objects.select_related('medication').first()
+        self.assertEqual(stock_transaction.stock_after, stock_transaction.medication.pill_count)
+        self.assertTrue(MedicationSchedule.objects.exclude(next_reminder_at=None).exists())
+
+    def test_invalidates_api_cache_tags(self):
+        """Test bulk-created medications and schedules retire tagged API entries on commit."""
+        tags = [model_tag(Medication), model_tag(MedicationSchedule), user_tag(self.patient.id)]
+        before = get_tag_versions(tags)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PrescriptionBatchIngestion(workers=0).run(self.items(self.texts[:2]), self.pharmacist)
+
+        after = get_tag_versions(tags)
+        self.assertTrue(all(after[tag] > before[tag] for tag in tags))
+
+    def test_isolates_failures_per_prescription(self):
+        """Test empty, unknown-patient and unwritable items fail alone."""
+        items = self.items(self.texts[:4])
+        items[1]['text'] = '  '
+        items[2]['patient_id'] = self.pharmacist.id
+        items[3]['prescription_number'] = 'RX-BAD'
+        original_bulk_create = PrescriptionRenewal.objects.bulk_create
+
+        def bulk_create(renewals, *args, **kwargs):
+            if any(renewal.prescription_number == 'RX-BAD' for renewal in renewals):
+                raise ValueError('write failed')
+            return original_bulk_create(renewals, *args, **kwargs)
+
+        with mock.patch.object(PrescriptionRenewal.objects, 'bulk_create', side_effect=bulk_create):
+            result = PrescriptionBatchIngestion(workers=0).run(items, self.pharmacist)
+
+        statuses = [item['status'] for item in result['results']]
+        self.assertEqual(statuses, ['created', 'failed', 'failed', 'failed'])
+        self.assertEqual(result['results'][1]['error'], 'No prescription text provided')
+        self.assertEqual(result['results'][2]['error'], 'Patient not found')
+        self.assertEqual(result['results'][3]['error'], 'write failed')
+        self.assertEqual(Medication.objects.count(), result['results'][0]['medications'])
+
+
+class BatchPrescriptionUploadEndpointTest(APITestCase):
+    """Test request validation of the batch prescription upload endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='pharmacist', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.prescriptions = [
+            {'text': text, 'patient_id': self.user.id} for text in make_prescriptions(25, ['PANADO'])
+        ]
+
+    def post(self, chunk_size):
+        return self.client.post(
+            reverse('medication-batch-prescription-upload'),
+            {'prescriptions': self.prescriptions, 'chunk_size': chunk_size},
+            format='json'
+        )
+
+    def test_rejects_invalid_chunk_size(self):
+        """Test non-numeric, zero, negative and oversized chunk sizes get a 400."""
+        with mock.patch('medications.tasks.batch_ingest_prescriptions_task.delay') as delay:
+            for chunk_size in ('abc', 0, -5, 100000):
+                with self.subTest(chunk_size=chunk_size):
+                    response = self.post(chunk_size)
+
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertIn('chunk_size', response.data)
+
+        delay.assert_not_called()
+
+    def test_queues_large_batches(self):
+        """Test a valid chunk size is passed to the ingestion task."""
+        with mock.patch('medications.tasks.batch_ingest_prescriptions_task.delay') as delay:
+            delay.return_value.id = 'task-1'
+            response = self.post('10')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        delay.assert_called_once_with(self.prescriptions, self.user.id, 10)
@@ -0,0 +1,130 @@
+"""
+Tests for the precompiled prescription parser.
+
+Keyword cues found in one pass must select the same fields the patterns
+would match, and parse throughput must not depend on the size of the brand
+dictionary.
+"""
+
+import random
+import time
+
+from django.test import SimpleTestCase, tag
+
+from medications.prescription_parser import PrescriptionParser
+
+INSTRUCTIONS = [
+    'Take 1 tablet twice daily with food',
+    'Take three tablets three times a day with meals',
+    'Inject 20 units once daily at bedtime',
+    'Use 2 puffs as needed for shortness of breath',
+    'Take 2 tablets at 8h00 and 20h00',
+    'Apply cream 2 times daily',
+    'Take one capsule daily in the morning',
+]
+
+
+def make_prescriptions(count, brands, seed=7):
+    """Prescriptions shaped like scanned South African scripts."""
+    rng = random.Random(seed)
+    codes = list(PrescriptionParser.ICD10_MAPPINGS)
+    prescriptions = []
+    for index in range(count):
+        medications = '\n'.join(
+            f"{number + 1}. {rng.choice(brands)} {rng.choice([5, 10, 20, 500])}mg tablets\n"
+            f"   {rng.choice(INSTRUCTIONS)}\n"
+            f"   Quantity: x {rng.choice([30, 60, 90])}\n"
+            f"   + {rng.randint(0, 5)} REPEATS\n"
+            for number in range(rng.randint(1, 4))
+        )
+        prescriptions.append(
+            f"Dr. Sarah Johnson, MBChB\nPatient: Michael Merwe\nID: {100000 + index}\n"
+            f"Date: 20/12/2024\nRX#: RX-2024-{index:03d}\n"
+            f"ICD-10: {', '.join(rng.sample(codes, 2))}\n\n{medications}"
+        )
+    return prescriptions
+
+
+def parse_rate(parser, prescriptions):
+    started = time.perf_counter()
+    for prescription in prescriptions:
+        parser.parse_prescription(prescription)
+    return len(prescriptions) / (time.perf_counter() - started)
+
+
+class PrescriptionParserMatchingTest(SimpleTestCase):
+    """Test cue-driven extraction."""
+
+    def test_first_brand_in_dictionary_order_wins(self):
+        """Test brand lookup keeps BRAND_TO_GENERIC precedence."""
+        section = '1. Zocor or Lipitor 20mg tablets\n   Take one tablet daily at night'
+
+        name = PrescriptionParser._extract_medication_name(section)
+        generic = PrescriptionParser._extract_generic_name(section)
+
+        self.assertEqual((name.value, generic.value), ('Lipitor', 'Atorvastatin'))
+
+    def test_cues_match_across_whitespace_and_case(self):
+        """Test cues stand in for patterns with flexible whitespace."""
+        section = PrescriptionParser.scan('NOVORAPID Flex\n Pen\n   Use as   NEEDED\n   + 2 repeats')
+
+        self.assertTrue(PrescriptionParser._extract_as_needed(section).value)
+        self.assertEqual(PrescriptionParser._extract_medication_type(section).value, 'pen')
+        self.assertEqual(PrescriptionParser._extract_repeats(section).value, 2)
+        self.assertEqual(
+            [item['type'] for item in PrescriptionParser._extract_timing(section).value], ['as_needed']
+        )
+
+    def test_sections_without_cues_skip_patterns(self):
+        """Test fields whose cues are absent fall back to their defaults."""
+        medication = PrescriptionParser._parse_single_medication('1. PANADO 500mg', 1).value
+
+        self.assertEqual(medication['generic_name'].value, 'Paracetamol')
+        self.assertIsNone(medication['instructions'].value)
+        self.assertEqual(medication['repeats'].value, 0)
+        self.assertFalse(medication['as_needed'].value)
+
+    def test_subclass_tables_get_their_own_matcher(self):
+        """Test extended brand tables are compiled for the subclass only."""
+        class LocalParser(PrescriptionParser):
+            BRAND_TO_GENERIC = {**PrescriptionParser.BRAND_TO_GENERIC, 'MEDGUARDOL': 'Paracetamol'}
+
+        self.assertEqual(LocalParser._extract_generic_name('MEDGUARDOL 500mg').value, 'Paracetamol')
+        self.assertIsNone(PrescriptionParser._extract_generic_name('medguardol 500mg').value)
+
+
+@tag('benchmark')
+class PrescriptionParserBenchmarkTest(SimpleTestCase):
+    """
+    Benchmark prescription parsing throughput.
+
+    Timing based, so tagged; slow CI runners can skip them with
+    ``--exclude-tag benchmark``.
+    """
+
+    def test_parse_throughput(self):
+        """Smoke test: 10,000 prescriptions parse well within a loose single-core floor."""
+        prescriptions = make_prescriptions(10000, list(PrescriptionParser.BRAND_TO_GENERIC))
+        PrescriptionParser.parse_prescription(prescriptions[0])
+
+        rate = parse_rate(PrescriptionParser, prescriptions)
+
+        # Well over 2,000 a second on a developer machine; the floor only
+        # catches a return to per-brand pattern scans
+        self.assertGreater(rate, 200)
+
+    def test_throughput_does_not_depend_on_dictionary_size(self):
+        """Test a 5,000 brand dictionary parses about as fast as the built-in one."""
+        brands = {f'BRAND{index:04d}X': f'Generic {index}' for index in range(5000)}
+
+        class LargeDictionaryParser(PrescriptionParser):
+            BRAND_TO_GENERIC = {**PrescriptionParser.BRAND_TO_GENERIC, **brands}
+
+        prescriptions = make_prescriptions(1000, list(brands))
+        PrescriptionParser.parse_prescription(prescriptions[0])
+        LargeDictionaryParser.parse_prescription(prescriptions[0])
+
+        baseline = parse_rate(PrescriptionParser, prescriptions)
+        large = parse_rate(LargeDictionaryParser, prescriptions)
+
+        self.assertGreater(large, baseline * 0.6)
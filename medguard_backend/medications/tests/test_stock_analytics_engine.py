@@ -0,0 +1,227 @@
+"""
+Tests for the incremental stock analytics engine.
+
+The incremental engine must produce the same figures as the pandas
+recompute in IntelligentStockService.predict_stock_depletion.
+"""
+
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from medications.models import Medication, StockAnalytics, StockTransaction
+from medications.services import IntelligentStockService
+from medications.stock_analytics_engine import (
+    BatchStockAnalytics, IncrementalStockAnalytics, apply_quantity, empty_state,
+    summarize_state
+)
+
+User = get_user_model()
+
+
+class UsageStateTest(SimpleTestCase):
+    """Test the running usage state against a pandas daily series."""
+
+    def _pandas_stats(self, rows):
+        df = pd.DataFrame(rows, columns=['date', 'quantity'])
+        df['date'] = pd.to_datetime(df['date'])
+        df_daily = df.groupby('date')['quantity'].sum().resample('D').sum().fillna(0).to_frame()
+        df_daily['day_of_week'] = df_daily.index.dayofweek
+        return (
+            df_daily['quantity'].mean(),
+            df_daily['quantity'].std(),
+            len(df_daily),
+            df_daily.groupby('day_of_week')['quantity'].mean().to_dict()
+        )
+
+    def test_summary_matches_pandas(self):
+        """Test running aggregates match the resampled pandas series."""
+        rng = random.Random(42)
+        today = date(2025, 8, 1)
+        rows = [
+            (today - timedelta(days=rng.randint(0, 60)), rng.choice([-1, -2, -1, 30]))
+            for _ in range(200)
+        ]
+
+        state = empty_state()
+        for day, quantity in rows:
+            apply_quantity(state, day, quantity, today=today)
+
+        summary = summarize_state(state)
+        mean, std, data_points, weekly = self._pandas_stats(rows)
+
+        self.assertAlmostEqual(summary['mean'], mean)
+        self.assertAlmostEqual(summary['std'], std)
+        self.assertEqual(summary['data_points'], data_points)
+        self.assertEqual(summary['transaction_count'], len(rows))
+        for dow, value in weekly.items():
+            self.assertAlmostEqual(summary['weekly_pattern'][dow], value)
+
+    def test_expired_days_are_evicted(self):
+        """Test days outside the window drop out of the aggregates."""
+        state = empty_state(window_days=10)
+        apply_quantity(state, date(2025, 1, 1), -5, today=date(2025, 1, 1))
+        apply_quantity(state, date(2025, 1, 20), -2, today=date(2025, 1, 20))
+
+        self.assertEqual(list(state['days']), ['2025-01-20'])
+        self.assertEqual(state['sum'], -2)
+        self.assertEqual(state['sumsq'], 4)
+        self.assertEqual(state['tx_count'], 1)
+
+    def test_ewma_tracks_completed_days(self):
+        """Test the EWMA folds in completed days only."""
+        state = empty_state()
+        apply_quantity(state, date(2025, 1, 1), -4, today=date(2025, 1, 1))
+        self.assertIsNone(state['ewma'])
+
+        apply_quantity(state, date(2025, 1, 2), -2, today=date(2025, 1, 2))
+        self.assertEqual(state['ewma'], 4)
+
+
+class IncrementalStockAnalyticsTest(TestCase):
+    """Test incremental analytics against the full recompute."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='stockuser',
+            email='stock@example.com',
+            password='testpass123'
+        )
+        self.medication = Medication.objects.create(
+            name='Metformin',
+            generic_name='Metformin',
+            medication_type='tablet',
+            strength='500mg',
+            dosage_unit='mg',
+            pill_count=500,
+            low_stock_threshold=10
+        )
+        self.engine = IncrementalStockAnalytics()
+        self.service = IntelligentStockService()
+
+    def _create_transaction(self, quantity, days_ago):
+        stock_transaction = StockTransaction.objects.create(
+            medication=self.medication,
+            user=self.user,
+            transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+            quantity=quantity
+        )
+        StockTransaction.objects.filter(pk=stock_transaction.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return stock_transaction
+
+    def test_incremental_prediction_matches_recompute(self):
+        """Test the incremental prediction equals the pandas prediction."""
+        for days_ago in range(20, 0, -1):
+            self._create_transaction(-2 if days_ago % 3 else -3, days_ago)
+
+        expected = self.service.predict_stock_depletion(self.medication)
+        actual = self.engine.predict(self.medication, self.engine.build_state(self.medication))
+
+        for key in ('daily_usage_rate', 'usage_volatility', 'confidence_level'):
+            self.assertAlmostEqual(actual[key], expected[key])
+        for key in ('days_until_stockout', 'predicted_stockout_date',
+                    'recommended_order_quantity', 'recommended_order_date', 'data_points'):
+            self.assertEqual(actual[key], expected[key])
+
+    def test_transaction_updates_analytics_in_constant_queries(self):
+        """Test recording a transaction does not rescan history."""
+        for days_ago in range(30, 0, -1):
+            self._create_transaction(-1, days_ago)
+        self.service.update_stock_analytics(self.medication)
+
+        self.medication.refresh_from_db()
+        stock_transaction = StockTransaction(
+            medication=self.medication,
+            user=self.user,
+            transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+            quantity=-1
+        )
+        with self.assertNumQueries(12):
+            # stock increment + insert, analytics lock + update, daily rollup
+            # lock + update, each in a savepoint
+            stock_transaction.save()
+
+        analytics = StockAnalytics.objects.get(medication=self.medication)
+        self.assertEqual(analytics.usage_state['tx_count'], 31)
+        self.assertEqual(analytics.days_until_stockout, stock_transaction.stock_after)
+
+
+class BatchStockAnalyticsTest(TestCase):
+    """Test the vectorized batch recompute against the per-medication path."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='batchuser',
+            email='batch@example.com',
+            password='testpass123'
+        )
+        self.service = IntelligentStockService()
+        rng = random.Random(7)
+
+        self.medications = []
+        for index, history_days in enumerate([40, 25, 3, 0, 60]):
+            medication = Medication.objects.create(
+                name=f"Medication {index}",
+                generic_name=f"Generic {index}",
+                medication_type='tablet',
+                strength='10mg',
+                dosage_unit='mg',
+                pill_count=1000,
+                low_stock_threshold=10 + index
+            )
+            self.medications.append(medication)
+            for days_ago in range(history_days, 0, -1):
+                if rng.random() < 0.3:
+                    continue  # Gaps count as zero-usage days
+                stock_transaction = StockTransaction.objects.create(
+                    medication=medication,
+                    user=self.user,
+                    transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+                    quantity=-rng.choice([1, 2, 3])
+                )
+                StockTransaction.objects.filter(pk=stock_transaction.pk).update(
+                    created_at=timezone.now() - timedelta(days=days_ago, hours=rng.randint(0, 12))
+                )
+        StockAnalytics.objects.all().delete()
+
+    def test_batch_matches_per_medication_recompute(self):
+        """Test batch figures equal predict_stock_depletion for every medication."""
+        stats = BatchStockAnalytics().run([medication.id for medication in self.medications])
+
+        self.assertEqual(stats['medications_updated'], 5)
+        self.assertEqual(stats['analytics_created'], 5)
+        self.assertIn('rows_per_second', stats)
+
+        for medication in self.medications:
+            medication.refresh_from_db()
+            expected = self.service.predict_stock_depletion(medication)
+            analytics = StockAnalytics.objects.get(medication=medication)
+
+            self.assertAlmostEqual(analytics.daily_usage_rate, expected['daily_usage_rate'])
+            self.assertAlmostEqual(analytics.usage_volatility, expected['usage_volatility'])
+            self.assertAlmostEqual(analytics.stockout_confidence, expected['confidence_level'])
+            self.assertEqual(analytics.days_until_stockout, expected['days_until_stockout'])
+            self.assertEqual(analytics.predicted_stockout_date, expected['predicted_stockout_date'])
+            self.assertEqual(analytics.recommended_order_quantity, expected['recommended_order_quantity'])
+            self.assertEqual(analytics.recommended_order_date, expected['recommended_order_date'])
+            self.assertEqual(
+                analytics.usage_state,
+                IncrementalStockAnalytics().build_state(medication)
+            )
+
+    def test_query_count_is_independent_of_medication_count(self):
+        """Test a chunk costs a fixed number of queries."""
+        ids = [medication.id for medication in self.medications]
+        BatchStockAnalytics().run(ids)
+
+        # medications, transactions, analytics, bulk update (in a savepoint)
+        with self.assertNumQueries(6):
+            BatchStockAnalytics().run(ids)
@@ -0,0 +1,173 @@
+"""
+Tests for the append-only stock ledger.
+
+Stock changes must be applied atomically in the database so concurrent
+doses and restocks never lose updates, and compaction must keep ledger
+balances consistent with Medication.pill_count.
+"""
+
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+
+from medications.models import Medication, StockLedgerSnapshot, StockTransaction
+from medications.stock_ledger import (
+    apply_stock_delta, compact_stock_ledger, get_ledger_balance
+)
+
+User = get_user_model()
+
+
+def create_medication(pill_count=100):
+    return Medication.objects.create(
+        name='Amoxicillin',
+        generic_name='Amoxicillin',
+        medication_type='capsule',
+        strength='500mg',
+        dosage_unit='mg',
+        pill_count=pill_count,
+        low_stock_threshold=5
+    )
+
+
+class StockLedgerTest(TestCase):
+    """Test ledger transactions and snapshots."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='pharmacist', password='testpass123')
+        self.medication = create_medication()
+
+    def _transact(self, medication, quantity):
+        return StockTransaction.objects.create(
+            medication=medication,
+            user=self.user,
+            transaction_type=StockTransaction.TransactionType.ADJUSTMENT,
+            quantity=quantity
+        )
+
+    def test_stale_instances_do_not_lose_updates(self):
+        """Test stock is derived from the database, not the in-memory instance."""
+        stale = Medication.objects.get(pk=self.medication.pk)
+
+        first = self._transact(self.medication, -10)
+        second = self._transact(stale, 30)
+
+        self.assertEqual((first.stock_before, first.stock_after), (100, 90))
+        self.assertEqual((second.stock_before, second.stock_after), (90, 120))
+        self.assertEqual(stale.pill_count, 120)
+        self.medication.refresh_from_db()
+        self.assertEqual(self.medication.pill_count, 120)
+
+    def test_apply_stock_delta_returns_new_balance(self):
+        """Test the in-database increment returns the updated stock."""
+        self.assertEqual(apply_stock_delta(self.medication.pk, 5), 105)
+        with self.assertRaises(Medication.DoesNotExist):
+            apply_stock_delta(0, 1)
+
+    def test_compaction_snapshots_the_ledger(self):
+        """Test balances come from the latest snapshot plus recent deltas."""
+        self._transact(self.medication, -3)
+        compact_stock_ledger([self.medication.pk])
+        snapshot = StockLedgerSnapshot.objects.get()
+        self.assertEqual(snapshot.balance, 97)
+
+        self._transact(self.medication, -2)
+        self._transact(self.medication, 10)
+        self.assertEqual(get_ledger_balance(self.medication.pk), 105)
+
+        stats = compact_stock_ledger([self.medication.pk])
+        self.assertEqual(stats['snapshots'], 1)
+        latest = StockLedgerSnapshot.objects.order_by('-last_transaction_id').first()
+        self.assertEqual((latest.balance, latest.transactions_folded, latest.drift), (105, 2, 0))
+
+        # Nothing new: no snapshot
+        self.assertEqual(compact_stock_ledger([self.medication.pk])['snapshots'], 0)
+
+    def test_compaction_records_drift(self):
+        """Test stock edited outside the ledger is reported as drift."""
+        compact_stock_ledger([self.medication.pk])
+        Medication.objects.filter(pk=self.medication.pk).update(pill_count=80)
+
+        stats = compact_stock_ledger([self.medication.pk])
+
+        self.assertEqual(stats['drifted'], 1)
+        self.assertEqual(StockLedgerSnapshot.objects.order_by('-id').first().drift, -20)
+
+    def test_drift_is_reported_once(self):
+        """Test a drifted snapshot re-anchors the ledger on the actual stock."""
+        compact_stock_ledger([self.medication.pk])
+        Medication.objects.filter(pk=self.medication.pk).update(pill_count=80)
+        compact_stock_ledger([self.medication.pk])
+
+        snapshot = StockLedgerSnapshot.objects.order_by('-id').first()
+        self.assertEqual((snapshot.balance, snapshot.drift), (80, -20))
+        self.assertEqual(get_ledger_balance(self.medication.pk), 80)
+
+        # Nothing new: no snapshot and no repeated drift
+        self.assertEqual(compact_stock_ledger([self.medication.pk])['snapshots'], 0)
+
+        self._transact(self.medication, -5)
+        stats = compact_stock_ledger([self.medication.pk])
+
+        self.assertEqual((stats['snapshots'], stats['drifted']), (1, 0))
+        latest = StockLedgerSnapshot.objects.order_by('-id').first()
+        self.assertEqual((latest.balance, latest.drift), (75, 0))
+
+
+class StockLedgerConcurrencyTest(TransactionTestCase):
+    """Stress the ledger with concurrent writers on separate connections."""
+
+    THREADS = 8
+    TRANSACTIONS_PER_THREAD = 25
+
+    def setUp(self):
+        """Skip on databases that cannot serve concurrent connections."""
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Shared in-memory SQLite fails concurrent connections instead of waiting for locks')
+
+    def test_concurrent_transactions_are_not_lost(self):
+        """Test concurrent doses and restocks all land in the stock level."""
+        user = User.objects.create_user(username='stress', password='testpass123')
+        medication = create_medication(pill_count=1000)
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for step in range(self.TRANSACTIONS_PER_THREAD):
+                    # Deliberately stale instance, as a long-lived request would hold
+                    stale = Medication.objects.get(pk=medication.pk)
+                    StockTransaction.objects.create(
+                        medication=stale,
+                        user=user,
+                        transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+                        quantity=-2 if (index + step) % 3 else 3
+                    )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+        transactions = list(StockTransaction.objects.filter(medication=medication).order_by('id'))
+        expected = 1000 + sum(t.quantity for t in transactions)
+        medication.refresh_from_db()
+
+        self.assertEqual(len(transactions), self.THREADS * self.TRANSACTIONS_PER_THREAD)
+        self.assertEqual(medication.pill_count, expected)
+        # Every transaction saw a distinct balance and the chain is unbroken
+        for previous, current in zip(transactions, transactions[1:]):
+            self.assertEqual(current.stock_before, previous.stock_after)
+        self.assertEqual(transactions[-1].stock_after, medication.pill_count)
@@ -0,0 +1,121 @@
+"""
+Tests for the stock report in StockAnalyticsService.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from medications.models import Medication, StockAnalytics, StockTransaction
+from medications.services import StockAnalyticsService
+
+User = get_user_model()
+
+
+class StockReportTest(TestCase):
+    """Test the stock report is built from one grouped query."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='reporter', password='testpass123')
+        self.service = StockAnalyticsService()
+        self.today = timezone.localdate()
+
+    def _create_medications(self, count):
+        medications = []
+        for index in range(count):
+            medication = Medication.objects.create(
+                name=f"Report Medication {Medication.objects.count()}",
+                generic_name='Generic',
+                medication_type='tablet',
+                strength='10mg',
+                dosage_unit='mg',
+                pill_count=20,
+                low_stock_threshold=15
+            )
+            StockTransaction.objects.create(
+                medication=medication, user=self.user,
+                transaction_type=StockTransaction.TransactionType.PURCHASE,
+                quantity=10, unit_price=Decimal('2.50')
+            )
+            for _dose in range(3):
+                StockTransaction.objects.create(
+                    medication=medication, user=self.user,
+                    transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+                    quantity=-2
+                )
+            medications.append(medication)
+        return medications
+
+    def _report(self):
+        return self.service.generate_stock_report(self.today - timedelta(days=7), self.today)
+
+    def test_report_totals(self):
+        """Test per-type and per-medication totals."""
+        self._create_medications(2)
+
+        report = self._report()
+        entry = report['medications'][0]
+
+        self.assertEqual(entry['total_transactions'], 4)
+        self.assertEqual(entry['total_quantity'], 4)
+        self.assertEqual(entry['total_value'], Decimal('25.00'))
+        self.assertEqual(entry['usage_by_type']['dose_taken'],
+                         {'count': 3, 'quantity': -6, 'value': Decimal('0.00')})
+        self.assertEqual(entry['usage_by_type']['expiry'],
+                         {'count': 0, 'quantity': 0, 'value': Decimal('0.00')})
+        analytics = StockAnalytics.objects.get(medication_id=entry['id'])
+        self.assertEqual(entry['analytics']['days_until_stockout'], analytics.days_until_stockout)
+        self.assertEqual(report['summary']['total_transactions'], 8)
+        self.assertEqual(report['summary']['low_stock_count'], 0)
+
+    def test_query_count_is_constant(self):
+        """Test the report cost does not grow with the number of medications."""
+        self._create_medications(2)
+        # medications, grouped transaction totals, analytics prefetch
+        with self.assertNumQueries(3):
+            self._report()
+
+        self._create_medications(8)
+        with self.assertNumQueries(3):
+            report = self._report()
+        self.assertEqual(len(report['medications']), 10)
+
+    def test_explicit_medication_list(self):
+        """Test reporting on a subset of medications."""
+        medications = self._create_medications(3)
+
+        report = self.service.generate_stock_report(
+            self.today - timedelta(days=7), self.today, medications=medications[:1]
+        )
+
+        self.assertEqual(report['summary']['total_medications'], 1)
+        self.assertEqual(report['summary']['total_transactions'], 4)
+
+    def test_dashboard_without_analytics_cache(self):
+        """Test the dashboard falls back to the default cache when no analytics cache is configured."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self._create_medications(2)
+        caches_without_analytics = {alias: config for alias, config in settings.CACHES.items() if alias != 'analytics'}
+
+        with override_settings(CACHES=caches_without_analytics):
+            caches['default'].clear()
+            with mock.patch.object(StockAnalyticsService, 'generate_stock_report',
+                                   autospec=True, side_effect=StockAnalyticsService.generate_stock_report) as report:
+                first = client.get(reverse('stock-analytics-dashboard'))
+                second = client.get(reverse('stock-analytics-dashboard'))
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        report.assert_called_once()
@@ -0,0 +1,134 @@
+"""
+Tests for the daily stock rollups.
+
+Rollups kept current as transactions are recorded must match a rebuild
+from the transactions, and charts and usage analysis must read them in a
+number of queries that does not depend on the transaction history.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from medications.models import Medication, StockDailyRollup, StockTransaction
+from medications.services import IntelligentStockService
+from medications.stock_rollups import rebuild_stock_rollups, record_stock_rollups
+
+User = get_user_model()
+
+
+def rollup_rows(medication):
+    return list(StockDailyRollup.objects.filter(medication=medication).order_by('day', 'transaction_type').values_list(
+        'day', 'transaction_type', 'quantity', 'transaction_count', 'total_value', 'hourly_quantity'
+    ))
+
+
+class StockDailyRollupTest(TestCase):
+    """Test incremental rollups, the rebuild and their readers."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='pharmacist', password='testpass123')
+        self.medication = Medication.objects.create(
+            name='Simvastatin',
+            generic_name='Simvastatin',
+            medication_type='tablet',
+            strength='20mg',
+            dosage_unit='mg',
+            pill_count=100,
+            low_stock_threshold=10
+        )
+        self.service = IntelligentStockService()
+        self.today = timezone.localdate()
+
+    def _transact(self, quantity, days_ago=None, hour=9, transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+                  unit_price=None):
+        stock_transaction = StockTransaction.objects.create(
+            medication=self.medication,
+            user=self.user,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            unit_price=unit_price
+        )
+        if days_ago is not None:
+            # Backdated transactions are rolled up by rebuild_stock_rollups
+            created_at = timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(hour)))
+            StockTransaction.objects.filter(pk=stock_transaction.pk).update(created_at=created_at)
+        return stock_transaction
+
+    def test_incremental_rollups_match_rebuild(self):
+        """Test rollups recorded per transaction equal a rebuild from the ledger."""
+        self._transact(-1)
+        self._transact(-2)
+        self._transact(30, transaction_type=StockTransaction.TransactionType.PURCHASE, unit_price=Decimal('1.50'))
+
+        incremental = rollup_rows(self.medication)
+        stats = rebuild_stock_rollups()
+
+        self.assertEqual(stats['transactions'], 3)
+        self.assertEqual(rollup_rows(self.medication), incremental)
+        purchase = StockDailyRollup.objects.get(transaction_type=StockTransaction.TransactionType.PURCHASE)
+        self.assertEqual((purchase.quantity, purchase.total_value), (30, Decimal('45.00')))
+        doses = StockDailyRollup.objects.get(transaction_type=StockTransaction.TransactionType.DOSE_TAKEN)
+        self.assertEqual((doses.quantity, doses.transaction_count), (-3, 2))
+
+    def test_bulk_created_transactions_are_rolled_up(self):
+        """Test transactions inserted with bulk_create are added in one pass."""
+        transactions = StockTransaction.objects.bulk_create([
+            StockTransaction(
+                medication=self.medication, user=self.user,
+                transaction_type=StockTransaction.TransactionType.DOSE_TAKEN,
+                quantity=-1, stock_before=100 - index, stock_after=99 - index
+            )
+            for index in range(5)
+        ])
+
+        self.assertEqual(record_stock_rollups(transactions), 1)
+        self.assertEqual(StockDailyRollup.objects.get().transaction_count, 5)
+
+    def test_rebuild_keeps_history_of_pruned_transactions(self):
+        """Test the default rebuild starts at the oldest transaction on record."""
+        StockDailyRollup.objects.create(
+            medication=self.medication, day=self.today - timedelta(days=400),
+            transaction_type=StockTransaction.TransactionType.DOSE_TAKEN, quantity=-4, transaction_count=4
+        )
+        self._transact(-1, days_ago=2)
+
+        rebuild_stock_rollups()
+
+        self.assertEqual(
+            [row[0] for row in rollup_rows(self.medication)],
+            [self.today - timedelta(days=400), self.today - timedelta(days=2)]
+        )
+
+    def test_usage_patterns_read_one_row_per_day(self):
+        """Test usage analysis cost does not grow with the number of transactions."""
+        for days_ago in range(10):
+            for hour in (8, 20):
+                self._transact(-1, days_ago=days_ago, hour=hour)
+        rebuild_stock_rollups()
+
+        with self.assertNumQueries(1):
+            patterns = self.service.analyze_usage_patterns(self.medication, days=30)
+
+        self.assertEqual(patterns['statistics']['total_transactions'], 20)
+        self.assertEqual(patterns['statistics']['unique_days'], 10)
+        self.assertEqual(patterns['statistics']['mean_daily_usage'], 2)
+        self.assertEqual(patterns['hourly_pattern'], {8: 10, 20: 10})
+
+    def test_visualization_plots_end_of_day_stock(self):
+        """Test chart points walk back from the current stock level."""
+        self._transact(-5, days_ago=2)
+        self._transact(20, days_ago=1, transaction_type=StockTransaction.TransactionType.PURCHASE)
+        self._transact(-3, days_ago=0)
+        rebuild_stock_rollups()
+        self.medication.refresh_from_db()
+
+        visualization = self.service.generate_stock_visualization(self.medication, days=3)
+
+        self.assertEqual(self.medication.pill_count, 112)
+        self.assertEqual(visualization.chart_data['labels'][-1], self.today.strftime('%Y-%m-%d'))
+        self.assertEqual(visualization.chart_data['datasets'][0]['data'], [100, 95, 115, 112])
@@ -0,0 +1,78 @@
+"""
+Multi-keyword text matching for MedGuard SA.
+
+``KeywordAutomaton`` is a pure Python Aho-Corasick automaton: it is built
+once from a keyword set and then finds every keyword occurring in a text in
+a single pass, however many keywords there are. It replaces loops of
+``keyword in text`` checks over drug and ingredient dictionaries.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed set of keywords.
+
+    Matching is case-sensitive; callers normalize keywords and text alike.
+    Every occurrence is reported, including keywords inside other words and
+    overlapping matches, exactly as ``keyword in text`` would find them.
+
+    Failure links are folded into the transition tables when the automaton
+    is built, so scanning costs one dictionary lookup per character.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[str]] = [[]]
+        for keyword in dict.fromkeys(keywords):
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(keyword)
+
+        # Breadth-first, so a state's failure target is complete before it
+        # is inherited from
+        transitions: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            transitions[state] = {**transitions[fail[state]], **goto[state]}
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fail[next_state] = transitions[fail[state]].get(char, 0)
+                outputs[next_state].extend(outputs[fail[next_state]])
+
+        self._step = [table.get for table in transitions]
+        self._output: List[Tuple[str, ...]] = [tuple(output) for output in outputs]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (end offset, keyword) for every keyword occurrence in text."""
+        step, output = self._step, self._output
+        state = 0
+        for position, char in enumerate(text):
+            state = step[state](char, 0)
+            if output[state]:
+                for keyword in output[state]:
+                    yield position + 1, keyword
+
+    def find_all(self, text: str) -> Set[str]:
+        """Set of keywords occurring anywhere in text."""
+        step, output = self._step, self._output
+        found = set()
+        state = 0
+        for char in text:
+            state = step[state](char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
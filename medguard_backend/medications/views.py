@@ -4,6 +4,7 @@ Views for medications app.
 This module contains API views for managing medications, schedules, logs, and alerts.
 """
 
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
 from django.db.models import Q, Count, Avg, F, Sum, Prefetch
@@ -22,8 +23,9 @@ from django_filters.rest_framework import DjangoFilterBackend
 from datetime import datetime, timedelta, date, time
 from decimal import Decimal
 import logging
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.core.exceptions import ValidationError
+from medguard_backend.cache import read_through
 from .models import (
     Medication, MedicationSchedule, MedicationLog, StockAlert, 
     StockAnalytics, PharmacyIntegration, StockTransaction,
@@ -36,6 +38,8 @@ from .serializers import (
     MedicationScheduleDetailSerializer,
     MedicationLogSerializer,
     MedicationLogDetailSerializer,
+    MarkTakenBulkSerializer,
+    BatchPrescriptionUploadSerializer,
     StockAlertSerializer,
     StockAlertDetailSerializer,
     MedicationStatsSerializer,
@@ -81,6 +85,9 @@ class MedicationViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at', 'updated_at', 'pill_count']
     ordering = ['name']
     pagination_class = OptimizedPagination
+
+    # Larger prescription batches are ingested by Celery workers
+    BATCH_INGESTION_SYNC_LIMIT = 20
     
     def get_queryset(self):
         """
@@ -774,6 +781,59 @@ class MedicationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'])
+    def batch_prescription_upload(self, request):
+        """
+        Ingest a backlog of prescription texts.
+
+        Small batches are parsed and written in the request; larger ones are
+        queued as chunked Celery tasks and the response lists their task IDs
+        for progress polling. Each prescription succeeds or fails on its own.
+
+        Expected payload:
+        {
+            "prescriptions": [
+                {
+                    "text": "Dr. Smith ... 1. Panado 500mg tablets ...",
+                    "patient_id": 1,
+                    "prescription_number": "RX123456"
+                }
+            ],
+            "chunk_size": 100
+        }
+        """
+        from .prescription_ingestion import PrescriptionBatchIngestion
+        from .tasks import batch_ingest_prescriptions_task
+
+        prescriptions = request.data.get('prescriptions', [])
+        if not prescriptions or not isinstance(prescriptions, list):
+            return Response(
+                {'error': 'No prescriptions provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        options = BatchPrescriptionUploadSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
+
+        try:
+            if len(prescriptions) > self.BATCH_INGESTION_SYNC_LIMIT:
+                chunk_size = options.validated_data['chunk_size']
+                task = batch_ingest_prescriptions_task.delay(prescriptions, request.user.id, chunk_size)
+                return Response(
+                    {'status': 'queued', 'task_id': task.id, 'total': len(prescriptions)},
+                    status=status.HTTP_202_ACCEPTED
+                )
+
+            result = PrescriptionBatchIngestion(workers=0).run(prescriptions, request.user)
+            response_status = status.HTTP_201_CREATED if result['succeeded'] else status.HTTP_400_BAD_REQUEST
+            return Response(result, status=response_status)
+
+        except Exception as e:
+            logger.error(f"Error in batch_prescription_upload: {e}")
+            return Response(
+                {'error': 'Internal server error'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     def _enrich_medication_data(self, med_data):
         """
         Enrich medication data using external APIs (prepare for Perplexity integration).
@@ -1263,6 +1323,42 @@ class MedicationScheduleViewSet(viewsets.ModelViewSet):
             'low_stock_alert': schedule.medication.pill_count <= schedule.medication.low_stock_threshold
         })
 
+    @action(detail=False, methods=['post'])
+    def mark_taken_bulk(self, request):
+        """
+        Mark many scheduled doses as taken in one request.
+        
+        Used by apps syncing doses recorded offline. Every event carries an
+        idempotency key (or one is derived from the schedule and scheduled
+        time), so a batch can be resent safely after a failed sync. Each
+        event gets its own status; a key already used for a different dose
+        is a ``conflict``. The whole batch is rejected with 409 only when a
+        concurrent request records the same key first, and can be resent.
+        """
+        serializer = MarkTakenBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        events = serializer.validated_data['events']
+        
+        schedule_ids = {event['schedule_id'] for event in events}
+        schedules = list(
+            self.get_queryset().filter(id__in=schedule_ids).select_related('medication')
+        )
+        
+        try:
+            results = IntelligentStockService().record_doses_bulk(request.user, schedules, events)
+        except IntegrityError:
+            return Response({
+                'error': 'Conflicting idempotency key',
+                'message': 'An idempotency key in this batch was recorded by a concurrent request; resend the batch'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        recorded = sum(1 for result in results if result['status'] == 'recorded')
+        return Response({
+            'message': f'{recorded} doses marked as taken',
+            'recorded': recorded,
+            'results': results,
+        })
+
     @action(detail=True, methods=['post'])
     def mark_missed(self, request, pk=None):
         """Mark a medication schedule as missed."""
@@ -1554,7 +1650,15 @@ class StockAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StockAnalyticsSerializer
     permission_classes = [permissions.IsAuthenticated]
     
-    @method_decorator(cache_page(60 * 15))  # Cache for 15 minutes
+    DASHBOARD_CACHE_TIMEOUT = 60 * 15
+    # Past expiry the old report is served while one worker rebuilds it
+    DASHBOARD_STALE_TIMEOUT = 60 * 5
+    
+    @staticmethod
+    def get_dashboard_cache_alias():
+        """Use the analytics cache when one is configured and the default cache otherwise."""
+        return 'analytics' if 'analytics' in settings.CACHES else 'default'
+    
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """
@@ -1578,8 +1682,12 @@ class StockAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
                 ).date()
             
             # Generate comprehensive report
-            report = analytics_service.generate_stock_report(
-                start_date, end_date
+            report = read_through(
+                f"stock_dashboard:{start_date.isoformat()}:{end_date.isoformat()}",
+                lambda: analytics_service.generate_stock_report(start_date, end_date),
+                self.DASHBOARD_CACHE_TIMEOUT,
+                cache_alias=self.get_dashboard_cache_alias(),
+                stale_ttl=self.DASHBOARD_STALE_TIMEOUT,
             )
             
             return Response(report)
@@ -0,0 +1,157 @@
+"""
+In-memory drug interaction index.
+
+Every drug and generic name on an active ``DrugInteraction`` is normalized
+to a canonical name with a small integer ID. Each interaction is stored
+under the sorted ``(id, id)`` pair of every name combination across its two
+sides, so checking N medications is one O(N²) pass of dictionary lookups
+without database queries.
+
+Medication names are resolved the way the previous ``icontains`` queries
+matched them: a name matches every canonical name that contains it.
+
+The index is built once per process and rebuilt when the version counter in
+the cache changes; ``signals.py`` bumps it whenever an interaction is saved
+or deleted. Changes that bypass signals (``QuerySet.update``, raw loads)
+are picked up after ``INDEX_MAX_AGE`` seconds.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_CACHE_KEY = 'drug_interactions:index:version'
+INDEX_MAX_AGE = 300
+RESOLVED_NAMES_LIMIT = 4096
+
+
+def normalize_drug_name(name: Optional[str]) -> str:
+    """Canonical form of a drug name: lower case with single spaces."""
+    return ' '.join((name or '').lower().split())
+
+
+class InteractionIndex:
+    """
+    Adjacency index of drug interactions keyed by sorted canonical ID pairs.
+
+    Args:
+        interactions: Active interactions to index
+        version: Cache version the index was built for
+    """
+
+    def __init__(self, interactions: Iterable, version: int = 0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.interactions = list(interactions)
+        self.name_ids: Dict[str, int] = {}
+        self._resolved: Dict[str, Tuple[int, ...]] = {}
+
+        pairs: Dict[Tuple[int, int], List[int]] = {}
+        for position, interaction in enumerate(self.interactions):
+            side_1 = self._side_ids(interaction.drug_name_1, interaction.generic_name_1)
+            side_2 = self._side_ids(interaction.drug_name_2, interaction.generic_name_2)
+            for id_1 in side_1:
+                for id_2 in side_2:
+                    key = (id_1, id_2) if id_1 <= id_2 else (id_2, id_1)
+                    positions = pairs.setdefault(key, [])
+                    if not positions or positions[-1] != position:
+                        positions.append(position)
+
+        self.pairs: Dict[Tuple[int, int], Tuple[int, ...]] = {
+            key: tuple(positions) for key, positions in pairs.items()
+        }
+        self.names = list(self.name_ids)
+
+    def _side_ids(self, drug_name: str, generic_name: str) -> set:
+        ids = set()
+        for name in (drug_name, generic_name):
+            name = normalize_drug_name(name)
+            if name:
+                ids.add(self.name_ids.setdefault(name, len(self.name_ids)))
+        return ids
+
+    def resolve(self, medication: str) -> Tuple[int, ...]:
+        """IDs of every canonical name containing the medication name."""
+        query = normalize_drug_name(medication)
+        ids = self._resolved.get(query)
+        if ids is None:
+            ids = tuple(name_id for name_id, name in enumerate(self.names) if query in name)
+            if len(self._resolved) >= RESOLVED_NAMES_LIMIT:
+                self._resolved.clear()
+            self._resolved[query] = ids
+        return ids
+
+    def find_between(self, drug1: str, drug2: str) -> List:
+        """Interactions between two drugs, most severe first."""
+        return self._between(self.resolve(drug1), self.resolve(drug2))
+
+    def check(self, medications: Sequence[str]) -> List:
+        """Interactions for every pair of medications, in pair order."""
+        resolved = [self.resolve(medication) for medication in medications]
+        found = []
+        for i, ids_1 in enumerate(resolved):
+            if not ids_1:
+                continue
+            for ids_2 in resolved[i + 1:]:
+                if ids_2:
+                    found.extend(self._between(ids_1, ids_2))
+        return found
+
+    def _between(self, ids_1: Tuple[int, ...], ids_2: Tuple[int, ...]) -> List:
+        pairs = self.pairs
+        positions = set()
+        for id_1 in ids_1:
+            for id_2 in ids_2:
+                match = pairs.get((id_1, id_2) if id_1 <= id_2 else (id_2, id_1))
+                if match:
+                    positions.update(match)
+        if not positions:
+            return []
+
+        # Ordered like the per-pair queries' order_by('-severity')
+        interactions = [self.interactions[position] for position in sorted(positions)]
+        interactions.sort(key=lambda interaction: interaction.severity, reverse=True)
+        return interactions
+
+
+_interaction_index: Optional[InteractionIndex] = None
+_interaction_index_lock = threading.Lock()
+
+
+def get_interaction_index() -> InteractionIndex:
+    """Get this process's interaction index, rebuilding it when stale."""
+    global _interaction_index
+    version = cache.get(INDEX_VERSION_CACHE_KEY, 0)
+    index = _interaction_index
+    if index is not None and index.version == version and time.monotonic() - index.built_at < INDEX_MAX_AGE:
+        return index
+
+    with _interaction_index_lock:
+        index = _interaction_index
+        if index is None or index.version != version or time.monotonic() - index.built_at >= INDEX_MAX_AGE:
+            from .models import DrugInteraction
+
+            index = InteractionIndex(DrugInteraction.objects.filter(is_active=True).order_by('pk'), version)
+            _interaction_index = index
+            logger.info(
+                f"Built drug interaction index: {len(index.interactions)} interactions, "
+                f"{len(index.names)} names, {len(index.pairs)} pairs"
+            )
+    return index
+
+
+def invalidate_interaction_index():
+    """Make every process rebuild its index once the current transaction commits."""
+    def bump_version():
+        if not cache.add(INDEX_VERSION_CACHE_KEY, 1, None):
+            try:
+                cache.incr(INDEX_VERSION_CACHE_KEY)
+            except ValueError:
+                cache.set(INDEX_VERSION_CACHE_KEY, 1, None)
+
+    transaction.on_commit(bump_version)
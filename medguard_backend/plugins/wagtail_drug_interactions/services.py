@@ -10,6 +10,7 @@ from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
+from .interaction_index import get_interaction_index
 from .models import DrugInteraction, InteractionCheck, DrugAllergy, InteractionSeverity
 
 logger = logging.getLogger(__name__)
@@ -50,14 +51,10 @@ class DrugInteractionService:
         start_time = timezone.now()
         
         try:
-            interactions_found = []
             allergy_alerts = []
             
-            # Check drug-drug interactions
-            for i, med1 in enumerate(medications):
-                for med2 in medications[i+1:]:
-                    interactions = self._find_interactions_between_drugs(med1, med2)
-                    interactions_found.extend(interactions)
+            # Check drug-drug interactions against the in-memory index
+            interactions_found = get_interaction_index().check(medications)
             
             # Check for drug allergies if patient provided
             if include_allergies and patient_id:
@@ -150,19 +147,7 @@ class DrugInteractionService:
     
     def _find_interactions_between_drugs(self, drug1: str, drug2: str) -> List[DrugInteraction]:
         """Find interactions between two specific drugs."""
-        interactions = DrugInteraction.objects.filter(
-            Q(
-                (Q(drug_name_1__icontains=drug1) | Q(generic_name_1__icontains=drug1)) &
-                (Q(drug_name_2__icontains=drug2) | Q(generic_name_2__icontains=drug2))
-            ) |
-            Q(
-                (Q(drug_name_1__icontains=drug2) | Q(generic_name_1__icontains=drug2)) &
-                (Q(drug_name_2__icontains=drug1) | Q(generic_name_2__icontains=drug1))
-            ),
-            is_active=True
-        ).order_by('-severity')
-        
-        return list(interactions)
+        return get_interaction_index().find_between(drug1, drug2)
     
     def _check_drug_allergies(self, medications: List[str], patient_id: int) -> List[DrugAllergy]:
         """Check for drug allergies for a specific patient."""
@@ -3,9 +3,10 @@ Django Signals for Drug Interactions Plugin
 Signal handlers for interaction and allergy events.
 """
 import logging
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from .interaction_index import invalidate_interaction_index
 from .models import DrugInteraction, InteractionCheck, DrugAllergy
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,13 @@ def handle_interaction_created(sender, instance, created, **kwargs):
         logger.info(f"New drug interaction created: {instance.drug_name_1} + {instance.drug_name_2}")
 
 
+@receiver(post_save, sender=DrugInteraction)
+@receiver(post_delete, sender=DrugInteraction)
+def rebuild_interaction_index(sender, instance, **kwargs):
+    """Rebuild the in-memory interaction index after interactions change."""
+    invalidate_interaction_index()
+
+
 @receiver(post_save, sender=InteractionCheck)
 def handle_interaction_check_completed(sender, instance, created, **kwargs):
     """Handle completed interaction checks."""
@@ -3,9 +3,11 @@ Prescription OCR Services
 Core OCR processing services for prescription image analysis.
 """
 import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 from django.conf import settings
 from django.utils.translation import gettext as _
 from PIL import Image as PILImage
@@ -15,6 +17,55 @@ from .models import PrescriptionOCRResult, OCRTemplate
 logger = logging.getLogger(__name__)
 
 
+def preprocess_image(image: PILImage) -> PILImage:
+    """
+    Preprocess image to improve OCR accuracy.
+    
+    Args:
+        image: PIL Image object
+        
+    Returns:
+        Preprocessed PIL Image
+    """
+    # Convert to grayscale
+    if image.mode != 'L':
+        image = image.convert('L')
+    
+    # Resize if too small
+    width, height = image.size
+    if width < 800 or height < 600:
+        scale_factor = max(800 / width, 600 / height)
+        new_size = (int(width * scale_factor), int(height * scale_factor))
+        image = image.resize(new_size, PILImage.LANCZOS)
+    
+    return image
+
+
+def extract_image_text(image_path: str, tesseract_config: str) -> Tuple[str, Dict]:
+    """
+    Preprocess an image and run OCR on it.
+    
+    Needs no database access, so it can run in a worker process.
+    
+    Returns:
+        Tuple of extracted text and pytesseract confidence data
+    """
+    with PILImage.open(image_path) as image:
+        processed_image = preprocess_image(image)
+    
+    extracted_text = pytesseract.image_to_string(processed_image, config=tesseract_config)
+    confidence_data = pytesseract.image_to_data(processed_image, output_type=pytesseract.Output.DICT)
+    return extracted_text, {'conf': confidence_data['conf']}
+
+
+def _extract_image_text_safely(image_path: str, tesseract_config: str) -> Tuple[str, Optional[Dict], Optional[str]]:
+    """Run ``extract_image_text``, returning (text, confidence data, error)."""
+    try:
+        return (*extract_image_text(image_path, tesseract_config), None)
+    except Exception as e:
+        return '', None, str(e)
+
+
 class PrescriptionOCRService:
     """Service for processing prescription images with OCR."""
     
@@ -42,70 +93,80 @@ class PrescriptionOCRService:
             Dictionary containing extracted data and confidence scores
         """
         try:
-            # Load and preprocess image
-            image = PILImage.open(image_path)
-            processed_image = self._preprocess_image(image)
-            
-            # Extract text using OCR
-            extracted_text = pytesseract.image_to_string(
-                processed_image, 
-                config=self.tesseract_config
-            )
-            
-            # Get confidence score
-            confidence_data = pytesseract.image_to_data(
-                processed_image, 
-                output_type=pytesseract.Output.DICT
-            )
-            confidence_score = self._calculate_confidence(confidence_data)
-            
-            # Parse extracted text
-            parsed_data = self._parse_prescription_text(
-                extracted_text, 
-                template_id
-            )
-            
-            return {
-                'success': True,
-                'extracted_text': extracted_text,
-                'confidence_score': confidence_score,
-                'parsed_data': parsed_data,
-                'processing_time': datetime.now()
-            }
+            # Load and preprocess image, then extract text using OCR
+            extracted_text, confidence_data = extract_image_text(image_path, self.tesseract_config)
+            return self._build_result(extracted_text, confidence_data, template_id)
             
         except Exception as e:
             logger.error(f"OCR processing failed: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e),
-                'extracted_text': '',
-                'confidence_score': 0.0,
-                'parsed_data': {},
-                'processing_time': datetime.now()
-            }
+            return self._failed_result(str(e))
     
-    def _preprocess_image(self, image: PILImage) -> PILImage:
+    def process_prescription_images(
+        self,
+        image_paths: Sequence[str],
+        template_id: Optional[int] = None,
+        workers: Optional[int] = None
+    ) -> List[Dict]:
         """
-        Preprocess image to improve OCR accuracy.
+        Process a batch of prescription images.
+        
+        Preprocessing and OCR run in a process pool; parsing, which may
+        read the OCR template, runs here. A failing image only fails its
+        own result.
         
         Args:
-            image: PIL Image object
+            image_paths: Paths to the prescription images
+            template_id: Optional OCR template ID for better accuracy
+            workers: Worker processes; 0 processes the images in this process
             
         Returns:
-            Preprocessed PIL Image
+            One result dictionary per image, in order
         """
-        # Convert to grayscale
-        if image.mode != 'L':
-            image = image.convert('L')
+        if workers is None:
+            workers = min(4, os.cpu_count() or 1)
+        configs = [self.tesseract_config] * len(image_paths)
         
-        # Resize if too small
-        width, height = image.size
-        if width < 800 or height < 600:
-            scale_factor = max(800 / width, 600 / height)
-            new_size = (int(width * scale_factor), int(height * scale_factor))
-            image = image.resize(new_size, PILImage.LANCZOS)
+        if workers > 0 and len(image_paths) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                extracted = list(pool.map(_extract_image_text_safely, image_paths, configs))
+        else:
+            extracted = list(map(_extract_image_text_safely, image_paths, configs))
         
-        return image
+        results = []
+        for image_path, (extracted_text, confidence_data, error) in zip(image_paths, extracted):
+            if error is not None:
+                logger.error(f"OCR processing failed for {image_path}: {error}")
+                results.append(self._failed_result(error))
+                continue
+            try:
+                results.append(self._build_result(extracted_text, confidence_data, template_id))
+            except Exception as e:
+                logger.error(f"OCR parsing failed for {image_path}: {str(e)}")
+                results.append(self._failed_result(str(e)))
+        return results
+    
+    def _build_result(self, extracted_text: str, confidence_data: Dict, template_id: Optional[int]) -> Dict:
+        return {
+            'success': True,
+            'extracted_text': extracted_text,
+            'confidence_score': self._calculate_confidence(confidence_data),
+            'parsed_data': self._parse_prescription_text(extracted_text, template_id),
+            'processing_time': datetime.now()
+        }
+    
+    def _failed_result(self, error: str) -> Dict:
+        return {
+            'success': False,
+            'error': error,
+            'extracted_text': '',
+            'confidence_score': 0.0,
+            'parsed_data': {},
+            'processing_time': datetime.now()
+        }
+    
+    def _preprocess_image(self, image: PILImage) -> PILImage:
+        """Preprocess image to improve OCR accuracy."""
+        return preprocess_image(image)
     
     def _calculate_confidence(self, confidence_data: Dict) -> float:
         """
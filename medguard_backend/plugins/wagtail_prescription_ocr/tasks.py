@@ -3,8 +3,9 @@ Celery Tasks for Prescription OCR Plugin
 Background tasks for OCR processing and image analysis.
 """
 import logging
-from celery import shared_task
+from celery import group, shared_task
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 from wagtailimages.models import Image
 
@@ -122,37 +123,153 @@ def send_low_confidence_notification(ocr_result_id, user_id):
         logger.error(f"Failed to send low confidence notification: {e}")
 
 
+def _write_ocr_results(records):
+    """
+    Write OCR results in bulk, falling back to one savepoint per image.
+    
+    Args:
+        records: (image_id, PrescriptionOCRResult) pairs to insert
+    
+    Returns:
+        dict: Error message by image ID for the results that were not written
+    """
+    if not records:
+        return {}
+    try:
+        with transaction.atomic():
+            PrescriptionOCRResult.objects.bulk_create([ocr_result for _, ocr_result in records])
+        return {}
+    except Exception as e:
+        if len(records) == 1:
+            image_id = records[0][0]
+            logger.error(f"Error writing OCR result for image {image_id}: {e}")
+            return {image_id: str(e)}
+        logger.warning(f"Bulk write of {len(records)} OCR results failed, writing them one by one: {e}")
+    
+    errors = {}
+    for record in records:
+        errors.update(_write_ocr_results([record]))
+    return errors
+
+
+@shared_task(bind=True, max_retries=3)
+def process_prescription_ocr_batch(self, image_ids, user_id, template_id=None):
+    """
+    Process a chunk of prescription images in one task.
+    
+    Preprocessing and OCR run in the worker process itself, since prefork
+    workers are daemonic and cannot start a pool; chunks run in parallel as
+    a Celery group. The results are written with one bulk insert, retried
+    one image per savepoint if it fails, so each image succeeds or fails on
+    its own. The chunk is retried if loading or OCR fails as a whole.
+    
+    Args:
+        image_ids: IDs of the images to process
+        user_id: ID of the user who initiated the processing
+        template_id: Optional OCR template ID
+    """
+    try:
+        user = User.objects.get(id=user_id)
+    except User.DoesNotExist:
+        logger.error(f"User {user_id} not found")
+        return [{'image_id': image_id, 'success': False, 'error': 'User not found'} for image_id in image_ids]
+    
+    try:
+        images = Image.objects.in_bulk(image_ids)
+        found = [image_id for image_id in image_ids if image_id in images]
+        self.update_state(state='PROGRESS', meta={'processed': 0, 'total': len(image_ids)})
+        
+        ocr_service = PrescriptionOCRService()
+        ocr_results = ocr_service.process_prescription_images(
+            [images[image_id].file.path for image_id in found],
+            template_id=template_id,
+            workers=0
+        )
+    except Exception as exc:
+        logger.error(f"OCR batch processing failed with exception: {exc}")
+        
+        # Retry the chunk; nothing has been written yet
+        if self.request.retries < self.max_retries:
+            logger.info(f"Retrying OCR processing for {len(image_ids)} images")
+            raise self.retry(countdown=60, exc=exc)
+        
+        return [{'image_id': image_id, 'success': False, 'error': str(exc)} for image_id in image_ids]
+    
+    records, results = [], {}
+    for image_id, result in zip(found, ocr_results):
+        if not result['success']:
+            logger.error(f"OCR processing failed for image {image_id}: {result['error']}")
+            results[image_id] = {'image_id': image_id, 'success': False, 'error': result['error']}
+            continue
+        try:
+            records.append((image_id, PrescriptionOCRResult(
+                prescription_image=images[image_id],
+                extracted_text=result['extracted_text'],
+                confidence_score=result['confidence_score'],
+                processed_by=user,
+                **result['parsed_data']
+            )))
+        except Exception as e:
+            logger.error(f"Invalid OCR result for image {image_id}: {e}")
+            results[image_id] = {'image_id': image_id, 'success': False, 'error': str(e)}
+    
+    errors = _write_ocr_results(records)
+    written = 0
+    for image_id, ocr_result in records:
+        if image_id in errors:
+            results[image_id] = {'image_id': image_id, 'success': False, 'error': errors[image_id]}
+            continue
+        written += 1
+        results[image_id] = {
+            'image_id': image_id,
+            'success': True,
+            'ocr_result_id': str(ocr_result.id),
+            'confidence_score': ocr_result.confidence_score
+        }
+        # Send notification if confidence is low
+        if ocr_result.confidence_score < 0.7:
+            send_low_confidence_notification.delay(ocr_result.id, user_id)
+    
+    logger.info(f"OCR batch processed {written} of {len(image_ids)} images")
+    return [
+        results.get(image_id, {'image_id': image_id, 'success': False, 'error': 'Image not found'})
+        for image_id in image_ids
+    ]
+
+
 @shared_task
-def batch_process_prescriptions(image_ids, user_id, template_id=None):
+def batch_process_prescriptions(image_ids, user_id, template_id=None, chunk_size=20):
     """
     Process multiple prescription images in batch.
     
+    The images are split into chunks processed as a group of
+    ``process_prescription_ocr_batch`` tasks, so a large backlog is spread
+    over every Celery worker process, one chunk per process at a time.
+    
     Args:
         image_ids: List of image IDs to process
         user_id: ID of the user who initiated the processing
         template_id: Optional OCR template ID
+        chunk_size: Images per chunk task
     """
-    results = []
+    chunks = [image_ids[offset:offset + chunk_size] for offset in range(0, len(image_ids), chunk_size)]
     
-    for image_id in image_ids:
-        try:
-            result = process_prescription_ocr_async.apply_async(
-                args=[image_id, user_id, template_id]
-            )
-            results.append({
-                'image_id': image_id,
-                'task_id': result.id,
-                'status': 'queued'
-            })
-        except Exception as e:
-            logger.error(f"Failed to queue OCR processing for image {image_id}: {e}")
-            results.append({
-                'image_id': image_id,
-                'status': 'failed',
-                'error': str(e)
-            })
+    try:
+        group_result = group(
+            process_prescription_ocr_batch.s(chunk, user_id, template_id) for chunk in chunks
+        ).apply_async()
+    except Exception as e:
+        logger.error(f"Failed to queue OCR batch processing: {e}")
+        return [
+            {'image_id': image_id, 'status': 'failed', 'error': str(e)}
+            for image_id in image_ids
+        ]
     
-    return results
+    return [
+        {'image_id': image_id, 'task_id': result.id, 'status': 'queued'}
+        for chunk, result in zip(chunks, group_result.results)
+        for image_id in chunk
+    ]
 
 
 @shared_task
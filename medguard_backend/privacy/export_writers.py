@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+MedGuard SA - Data Export Writers
+
+Streaming file writers for the data export engine. Each writer takes the
+export metadata, the patient information and an iterable of
+``(model_path, model_name, records)`` and writes records to disk as they
+are produced, hashing and counting the bytes on their way to the file.
+
+The writers do not touch the database or the privacy models, so they can
+be used (and tested) on their own.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import zipfile
+from contextlib import contextmanager
+from html import escape
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+from xml.sax.saxutils import XMLGenerator
+
+# Bytes buffered before a write reaches the export file
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+ModelExports = Iterable[Tuple[str, str, Iterator[Dict[str, Any]]]]
+
+
+class HashingWriter(io.RawIOBase):
+    """
+    Binary stream that hashes and counts bytes on their way to a file.
+
+    It is deliberately unseekable, so ZipFile writes entries sequentially
+    with data descriptors instead of seeking back to patch headers, and
+    the running hash matches the finished file.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        written = self.raw.write(data)
+        self.sha256.update(data)
+        self.size += written
+        return written
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self):
+        self.raw.flush()
+
+
+@contextmanager
+def hashed_file(file_path: str) -> Iterator[HashingWriter]:
+    """Open an export file whose SHA-256 hash and size are taken while writing."""
+    with open(file_path, 'wb') as raw:
+        yield HashingWriter(raw)
+
+
+@contextmanager
+def text_stream(output: HashingWriter) -> Iterator[io.TextIOWrapper]:
+    """Open a buffered UTF-8 text stream over a hashed export file."""
+    stream = io.TextIOWrapper(
+        io.BufferedWriter(output, buffer_size=EXPORT_BUFFER_SIZE), encoding='utf-8', newline=''
+    )
+    yield stream
+    stream.flush()
+    stream.detach().detach()
+
+
+def write_json_export(file_path: str, metadata: Dict[str, Any], patient_info: Dict[str, Any],
+                      model_exports: ModelExports) -> Tuple[str, int]:
+    """
+    Write a JSON export, writing records as they are read.
+
+    Returns:
+        SHA-256 hex digest and size in bytes of the written file
+    """
+    def dump(value, level=0):
+        # Same layout as json.dump(indent=2), nested `level` objects deep
+        return json.dumps(value, indent=2, ensure_ascii=False, default=str).replace('\n', '\n' + '  ' * level)
+
+    with hashed_file(file_path) as output, text_stream(output) as stream:
+        stream.write(f'{{\n  "metadata": {dump(metadata, 1)},\n')
+        stream.write(f'  "patient_info": {dump(patient_info, 1)},\n')
+        stream.write('  "models": {')
+
+        model_separator = '\n'
+        for model_path, model_name, records in model_exports:
+            stream.write(f'{model_separator}    {dump(model_path)}: {{\n')
+            stream.write(f'      "model_name": {dump(model_name)},\n      "records": [')
+            count = 0
+            for count, record in enumerate(records, 1):
+                stream.write(f'{"," if count > 1 else ""}\n        {dump(record, 4)}')
+            # The count follows the records since it is only known once they are written
+            stream.write(f'\n      ],\n      "count": {count}\n    }}')
+            model_separator = ',\n'
+
+        stream.write('\n  }\n}' if model_separator != '\n' else '}\n}')
+
+    return output.sha256.hexdigest(), output.size
+
+
+def write_ndjson_export(file_path: str, metadata: Dict[str, Any], patient_info: Dict[str, Any],
+                        model_exports: ModelExports) -> Tuple[str, int]:
+    """
+    Write a newline-delimited JSON export with one record per line.
+
+    Each model's records are followed by a ``model`` line with their count.
+
+    Returns:
+        SHA-256 hex digest and size in bytes of the written file
+    """
+    def line(entry):
+        return json.dumps(entry, ensure_ascii=False, default=str, separators=(',', ':')) + '\n'
+
+    with hashed_file(file_path) as output, text_stream(output) as stream:
+        stream.write(line({'type': 'metadata', 'data': metadata}))
+        stream.write(line({'type': 'patient_info', 'data': patient_info}))
+
+        for model_path, model_name, records in model_exports:
+            count = 0
+            for count, record in enumerate(records, 1):
+                stream.write(line({'type': 'record', 'model': model_path, 'data': record}))
+            stream.write(line({'type': 'model', 'model': model_path, 'model_name': model_name, 'count': count}))
+
+    return output.sha256.hexdigest(), output.size
+
+
+@contextmanager
+def zip_text_entry(zipf: zipfile.ZipFile, name: str) -> Iterator[io.TextIOWrapper]:
+    """Open a UTF-8 text stream onto a new ZIP entry of unknown size."""
+    with io.TextIOWrapper(zipf.open(name, 'w', force_zip64=True), encoding='utf-8', newline='') as stream:
+        yield stream
+
+
+def write_csv_export(file_path: str, metadata: Dict[str, Any], patient_info: Dict[str, Any],
+                     model_exports: ModelExports) -> Tuple[str, int]:
+    """
+    Write a CSV export as a ZIP file with one CSV file per section and model.
+
+    Returns:
+        SHA-256 hex digest and size in bytes of the written file
+    """
+    with hashed_file(file_path) as output, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        # Add metadata file
+        with zip_text_entry(zipf, 'metadata.csv') as metadata_csv:
+            metadata_writer = csv.writer(metadata_csv)
+            metadata_writer.writerow(['Key', 'Value'])
+
+            for key, value in metadata.items():
+                if isinstance(value, dict):
+                    for sub_key, sub_value in value.items():
+                        metadata_writer.writerow([f"{key}.{sub_key}", sub_value])
+                else:
+                    metadata_writer.writerow([key, value])
+
+        # Add patient info
+        with zip_text_entry(zipf, 'patient_info.csv') as patient_csv:
+            patient_writer = csv.writer(patient_csv)
+            patient_writer.writerow(patient_info.keys())
+            patient_writer.writerow(patient_info.values())
+
+        # Add model data
+        for model_path, model_name, records in model_exports:
+            with zip_text_entry(zipf, f"{model_name}.csv") as model_csv:
+                model_writer = csv.writer(model_csv)
+
+                headers = None
+                for record in records:
+                    if headers is None:
+                        # Write headers
+                        headers = list(record.keys())
+                        model_writer.writerow(headers)
+
+                    model_writer.writerow([record.get(h, '') for h in headers])
+
+    return output.sha256.hexdigest(), output.size
+
+
+def write_xml_export(file_path: str, metadata: Dict[str, Any], patient_info: Dict[str, Any],
+                     model_exports: ModelExports) -> Tuple[str, int]:
+    """
+    Write an XML export, writing records as they are read.
+
+    Returns:
+        SHA-256 hex digest and size in bytes of the written file
+    """
+    with hashed_file(file_path) as output, text_stream(output) as stream:
+        xml = XMLGenerator(stream, encoding='utf-8', short_empty_elements=True)
+
+        def element(name, text):
+            xml.startElement(name, {})
+            xml.characters(text)
+            xml.endElement(name)
+
+        xml.startDocument()
+        xml.startElement('DataExport', {})
+
+        # Add metadata
+        xml.startElement('Metadata', {})
+        for key, value in metadata.items():
+            if isinstance(value, dict):
+                xml.startElement(key, {})
+                for sub_key, sub_value in value.items():
+                    element(sub_key, str(sub_value))
+                xml.endElement(key)
+            else:
+                element(key, str(value))
+        xml.endElement('Metadata')
+
+        # Add patient info
+        xml.startElement('PatientInfo', {})
+        for key, value in patient_info.items():
+            element(key, str(value))
+        xml.endElement('PatientInfo')
+
+        # Add model data
+        xml.startElement('Models', {})
+        for model_path, model_name, records in model_exports:
+            xml.startElement('Model', {'name': model_name})
+            xml.startElement('Records', {})
+            count = 0
+            for count, record in enumerate(records, 1):
+                xml.startElement('Record', {})
+                for key, value in record.items():
+                    element(key, str(value) if value is not None else '')
+                xml.endElement('Record')
+            xml.endElement('Records')
+            # The count follows the records since it is only known once they are written
+            element('Count', str(count))
+            xml.endElement('Model')
+        xml.endElement('Models')
+
+        xml.endElement('DataExport')
+        xml.endDocument()
+
+    return output.sha256.hexdigest(), output.size
+
+
+def write_html_export(file_path: str, metadata: Dict[str, Any], patient_info: Dict[str, Any],
+                      model_exports: ModelExports) -> Tuple[str, int]:
+    """
+    Write an HTML report, writing table rows as they are read.
+
+    Returns:
+        SHA-256 hex digest and size in bytes of the written file
+    """
+    with hashed_file(file_path) as output, text_stream(output) as stream:
+        stream.write('<!DOCTYPE html>')
+        stream.write('<html><head><meta charset="utf-8">')
+        stream.write('<title>Data Export Report</title>')
+        stream.write('<style>body{font-family:Arial,sans-serif;margin:40px;}</style>')
+        stream.write('</head><body>')
+
+        stream.write('<h1>Personal Data Export Report</h1>')
+
+        # Metadata
+        stream.write('<h2>Export Information</h2>')
+        stream.write('<table border="1" cellpadding="5">')
+        for key, value in metadata.items():
+            if isinstance(value, dict):
+                value = json.dumps(value, indent=2)
+            stream.write(f'<tr><td><strong>{escape(str(key))}</strong></td><td>{escape(str(value))}</td></tr>')
+        stream.write('</table>')
+
+        # Patient info
+        stream.write('<h2>Personal Information</h2>')
+        stream.write('<table border="1" cellpadding="5">')
+        for key, value in patient_info.items():
+            stream.write(f'<tr><td><strong>{escape(str(key))}</strong></td><td>{escape(str(value))}</td></tr>')
+        stream.write('</table>')
+
+        # Model data
+        for model_path, model_name, records in model_exports:
+            stream.write(f'<h2>{escape(model_name)}</h2>')
+            stream.write('<table border="1" cellpadding="5">')
+
+            headers = None
+            count = 0
+            for count, record in enumerate(records, 1):
+                if headers is None:
+                    # Headers
+                    headers = list(record.keys())
+                    stream.write('<tr>')
+                    for header in headers:
+                        stream.write(f'<th>{escape(header)}</th>')
+                    stream.write('</tr>')
+
+                # Data rows
+                stream.write('<tr>')
+                for header in headers:
+                    stream.write(f'<td>{escape(str(record.get(header, "")))}</td>')
+                stream.write('</tr>')
+
+            stream.write('</table>')
+            stream.write(f'<p>{count} records</p>')
+
+        stream.write('</body></html>')
+
+    return output.sha256.hexdigest(), output.size
+
+
+# Export format -> (file extension, writer)
+EXPORT_WRITERS: Dict[str, Tuple[str, Callable[..., Tuple[str, int]]]] = {
+    'json': ('json', write_json_export),
+    'ndjson': ('ndjson', write_ndjson_export),
+    'csv': ('zip', write_csv_export),
+    'xml': ('xml', write_xml_export),
+    'html': ('html', write_html_export),
+}
@@ -6,6 +6,7 @@ Implements privacy-aware search functionality that respects patient data restric
 and compliance requirements while providing comprehensive audit trails.
 """
 
+import hashlib
 import time
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
@@ -13,8 +14,11 @@ import logging
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import Q, Avg
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Q, Avg, Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
@@ -22,14 +26,19 @@ from django.core.exceptions import ValidationError
 from wagtail.models import Page
 from wagtail.admin.panels import FieldPanel, MultiFieldPanel
 from wagtail.snippets.models import register_snippet
+from wagtail.search import index
 from wagtail.search.backends import get_search_backend
 from wagtail.search.models import Query
 
+from .search_rules import CompiledSearchRules, compile_search_rules, condition_q
 from .wagtail_privacy import AnonymizationProfile, DataAnonymizer, ConsentManager
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Results returned per model and page of a privacy-aware search
+SEARCH_PAGE_SIZE = 50
+
 
 @register_snippet
 class SearchPrivacyRule(models.Model):
@@ -201,6 +210,20 @@ class SearchPrivacyRule(models.Model):
         return True
 
 
+@receiver([post_save, post_delete], sender=SearchPrivacyRule)
+def invalidate_compiled_search_rules(sender, **kwargs):
+    """Retire cached compiled rules once a rule change is committed."""
+    def bump_version():
+        key = PrivacyAwareSearchBackend.RULES_VERSION_CACHE_KEY
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+    
+    transaction.on_commit(bump_version)
+
+
 class SearchAuditLog(models.Model):
     """
     Audit log for privacy-aware search operations.
@@ -337,9 +360,14 @@ class PrivacyAwareSearchBackend:
     Privacy-aware search backend that applies privacy rules to search operations.
     
     Wraps the default Wagtail search backend to add privacy filtering,
-    anonymization, and audit logging.
+    anonymization, and audit logging. Privacy rules are compiled once per
+    user role and model, and evaluated inside the search query so only the
+    requested page of results is loaded.
     """
     
+    RULES_CACHE_TIMEOUT = 60 * 60
+    RULES_VERSION_CACHE_KEY = 'privacy_search:rules:version'
+    
     def __init__(self, user: User, search_purpose: str = "", ip_address: str = "", user_agent: str = ""):
         """Initialize the privacy-aware search backend."""
         self.user = user
@@ -349,7 +377,14 @@ class PrivacyAwareSearchBackend:
         self.backend = get_search_backend()
         
     def search(self, query: str, model_classes: List = None, **kwargs) -> Dict[str, Any]:
-        """Perform privacy-aware search across specified models."""
+        """
+        Perform privacy-aware search across specified models.
+        
+        Accepts ``page`` and ``page_size`` to select the page of results
+        returned per model, and ``filters`` to narrow the searched records.
+        Filtered searches use the ORM search for every model, so the counts
+        only cover records matching the filters.
+        """
         start_time = time.time()
         
         # Create audit log entry
@@ -365,16 +400,21 @@ class PrivacyAwareSearchBackend:
         
         try:
             # Get applicable privacy rules
-            privacy_rules = self._get_applicable_privacy_rules(model_classes)
+            compiled_rules = {
+                self._model_path(model_class): self._get_compiled_rules(model_class)
+                for model_class in (model_classes or [])
+            }
             
             # Perform search with privacy filtering
             search_results = self._execute_privacy_filtered_search(
-                query, model_classes, privacy_rules, **kwargs
+                query, model_classes, compiled_rules, **kwargs
             )
             
             # Update audit log with results
             execution_time = int((time.time() - start_time) * 1000)
-            audit_log.privacy_rules_applied = [rule.name for rule in privacy_rules]
+            audit_log.privacy_rules_applied = list(dict.fromkeys(
+                name for rules in compiled_rules.values() for name in rules.rule_names
+            ))
             audit_log.results_count = search_results['total_results']
             audit_log.filtered_results_count = search_results['accessible_results']
             audit_log.anonymized_results_count = search_results['anonymized_results']
@@ -395,30 +435,33 @@ class PrivacyAwareSearchBackend:
             audit_log.save()
             raise
     
-    def _get_applicable_privacy_rules(self, model_classes: List) -> List[SearchPrivacyRule]:
-        """Get privacy rules applicable to the search."""
-        if not model_classes:
-            return []
-        
-        model_paths = [f"{m._meta.app_label}.{m._meta.model_name}" for m in model_classes]
-        
-        rules = SearchPrivacyRule.objects.filter(
-            is_active=True
-        ).order_by('priority')
-        
-        applicable_rules = []
-        for rule in rules:
-            if any(rule.applies_to_model(path) for path in model_paths):
-                if rule.applies_to_user(self.user):
-                    applicable_rules.append(rule)
-        
-        return applicable_rules
+    @staticmethod
+    def _model_path(model_class) -> str:
+        return f"{model_class._meta.app_label}.{model_class._meta.model_name}"
+    
+    def _get_compiled_rules(self, model_class) -> CompiledSearchRules:
+        """Get the compiled privacy rules for a model, cached per user role."""
+        roles = sorted(getattr(self.user, 'roles', None) or [])
+        role_key = hashlib.sha256(','.join(roles).encode()).hexdigest()[:16]
+        version = cache.get(self.RULES_VERSION_CACHE_KEY, 0)
+        cache_key = f"privacy_search:compiled_rules:{version}:{role_key}:{self._model_path(model_class)}"
+        
+        compiled = cache.get(cache_key)
+        if compiled is None:
+            compiled = self._compile_rules(model_class)
+            cache.set(cache_key, compiled, self.RULES_CACHE_TIMEOUT)
+        return compiled
+    
+    def _compile_rules(self, model_class) -> CompiledSearchRules:
+        """Reduce the active rules that apply to a model and this user."""
+        rules = SearchPrivacyRule.objects.filter(is_active=True).order_by('priority')
+        return compile_search_rules(rules, self._model_path(model_class), self.user)
     
     def _execute_privacy_filtered_search(
         self, 
         query: str, 
         model_classes: List, 
-        privacy_rules: List[SearchPrivacyRule], 
+        compiled_rules: Dict[str, CompiledSearchRules], 
         **kwargs
     ) -> Dict[str, Any]:
         """Execute search with privacy filtering applied."""
@@ -437,15 +480,12 @@ class PrivacyAwareSearchBackend:
             return search_results
         
         for model_class in model_classes:
-            model_path = f"{model_class._meta.app_label}.{model_class._meta.model_name}"
+            model_path = self._model_path(model_class)
             
             try:
-                # Get model-specific privacy rules
-                model_rules = [rule for rule in privacy_rules if rule.applies_to_model(model_path)]
-                
                 # Execute search for this model
                 model_results = self._search_model_with_privacy(
-                    query, model_class, model_rules, **kwargs
+                    query, model_class, compiled_rules[model_path], **kwargs
                 )
                 
                 search_results['results'][model_path] = model_results
@@ -467,63 +507,137 @@ class PrivacyAwareSearchBackend:
         self, 
         query: str, 
         model_class, 
-        privacy_rules: List[SearchPrivacyRule], 
+        rules: CompiledSearchRules, 
+        page: int = 1,
+        page_size: int = SEARCH_PAGE_SIZE,
+        filters: Optional[Dict[str, Any]] = None,
         **kwargs
     ) -> Dict[str, Any]:
-        """Search a specific model with privacy rules applied."""
+        """Search a specific model with privacy rules applied, returning one page."""
         
         model_results = {
-            'model': f"{model_class._meta.app_label}.{model_class._meta.model_name}",
+            'model': self._model_path(model_class),
             'total_count': 0,
             'accessible_count': 0,
             'anonymized_count': 0,
             'denied_count': 0,
+            'count_estimated': False,
+            'page': page,
+            'page_size': page_size,
             'results': [],
             'privacy_summary': {}
         }
         
         # Check if model search is completely blocked
-        blocking_rules = [rule for rule in privacy_rules if rule.restriction_level == 'no_access']
-        if blocking_rules:
-            model_results['privacy_summary']['blocked_by'] = [rule.name for rule in blocking_rules]
+        now = timezone.now()
+        blocked_by = rules.blocked_by + [
+            condition['rule'] for condition in rules.conditions
+            if condition['business_hours_only'] and not self._within_business_hours(now)
+        ]
+        if blocked_by:
+            model_results['privacy_summary']['blocked_by'] = blocked_by
             return model_results
         
+        access_q = Q()
+        for condition in rules.conditions:
+            access_q &= condition_q(model_class, condition, now)
+        
+        # Accessible objects failing a conditional anonymized_only rule are anonymized
+        anonymize_all = rules.anonymize or any(
+            condition['business_hours_only'] and not self._within_business_hours(now)
+            for condition in rules.anonymize_conditions
+        )
+        anonymize_conditional = not anonymize_all and bool(rules.anonymize_conditions)
+        clear_q = Q()
+        for condition in rules.anonymize_conditions:
+            clear_q &= condition_q(model_class, condition, now)
+        offset = (max(page, 1) - 1) * page_size
+        
         # Perform the actual search
         try:
-            # Use Wagtail search or Django ORM based on model type
-            if hasattr(model_class, 'search'):
-                # Wagtail search
+            # Use Wagtail search or Django ORM based on model type; filtered
+            # searches use the ORM so the filters apply before counting
+            if hasattr(model_class, 'search') and not filters:
+                # Wagtail search: results can only be checked a page at a time
                 search_queryset = model_class.search(query)
+                total_count = search_queryset.count()
+                page_objects = list(search_queryset[offset:offset + page_size])
+                
+                accessible_pks = set(model_class.objects.filter(
+                    access_q, pk__in=[obj.pk for obj in page_objects]
+                ).values_list('pk', flat=True))
+                page_objects = [obj for obj in page_objects if obj.pk in accessible_pks]
+                
+                # Estimate access across all matches from the page that was checked
+                checked = min(page_size, max(total_count - offset, 0))
+                accessible_count = total_count
+                if checked and len(accessible_pks) < checked:
+                    accessible_count = round(total_count * len(accessible_pks) / checked)
+                    model_results['count_estimated'] = True
+                anonymized_count = None
             else:
-                # Django ORM search (basic implementation)
+                # Django ORM search: privacy conditions run in the same query
                 search_queryset = self._django_orm_search(model_class, query)
+                if filters:
+                    search_queryset = search_queryset.filter(**filters)
+                
+                aggregates = {'total': Count('pk'), 'accessible': Count('pk', filter=access_q)}
+                if anonymize_conditional:
+                    aggregates['anonymized'] = Count('pk', filter=access_q & ~clear_q)
+                counts = search_queryset.aggregate(**aggregates)
+                total_count, accessible_count = counts['total'], counts['accessible']
+                anonymized_count = counts.get('anonymized', 0)
+                
+                related_fields = [
+                    f.name for f in model_class._meta.fields
+                    if f.is_relation and f.name not in rules.restricted_fields
+                ]
+                page_objects = list(
+                    search_queryset.filter(access_q).select_related(*related_fields)
+                    .order_by('pk')[offset:offset + page_size]
+                )
             
-            model_results['total_count'] = len(search_queryset)
+            model_results['total_count'] = total_count
+            model_results['accessible_count'] = accessible_count
+            model_results['denied_count'] = total_count - accessible_count
             
-            # Apply privacy filtering to results
-            for obj in search_queryset:
-                privacy_decision = self._evaluate_object_privacy(obj, privacy_rules)
-                
-                if privacy_decision['access_allowed']:
-                    if privacy_decision['anonymize_required']:
-                        # Anonymize the object
-                        anonymized_obj = self._anonymize_search_result(obj, privacy_decision['anonymization_profile'])
-                        model_results['results'].append(anonymized_obj)
-                        model_results['anonymized_count'] += 1
-                    else:
-                        # Return object as-is (possibly with field restrictions)
-                        filtered_obj = self._apply_field_restrictions(obj, privacy_decision['restricted_fields'])
-                        model_results['results'].append(filtered_obj)
-                    
-                    model_results['accessible_count'] += 1
-                else:
-                    model_results['denied_count'] += 1
+            # Objects on the page to anonymize
+            if anonymize_all:
+                anonymize_pks = {obj.pk for obj in page_objects}
+                anonymized_count = accessible_count
+            elif anonymize_conditional:
+                page_pks = [obj.pk for obj in page_objects]
+                anonymize_pks = set(page_pks) - set(model_class.objects.filter(
+                    clear_q, pk__in=page_pks
+                ).values_list('pk', flat=True))
+                if anonymized_count is None:
+                    # Wagtail search: estimated from the page, like access
+                    anonymized_count = (
+                        round(accessible_count * len(anonymize_pks) / len(page_objects)) if page_objects else 0
+                    )
+                    model_results['count_estimated'] |= 0 < len(anonymize_pks) < len(page_objects)
+            else:
+                anonymize_pks = set()
+                anonymized_count = 0
+            model_results['anonymized_count'] = anonymized_count
+            
+            # Apply anonymization or field restrictions to the page of results
+            anonymizer = None
+            if anonymize_pks and rules.anonymization_profile_id:
+                profile = AnonymizationProfile.objects.filter(pk=rules.anonymization_profile_id).first()
+                anonymizer = DataAnonymizer(profile) if profile else None
+            
+            model_results['results'] = [
+                self._anonymize_search_result(obj, anonymizer) if obj.pk in anonymize_pks
+                else self._apply_field_restrictions(obj, rules.restricted_fields)
+                for obj in page_objects
+            ]
             
             # Add privacy summary
             model_results['privacy_summary'] = {
-                'rules_applied': [rule.name for rule in privacy_rules],
+                'rules_applied': rules.rule_names,
                 'anonymization_applied': model_results['anonymized_count'] > 0,
-                'access_restrictions': any(rule.restriction_level != 'none' for rule in privacy_rules)
+                'access_restrictions': rules.access_restrictions
             }
             
         except Exception as e:
@@ -533,96 +647,40 @@ class PrivacyAwareSearchBackend:
         return model_results
     
     def _django_orm_search(self, model_class, query: str):
-        """Basic Django ORM search implementation."""
-        # This is a simplified implementation
-        # In practice, you'd implement more sophisticated search logic
-        
-        search_fields = []
+        """
+        Basic Django ORM search implementation.
+        
+        Matches against the model's indexed search fields when it declares
+        any, and its text fields otherwise.
+        """
+        concrete_fields = {
+            field.name: field for field in model_class._meta.fields
+            if field.get_internal_type() in ['CharField', 'TextField']
+        }
         
-        # Find text fields to search
-        for field in model_class._meta.fields:
-            if field.get_internal_type() in ['CharField', 'TextField']:
-                search_fields.append(field.name)
+        search_fields = [
+            search_field.field_name for search_field in getattr(model_class, 'search_fields', [])
+            if isinstance(search_field, index.SearchField) and search_field.field_name in concrete_fields
+        ] or list(concrete_fields)
         
         if not search_fields:
             return model_class.objects.none()
         
         # Build search query
         search_q = Q()
-        for field in search_fields:
-            search_q |= Q(**{f"{field}__icontains": query})
+        for field_name in dict.fromkeys(search_fields):
+            search_q |= Q(**{f"{field_name}__icontains": query})
         
         return model_class.objects.filter(search_q)
     
-    def _evaluate_object_privacy(self, obj, privacy_rules: List[SearchPrivacyRule]) -> Dict[str, Any]:
-        """Evaluate privacy requirements for a specific object."""
-        
-        decision = {
-            'access_allowed': True,
-            'anonymize_required': False,
-            'anonymization_profile': None,
-            'restricted_fields': [],
-            'consent_required': [],
-            'violations': []
-        }
-        
-        for rule in privacy_rules:
-            # Check consent requirements
-            if rule.required_consent_types and hasattr(obj, 'patient'):
-                patient = getattr(obj, 'patient', None) or getattr(obj, 'user', None)
-                if patient and not rule.check_consent_requirements(patient, self.user):
-                    if rule.restriction_level == 'no_access':
-                        decision['access_allowed'] = False
-                        decision['violations'].append(f"Missing consent: {rule.required_consent_types}")
-                    elif rule.restriction_level == 'anonymized_only':
-                        decision['anonymize_required'] = True
-                        decision['anonymization_profile'] = rule.anonymization_profile
-            
-            # Check time restrictions
-            if rule.time_restrictions:
-                if not self._check_time_restrictions(obj, rule.time_restrictions):
-                    if rule.restriction_level == 'no_access':
-                        decision['access_allowed'] = False
-                        decision['violations'].append("Time restriction violated")
-                    elif rule.restriction_level == 'anonymized_only':
-                        decision['anonymize_required'] = True
-            
-            # Apply field restrictions
-            if rule.restricted_fields:
-                decision['restricted_fields'].extend(rule.restricted_fields)
-            
-            # Check if anonymization is required
-            if rule.restriction_level == 'anonymized_only':
-                decision['anonymize_required'] = True
-                if rule.anonymization_profile:
-                    decision['anonymization_profile'] = rule.anonymization_profile
-        
-        return decision
+    def _within_business_hours(self, now: datetime) -> bool:
+        """Check the business hours restriction (8 AM - 5 PM)."""
+        current_hour = timezone.localtime(now).hour
+        return 8 <= current_hour <= 17
     
-    def _check_time_restrictions(self, obj, time_restrictions: Dict) -> bool:
-        """Check if object access violates time restrictions."""
-        if not time_restrictions:
-            return True
-        
-        # Check business hours restriction
-        if 'business_hours_only' in time_restrictions and time_restrictions['business_hours_only']:
-            current_hour = timezone.now().hour
-            if current_hour < 8 or current_hour > 17:  # Outside 8 AM - 5 PM
-                return False
-        
-        # Check data age restriction
-        if 'max_age_days' in time_restrictions:
-            max_age = time_restrictions['max_age_days']
-            if hasattr(obj, 'created_at'):
-                age_days = (timezone.now() - obj.created_at).days
-                if age_days > max_age:
-                    return False
-        
-        return True
-    
-    def _anonymize_search_result(self, obj, anonymization_profile: AnonymizationProfile) -> Dict[str, Any]:
+    def _anonymize_search_result(self, obj, anonymizer: Optional[DataAnonymizer]) -> Dict[str, Any]:
         """Anonymize a search result object."""
-        if not anonymization_profile:
+        if not anonymizer:
             # Use default anonymization
             anonymized_data = {
                 'id': f"anon_{obj.pk}",
@@ -630,9 +688,6 @@ class PrivacyAwareSearchBackend:
                 'anonymized': True
             }
         else:
-            # Use specified anonymization profile
-            anonymizer = DataAnonymizer(anonymization_profile)
-            
             # Convert object to dict
             obj_dict = {}
             for field in obj._meta.fields:
@@ -746,26 +801,16 @@ class PrivacySearchManager:
             # Fallback if medication models don't exist yet
             model_classes = []
         
-        search_results = search_backend.search(
+        # Filter by patient if specified
+        if patient:
+            kwargs['filters'] = {'patient': patient}
+        
+        return search_backend.search(
             query=query,
             model_classes=model_classes,
             search_type='medical_record_search',
             **kwargs
         )
-        
-        # Filter by patient if specified
-        if patient:
-            for model_path, model_results in search_results['results'].items():
-                filtered_results = []
-                for result in model_results['results']:
-                    if (hasattr(result, 'patient_id') and result.get('patient_id') == patient.id) or \
-                       (hasattr(result, 'user_id') and result.get('user_id') == patient.id):
-                        filtered_results.append(result)
-                
-                model_results['results'] = filtered_results
-                model_results['accessible_count'] = len(filtered_results)
-        
-        return search_results
     
     @staticmethod
     def get_search_audit_logs(
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+MedGuard SA - Search Privacy Rule Compilation
+
+Reduces the active ``SearchPrivacyRule`` rows for one model and searcher
+to a ``CompiledSearchRules``, and turns conditional ``no_access`` rules
+into queryset filters. Nothing here queries the privacy rule tables, so
+the rules can be compiled (and tested) without them.
+"""
+
+from dataclasses import dataclass, field as dataclass_field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Q
+
+
+@dataclass
+class CompiledSearchRules:
+    """
+    Privacy rules for one model and user role, reduced to what a search needs.
+
+    Unconditional ``no_access`` rules block the model outright. ``no_access``
+    rules with consent or time conditions only deny the objects that fail
+    them; those conditions are turned into queryset filters at search time.
+    ``anonymized_only`` rules work the same way: unconditional ones
+    anonymize every accessible object, conditional ones only the objects
+    that fail their conditions. Field restrictions apply to every
+    accessible object.
+    """
+
+    rule_names: List[str] = dataclass_field(default_factory=list)
+    blocked_by: List[str] = dataclass_field(default_factory=list)
+    conditions: List[Dict[str, Any]] = dataclass_field(default_factory=list)
+    anonymize: bool = False
+    anonymize_conditions: List[Dict[str, Any]] = dataclass_field(default_factory=list)
+    anonymization_profile_id: Optional[int] = None
+    restricted_fields: List[str] = dataclass_field(default_factory=list)
+    access_restrictions: bool = False
+
+
+def compile_search_rules(rules: Iterable, model_path: str, user) -> CompiledSearchRules:
+    """
+    Reduce the rules that apply to a model and user.
+
+    Args:
+        rules: Active rules in priority order
+        model_path: ``app_label.model_name`` of the searched model
+        user: User performing the search
+    """
+    compiled = CompiledSearchRules()
+
+    for rule in rules:
+        if not (rule.applies_to_model(model_path) and rule.applies_to_user(user)):
+            continue
+
+        compiled.rule_names.append(rule.name)
+        compiled.restricted_fields.extend(rule.restricted_fields)
+        compiled.access_restrictions |= rule.restriction_level != 'none'
+
+        if rule.restriction_level not in ('no_access', 'anonymized_only'):
+            continue
+
+        time_restrictions = rule.time_restrictions or {}
+        condition = {
+            'rule': rule.name,
+            'consent_types': list(rule.required_consent_types),
+            'max_age_days': time_restrictions.get('max_age_days'),
+            'business_hours_only': bool(time_restrictions.get('business_hours_only')),
+        }
+        conditional = bool(
+            condition['consent_types'] or condition['max_age_days'] is not None
+            or condition['business_hours_only']
+        )
+
+        if rule.restriction_level == 'no_access':
+            if conditional:
+                compiled.conditions.append(condition)
+            else:
+                compiled.blocked_by.append(rule.name)
+        else:
+            if conditional:
+                compiled.anonymize_conditions.append(condition)
+            else:
+                compiled.anonymize = True
+            if rule.anonymization_profile_id:
+                compiled.anonymization_profile_id = rule.anonymization_profile_id
+
+    return compiled
+
+
+def condition_q(model_class, condition: Dict[str, Any], now: datetime) -> Q:
+    """Build the filter matching objects that satisfy a conditional rule."""
+    field_names = {f.name for f in model_class._meta.fields}
+    access_q = Q()
+
+    # Data age restriction
+    if condition['max_age_days'] is not None and 'created_at' in field_names:
+        access_q &= Q(created_at__gt=now - timedelta(days=condition['max_age_days'] + 1))
+
+    # Consent requirements, checked against the record's patient
+    if 'patient' in field_names:
+        patient_ref = 'patient'
+    elif model_class is get_user_model():
+        patient_ref = 'pk'
+    else:
+        patient_ref = None
+
+    if patient_ref and condition['consent_types']:
+        from .wagtail_privacy import PatientConsent
+
+        for consent_type in condition['consent_types']:
+            access_q &= Exists(PatientConsent.objects.filter(
+                Q(expiry_date__isnull=True) | Q(expiry_date__gte=now),
+                patient=OuterRef(patient_ref),
+                category__consent_type=consent_type,
+                category__is_active=True,
+                status='given',
+            ))
+
+    return access_q
@@ -1579,6 +1579,7 @@ class DataExportTemplate(models.Model):
     
     EXPORT_FORMATS = [
         ('json', _('JSON Format')),
+        ('ndjson', _('NDJSON Format (one record per line)')),
         ('csv', _('CSV Format')),
         ('xml', _('XML Format')),
         ('pdf', _('PDF Report')),
@@ -2423,19 +2424,13 @@ class DataDeletionExecutor:
             purpose="Data backup before deletion for compliance"
         )
         
-        # Generate backup
+        # Generate backup; the exporter hashes the file as it writes it
         exporter = DataExporter(backup_request)
         backup_path = exporter.generate_export()
         
-        # Calculate backup hash
-        backup_hash = hashlib.sha256()
-        with open(backup_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                backup_hash.update(chunk)
-        
         # Update deletion request with backup info
         self.deletion_request.backup_path = backup_path
-        self.deletion_request.backup_hash = backup_hash.hexdigest()
+        self.deletion_request.backup_hash = exporter.file_hash
         self.deletion_request.save(update_fields=['backup_path', 'backup_hash'])
         
         logger.info(f"Backup created for deletion request {self.deletion_request.request_id}: {backup_path}")
@@ -0,0 +1,357 @@
+"""
+Federated search for MedGuard SA.
+
+Each searchable source (Wagtail pages, medications, notifications) returns
+its own results already ranked by a common relevance score in the range
+0..1, with limit/offset pushed down into the database. The engine merges
+the per-source top-k streams with a heap and remembers how far into each
+source it got in an opaque cursor, so the next page is served by asking
+every source for ``per_page + 1`` rows from its own offset. Memory per
+request stays proportional to the page size, not to the number of matches.
+"""
+
+import base64
+import binascii
+import heapq
+import itertools
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.db import models
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.functions import Greatest
+
+from wagtail.models import Page
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SearchHit:
+    """A single ranked result from one search source."""
+
+    source: str
+    score: float
+    title: str
+    url: Optional[str]
+    object: Any
+
+
+class SearchSource:
+    """
+    A ranked, paginated search backend.
+
+    Subclasses return hits ordered by descending score, reading at most
+    ``limit`` rows starting at ``offset``.
+    """
+
+    name = ''
+
+    def is_available(self, request) -> bool:
+        """Return whether this source should be searched for the request."""
+        return True
+
+    def fetch(self, query: str, offset: int, limit: int, request=None) -> List[SearchHit]:
+        raise NotImplementedError
+
+    def scores(self, query: str, limit: int, request=None) -> List[float]:
+        """Return only the scores of the top ``limit`` hits (used to seek to a page)."""
+        return [hit.score for hit in self.fetch(query, 0, limit, request=request)]
+
+
+class PageSearchSource(SearchSource):
+    """Live Wagtail pages, ranked by the configured search backend."""
+
+    name = 'pages'
+
+    def fetch(self, query: str, offset: int, limit: int, request=None) -> List[SearchHit]:
+        results = Page.objects.live().search(query).annotate_score('_score')
+        return [
+            SearchHit(
+                source=self.name,
+                score=self._normalise(page._score),
+                title=page.title,
+                url=page.url,
+                object=page,
+            )
+            for page in results[offset:offset + limit]
+        ]
+
+    def scores(self, query: str, limit: int, request=None) -> List[float]:
+        # Pages are loaded with their primary key only: no titles, URLs or content
+        results = Page.objects.live().only('pk').search(query).annotate_score('_score')
+        return [self._normalise(page._score) for page in results[:limit]]
+
+    @staticmethod
+    def _normalise(score) -> float:
+        # Backend ranks are unbounded (or None without full-text support);
+        # squash them monotonically into 0..1 so the ranking order is kept
+        if score is None:
+            return 0.5
+        score = max(float(score), 0.0)
+        return score / (1.0 + score)
+
+
+class ModelSearchSource(SearchSource):
+    """
+    A model searched with ``icontains`` lookups and scored in the database.
+
+    ``weights`` maps a lookup (e.g. ``name__istartswith``) to the score it
+    contributes; a row scores the highest weight it matches.
+    """
+
+    model = None
+    weights: Sequence = ()
+    title_field = 'name'
+
+    def get_queryset(self, request=None):
+        return self.model._default_manager.all()
+
+    def ranked_queryset(self, query: str, request=None):
+        conditions = [(lookup, weight) for lookup, weight in self.weights]
+        match = models.Q()
+        for lookup, _weight in conditions:
+            match |= models.Q(**{lookup: query})
+
+        whens = [
+            Case(When(models.Q(**{lookup: query}), then=Value(weight)), default=Value(0.0),
+                 output_field=FloatField())
+            for lookup, weight in conditions
+        ]
+        score = Greatest(*whens) if len(whens) > 1 else whens[0]
+
+        return (
+            self.get_queryset(request)
+            .filter(match)
+            .annotate(_score=score)
+            .order_by('-_score', '-pk')
+        )
+
+    def get_url(self, obj) -> Optional[str]:
+        get_absolute_url = getattr(obj, 'get_absolute_url', None)
+        if get_absolute_url is None:
+            return None
+        try:
+            return get_absolute_url()
+        except Exception:
+            return None
+
+    def fetch(self, query: str, offset: int, limit: int, request=None) -> List[SearchHit]:
+        return [
+            SearchHit(
+                source=self.name,
+                score=obj._score,
+                title=getattr(obj, self.title_field),
+                url=self.get_url(obj),
+                object=obj,
+            )
+            for obj in self.ranked_queryset(query, request)[offset:offset + limit]
+        ]
+
+    def scores(self, query: str, limit: int, request=None) -> List[float]:
+        return list(self.ranked_queryset(query, request).values_list('_score', flat=True)[:limit])
+
+
+class MedicationSearchSource(ModelSearchSource):
+    """Medications matched on name, generic name and description."""
+
+    name = 'medications'
+    weights = (
+        ('name__iexact', 1.0),
+        ('name__istartswith', 0.9),
+        ('name__icontains', 0.7),
+        ('generic_name__icontains', 0.6),
+        ('description__icontains', 0.3),
+    )
+
+    @property
+    def model(self):
+        from medications.models import Medication
+        return Medication
+
+
+class NotificationSearchSource(ModelSearchSource):
+    """
+    Active notifications visible to the signed-in user.
+
+    A user sees notifications addressed to them (directly or through a
+    delivered ``UserNotification``) and broadcasts without specific target
+    users whose ``target_user_types`` is empty or includes their user type.
+    Other users' personal reminders are never searchable.
+    """
+
+    name = 'notifications'
+    title_field = 'title'
+    weights = (
+        ('title__icontains', 0.5),
+        ('content__icontains', 0.2),
+    )
+
+    @property
+    def model(self):
+        from medguard_notifications.models import Notification
+        return Notification
+
+    def is_available(self, request) -> bool:
+        return request is not None and request.user.is_authenticated
+
+    def get_queryset(self, request=None):
+        if request is None or not request.user.is_authenticated:
+            return self.model.objects.none()
+
+        user = request.user
+        addressed = models.Q(target_users=user) | models.Q(user_notifications__user=user)
+        audience = models.Q(target_user_types=[])
+        user_type = getattr(user, 'user_type', None)
+        if user_type:
+            audience |= models.Q(target_user_types__contains=[user_type])
+        broadcast = models.Q(target_users__isnull=True) & audience
+
+        visible = self.model.objects.filter(addressed | broadcast).values('pk')
+        return self.model.objects.filter(is_active=True, pk__in=visible)
+
+
+DEFAULT_SOURCES = (PageSearchSource, MedicationSearchSource, NotificationSearchSource)
+
+
+@dataclass
+class SearchPage:
+    """One page of federated search results."""
+
+    hits: List[SearchHit]
+    number: int
+    per_page: int
+    next_cursor: Optional[str]
+
+    def __iter__(self):
+        return iter(self.hits)
+
+    def __len__(self):
+        return len(self.hits)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.number > 1
+
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+    def previous_page_number(self) -> int:
+        return self.number - 1
+
+
+class FederatedSearch:
+    """
+    Merges ranked results from several search sources, one page at a time.
+    """
+
+    MAX_SEEK_PAGE = 100  # Page-number access beyond this needs a cursor
+
+    def __init__(self, sources=None, per_page: int = 10):
+        self.sources = [source() if isinstance(source, type) else source
+                        for source in (sources or DEFAULT_SOURCES)]
+        self.per_page = per_page
+
+    def search(self, query: str, request=None, cursor: Optional[str] = None,
+               page: int = 1) -> SearchPage:
+        """
+        Return one page of results.
+
+        Args:
+            query: Search query
+            request: Current request (used to decide which sources apply)
+            cursor: Cursor returned with the previous page, if any
+            page: Page number, used when no cursor is given
+
+        Returns:
+            SearchPage with the merged hits and the cursor for the next page
+        """
+        sources = [source for source in self.sources if source.is_available(request)]
+
+        state = decode_cursor(cursor)
+        if state is not None:
+            offsets, number = state['offsets'], state['page']
+        else:
+            number = max(1, min(page, self.MAX_SEEK_PAGE))
+            offsets = self._seek(query, sources, (number - 1) * self.per_page, request)
+
+        # Fetch one extra row per source to know whether it has more results
+        fetched = {}
+        for source in sources:
+            offset = offsets.get(source.name, 0)
+            if offset is None:
+                continue  # Source exhausted on an earlier page
+            try:
+                fetched[source.name] = source.fetch(query, offset, self.per_page + 1,
+                                                    request=request)
+            except Exception as e:
+                logger.error(f"Search source {source.name} failed: {e}")
+                fetched[source.name] = []
+
+        streams = [
+            [(-hit.score, order, position, hit) for position, hit in enumerate(hits)]
+            for order, hits in enumerate(fetched.values())
+        ]
+        page_hits = [
+            hit for _neg_score, _order, _position, hit
+            in itertools.islice(heapq.merge(*streams), self.per_page)
+        ]
+
+        next_offsets = {}
+        for name, hits in fetched.items():
+            used = sum(1 for hit in page_hits if hit.source == name)
+            next_offsets[name] = offsets.get(name, 0) + used if len(hits) > used else None
+        has_more = any(offset is not None for offset in next_offsets.values())
+
+        next_cursor = encode_cursor(next_offsets, number + 1) if has_more else None
+        return SearchPage(hits=page_hits, number=number, per_page=self.per_page,
+                          next_cursor=next_cursor)
+
+    def _seek(self, query: str, sources, skip: int, request=None) -> Dict[str, Optional[int]]:
+        """
+        Find each source's offset for the first result after ``skip`` merged hits.
+
+        Only scores are read for the skipped hits, never the full rows.
+        """
+        if skip <= 0:
+            return {source.name: 0 for source in sources}
+
+        streams = []
+        for order, source in enumerate(sources):
+            try:
+                scores = source.scores(query, skip, request=request)
+            except Exception as e:
+                logger.error(f"Search source {source.name} failed: {e}")
+                scores = []
+            streams.append([(-score, order, position) for position, score in enumerate(scores)])
+
+        offsets = {source.name: 0 for source in sources}
+        for _neg_score, order, _position in itertools.islice(heapq.merge(*streams), skip):
+            offsets[sources[order].name] += 1
+        return offsets
+
+
+def encode_cursor(offsets: Dict[str, Optional[int]], page: int) -> str:
+    """Encode per-source offsets into an opaque URL-safe cursor."""
+    payload = json.dumps({'o': offsets, 'p': page}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Decode a cursor, returning None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        offsets = {
+            str(name): (None if offset is None else max(0, int(offset)))
+            for name, offset in payload['o'].items()
+        }
+        return {'offsets': offsets, 'page': max(1, int(payload['p']))}
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError, UnicodeDecodeError):
+        return None
@@ -5,14 +5,20 @@ This module provides comprehensive audit logging for HIPAA compliance,
 tracking all access, modifications, and deletions of medical data.
 """
 
+import atexit
 import json
 import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
-from django.db import models
+from django.db import close_old_connections, models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -163,9 +169,10 @@ class AuditLog(models.Model):
         help_text=_('Additional metadata about the action')
     )
     
-    # Timestamps
+    # Timestamps. Not auto_now_add: buffered entries are inserted after
+    # the event, and must keep the time it happened
     timestamp = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         help_text=_('When the action occurred')
     )
     
@@ -223,6 +230,151 @@ class AuditLog(models.Model):
         return self.severity in [self.Severity.HIGH, self.Severity.CRITICAL]
 
 
+class AuditLogWriter:
+    """
+    Buffered writer that keeps audit inserts off the request path.
+
+    Entries are put on a bounded in-process queue and written with
+    ``bulk_create`` by a background thread once ``batch_size`` entries are
+    waiting or ``flush_interval`` seconds after the first one arrived. When
+    the queue is full the caller writes its own entry, so a slow database
+    slows requests down instead of dropping audit records. The queue is
+    drained when the process exits.
+    """
+
+    def __init__(self, max_queue_size: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 1.0, background: bool = True):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self.logger = logging.getLogger(__name__)
+        self._start_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        """Number of entries waiting to be written."""
+        return self._queue.qsize()
+
+    def enqueue(self, entry: AuditLog) -> bool:
+        """
+        Queue an unsaved audit entry for writing.
+
+        Returns:
+            True if the entry was queued, False if it was written
+            synchronously because the queue was full or the writer is
+            shutting down
+        """
+        if entry.timestamp is None:
+            # Stamp the event now, not when the batch is written
+            entry.timestamp = timezone.now()
+        if self._pid != os.getpid():
+            # Forked worker: the parent's thread and queue are not ours
+            self._reset()
+        if self._stopping.is_set():
+            self._write([entry])
+            return False
+        if self.background and self._thread is None:
+            self._start()
+
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.logger.warning("Audit log queue is full, writing entry synchronously")
+            self._write([entry])
+            return False
+        return True
+
+    def flush(self) -> int:
+        """
+        Write every queued entry from the calling thread.
+
+        Returns:
+            Number of entries written
+        """
+        written = 0
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+
+    def close(self, timeout: float = 10.0):
+        """Stop the background thread and write everything still queued."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+                close_old_connections()
+
+    def _take_batch(self) -> List[AuditLog]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # Take whatever is already queued once the deadline has passed
+            # or the writer is shutting down
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stopping.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, entries: List[AuditLog]):
+        retention_date = timezone.now() + timezone.timedelta(days=2555)
+        for entry in entries:
+            if not entry.retention_date:
+                entry.retention_date = retention_date
+
+        try:
+            AuditLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            return
+        except Exception as e:
+            self.logger.error(f"Failed to bulk write {len(entries)} audit log entries: {str(e)}")
+
+        # Write entries one by one so a single bad entry does not lose the batch
+        for entry in entries:
+            try:
+                entry.save()
+            except Exception as e:
+                self.logger.error(
+                    f"Failed to write audit log entry: {entry.action} by user {entry.user_id} "
+                    f"- {entry.description}: {str(e)}"
+                )
+
+
 class AuditLogger:
     """
     Audit logger for creating audit trail entries.
@@ -245,7 +397,8 @@ class AuditLogger:
         description: str = "",
         severity: str = AuditLog.Severity.LOW,
         request=None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        buffered: bool = False
     ) -> AuditLog:
         """
         Log an action to the audit trail.
@@ -261,9 +414,12 @@ class AuditLogger:
             severity: Severity level
             request: Django request object for context
             metadata: Additional metadata
+            buffered: Queue the entry for a batched write instead of
+                inserting it now. Critical entries are always written
+                synchronously.
             
         Returns:
-            Created AuditLog instance
+            Created AuditLog instance (unsaved until flushed when buffered)
         """
         try:
             # Extract request information
@@ -282,7 +438,7 @@ class AuditLogger:
                 session_id = session_id.session_key if session_id else ""
             
             # Create audit log entry
-            audit_log = AuditLog.objects.create(
+            audit_log = AuditLog(
                 user=user,
                 action=action,
                 severity=severity,
@@ -301,11 +457,23 @@ class AuditLogger:
                 metadata=metadata or {},
             )
             
+            queued = False
+            if (
+                buffered
+                and severity != AuditLog.Severity.CRITICAL
+                and getattr(settings, 'AUDIT_LOG_BUFFERED', False)
+            ):
+                queued = get_audit_log_writer().enqueue(audit_log)
+            else:
+                audit_log.save()
+            
             # Log to application logger as well
             self.logger.info(
                 f"Audit: {user} performed {action} on {obj} - {description}",
                 extra={
+                    # Queued entries only get an ID once their batch is written
                     'audit_log_id': audit_log.id,
+                    'audit_log_queued': queued,
                     'user_id': user.id if user else None,
                     'action': action,
                     'object_id': obj.pk if obj else None,
@@ -425,6 +593,8 @@ class AuditLogger:
 
 # Global audit logger instance
 _audit_logger = None
+_audit_log_writer = None
+_audit_log_writer_lock = threading.Lock()
 
 
 def get_audit_logger() -> AuditLogger:
@@ -435,6 +605,22 @@ def get_audit_logger() -> AuditLogger:
     return _audit_logger
 
 
+def get_audit_log_writer() -> AuditLogWriter:
+    """Get the global buffered audit log writer, drained at process exit."""
+    global _audit_log_writer
+    if _audit_log_writer is None:
+        with _audit_log_writer_lock:
+            if _audit_log_writer is None:
+                writer = AuditLogWriter(
+                    max_queue_size=getattr(settings, 'AUDIT_LOG_BUFFER_SIZE', 10000),
+                    batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 200),
+                    flush_interval=getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 1.0),
+                )
+                atexit.register(writer.close)
+                _audit_log_writer = writer
+    return _audit_log_writer
+
+
 def log_audit_event(
     user: Optional[User],
     action: str,
@@ -509,7 +695,8 @@ class AuditMiddleware:
     Django middleware for automatic audit logging.
     
     This middleware automatically logs certain types of requests
-    for audit trail purposes.
+    for audit trail purposes. Entries are buffered and written in
+    batches so the inserts stay off the request path.
     """
     
     def __init__(self, get_response):
@@ -546,7 +733,8 @@ class AuditMiddleware:
                         description=f"Access to sensitive endpoint: {request.path}",
                         severity=AuditLog.Severity.MEDIUM,
                         request=request,
-                        metadata={'endpoint_type': 'sensitive'}
+                        metadata={'endpoint_type': 'sensitive'},
+                        buffered=True
                     )
                     break
     
@@ -559,5 +747,6 @@ class AuditMiddleware:
                 description=f"HTTP {response.status_code} error for {request.path}",
                 severity=AuditLog.Severity.MEDIUM,
                 request=request,
-                metadata={'status_code': response.status_code}
+                metadata={'status_code': response.status_code},
+                buffered=True
             ) 
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Django management command to re-encrypt patient data after key rotation.
+
+Walks every encrypted column in resumable, throttled batches and rewrites
+values encrypted under old keys with the active key. Safe to run while the
+application is serving traffic and to interrupt: the next run continues
+from the last checkpoint.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from security.reencryption import ReEncryptionJob, discover_targets
+
+
+class Command(BaseCommand):
+    help = 'Re-encrypt patient data under the active encryption key'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows to read per batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker processes for encryption (0 runs in this process)',
+        )
+        parser.add_argument(
+            '--max-rows-per-second',
+            type=float,
+            default=5000,
+            help='Upper bound on rows processed per second (0 disables the limit)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to pause after every batch',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches; the next run resumes',
+        )
+        parser.add_argument(
+            '--target',
+            action='append',
+            dest='targets',
+            help='Only re-encrypt this column (app_label.Model.column); may be repeated',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore checkpoints and start from the first row',
+        )
+
+    def handle(self, *args, **options):
+        targets = discover_targets()
+        if not targets:
+            raise CommandError(
+                'No encrypted columns found: no model declares EncryptedPatientField or EncryptedField'
+            )
+        if options['targets']:
+            unknown = set(options['targets']) - {target.label for target in targets}
+            if unknown:
+                raise CommandError(f"Unknown encrypted columns: {', '.join(sorted(unknown))}")
+            targets = [target for target in targets if target.label in options['targets']]
+
+        self.stdout.write(f'Re-encrypting {len(targets)} encrypted columns...')
+        job = ReEncryptionJob(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            max_rows_per_second=options['max_rows_per_second'] or None,
+            pause_seconds=options['pause'],
+        )
+        stats = job.run(targets, max_batches=options['max_batches'], restart=options['restart'])
+
+        for label, target_stats in stats['targets'].items():
+            self.stdout.write(
+                f"  {label}: {target_stats['rewritten']} rewritten, {target_stats['failed']} failed "
+                f"of {target_stats['scanned']} scanned{'' if target_stats['complete'] else ' (in progress)'}"
+            )
+
+        if stats['complete']:
+            self.stdout.write(self.style.SUCCESS('Re-encryption complete'))
+        else:
+            self.stdout.write(self.style.WARNING('Re-encryption paused; run again to resume'))
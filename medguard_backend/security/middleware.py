@@ -9,7 +9,6 @@ import logging
 import time
 from typing import Any, Dict, Optional
 from django.conf import settings
-from django.core.cache import cache
 from django.http import HttpRequest, HttpResponse
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
@@ -23,6 +22,7 @@ from .hipaa_compliance import (
     detect_breach_indicators,
 )
 from .permissions import check_permission, check_resource_access
+from .rate_limiting import RateLimit, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +58,7 @@ class HIPAASecurityMiddleware(MiddlewareMixin):
         }
         
         # Rate limiting configuration
+        self.rate_limiter = get_rate_limiter()
         self.rate_limit_config = {
             'requests_per_minute': 60,
             'burst_limit': 10,
@@ -122,17 +123,9 @@ class HIPAASecurityMiddleware(MiddlewareMixin):
         
         # Use IP address for rate limiting
         client_ip = self._get_client_ip(request)
-        cache_key = f'rate_limit:{client_ip}'
-        
-        # Get current request count
-        request_count = cache.get(cache_key, 0)
-        
-        if request_count >= self.rate_limit_config['requests_per_minute']:
-            return False
-        
-        # Increment request count
-        cache.set(cache_key, request_count + 1, 60)  # 1 minute window
-        return True
+        return self.rate_limiter.hit(RateLimit(
+            f'rate_limit:{client_ip}', self.rate_limit_config['requests_per_minute'], 60
+        ))
     
     def _detect_suspicious_patterns(self, request: HttpRequest) -> bool:
         """Detect suspicious request patterns."""
@@ -186,7 +179,8 @@ class HIPAASecurityMiddleware(MiddlewareMixin):
                 'request_id': request.request_id,
                 'user_agent': request.META.get('HTTP_USER_AGENT', ''),
                 'ip_address': self._get_client_ip(request),
-            }
+            },
+            buffered=True
         )
     
     def _log_request_completion(self, request: HttpRequest, response: HttpResponse, start_time: float):
@@ -212,7 +206,8 @@ class HIPAASecurityMiddleware(MiddlewareMixin):
                 'response_status': response.status_code,
                 'duration': round(duration, 3),
                 'content_length': len(response.content) if hasattr(response, 'content') else 0,
-            }
+            },
+            buffered=True
         )
     
     def _log_rate_limit_violation(self, request: HttpRequest):
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2025-08-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0012_encryptionkey_formsubmissionlog_patientdatalog_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReEncryptionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(help_text='Encrypted column, as app_label.Model.column', max_length=200, unique=True)),
+                ('target_key', models.CharField(help_text='Key ID (or key fingerprint) rows are re-encrypted to', max_length=64)),
+                ('last_pk', models.BigIntegerField(default=0, help_text='Primary key of the last row processed')),
+                ('rows_scanned', models.PositiveBigIntegerField(default=0)),
+                ('rows_rewritten', models.PositiveBigIntegerField(default=0)),
+                ('rows_failed', models.PositiveBigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Re-encryption Checkpoint',
+                'verbose_name_plural': 'Re-encryption Checkpoints',
+                'db_table': 'security_reencryption_checkpoints',
+                'ordering': ['target'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-16 21:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0013_reencryptioncheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the action occurred'),
+        ),
+    ]
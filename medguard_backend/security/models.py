@@ -734,6 +734,7 @@ from .audit import AuditLog
 from .anonymization import AnonymizedDataset, DatasetAccessLog
 from .wagtail_audit import WagtailAuditLog
 from .wagtail_page_access import PageAccessControl, PageAccessLog
+from .reencryption import ReEncryptionCheckpoint
 
 __all__ = [
     'AuditLog',
@@ -745,4 +746,5 @@ __all__ = [
     'WagtailAuditLog',
     'PageAccessControl',
     'PageAccessLog',
+    'ReEncryptionCheckpoint',
 ] 
\ No newline at end of file
@@ -12,14 +12,17 @@ This module provides healthcare-specific patient data encryption including:
 import logging
 import hashlib
 import base64
+import threading
+import time
 from typing import Dict, Any, Optional, List, Union
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.http import HttpRequest, HttpResponse
@@ -163,6 +166,9 @@ class EncryptionKeyManager(models.Manager):
                 key_id=new_key_id
             ).update(is_active=True)
             
+            # Queryset updates bypass EncryptionKey.save()
+            patient_keyring.invalidate()
+            
             logger.info(f"Successfully rotated {key_type} encryption keys")
             return True
         except Exception as e:
@@ -208,6 +214,17 @@ class EncryptionKey(models.Model):
     def __str__(self):
         return f"{self.key_id} ({self.key_type})"
     
+    def save(self, *args, **kwargs):
+        """Save the key and invalidate every process's patient keyring."""
+        super().save(*args, **kwargs)
+        patient_keyring.invalidate()
+    
+    def delete(self, *args, **kwargs):
+        """Delete the key and invalidate every process's patient keyring."""
+        result = super().delete(*args, **kwargs)
+        patient_keyring.invalidate()
+        return result
+    
     def is_valid(self) -> bool:
         """Check if key is still valid."""
         if not self.is_active:
@@ -265,6 +282,166 @@ class PatientDataLog(models.Model):
         return f"{self.operation} - Patient {self.patient_id} - {self.timestamp}"
 
 
+class EncryptedValue(bytes):
+    """
+    Ciphertext that is already encrypted for EncryptedPatientField.
+    
+    Saved as-is instead of being encrypted again, so re-encryption jobs can
+    write ciphertext produced outside the keyring with bulk_update.
+    """
+
+
+class PatientDataKeyring:
+    """
+    Process-local keyring for patient data encryption.
+    
+    Caches the Fernet instance for every known key so encrypting or
+    decrypting a value costs no database query. Ciphertext is prefixed with
+    the ID of the key that produced it, so values written before a rotation
+    are decrypted with their own key directly; untagged legacy values fall
+    back to trying every known key.
+    
+    Processes share a version counter in the cache. Each process checks it
+    at most every CHECK_INTERVAL seconds and reloads when it has changed; a
+    value tagged with an unknown key ID also triggers a reload.
+    """
+    
+    KEY_TYPE = 'fernet'
+    HEADER_PREFIX = b'mgk1:'
+    HEADER_SEPARATOR = b':'
+    VERSION_CACHE_KEY = 'security:patient_keyring:version'
+    CHECK_INTERVAL = 5.0
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fernets: Dict[str, Fernet] = {}
+        self._multi_fernet: Optional[MultiFernet] = None
+        self._active_key_id: Optional[str] = None
+        self._version = None
+        self._checked_at = None
+    
+    @property
+    def active_key_id(self) -> Optional[str]:
+        """ID of the key new values are encrypted with."""
+        self._ensure_current()
+        return self._active_key_id
+    
+    def encrypt(self, plaintext: bytes) -> bytes:
+        """
+        Encrypt a value with the active key and tag it with the key ID.
+        
+        Raises:
+            ValueError: If there is no usable active key
+        """
+        self._ensure_current()
+        key_id = self._active_key_id
+        if key_id is None:
+            raise ValueError("No active encryption key found")
+        
+        token = self._fernets[key_id].encrypt(plaintext)
+        return self.HEADER_PREFIX + key_id.encode('ascii') + self.HEADER_SEPARATOR + token
+    
+    def decrypt(self, value: bytes) -> bytes:
+        """
+        Decrypt a value with the key named in its header.
+        
+        Raises:
+            ValueError: If the key that encrypted the value is unknown
+            InvalidToken: If the value does not decrypt
+        """
+        value = bytes(value)
+        self._ensure_current()
+        
+        if not value.startswith(self.HEADER_PREFIX):
+            # Written before key IDs were tagged
+            if self._multi_fernet is None:
+                raise ValueError("No encryption keys found")
+            return self._multi_fernet.decrypt(value)
+        
+        key_id, _, token = value[len(self.HEADER_PREFIX):].partition(self.HEADER_SEPARATOR)
+        key_id = key_id.decode('ascii')
+        fernet = self._fernets.get(key_id)
+        if fernet is None:
+            # Rotated in another process since our last check
+            self.reload()
+            fernet = self._fernets.get(key_id)
+            if fernet is None:
+                raise ValueError(f"Failed to retrieve encryption key: {key_id}")
+        return fernet.decrypt(token)
+    
+    @classmethod
+    def key_id_of(cls, value: bytes) -> Optional[str]:
+        """Return the key ID a value was encrypted with, if it is tagged."""
+        value = bytes(value)
+        if not value.startswith(cls.HEADER_PREFIX):
+            return None
+        return value[len(cls.HEADER_PREFIX):].partition(cls.HEADER_SEPARATOR)[0].decode('ascii')
+    
+    def invalidate(self) -> None:
+        """
+        Drop this process's keys and signal other processes to reload.
+        
+        The shared version is bumped after the surrounding transaction
+        commits, so other processes never reload uncommitted key changes.
+        """
+        with self._lock:
+            self._version = None
+        transaction.on_commit(self._bump_version)
+    
+    def reload(self) -> None:
+        """Reload key material from the key records and the key store."""
+        with self._lock:
+            self._load(self._read_version())
+    
+    def _bump_version(self) -> None:
+        if not cache.add(self.VERSION_CACHE_KEY, 1, None):
+            try:
+                cache.incr(self.VERSION_CACHE_KEY)
+            except ValueError:
+                cache.set(self.VERSION_CACHE_KEY, 1, None)
+    
+    def _read_version(self):
+        return cache.get(self.VERSION_CACHE_KEY, 0)
+    
+    def _ensure_current(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.CHECK_INTERVAL:
+            return
+        
+        with self._lock:
+            version = self._read_version()
+            if self._version is None or version != self._version:
+                self._load(version)
+            self._checked_at = now
+    
+    def _load(self, version) -> None:
+        fernets = {}
+        active_key_id = None
+        keys = EncryptionKey.objects.filter(key_type=self.KEY_TYPE).order_by(
+            '-is_active', '-created_at'
+        ).values_list('key_id', 'is_active')
+        
+        for key_id, is_active in keys:
+            key = get_encryption_key(key_id)
+            if not key:
+                logger.error(f"Failed to retrieve encryption key: {key_id}")
+                continue
+            fernets[key_id] = Fernet(key)
+            if is_active and active_key_id is None:
+                active_key_id = key_id
+        
+        # Active key first, so MultiFernet tries it before older keys
+        self._fernets = fernets
+        self._active_key_id = active_key_id
+        self._multi_fernet = MultiFernet(list(fernets.values())) if fernets else None
+        self._version = version
+        self._checked_at = time.monotonic()
+
+
+# Shared keyring for this process
+patient_keyring = PatientDataKeyring()
+
+
 class EncryptedPatientField(models.Field):
     """
     Custom field for encrypted patient data.
@@ -284,21 +461,7 @@ class EncryptedPatientField(models.Field):
             return None
         
         try:
-            # Get encryption key
-            key_id = EncryptionKey.objects.get_active_key('fernet')
-            if not key_id:
-                logger.error("No active encryption key found")
-                return None
-            
-            key = get_encryption_key(key_id)
-            if not key:
-                logger.error(f"Failed to retrieve encryption key: {key_id}")
-                return None
-            
-            # Decrypt value
-            fernet = Fernet(key)
-            decrypted_data = fernet.decrypt(value)
-            return decrypted_data.decode('utf-8')
+            return patient_keyring.decrypt(value).decode('utf-8')
         except Exception as e:
             logger.error(f"Failed to decrypt field value: {e}")
             return None
@@ -321,22 +484,11 @@ class EncryptedPatientField(models.Field):
         if value is None:
             return None
         
+        if isinstance(value, EncryptedValue):
+            return bytes(value)
+        
         try:
-            # Get encryption key
-            key_id = EncryptionKey.objects.get_active_key('fernet')
-            if not key_id:
-                logger.error("No active encryption key found")
-                return None
-            
-            key = get_encryption_key(key_id)
-            if not key:
-                logger.error(f"Failed to retrieve encryption key: {key_id}")
-                return None
-            
-            # Encrypt value
-            fernet = Fernet(key)
-            encrypted_data = fernet.encrypt(value.encode('utf-8'))
-            return encrypted_data
+            return patient_keyring.encrypt(value.encode('utf-8'))
         except Exception as e:
             logger.error(f"Failed to encrypt field value: {e}")
             return None
@@ -467,20 +619,7 @@ class SecurePatientDataManager(models.Manager):
     def _encrypt_field_value(self, field_name: str, value: Any, user: User) -> bytes:
         """Encrypt field value."""
         try:
-            # Get encryption key
-            key_id = EncryptionKey.objects.get_active_key('fernet')
-            if not key_id:
-                raise ValueError("No active encryption key found")
-            
-            key = get_encryption_key(key_id)
-            if not key:
-                raise ValueError(f"Failed to retrieve encryption key: {key_id}")
-            
-            # Encrypt value
-            fernet = Fernet(key)
-            encrypted_data = fernet.encrypt(str(value).encode('utf-8'))
-            
-            return encrypted_data
+            return patient_keyring.encrypt(str(value).encode('utf-8'))
         except Exception as e:
             logger.error(f"Failed to encrypt field {field_name}: {e}")
             raise
@@ -488,20 +627,7 @@ class SecurePatientDataManager(models.Manager):
     def _decrypt_field_value(self, field_name: str, value: bytes, user: User) -> str:
         """Decrypt field value."""
         try:
-            # Get encryption key
-            key_id = EncryptionKey.objects.get_active_key('fernet')
-            if not key_id:
-                raise ValueError("No active encryption key found")
-            
-            key = get_encryption_key(key_id)
-            if not key:
-                raise ValueError(f"Failed to retrieve encryption key: {key_id}")
-            
-            # Decrypt value
-            fernet = Fernet(key)
-            decrypted_data = fernet.decrypt(value)
-            
-            return decrypted_data.decode('utf-8')
+            return patient_keyring.decrypt(value).decode('utf-8')
         except Exception as e:
             logger.error(f"Failed to decrypt field {field_name}: {e}")
             raise
@@ -517,7 +643,7 @@ class SecurePatientDataManager(models.Manager):
                 data_type='personal',
                 patient_id=patient_id,
                 field_name=field_name,
-                key_id=EncryptionKey.objects.get_active_key('fernet') or '',
+                key_id=patient_keyring.active_key_id or '',
                 encryption_level='standard',
                 ip_address=getattr(user, 'last_ip', ''),
                 success=success,
@@ -0,0 +1,203 @@
+"""
+Shared rate limiting for MedGuard SA.
+
+Limits are sliding windows that are checked and counted in one atomic step,
+so concurrent requests cannot all read the same count and slip past a
+limit. Several limits (for example hourly and daily) are applied together
+and a hit is only counted when every one of them allows it.
+
+When the rate limiting cache is Redis, through django-redis or Django's own
+Redis backend, each window is a sorted-set log of hit timestamps that one
+Lua script trims, checks and appends to, for any number of keys in a single
+round trip. Other cache backends use a sliding window
+counter: the current fixed window is reserved with the cache's atomic
+``add``/``incr``, weighted with the previous window, and released again if
+the reservation would exceed the limit.
+"""
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Sequence, Set
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+# KEYS are grouped by their group index in ARGV; a group is counted only
+# when all of its keys are under their limits. ARGV[1] is the current time
+# in milliseconds, ARGV[2] a token making log members unique, then for key
+# i: ARGV[3i] window in milliseconds, ARGV[3i+1] limit, ARGV[3i+2] group.
+SLIDING_WINDOW_LOG_SCRIPT = """
+local now = tonumber(ARGV[1])
+local token = ARGV[2]
+local denied = {}
+local first = 1
+while first <= #KEYS do
+    local group = ARGV[first * 3 + 2]
+    local last = first
+    while last < #KEYS and ARGV[(last + 1) * 3 + 2] == group do
+        last = last + 1
+    end
+    local allowed = true
+    for i = first, last do
+        redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - tonumber(ARGV[i * 3]))
+        if redis.call('ZCARD', KEYS[i]) >= tonumber(ARGV[i * 3 + 1]) then
+            allowed = false
+        end
+    end
+    if allowed then
+        for i = first, last do
+            redis.call('ZADD', KEYS[i], now, token .. ':' .. i)
+            redis.call('PEXPIRE', KEYS[i], tonumber(ARGV[i * 3]))
+        end
+    else
+        table.insert(denied, group)
+    end
+    first = last + 1
+end
+return denied
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """At most ``limit`` hits on ``key`` within any ``window`` seconds."""
+
+    key: str
+    limit: int
+    window: int
+
+
+class RateLimiter:
+    """
+    Atomic sliding window rate limiter backed by a Django cache.
+
+    Uses the ``rate_limiting`` cache when one is configured and the default
+    cache otherwise.
+    """
+
+    def __init__(self, cache_alias: Optional[str] = None):
+        if cache_alias is None:
+            cache_alias = 'rate_limiting' if 'rate_limiting' in settings.CACHES else 'default'
+        self.cache = caches[cache_alias]
+        self._script = None
+
+    def hit(self, *limits: RateLimit) -> bool:
+        """
+        Count one hit against every limit if all of them allow it.
+
+        Returns:
+            True if the hit was allowed and counted, False if any limit
+            has been reached (nothing is counted then)
+        """
+        return bool(self.hit_many({None: limits}))
+
+    def hit_many(self, groups: Dict[Hashable, Sequence[RateLimit]]) -> Set[Any]:
+        """
+        Apply hits for many independent groups of limits at once.
+
+        Args:
+            groups: Limits keyed by an identifier for the hit, for example
+                a (user_id, channel) pair
+
+        Returns:
+            Set of the identifiers whose hit was allowed and counted
+        """
+        groups = {name: limits for name, limits in groups.items() if limits}
+        if not groups:
+            return set()
+
+        now = time.time()
+        client = self._get_redis_client()
+        if client is not None:
+            return self._hit_many_redis(client, groups, now)
+        return self._hit_many_cache(groups, now)
+
+    def _get_redis_client(self):
+        # A two-tier cache keeps its shared entries in its L2 backend
+        cache = getattr(self.cache, 'l2', self.cache)
+        client = None
+
+        try:
+            from django_redis.cache import RedisCache as DjangoRedisCache
+        except ImportError:
+            DjangoRedisCache = None
+        if DjangoRedisCache is not None and isinstance(cache, DjangoRedisCache):
+            client = cache.client.get_client(write=True)
+        elif isinstance(cache, RedisCache):
+            client = cache._cache.get_client(write=True)
+
+        if client is None:
+            return None
+        if self._script is None:
+            self._script = client.register_script(SLIDING_WINDOW_LOG_SCRIPT)
+        return client
+
+    def _hit_many_redis(self, client, groups: Dict[Hashable, Sequence[RateLimit]], now: float) -> Set[Any]:
+        names = list(groups)
+        keys, args = [], [int(now * 1000), uuid.uuid4().hex]
+        for index, name in enumerate(names):
+            for limit in groups[name]:
+                keys.append(self.cache.make_key(limit.key))
+                args.extend([limit.window * 1000, limit.limit, index])
+
+        denied = {int(index) for index in self._script(keys=keys, args=args, client=client)}
+        return {name for index, name in enumerate(names) if index not in denied}
+
+    def _hit_many_cache(self, groups: Dict[Hashable, Sequence[RateLimit]], now: float) -> Set[Any]:
+        windows = {
+            name: [(limit, int(now // limit.window)) for limit in limits]
+            for name, limits in groups.items()
+        }
+        previous_counts = self.cache.get_many([
+            f"{limit.key}:{index - 1}" for name_windows in windows.values() for limit, index in name_windows
+        ])
+
+        allowed = set()
+        for name, name_windows in windows.items():
+            reserved = []
+            for limit, index in name_windows:
+                key = f"{limit.key}:{index}"
+                count = self._incr(key, limit.window * 2)
+                reserved.append(key)
+                weight = 1 - (now % limit.window) / limit.window
+                if previous_counts.get(f"{limit.key}:{index - 1}", 0) * weight + count > limit.limit:
+                    self._release(reserved)
+                    break
+            else:
+                allowed.add(name)
+        return allowed
+
+    def _incr(self, key: str, timeout: int) -> int:
+        # add() is a no-op when the counter exists; incr() is atomic
+        if self.cache.add(key, 1, timeout):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(key, 0, timeout)
+            return self.cache.incr(key)
+
+    def _release(self, keys: Sequence[str]):
+        for key in keys:
+            try:
+                self.cache.decr(key)
+            except ValueError:
+                pass
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the global rate limiter instance."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,436 @@
+"""
+Online re-encryption of patient data after key rotation.
+
+Every model column backed by ``EncryptedPatientField`` or by the
+``security.encryption.EncryptedField`` descriptor (``FieldEncryption``) is a
+re-encryption target. Targets are walked in keyset-paginated batches
+(``pk > last_pk``); ciphertext is re-encrypted under the current key in a
+process pool, written back with ``bulk_update`` and progress is checkpointed
+after every batch, so a run can be stopped and resumed at any point.
+
+Rows are only locked for the write: each batch re-reads its rows under
+``SELECT ... FOR UPDATE`` and skips any that changed since they were
+scanned. A rows-per-second limit and an optional pause between batches
+bound the load on the database.
+
+Checkpoints record the last primary key as an integer, so only models with
+integer primary keys can be targets; others are rejected.
+
+No model in this tree declares either kind of encrypted field yet, so
+discovery currently finds nothing. The job logs a warning and the
+management command fails rather than reporting success. Columns holding
+ciphertext written by other means, such as ``FormSubmissionLog.encrypted_data``,
+have to be passed to ``ReEncryptionJob.run`` explicitly.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .encryption import EncryptedField, FieldEncryption, get_encryption_key
+from .patient_encryption import EncryptedPatientField, EncryptedValue, EncryptionKey, PatientDataKeyring
+
+logger = logging.getLogger(__name__)
+
+CODEC_PATIENT = 'patient'
+CODEC_FIELD = 'field'
+
+
+class ReEncryptionCheckpoint(models.Model):
+    """
+    Progress of the re-encryption of one encrypted column.
+
+    A checkpoint belongs to the key it re-encrypts to; when the key changes
+    again the walk restarts from the first row.
+    """
+
+    target = models.CharField(
+        max_length=200,
+        unique=True,
+        help_text=_('Encrypted column, as app_label.Model.column')
+    )
+
+    target_key = models.CharField(
+        max_length=64,
+        help_text=_('Key ID (or key fingerprint) rows are re-encrypted to')
+    )
+
+    last_pk = models.BigIntegerField(
+        default=0,
+        help_text=_('Primary key of the last row processed')
+    )
+
+    rows_scanned = models.PositiveBigIntegerField(default=0)
+    rows_rewritten = models.PositiveBigIntegerField(default=0)
+    rows_failed = models.PositiveBigIntegerField(default=0)
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Re-encryption Checkpoint')
+        verbose_name_plural = _('Re-encryption Checkpoints')
+        db_table = 'security_reencryption_checkpoints'
+        ordering = ['target']
+
+    def __str__(self):
+        state = 'complete' if self.completed_at else f'at pk {self.last_pk}'
+        return f"{self.target} -> {self.target_key} ({state})"
+
+    def restart(self, target_key: str) -> None:
+        """Start the walk again for a new target key."""
+        self.target_key = target_key
+        self.last_pk = 0
+        self.rows_scanned = 0
+        self.rows_rewritten = 0
+        self.rows_failed = 0
+        self.started_at = timezone.now()
+        self.completed_at = None
+
+
+@dataclass(frozen=True)
+class ReEncryptionTarget:
+    """One encrypted database column."""
+
+    model: Any
+    field: Any
+    codec: str
+
+    def __post_init__(self):
+        pk = self.model._meta.pk
+        if pk.is_relation:
+            # Multi-table inheritance: the parent's key
+            pk = pk.target_field
+        if not isinstance(pk, models.IntegerField):
+            raise ValueError(
+                f"{self.model._meta.label} has a non-integer primary key; "
+                f"re-encryption checkpoints need integer keys"
+            )
+
+    @property
+    def label(self) -> str:
+        return f"{self.model._meta.label}.{self.field.column}"
+
+
+def discover_targets() -> List[ReEncryptionTarget]:
+    """
+    Find every column encrypted with EncryptedPatientField or FieldEncryption.
+
+    Columns on models without an integer primary key are logged and skipped.
+    """
+    found = []
+    for model in apps.get_models():
+        if model._meta.proxy or model._meta.abstract:
+            continue
+
+        fields_by_attname = {field.attname: field for field in model._meta.concrete_fields}
+        for field in model._meta.concrete_fields:
+            if isinstance(field, EncryptedPatientField):
+                found.append((model, field, CODEC_PATIENT))
+
+        for klass in model.__mro__:
+            for attr in vars(klass).values():
+                if isinstance(attr, EncryptedField):
+                    field = fields_by_attname.get(f'_{attr.field_name}')
+                    if field is not None:
+                        found.append((model, field, CODEC_FIELD))
+
+    targets = []
+    for model, field, codec in found:
+        try:
+            targets.append(ReEncryptionTarget(model, field, codec))
+        except ValueError as e:
+            logger.warning(f"Skipping encrypted column {model._meta.label}.{field.column}: {e}")
+
+    if not targets:
+        logger.warning("No encrypted columns found; nothing will be re-encrypted")
+    return targets
+
+
+# Codecs. They run in worker processes, so they are built from plain,
+# picklable key material rather than from the keyring or Django state.
+
+class _PatientCodec:
+    """Re-encrypts key-ID-tagged EncryptedPatientField ciphertext."""
+
+    def __init__(self, keys: Dict[str, bytes], active_key_id: str):
+        self.fernets = {key_id: Fernet(key) for key_id, key in keys.items()}
+        self.active_key_id = active_key_id
+        self.active = self.fernets[active_key_id]
+        self.multi = MultiFernet([self.active] + [
+            fernet for key_id, fernet in self.fernets.items() if key_id != active_key_id
+        ])
+
+    def reencrypt(self, raw: bytes) -> Optional[bytes]:
+        raw = bytes(raw)
+        key_id = PatientDataKeyring.key_id_of(raw)
+        if key_id == self.active_key_id:
+            return None
+
+        if key_id is None:
+            plaintext = self.multi.decrypt(raw)
+        else:
+            token = raw[len(PatientDataKeyring.HEADER_PREFIX) + len(key_id) + 1:]
+            fernet = self.fernets.get(key_id)
+            if fernet is None:
+                raise InvalidToken(f"Unknown key {key_id}")
+            plaintext = fernet.decrypt(token)
+
+        return (PatientDataKeyring.HEADER_PREFIX + self.active_key_id.encode('ascii')
+                + PatientDataKeyring.HEADER_SEPARATOR + self.active.encrypt(plaintext))
+
+
+class _FieldCodec:
+    """Re-encrypts FieldEncryption ciphertext from previous master keys."""
+
+    def __init__(self, derived_keys: List[bytes]):
+        self.current = Fernet(derived_keys[0])
+        self.previous = MultiFernet([Fernet(key) for key in derived_keys[1:]])
+
+    def reencrypt(self, raw: str) -> Optional[str]:
+        token = base64.urlsafe_b64decode(raw.encode('ascii'))
+        try:
+            self.current.decrypt(token)
+            return None
+        except InvalidToken:
+            pass
+
+        plaintext = self.previous.decrypt(token)
+        return base64.urlsafe_b64encode(self.current.encrypt(plaintext)).decode('ascii')
+
+
+_CODEC_CLASSES = {CODEC_PATIENT: _PatientCodec, CODEC_FIELD: _FieldCodec}
+_worker_codecs: Dict[str, Any] = {}
+
+
+def _build_codecs(config: Dict[str, tuple]) -> Dict[str, Any]:
+    return {kind: _CODEC_CLASSES[kind](*args) for kind, args in config.items()}
+
+
+def _init_worker(config: Dict[str, tuple]) -> None:
+    global _worker_codecs
+    _worker_codecs = _build_codecs(config)
+
+
+def _reencrypt_rows(kind: str, rows: List[Tuple[Any, Any]],
+                    codecs: Optional[Dict[str, Any]] = None) -> List[Tuple[Any, Any, Any, bool]]:
+    """
+    Re-encrypt (pk, raw) rows.
+
+    Returns:
+        (pk, original, new value or None when already current, failed) tuples
+    """
+    codec = (codecs or _worker_codecs)[kind]
+    results = []
+    for pk, raw in rows:
+        try:
+            results.append((pk, raw, codec.reencrypt(raw), False))
+        except Exception:
+            results.append((pk, raw, None, True))
+    return results
+
+
+class ReEncryptionJob:
+    """
+    Resumable, throttled re-encryption of every encrypted column.
+
+    Args:
+        batch_size: Rows read per keyset page
+        workers: Worker processes for the crypto; 0 runs in this process
+        max_rows_per_second: Upper bound on rows processed per second
+        pause_seconds: Extra pause after every batch
+    """
+
+    def __init__(self, batch_size: int = 1000, workers: Optional[int] = None,
+                 max_rows_per_second: Optional[float] = 5000, pause_seconds: float = 0.0):
+        self.batch_size = batch_size
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self.max_rows_per_second = max_rows_per_second
+        self.pause_seconds = pause_seconds
+
+    def run(self, targets: Optional[Iterable[ReEncryptionTarget]] = None,
+            max_batches: Optional[int] = None, restart: bool = False) -> Dict[str, Any]:
+        """
+        Re-encrypt targets until done or max_batches have been processed.
+
+        Returns:
+            Dict with per-target statistics and whether every target is complete
+        """
+        targets = list(discover_targets() if targets is None else targets)
+        config, target_keys = self._codec_config(targets)
+        targets = [target for target in targets if target.codec in config]
+
+        stats = {'targets': {}, 'batches': 0, 'complete': True}
+        if not targets:
+            logger.warning("Re-encryption has no targets with usable keys; nothing was re-encrypted")
+            return stats
+
+        pool = None
+        if self.workers > 0:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(config,))
+        codecs = None if pool else _build_codecs(config)
+
+        try:
+            for target in targets:
+                checkpoint = self._checkpoint(target, target_keys[target.codec], restart)
+                while checkpoint.completed_at is None:
+                    if max_batches is not None and stats['batches'] >= max_batches:
+                        break
+                    self._run_batch(target, checkpoint, pool, codecs)
+                    stats['batches'] += 1
+
+                stats['targets'][target.label] = {
+                    'scanned': checkpoint.rows_scanned,
+                    'rewritten': checkpoint.rows_rewritten,
+                    'failed': checkpoint.rows_failed,
+                    'complete': checkpoint.completed_at is not None,
+                }
+                stats['complete'] &= checkpoint.completed_at is not None
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        logger.info(f"Re-encryption ran {stats['batches']} batches; complete: {stats['complete']}")
+        return stats
+
+    def _codec_config(self, targets: List[ReEncryptionTarget]) -> Tuple[Dict[str, tuple], Dict[str, str]]:
+        """Collect key material for the codecs the targets need."""
+        config, target_keys = {}, {}
+        kinds = {target.codec for target in targets}
+
+        if CODEC_PATIENT in kinds:
+            keys, active_key_id = {}, None
+            for key_id, is_active in EncryptionKey.objects.filter(key_type='fernet').order_by(
+                '-is_active', '-created_at'
+            ).values_list('key_id', 'is_active'):
+                key = get_encryption_key(key_id)
+                if key:
+                    keys[key_id] = key
+                    if is_active and active_key_id is None:
+                        active_key_id = key_id
+            if active_key_id is None:
+                logger.error("No active encryption key found; skipping patient field re-encryption")
+            else:
+                config[CODEC_PATIENT] = (keys, active_key_id)
+                target_keys[CODEC_PATIENT] = active_key_id
+
+        if CODEC_FIELD in kinds:
+            previous = getattr(settings, 'FIELD_ENCRYPTION_PREVIOUS_KEYS', [])
+            if previous:
+                current = FieldEncryption()
+                derived = [current.encryption_key] + [current._derive_key(key) for key in previous]
+                config[CODEC_FIELD] = (derived,)
+                target_keys[CODEC_FIELD] = hashlib.sha256(current.encryption_key).hexdigest()[:16]
+
+        return config, target_keys
+
+    def _checkpoint(self, target: ReEncryptionTarget, target_key: str, restart: bool) -> ReEncryptionCheckpoint:
+        checkpoint, created = ReEncryptionCheckpoint.objects.get_or_create(
+            target=target.label, defaults={'target_key': target_key}
+        )
+        if not created and (restart or checkpoint.target_key != target_key):
+            checkpoint.restart(target_key)
+            checkpoint.save()
+        return checkpoint
+
+    def _run_batch(self, target: ReEncryptionTarget, checkpoint: ReEncryptionCheckpoint,
+                   pool: Optional[ProcessPoolExecutor], codecs: Optional[Dict[str, Any]]) -> None:
+        started = time.monotonic()
+        rows = self._read_page(target, checkpoint.last_pk)
+
+        if rows:
+            results = self._reencrypt(target.codec, rows, pool, codecs)
+            rewritten = self._write_back(target, results)
+
+            checkpoint.last_pk = rows[-1][0]
+            checkpoint.rows_scanned += len(rows)
+            checkpoint.rows_rewritten += rewritten
+            checkpoint.rows_failed += sum(1 for result in results if result[3])
+        if len(rows) < self.batch_size:
+            checkpoint.completed_at = timezone.now()
+        checkpoint.save()
+
+        self._throttle(len(rows), time.monotonic() - started)
+
+    def _read_page(self, target: ReEncryptionTarget, last_pk: int) -> List[Tuple[Any, Any]]:
+        """Read the next keyset page of raw ciphertext, bypassing decryption."""
+        meta = target.model._meta
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {quote(meta.pk.column)}, {quote(target.field.column)} FROM {quote(meta.db_table)} "
+                f"WHERE {quote(meta.pk.column)} > %s AND {quote(target.field.column)} IS NOT NULL "
+                f"ORDER BY {quote(meta.pk.column)} LIMIT %s",
+                [last_pk, self.batch_size]
+            )
+            return cursor.fetchall()
+
+    def _reencrypt(self, kind: str, rows: List[Tuple[Any, Any]],
+                   pool: Optional[ProcessPoolExecutor], codecs: Optional[Dict[str, Any]]) -> List[tuple]:
+        rows = [(pk, bytes(raw) if isinstance(raw, memoryview) else raw) for pk, raw in rows]
+        if pool is None:
+            return _reencrypt_rows(kind, rows, codecs)
+
+        slice_size = max(1, -(-len(rows) // self.workers))
+        slices = [rows[offset:offset + slice_size] for offset in range(0, len(rows), slice_size)]
+        results = []
+        for chunk in pool.map(_reencrypt_rows, [kind] * len(slices), slices):
+            results.extend(chunk)
+        return results
+
+    def _write_back(self, target: ReEncryptionTarget, results: List[tuple]) -> int:
+        """Write re-encrypted values for rows that did not change since they were read."""
+        changed = {pk: (original, new) for pk, original, new, failed in results if new is not None}
+        if not changed:
+            return 0
+
+        meta = target.model._meta
+        quote = connection.ops.quote_name
+        placeholders = ', '.join(['%s'] * len(changed))
+        lock = f" {connection.ops.for_update_sql()}" if connection.features.has_select_for_update else ''
+        wrap = EncryptedValue if target.codec == CODEC_PATIENT else (lambda value: value)
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {quote(meta.pk.column)}, {quote(target.field.column)} FROM {quote(meta.db_table)} "
+                    f"WHERE {quote(meta.pk.column)} IN ({placeholders}){lock}",
+                    list(changed)
+                )
+                current = dict(cursor.fetchall())
+
+            objects = []
+            for pk, (original, new) in changed.items():
+                raw = current.get(pk)
+                if isinstance(raw, memoryview):
+                    raw = bytes(raw)
+                if raw != original:
+                    # Rewritten by the application since we read it
+                    continue
+                obj = target.model(pk=pk)
+                setattr(obj, target.field.attname, wrap(new))
+                objects.append(obj)
+
+            if objects:
+                target.model.objects.bulk_update(objects, [target.field.name], batch_size=self.batch_size)
+        return len(objects)
+
+    def _throttle(self, rows: int, elapsed: float) -> None:
+        delay = self.pause_seconds
+        if self.max_rows_per_second:
+            delay += max(0.0, rows / self.max_rows_per_second - elapsed)
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,31 @@
+"""
+Celery tasks for the MedGuard SA security app.
+"""
+
+import logging
+
+from celery import shared_task
+
+from .reencryption import ReEncryptionJob
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='security.reencrypt_patient_data')
+def reencrypt_patient_data_task(max_batches: int = 100, batch_size: int = 1000,
+                                max_rows_per_second: float = 2000):
+    """
+    Re-encrypt patient data in bounded slices after a key rotation.
+
+    Each run processes at most max_batches batches and queues the next run
+    until every encrypted column is complete. Crypto runs in the worker
+    process itself: prefork workers are daemonic and cannot start a pool.
+    """
+    job = ReEncryptionJob(batch_size=batch_size, workers=0, max_rows_per_second=max_rows_per_second)
+    stats = job.run(max_batches=max_batches)
+
+    if not stats['complete']:
+        reencrypt_patient_data_task.delay(
+            max_batches=max_batches, batch_size=batch_size, max_rows_per_second=max_rows_per_second
+        )
+    return stats
@@ -7,13 +7,14 @@ created and maintained.
 
 import json
 from datetime import datetime, timedelta
-from django.test import TestCase, RequestFactory
+from unittest.mock import patch
+from django.test import TestCase, RequestFactory, override_settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
-from security.audit import AuditLog, AuditLogger, log_audit_event
+from security.audit import AuditLog, AuditLogger, AuditLogWriter, log_audit_event
 from security.hipaa_compliance import get_compliance_monitor
 
 User = get_user_model()
@@ -225,6 +226,17 @@ class AuditLoggerTest(TestCase):
         
         self.assertEqual(audit_log.severity, AuditLog.Severity.CRITICAL)
         self.assertIn('event_type', audit_log.metadata)
+    
+    def test_buffered_logging_is_synchronous_by_default(self):
+        """Test buffering is off outside production settings."""
+        audit_log = self.audit_logger.log_action(
+            user=self.user,
+            action=AuditLog.ActionType.READ,
+            description="Request logging",
+            buffered=True
+        )
+        
+        self.assertIsNotNone(audit_log.pk)
 
 
 class ComplianceMonitorTest(TestCase):
@@ -327,13 +339,16 @@ class AuditMiddlewareTest(TestCase):
             return HttpResponse("OK")
         
         middleware = HIPAASecurityMiddleware(dummy_get_response)
+        writer = AuditLogWriter(background=False)
         
         # Create a request
         request = self.factory.get('/api/medications/')
         request.user = self.user
         
-        # Process request
-        response = middleware(request)
+        # Process request; request logging is buffered until flushed
+        with patch('security.audit._audit_log_writer', writer):
+            response = middleware(request)
+        writer.flush()
         
         # Check that audit logs were created
         audit_logs = AuditLog.objects.filter(user=self.user)
@@ -365,6 +380,91 @@ class AuditMiddlewareTest(TestCase):
         self.assertIn('Permissions-Policy', response)
 
 
+@override_settings(AUDIT_LOG_BUFFERED=True)
+class AuditLogWriterTest(TestCase):
+    """Test buffered audit log writes."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.factory = RequestFactory()
+        self.audit_logger = AuditLogger()
+        self.writer = AuditLogWriter(max_queue_size=1000, background=False)
+        patcher = patch('security.audit._audit_log_writer', self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _log(self, severity=AuditLog.Severity.MEDIUM, request=None):
+        return self.audit_logger.log_action(
+            user=self.user,
+            action=AuditLog.ActionType.READ,
+            description="Buffered access",
+            severity=severity,
+            request=request,
+            buffered=True
+        )
+    
+    def test_buffered_entries_written_in_one_batch(self):
+        """Test buffered entries are inserted together on flush."""
+        for _ in range(5):
+            self._log()
+        
+        self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertEqual(self.writer.pending, 5)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(self.writer.flush(), 5)
+        
+        self.assertEqual(AuditLog.objects.count(), 5)
+        self.assertFalse(AuditLog.objects.filter(retention_date__isnull=True).exists())
+    
+    def test_critical_entries_written_synchronously(self):
+        """Test critical entries bypass the buffer."""
+        audit_log = self._log(severity=AuditLog.Severity.CRITICAL)
+        
+        self.assertIsNotNone(audit_log.pk)
+        self.assertEqual(self.writer.pending, 0)
+    
+    def test_full_queue_writes_synchronously(self):
+        """Test a full queue pushes the write back onto the caller."""
+        writer = AuditLogWriter(max_queue_size=2, background=False)
+        entries = [
+            AuditLog(user=self.user, action=AuditLog.ActionType.READ, description=f"Entry {index}")
+            for index in range(3)
+        ]
+        
+        self.assertEqual([writer.enqueue(entry) for entry in entries], [True, True, False])
+        self.assertEqual(AuditLog.objects.get().description, "Entry 2")
+        
+        writer.close()
+        self.assertEqual(AuditLog.objects.count(), 3)
+    
+    def test_buffered_logging_issues_no_queries(self):
+        """Test a buffered entry costs the request no database round trips."""
+        request = self.factory.get('/api/medications/')
+        request.META['REMOTE_ADDR'] = '127.0.0.1'
+        
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                self._log(request=request)
+        
+        self.assertEqual(self.writer.pending, 100)
+    
+    def test_entries_keep_the_time_of_the_event(self):
+        """Test buffered entries are stamped when logged, not when flushed."""
+        logged = [self._log() for _ in range(3)]
+        stamps = [entry.timestamp for entry in logged]
+        
+        with patch('django.utils.timezone.now', return_value=stamps[-1] + timedelta(minutes=5)):
+            self.writer.flush()
+        
+        self.assertEqual(list(AuditLog.objects.order_by('timestamp').values_list('timestamp', flat=True)), stamps)
+
+
 class IntegrationTest(TestCase):
     """Integration tests for the complete audit system."""
     
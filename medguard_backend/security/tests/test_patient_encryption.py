@@ -0,0 +1,119 @@
+"""
+Tests for the patient data keyring behind EncryptedPatientField.
+
+Reading encrypted columns must not query the database per value, and
+values encrypted before a key rotation must stay readable.
+"""
+
+import time
+from unittest import mock
+
+from cryptography.fernet import Fernet
+from django.core.cache import cache
+from django.test import TestCase, tag
+
+from security.patient_encryption import (
+    EncryptedPatientField, EncryptionKey, PatientDataKeyring, patient_keyring
+)
+
+
+class PatientDataKeyringTest(TestCase):
+    """Test key-ID-tagged encryption and keyring invalidation."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.key_id = EncryptionKey.objects.generate_key('fernet')
+        self.field = EncryptedPatientField()
+
+    def _read(self, value):
+        return self.field.from_db_value(value, None, None)
+
+    def test_values_are_tagged_with_the_active_key(self):
+        """Test ciphertext names its key and round-trips through the field."""
+        stored = self.field.get_prep_value('Penicillin allergy')
+
+        self.assertEqual(PatientDataKeyring.key_id_of(stored), self.key_id)
+        self.assertEqual(self._read(stored), 'Penicillin allergy')
+        self.assertEqual(self._read(memoryview(stored)), 'Penicillin allergy')
+
+    def test_rotation_keeps_old_values_readable(self):
+        """Test values written before rotate_keys decrypt with their own key."""
+        before = self.field.get_prep_value('Type 2 diabetes')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(EncryptionKey.objects.rotate_keys('fernet'))
+        after = self.field.get_prep_value('Type 2 diabetes')
+
+        self.assertNotEqual(PatientDataKeyring.key_id_of(after), self.key_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._read(before), 'Type 2 diabetes')
+            self.assertEqual(self._read(after), 'Type 2 diabetes')
+
+    def test_other_processes_reload_on_version_change(self):
+        """Test a rotation elsewhere is picked up via the cache version."""
+        other = PatientDataKeyring()
+        other.CHECK_INTERVAL = 0
+        self.assertEqual(other.active_key_id, self.key_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EncryptionKey.objects.rotate_keys('fernet')
+
+        self.assertEqual(other.active_key_id, patient_keyring.active_key_id)
+        self.assertNotEqual(other.active_key_id, self.key_id)
+
+    def test_untagged_legacy_values_decrypt(self):
+        """Test values written before key IDs were tagged still decrypt."""
+        from security.encryption import get_encryption_key
+
+        legacy = Fernet(get_encryption_key(self.key_id)).encrypt(b'Legacy note')
+
+        self.assertEqual(self._read(legacy), 'Legacy note')
+
+    def test_decrypt_does_no_per_value_work(self):
+        """Test 500 rows of 4 encrypted columns decrypt without queries or keyring reloads."""
+        rows = [
+            [self.field.get_prep_value(f'Patient {index} column {column}') for column in range(4)]
+            for index in range(500)
+        ]
+
+        with mock.patch.object(PatientDataKeyring, '_load', autospec=True,
+                               side_effect=PatientDataKeyring._load) as load:
+            with self.assertNumQueries(0):
+                for row in rows:
+                    for value in row:
+                        self._read(value)
+
+        # Four Fernet decrypts per row; the keyring adds no round trips
+        load.assert_not_called()
+
+
+@tag('benchmark')
+class PatientDataKeyringBenchmarkTest(TestCase):
+    """
+    Benchmark decrypt throughput of EncryptedPatientField.
+
+    Timing based, so tagged; slow CI runners can skip them with
+    ``--exclude-tag benchmark``. The rate is reported, not asserted.
+    """
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        EncryptionKey.objects.generate_key('fernet')
+        self.field = EncryptedPatientField()
+
+    def test_decrypt_throughput(self):
+        """Report rows/s for 2,000 rows of 4 encrypted columns."""
+        rows = [
+            [self.field.get_prep_value(f'Patient {index} column {column}') for column in range(4)]
+            for index in range(2000)
+        ]
+        self.field.from_db_value(rows[0][0], None, None)
+
+        started = time.perf_counter()
+        values = [self.field.from_db_value(value, None, None) for row in rows for value in row]
+        rate = len(rows) / (time.perf_counter() - started)
+
+        print(f"\nEncryptedPatientField: {rate:,.0f} rows/s (4 columns per row)")
+        self.assertEqual(values[-1], 'Patient 1999 column 3')
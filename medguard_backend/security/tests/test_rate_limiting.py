@@ -0,0 +1,103 @@
+"""
+Tests for the shared rate limiter.
+
+Limits must hold when many threads hit the same key at once, and a hit
+that is denied by one limit must not be counted against the others.
+"""
+
+import importlib.util
+import threading
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from django.test import RequestFactory, SimpleTestCase
+
+from security.rate_limiting import RateLimit, RateLimiter
+
+
+class RateLimiterTest(SimpleTestCase):
+    """Test the cache-backed sliding window rate limiter."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.limiter = RateLimiter(cache_alias='default')
+
+    def test_limit_holds_under_concurrent_hits(self):
+        """Test no more than the limit is allowed when threads race for it."""
+        limit = RateLimit('test:concurrent', 50, 3600)
+        allowed = []
+        barrier = threading.Barrier(20)
+
+        def worker():
+            barrier.wait()
+            allowed.extend(self.limiter.hit(limit) for _ in range(10))
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(allowed), 200)
+        self.assertEqual(sum(allowed), 50)
+        self.assertFalse(self.limiter.hit(limit))
+
+    def test_denied_hit_is_not_counted(self):
+        """Test a hit over one limit leaves the other limits untouched."""
+        hourly = RateLimit('test:hourly', 2, 3600)
+        daily = RateLimit('test:daily', 3, 86400)
+
+        results = [self.limiter.hit(hourly, daily) for _ in range(4)]
+
+        self.assertEqual(results, [True, True, False, False])
+        self.assertTrue(self.limiter.hit(daily))
+        self.assertFalse(self.limiter.hit(daily))
+
+    def test_hit_many_applies_groups_independently(self):
+        """Test one call checks and counts many groups of limits."""
+        self.limiter.hit(RateLimit('test:user:1', 1, 60))
+
+        allowed = self.limiter.hit_many({
+            1: [RateLimit('test:user:1', 1, 60)],
+            2: [RateLimit('test:user:2', 1, 60)],
+            3: [],
+        })
+
+        self.assertEqual(allowed, {2})
+        self.assertFalse(self.limiter.hit(RateLimit('test:user:2', 1, 60)))
+
+    def test_security_middleware_limits_per_client(self):
+        """Test HIPAASecurityMiddleware denies requests over the per-minute limit."""
+        from security.middleware import HIPAASecurityMiddleware
+
+        middleware = HIPAASecurityMiddleware(lambda request: None)
+        middleware.rate_limiter = self.limiter
+        request = RequestFactory().get('/api/medications/', REMOTE_ADDR='10.0.0.1')
+        request.user = type('AuthenticatedUser', (), {'is_authenticated': True})()
+
+        results = [middleware._check_rate_limit(request) for _ in range(61)]
+
+        self.assertEqual(results.count(True), 60)
+        self.assertFalse(results[-1])
+
+
+@skipUnless(importlib.util.find_spec('redis'), 'redis is not installed')
+class RateLimiterRedisClientTest(SimpleTestCase):
+    """Test the Lua limiter is used with Django's built-in Redis backend."""
+
+    def test_builtin_redis_cache_uses_lua_script(self):
+        """Test a RedisCache alias yields a Redis client and registers the script."""
+        # Building the client and registering the script do not connect
+        limiter = RateLimiter(cache_alias='default')
+        limiter.cache = RedisCache('redis://localhost:6379/5', {'KEY_PREFIX': 'rate_limit'})
+
+        client = limiter._get_redis_client()
+
+        self.assertIsNotNone(client)
+        self.assertIsNotNone(limiter._script)
+
+    def test_other_backends_use_the_cache_counter(self):
+        """Test a non-Redis cache has no Redis client."""
+        self.assertIsNone(RateLimiter(cache_alias='default')._get_redis_client())
@@ -0,0 +1,138 @@
+"""
+Tests for the online re-encryption job run after key rotation.
+"""
+
+from unittest import mock
+
+from cryptography.fernet import Fernet
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from security.encryption import FieldEncryption, get_encryption_key
+from security.form_security import FormSubmissionLog
+from security.patient_encryption import EncryptionKey, PatientDataKeyring, patient_keyring
+from security.reencryption import (
+    CODEC_FIELD, CODEC_PATIENT, ReEncryptionCheckpoint, ReEncryptionJob, ReEncryptionTarget, _build_codecs,
+    _FieldCodec
+)
+
+User = get_user_model()
+
+
+class ReEncryptionJobTest(TestCase):
+    """Test resumable re-encryption of a binary ciphertext column."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(username='auditor', password='testpass123')
+        self.old_key_id = EncryptionKey.objects.generate_key('fernet')
+        self.target = ReEncryptionTarget(
+            FormSubmissionLog, FormSubmissionLog._meta.get_field('encrypted_data'), CODEC_PATIENT
+        )
+
+        values = [patient_keyring.encrypt(f'record {index}'.encode()) for index in range(4)]
+        # Written before ciphertext carried a key ID
+        values.append(Fernet(get_encryption_key(self.old_key_id)).encrypt(b'record 4'))
+        values.append(None)
+        self.logs = [
+            FormSubmissionLog.objects.create(
+                user=self.user, form_type='intake', form_data_hash='0' * 64,
+                encrypted_data=value, ip_address='127.0.0.1'
+            )
+            for value in values
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EncryptionKey.objects.rotate_keys('fernet')
+        self.new_key_id = patient_keyring.active_key_id
+
+    def _stored(self):
+        return [
+            bytes(value) for value in FormSubmissionLog.objects.order_by('pk').values_list(
+                'encrypted_data', flat=True
+            ) if value is not None
+        ]
+
+    def test_job_resumes_from_checkpoint(self):
+        """Test batches are checkpointed and a later run finishes the walk."""
+        job = ReEncryptionJob(batch_size=2, workers=0, max_rows_per_second=None)
+
+        stats = job.run([self.target], max_batches=1)
+        checkpoint = ReEncryptionCheckpoint.objects.get()
+        self.assertFalse(stats['complete'])
+        self.assertEqual((checkpoint.last_pk, checkpoint.rows_rewritten), (self.logs[1].pk, 2))
+
+        stats = job.run([self.target])
+        self.assertTrue(stats['complete'])
+        self.assertEqual(stats['targets'][self.target.label]['rewritten'], 5)
+
+        stored = self._stored()
+        self.assertEqual({PatientDataKeyring.key_id_of(value) for value in stored}, {self.new_key_id})
+        self.assertEqual(
+            [patient_keyring.decrypt(value).decode() for value in stored],
+            [f'record {index}' for index in range(5)]
+        )
+
+        # Nothing left to do for this key
+        self.assertEqual(job.run([self.target])['batches'], 0)
+
+    def test_rows_changed_during_the_batch_are_skipped(self):
+        """Test a value rewritten by the application is not overwritten."""
+        job = ReEncryptionJob(batch_size=10, workers=0, max_rows_per_second=None)
+        config, _target_keys = job._codec_config([self.target])
+        rows = job._read_page(self.target, 0)
+        results = job._reencrypt(CODEC_PATIENT, rows, None, _build_codecs(config))
+
+        fresh = patient_keyring.encrypt(b'updated by the application')
+        FormSubmissionLog.objects.filter(pk=self.logs[0].pk).update(encrypted_data=fresh)
+
+        self.assertEqual(job._write_back(self.target, results), 4)
+        self.assertEqual(self._stored()[0], fresh)
+
+    def test_process_pool(self):
+        """Test the crypto can run in worker processes."""
+        stats = ReEncryptionJob(batch_size=3, workers=2, max_rows_per_second=None).run([self.target])
+
+        self.assertTrue(stats['complete'])
+        self.assertEqual(stats['targets'][self.target.label]['rewritten'], 5)
+
+
+class ReEncryptionTargetTest(SimpleTestCase):
+    """Test target validation and the command's handling of missing targets."""
+
+    def test_non_integer_primary_keys_are_rejected(self):
+        """Test a model keyed by a string cannot be walked with integer checkpoints."""
+        with self.assertRaises(ValueError):
+            ReEncryptionTarget(Session, Session._meta.get_field('session_data'), CODEC_FIELD)
+
+    def test_command_fails_without_targets(self):
+        """Test the command does not report success when there is nothing to re-encrypt."""
+        with mock.patch('security.management.commands.reencrypt_patient_data.discover_targets', return_value=[]):
+            with self.assertRaises(CommandError):
+                call_command('reencrypt_patient_data')
+
+        target = ReEncryptionTarget(
+            FormSubmissionLog, FormSubmissionLog._meta.get_field('encrypted_data'), CODEC_PATIENT
+        )
+        with mock.patch('security.management.commands.reencrypt_patient_data.discover_targets',
+                        return_value=[target]):
+            with self.assertRaisesMessage(CommandError, 'security.Missing.column'):
+                call_command('reencrypt_patient_data', target=['security.Missing.column'])
+
+
+class FieldCodecTest(SimpleTestCase):
+    """Test re-encryption of FieldEncryption values from a previous master key."""
+
+    def test_reencrypts_values_from_previous_master_key(self):
+        """Test old values move to the current key and current values are left alone."""
+        current, previous = FieldEncryption('current-master'), FieldEncryption('previous-master')
+        codec = _FieldCodec([current.encryption_key, previous.encryption_key])
+
+        rewritten = codec.reencrypt(previous.encrypt_field({'allergies': ['penicillin']}))
+
+        self.assertEqual(current.decrypt_field(rewritten), {'allergies': ['penicillin']})
+        self.assertIsNone(codec.reencrypt(rewritten))
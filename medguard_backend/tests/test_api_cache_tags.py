@@ -0,0 +1,133 @@
+"""
+Tests for tag-based API cache invalidation in MedGuard SA.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.cache_tags import (
+    MISS, get_tag_versions, get_tagged, invalidate_instance, invalidate_tags,
+    model_tag, object_tag, set_tagged, tags_for_path, user_tag
+)
+from medications.models import Medication, StockAlert
+
+User = get_user_model()
+
+
+class CacheTagTest(TestCase):
+    """Test tag generations and tagged cache entries."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+
+    def test_tagged_entry_round_trip(self):
+        """Test a tagged entry is served until one of its tags is bumped."""
+        set_tagged('entry', {'data': 1}, ['model:medications.medication', 'user:1'], 600)
+        self.assertEqual(get_tagged('entry'), {'data': 1})
+
+        invalidate_tags(['user:2'])
+        self.assertEqual(get_tagged('entry'), {'data': 1})
+
+        invalidate_tags(['user:1'])
+        self.assertIs(get_tagged('entry'), MISS)
+
+    def test_invalidation_is_a_counter_bump(self):
+        """Test invalidating a tag increments its generation."""
+        before = get_tag_versions(['model:x'])['model:x']
+        invalidate_tags(['model:x'])
+        self.assertEqual(get_tag_versions(['model:x'])['model:x'], before + 1)
+
+    def test_unknown_tag_invalidation(self):
+        """Test invalidating a never-read tag still invalidates later entries."""
+        invalidate_tags(['model:never_read'])
+        self.assertEqual(get_tag_versions(['model:never_read'])['model:never_read'], 2)
+
+    def test_stale_versions_are_not_cached(self):
+        """Test values computed before an invalidation are stored as stale."""
+        versions = get_tag_versions(['model:y'])
+        invalidate_tags(['model:y'])
+        set_tagged('entry', 'old', ['model:y'], 600, versions=versions)
+        self.assertIs(get_tagged('entry'), MISS)
+
+    def test_tags_for_path(self):
+        """Test API paths map to the models they are built from."""
+        self.assertIn('model:medications.medication', tags_for_path('/api/medications/12/'))
+        self.assertIn('model:medications.medicationlog', tags_for_path('/api/medications/logs/'))
+        self.assertIn('model:medications.stockalert', tags_for_path('/api/medications/alerts/3/'))
+        self.assertEqual(tags_for_path('/api/unknown/'), [])
+
+    def test_paths_without_invalidation_have_no_model_tags(self):
+        """Test paths built from models no signal covers fall back to short TTLs."""
+        self.assertEqual(tags_for_path('/api/medications/stock-analytics/'), [])
+
+    def test_middleware_keeps_short_ttl_for_untagged_responses(self):
+        """Test only tagged responses are cached for the long TTL."""
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        from api.wagtail_api import EnhancedCacheMiddleware
+
+        middleware = EnhancedCacheMiddleware(lambda request: HttpResponse('ok'))
+        request = RequestFactory().get('/api/v2/pages/')
+        request.user = type('AnonymousUser', (), {'is_authenticated': False})()
+
+        self.assertEqual(middleware._get_dynamic_timeout(request, HttpResponse('ok'), ['model:wagtailcore.page']), 900)
+        self.assertEqual(middleware._get_dynamic_timeout(request, HttpResponse('ok'), []), 300)
+
+
+class CacheInvalidationSignalTest(TestCase):
+    """Test model signals bump the right tags."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.medication = Medication.objects.create(
+            name='Lipitor',
+            generic_name='Atorvastatin',
+            medication_type='tablet',
+            strength='20mg',
+            dosage_unit='mg',
+            pill_count=30
+        )
+
+    def test_medication_save_invalidates_entries(self):
+        """Test saving a medication invalidates model and object entries."""
+        set_tagged('list', ['Lipitor'], [model_tag(Medication)], 3600)
+        set_tagged('detail', {'name': 'Lipitor'}, [object_tag(self.medication)], 3600)
+
+        self.medication.pill_count = 20
+        self.medication.save()
+
+        self.assertIs(get_tagged('list'), MISS)
+        self.assertIs(get_tagged('detail'), MISS)
+
+    def test_medication_delete_invalidates_entries(self):
+        """Test deleting a medication invalidates dependent entries."""
+        set_tagged('detail', {'name': 'Lipitor'}, [object_tag(self.medication)], 3600)
+        self.medication.delete()
+        self.assertIs(get_tagged('detail'), MISS)
+
+    def test_patient_records_invalidate_user_tag(self):
+        """Test patient-scoped instances invalidate the patient's entries."""
+        user = User.objects.create_user(username='patient', password='testpass123')
+        set_tagged('mine', ['schedule'], [user_tag(user.id)], 3600)
+
+        self.medication.patient_id = user.id
+        invalidate_instance(self.medication)
+
+        self.assertIs(get_tagged('mine'), MISS)
+
+    def test_stock_alert_save_invalidates_alert_entries(self):
+        """Test stock alerts retire the cached alert lists."""
+        user = User.objects.create_user(username='pharmacist', password='testpass123')
+        set_tagged('alerts', [], tags_for_path('/api/medications/alerts/'), 3600)
+
+        StockAlert.objects.create(
+            medication=self.medication, created_by=user, alert_type=StockAlert.AlertType.LOW_STOCK,
+            priority=StockAlert.Priority.HIGH, title='Low Stock Alert - Lipitor', message='Lipitor is low',
+            current_stock=3, threshold_level=10
+        )
+
+        self.assertIs(get_tagged('alerts'), MISS)
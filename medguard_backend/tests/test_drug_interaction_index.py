@@ -0,0 +1,235 @@
+"""
+Tests for the in-memory drug interaction index.
+
+The index itself is pure Python and is tested with stand-in interactions
+against the matching rules of the per-pair ``icontains`` queries it
+replaced. The comparison with those queries and the benchmark need the
+``DrugInteraction`` model, so they are skipped unless the drug interactions
+plugin is installed.
+"""
+
+import time
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, tag
+from django.test.utils import CaptureQueriesContext
+
+from plugins.wagtail_drug_interactions import interaction_index
+from plugins.wagtail_drug_interactions.interaction_index import InteractionIndex
+
+PLUGIN_INSTALLED = any(apps.is_installed(name) for name in (
+    'plugins.wagtail_drug_interactions', 'medguard_backend.plugins.wagtail_drug_interactions'
+))
+
+SEVERITIES = ['minor', 'moderate', 'major', 'contraindicated']
+
+
+def make_interaction(pk, drug_name_1, drug_name_2, severity='moderate', generic_name_1='', generic_name_2=''):
+    """Build a stand-in with the attributes the index reads from a DrugInteraction."""
+    return SimpleNamespace(
+        pk=pk, drug_name_1=drug_name_1, generic_name_1=generic_name_1,
+        drug_name_2=drug_name_2, generic_name_2=generic_name_2, severity=severity,
+    )
+
+
+def make_interactions(drug_count, partners=3):
+    """Interactions between each drug and its next few neighbours."""
+    return [
+        make_interaction(
+            number * partners + offset,
+            f'Drug{number:03d}', f'Drug{(number + offset + 1) % drug_count:03d}',
+            severity=SEVERITIES[(number + offset) % len(SEVERITIES)],
+            generic_name_1=f'Generic {number:03d}',
+        )
+        for number in range(drug_count)
+        for offset in range(partners)
+    ]
+
+
+def legacy_find_between(interactions, drug1, drug2):
+    """The old per-pair query, evaluated in Python: icontains on either side, by -severity."""
+    def side_matches(interaction, side, drug):
+        drug = drug.lower()
+        return (drug in getattr(interaction, f'drug_name_{side}').lower()
+                or drug in getattr(interaction, f'generic_name_{side}').lower())
+
+    found = [
+        interaction for interaction in interactions
+        if (side_matches(interaction, 1, drug1) and side_matches(interaction, 2, drug2))
+        or (side_matches(interaction, 1, drug2) and side_matches(interaction, 2, drug1))
+    ]
+    return sorted(found, key=lambda interaction: interaction.severity, reverse=True)
+
+
+def legacy_check(interactions, medications):
+    """The old check_drug_interactions loop over every pair of medications."""
+    found = []
+    for i, med1 in enumerate(medications):
+        for med2 in medications[i + 1:]:
+            found.extend(legacy_find_between(interactions, med1, med2))
+    return found
+
+
+class InteractionIndexTest(SimpleTestCase):
+    """Test name resolution, ordering and equivalence with the per-pair queries."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.warfarin_aspirin = make_interaction(
+            1, 'Warfarin Sodium', 'Aspirin', 'major', generic_name_2='Acetylsalicylic acid'
+        )
+        self.warfarin_ibuprofen = make_interaction(2, 'Coumadin', 'Ibuprofen', 'moderate', generic_name_1='Warfarin')
+        self.aspirin_ibuprofen = make_interaction(3, 'Ibuprofen', 'Aspirin', 'minor')
+        self.warfarin_aspirin_contra = make_interaction(4, 'Aspirin', 'Warfarin', 'contraindicated')
+        self.index = InteractionIndex([
+            self.warfarin_aspirin, self.warfarin_ibuprofen, self.aspirin_ibuprofen, self.warfarin_aspirin_contra
+        ])
+
+    def test_resolve_matches_substrings(self):
+        """Test a name resolves to every canonical name containing it, case and spacing aside."""
+        resolved = {self.index.names[name_id] for name_id in self.index.resolve('  WARFARIN ')}
+
+        self.assertEqual(resolved, {'warfarin sodium', 'warfarin'})
+        self.assertEqual(
+            {self.index.names[name_id] for name_id in self.index.resolve('salicylic')}, {'acetylsalicylic acid'}
+        )
+        self.assertEqual(self.index.resolve('paracetamol'), ())
+
+    def test_find_between_orders_by_severity(self):
+        """Test interactions from either side come back ordered by -severity."""
+        self.assertEqual(
+            self.index.find_between('aspirin', 'warfarin'),
+            [self.warfarin_aspirin, self.warfarin_aspirin_contra]
+        )
+        self.assertEqual(
+            self.index.find_between('Warfarin', 'Acetylsalicylic'), [self.warfarin_aspirin]
+        )
+
+    def test_check_returns_pairs_in_order(self):
+        """Test check() concatenates each pair's interactions in medication pair order."""
+        self.assertEqual(
+            self.index.check(['Warfarin', 'Aspirin', 'Ibuprofen']),
+            [self.warfarin_aspirin, self.warfarin_aspirin_contra, self.warfarin_ibuprofen, self.aspirin_ibuprofen]
+        )
+        self.assertEqual(self.index.check(['Paracetamol', 'Aspirin']), [])
+
+    def test_check_matches_per_pair_queries(self):
+        """Test check() returns exactly what the old per-pair lookups returned."""
+        interactions = make_interactions(50) + [
+            self.warfarin_aspirin, self.warfarin_ibuprofen, self.aspirin_ibuprofen, self.warfarin_aspirin_contra
+        ]
+        index = InteractionIndex(interactions)
+
+        for medications in (
+            ['Drug001', 'Drug002', 'Drug003', 'Drug004'],
+            ['Generic 010', 'drug011', 'DRUG012', 'Drug049', 'Drug000'],
+            ['Drug00', 'Generic', 'warfarin', 'aspirin', 'Ibuprofen'],
+            [f'Drug{number:03d}' for number in range(0, 50, 3)],
+        ):
+            with self.subTest(medications=medications):
+                self.assertEqual(index.check(medications), legacy_check(interactions, medications))
+
+
+class InteractionTableMixin:
+    """Active DrugInteraction rows for 50 drugs, and the query the index replaced."""
+
+    drug_count = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        from plugins.wagtail_drug_interactions.models import DrugInteraction
+
+        DrugInteraction.objects.bulk_create([
+            DrugInteraction(
+                drug_name_1=interaction.drug_name_1, generic_name_1=interaction.generic_name_1,
+                drug_name_2=interaction.drug_name_2, severity=interaction.severity,
+                mechanism='', clinical_effects='', management='',
+            )
+            for interaction in make_interactions(cls.drug_count)
+        ])
+
+    def setUp(self):
+        """Start every test from a freshly built index."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        interaction_index._interaction_index = None
+        self.addCleanup(setattr, interaction_index, '_interaction_index', None)
+
+    def legacy_find_between(self, drug1, drug2):
+        """The per-pair query the index replaced."""
+        from plugins.wagtail_drug_interactions.models import DrugInteraction
+
+        return list(DrugInteraction.objects.filter(
+            Q(
+                (Q(drug_name_1__icontains=drug1) | Q(generic_name_1__icontains=drug1)) &
+                (Q(drug_name_2__icontains=drug2) | Q(generic_name_2__icontains=drug2))
+            ) |
+            Q(
+                (Q(drug_name_1__icontains=drug2) | Q(generic_name_1__icontains=drug2)) &
+                (Q(drug_name_2__icontains=drug1) | Q(generic_name_2__icontains=drug1))
+            ),
+            is_active=True
+        ).order_by('-severity'))
+
+
+@skipUnless(PLUGIN_INSTALLED, 'drug interactions plugin is not installed')
+class InteractionIndexQueryTest(InteractionTableMixin, TestCase):
+    """Test the index against the DrugInteraction table."""
+
+    def test_find_between_matches_query(self):
+        """Test per-pair results match the query and its -severity order."""
+        index = interaction_index.get_interaction_index()
+
+        for drug1, drug2 in (('Drug001', 'Drug002'), ('Generic 003', 'drug004'), ('Drug00', 'Drug01')):
+            with self.subTest(pair=(drug1, drug2)):
+                found = index.find_between(drug1, drug2)
+                expected = self.legacy_find_between(drug1, drug2)
+                # Rows of equal severity have no defined order in the query
+                self.assertEqual({i.pk for i in found}, {i.pk for i in expected})
+                self.assertEqual([i.severity for i in found], [i.severity for i in expected])
+
+
+@tag('benchmark')
+@skipUnless(PLUGIN_INSTALLED, 'drug interactions plugin is not installed')
+class InteractionIndexBenchmarkTest(InteractionTableMixin, TestCase):
+    """
+    Benchmark interaction checks against the per-pair queries.
+
+    Timing based, so tagged; slow CI runners can skip them with
+    ``--exclude-tag benchmark``.
+    """
+
+    def test_check_runs_without_queries(self):
+        """Test checks of 5, 20 and 50 drugs make no queries once the index is built."""
+        index = interaction_index.get_interaction_index()
+
+        for size in (5, 20, 50):
+            medications = [f'Drug{number:03d}' for number in range(size)]
+
+            with CaptureQueriesContext(connection) as legacy_queries:
+                started = time.perf_counter()
+                expected = [
+                    interaction
+                    for i, med1 in enumerate(medications)
+                    for med2 in medications[i + 1:]
+                    for interaction in self.legacy_find_between(med1, med2)
+                ]
+                legacy_seconds = time.perf_counter() - started
+
+            with self.assertNumQueries(0):
+                started = time.perf_counter()
+                found = interaction_index.get_interaction_index().check(medications)
+                index_seconds = time.perf_counter() - started
+
+            self.assertIs(interaction_index.get_interaction_index(), index)
+            self.assertEqual(sorted(i.pk for i in found), sorted(i.pk for i in expected))
+            print(
+                f"\n{size} drugs: {len(legacy_queries)} queries / {legacy_seconds * 1000:.1f} ms "
+                f"-> 0 queries / {index_seconds * 1000:.2f} ms"
+            )
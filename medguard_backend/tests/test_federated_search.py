@@ -0,0 +1,219 @@
+"""
+Tests for the federated site search in MedGuard SA.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from wagtail.coreutils import get_supported_content_language_variant
+from wagtail.models import Locale, Page
+
+from medguard_notifications.models import Notification, UserNotification
+from medications.models import Medication
+from search.federated import (
+    FederatedSearch, MedicationSearchSource, NotificationSearchSource, PageSearchSource,
+    SearchHit, SearchSource, decode_cursor, encode_cursor
+)
+
+User = get_user_model()
+
+
+class StaticSearchSource(SearchSource):
+    """In-memory source recording how many rows each fetch reads."""
+
+    def __init__(self, name, scores):
+        self.name = name
+        self.hits = [
+            SearchHit(source=name, score=score, title=f"{name}-{index}", url=None, object=None)
+            for index, score in enumerate(sorted(scores, reverse=True))
+        ]
+        self.rows_read = []
+
+    def fetch(self, query, offset, limit, request=None):
+        rows = self.hits[offset:offset + limit]
+        self.rows_read.append(len(rows))
+        return rows
+
+
+class FederatedMergeTest(SimpleTestCase):
+    """Test merging ranked sources page by page."""
+
+    def _walk(self, engine):
+        pages = []
+        result = engine.search('q')
+        pages.append(result)
+        while result.has_next():
+            result = engine.search('q', cursor=result.next_cursor)
+            pages.append(result)
+        return pages
+
+    def test_cursor_pages_match_global_ranking(self):
+        """Test walking the cursor yields every hit once, in score order."""
+        first = StaticSearchSource('a', [0.9, 0.7, 0.5, 0.3, 0.1, 0.05])
+        second = StaticSearchSource('b', [0.8, 0.6, 0.4])
+        engine = FederatedSearch(sources=[first, second], per_page=4)
+
+        pages = self._walk(engine)
+        titles = [hit.title for page in pages for hit in page]
+        scores = [hit.score for page in pages for hit in page]
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(len(titles), 9)
+        self.assertEqual(len(set(titles)), 9)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+
+    def test_each_page_reads_at_most_page_size_per_source(self):
+        """Test memory per request is bounded by the page size."""
+        big = StaticSearchSource('big', [index / 1000 for index in range(1000)])
+        engine = FederatedSearch(sources=[big], per_page=10)
+
+        pages = self._walk(engine)
+
+        self.assertEqual(len(pages), 100)
+        self.assertLessEqual(max(big.rows_read), 11)
+
+    def test_page_number_seek_matches_cursor(self):
+        """Test jumping to page N returns the same hits as following the cursor."""
+        engine = FederatedSearch(
+            sources=[StaticSearchSource('a', [0.9, 0.6, 0.3, 0.2]),
+                     StaticSearchSource('b', [0.8, 0.7, 0.1])],
+            per_page=2
+        )
+        walked = self._walk(engine)
+        for number, page in enumerate(walked, start=1):
+            seeked = engine.search('q', page=number)
+            self.assertEqual([hit.title for hit in seeked], [hit.title for hit in page])
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        """Test a tampered cursor is ignored."""
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertEqual(decode_cursor(encode_cursor({'a': 3, 'b': None}, 2)),
+                         {'offsets': {'a': 3, 'b': None}, 'page': 2})
+
+
+class MedicationSearchSourceTest(TestCase):
+    """Test the database-ranked medication source."""
+
+    def setUp(self):
+        """Set up test data."""
+        for index in range(15):
+            Medication.objects.create(
+                name=f"Metformin {index}",
+                generic_name='Metformin',
+                medication_type='tablet',
+                strength='500mg',
+                dosage_unit='mg',
+                pill_count=30
+            )
+        Medication.objects.create(
+            name='Glucophage',
+            generic_name='Metformin',
+            medication_type='tablet',
+            strength='500mg',
+            dosage_unit='mg',
+            pill_count=30
+        )
+
+    def test_scores_and_limit_are_pushed_down(self):
+        """Test the source ranks in SQL and reads only the requested slice."""
+        source = MedicationSearchSource()
+
+        with self.assertNumQueries(1):
+            hits = source.fetch('metformin', 10, 6)
+
+        self.assertEqual(len(hits), 6)
+        self.assertEqual(hits[-1].title, 'Glucophage')
+        self.assertEqual(hits[-1].score, 0.6)
+        self.assertEqual(hits[0].score, 0.9)
+
+    def test_federated_pages_do_not_overlap(self):
+        """Test paging medications through the engine."""
+        engine = FederatedSearch(sources=[MedicationSearchSource], per_page=10)
+        first = engine.search('metformin')
+        second = engine.search('metformin', cursor=first.next_cursor)
+
+        names = [hit.title for hit in first] + [hit.title for hit in second]
+        self.assertEqual(len(names), 16)
+        self.assertEqual(len(set(names)), 16)
+        self.assertFalse(second.has_next())
+
+
+class NotificationSearchSourceTest(TestCase):
+    """Test notifications are only searchable by the users they are for."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.alice = User.objects.create_user(username='alice', password='pass12345', user_type='PATIENT')
+        self.bob = User.objects.create_user(username='bob', password='pass12345', user_type='PATIENT')
+        self.doctor = User.objects.create_user(
+            username='doctor', password='pass12345', user_type='HEALTHCARE_PROVIDER'
+        )
+
+        self.reminder = Notification.objects.create(
+            title='Medication Reminder',
+            content='Time to take Warfarin - 5mg',
+            notification_type=Notification.NotificationType.MEDICATION,
+            status=Notification.Status.ACTIVE,
+        )
+        self.reminder.target_users.add(self.alice)
+        UserNotification.objects.create(user=self.alice, notification=self.reminder)
+
+        self.broadcast = Notification.objects.create(
+            title='Warfarin recall notice',
+            content='Batch W-12 of Warfarin has been recalled',
+            status=Notification.Status.ACTIVE,
+            target_user_types=['PATIENT'],
+        )
+
+        self.factory = RequestFactory()
+
+    def _search(self, user, query):
+        request = self.factory.get('/search/', {'query': query})
+        request.user = user
+        engine = FederatedSearch(sources=[NotificationSearchSource], per_page=10)
+        return [hit.object for hit in engine.search(query, request=request)]
+
+    def test_owner_finds_own_reminder(self):
+        """Test a user can search the text of their own reminder."""
+        self.assertIn(self.reminder, self._search(self.alice, 'Time to take Warfarin'))
+
+    def test_other_user_cannot_find_reminder(self):
+        """Test another patient gets no hit for text in someone else's reminder."""
+        self.assertEqual(self._search(self.bob, 'Time to take Warfarin'), [])
+
+    def test_broadcasts_follow_target_user_types(self):
+        """Test broadcasts reach only the targeted user types."""
+        self.assertEqual(self._search(self.bob, 'recalled'), [self.broadcast])
+        self.assertEqual(self._search(self.doctor, 'recalled'), [])
+        self.assertEqual(self._search(self.doctor, 'Warfarin'), [])
+
+    def test_no_results_without_request(self):
+        """Test anonymous or request-less searches see no notifications."""
+        self.assertEqual(NotificationSearchSource().fetch('Warfarin', 0, 10), [])
+
+
+@override_settings(WAGTAILSEARCH_BACKENDS={'default': {'BACKEND': 'wagtail.search.backends.database.fallback'}})
+class PageSearchSourceTest(TestCase):
+    """Test seeking through pages reads scores only."""
+
+    def setUp(self):
+        """Set up test data."""
+        Locale.objects.get_or_create(language_code=get_supported_content_language_variant(settings.LANGUAGE_CODE))
+        root = Page.get_first_root_node() or Page.add_root(title='Root', slug='root')
+        for index in range(5):
+            root.add_child(instance=Page(title=f'Panado dosage guide {index}', slug=f'panado-{index}'))
+
+    def test_scores_do_not_load_pages(self):
+        """Test scores match fetch without selecting page content."""
+        source = PageSearchSource()
+
+        with CaptureQueriesContext(connection) as context:
+            scores = source.scores('Panado', 3)
+
+        self.assertEqual(scores, [hit.score for hit in source.fetch('Panado', 0, 3)])
+        selected = [query['sql'].split(' FROM ')[0] for query in context.captured_queries]
+        self.assertTrue(selected)
+        self.assertFalse(any('"title"' in columns for columns in selected))
@@ -0,0 +1,78 @@
+"""
+Tests for batch prescription OCR.
+
+One image whose OCR result cannot be written must not lose the results of
+the other images in its chunk. The task writes to the plugin's tables, so
+the tests are skipped unless the prescription OCR plugin is installed.
+"""
+
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+PLUGIN_INSTALLED = any(apps.is_installed(name) for name in (
+    'plugins.wagtail_prescription_ocr', 'medguard_backend.plugins.wagtail_prescription_ocr'
+))
+
+User = get_user_model()
+
+
+def ocr_result(medication_name, **parsed_data):
+    return {
+        'success': True,
+        'extracted_text': f'{medication_name} 500mg',
+        'confidence_score': 0.9,
+        'parsed_data': {'medication_name': medication_name, **parsed_data},
+    }
+
+
+@skipUnless(PLUGIN_INSTALLED, 'prescription OCR plugin is not installed')
+class PrescriptionOCRBatchTest(TestCase):
+    """Test per-image error isolation in process_prescription_ocr_batch."""
+
+    def setUp(self):
+        """Set up test data."""
+        from wagtail.images.models import Image
+        from wagtail.images.tests.utils import get_test_image_file
+
+        self.user = User.objects.create_user(username='pharmacist', password='testpass123')
+        self.images = [
+            Image.objects.create(title=f'Prescription {number}', file=get_test_image_file())
+            for number in range(3)
+        ]
+        self.image_ids = [image.id for image in self.images]
+
+    def _process(self, ocr_results):
+        from plugins.wagtail_prescription_ocr.services import PrescriptionOCRService
+        from plugins.wagtail_prescription_ocr.tasks import process_prescription_ocr_batch
+
+        with mock.patch.object(PrescriptionOCRService, 'process_prescription_images', return_value=ocr_results):
+            return process_prescription_ocr_batch.apply(args=[self.image_ids, self.user.id]).get()
+
+    def test_bad_result_does_not_discard_the_chunk(self):
+        """Test a result that fails to insert is reported and the others are written."""
+        from plugins.wagtail_prescription_ocr.models import PrescriptionOCRResult
+
+        results = self._process([
+            ocr_result('Metformin'),
+            ocr_result('Lipitor', prescription_date='not a date'),
+            ocr_result('Panado'),
+        ])
+
+        self.assertEqual([result['success'] for result in results], [True, False, True])
+        self.assertEqual(results[1]['image_id'], self.image_ids[1])
+        self.assertEqual(
+            set(PrescriptionOCRResult.objects.values_list('medication_name', flat=True)), {'Metformin', 'Panado'}
+        )
+
+    def test_unknown_parsed_field_fails_only_its_image(self):
+        """Test parsed data the model cannot take fails that image alone."""
+        results = self._process([
+            ocr_result('Metformin'),
+            ocr_result('Lipitor'),
+            ocr_result('Panado', not_a_field='x'),
+        ])
+
+        self.assertEqual([result['success'] for result in results], [True, True, False])
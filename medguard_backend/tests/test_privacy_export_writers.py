@@ -0,0 +1,157 @@
+"""
+Tests for the streaming data export writers in MedGuard SA.
+
+Each format is written from a few records, parsed back, and its reported
+SHA-256 and size are checked against the file on disk, since deletion
+backups store that hash as their integrity check.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+from django.test import SimpleTestCase
+
+from privacy.export_writers import (
+    EXPORT_WRITERS, write_csv_export, write_html_export, write_json_export, write_ndjson_export,
+    write_xml_export
+)
+
+METADATA = {
+    'export_request_id': 'EXP-1',
+    'generated_at': '2025-08-16T10:00:00+02:00',
+    'date_range': {'start': None, 'end': None},
+}
+PATIENT_INFO = {'id': 7, 'username': 'thandi', 'email': 'thandi@example.com'}
+MEDICATIONS = [
+    {'id': '1', 'name': 'Panado', 'notes': 'Take with food & water'},
+    {'id': '2', 'name': 'Lipitor', 'notes': '<b>Evening</b>, "as prescribed"'},
+    {'id': '3', 'name': 'Glucophage', 'notes': 'Ûnicode ✓'},
+]
+SCHEDULES = [{'id': '9', 'timing': 'morning'}]
+
+
+class ExportWritersTest(SimpleTestCase):
+    """Test each export format round-trips and reports its hash and size."""
+
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_dir, ignore_errors=True)
+        self.consumed = []
+
+    def model_exports(self):
+        """Yield the test models, recording each record as the writer reads it."""
+        for model_path, model_name, records in (
+            ('medications.medication', 'medication', MEDICATIONS),
+            ('medications.medicationschedule', 'medicationschedule', SCHEDULES),
+        ):
+            yield model_path, model_name, self.track(records)
+
+    def track(self, records):
+        for record in records:
+            self.consumed.append(record)
+            yield record
+
+    def write(self, writer, extension):
+        file_path = os.path.join(self.export_dir, f'export.{extension}')
+        file_hash, file_size = writer(file_path, METADATA, PATIENT_INFO, self.model_exports())
+
+        with open(file_path, 'rb') as export_file:
+            data = export_file.read()
+        self.assertEqual(file_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(file_size, len(data))
+        # Every record is read exactly once, which is what total_records counts
+        self.assertEqual(self.consumed, MEDICATIONS + SCHEDULES)
+        return data
+
+    def test_json(self):
+        """Test the JSON layout parses back with records and counts."""
+        export = json.loads(self.write(write_json_export, 'json'))
+
+        self.assertEqual(export['metadata'], METADATA)
+        self.assertEqual(export['patient_info'], PATIENT_INFO)
+        medications = export['models']['medications.medication']
+        self.assertEqual(medications['model_name'], 'medication')
+        self.assertEqual(medications['records'], MEDICATIONS)
+        self.assertEqual(medications['count'], 3)
+        self.assertEqual(export['models']['medications.medicationschedule']['count'], 1)
+
+    def test_json_without_models(self):
+        """Test an export with no model records is still valid JSON."""
+        file_path = os.path.join(self.export_dir, 'empty.json')
+        write_json_export(file_path, METADATA, PATIENT_INFO, iter(()))
+
+        with open(file_path, encoding='utf-8') as export_file:
+            self.assertEqual(json.load(export_file)['models'], {})
+
+    def test_ndjson(self):
+        """Test one JSON document per line, with a count line after each model."""
+        lines = [json.loads(line) for line in self.write(write_ndjson_export, 'ndjson').decode().splitlines()]
+
+        self.assertEqual(lines[0], {'type': 'metadata', 'data': METADATA})
+        self.assertEqual(lines[1], {'type': 'patient_info', 'data': PATIENT_INFO})
+        records = [line['data'] for line in lines if line['type'] == 'record']
+        self.assertEqual(records, MEDICATIONS + SCHEDULES)
+        counts = {line['model']: line['count'] for line in lines if line['type'] == 'model'}
+        self.assertEqual(counts, {'medications.medication': 3, 'medications.medicationschedule': 1})
+        self.assertEqual(lines[5], {
+            'type': 'model', 'model': 'medications.medication', 'model_name': 'medication', 'count': 3
+        })
+
+    def test_csv_zip(self):
+        """Test the streamed ZIP is valid and each CSV entry parses back."""
+        with zipfile.ZipFile(io.BytesIO(self.write(write_csv_export, 'zip'))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(
+                archive.namelist(),
+                ['metadata.csv', 'patient_info.csv', 'medication.csv', 'medicationschedule.csv']
+            )
+
+            def rows(name):
+                return list(csv.reader(io.StringIO(archive.read(name).decode('utf-8'), newline='')))
+
+            self.assertIn(['date_range.start', ''], rows('metadata.csv'))
+            self.assertEqual(rows('patient_info.csv'), [['id', 'username', 'email'], ['7', 'thandi', 'thandi@example.com']])
+            self.assertEqual(
+                rows('medication.csv'),
+                [['id', 'name', 'notes']] + [list(record.values()) for record in MEDICATIONS]
+            )
+
+    def test_xml(self):
+        """Test the XML document parses back with records and counts."""
+        root = ElementTree.fromstring(self.write(write_xml_export, 'xml'))
+
+        self.assertEqual(root.findtext('Metadata/export_request_id'), 'EXP-1')
+        self.assertEqual(root.findtext('PatientInfo/username'), 'thandi')
+        models = root.findall('Models/Model')
+        self.assertEqual([model.get('name') for model in models], ['medication', 'medicationschedule'])
+        records = [
+            {child.tag: child.text or '' for child in record}
+            for record in models[0].findall('Records/Record')
+        ]
+        self.assertEqual(records, MEDICATIONS)
+        self.assertEqual(models[0].findtext('Count'), '3')
+
+    def test_html(self):
+        """Test the HTML report escapes values and reports counts."""
+        html = self.write(write_html_export, 'html').decode('utf-8')
+
+        self.assertTrue(html.startswith('<!DOCTYPE html>'))
+        self.assertTrue(html.endswith('</body></html>'))
+        self.assertIn('<td>&lt;b&gt;Evening&lt;/b&gt;, &quot;as prescribed&quot;</td>', html)
+        self.assertNotIn('<b>Evening</b>', html)
+        self.assertIn('<p>3 records</p>', html)
+        self.assertIn('<p>1 records</p>', html)
+
+    def test_every_format_has_a_writer(self):
+        """Test the registry covers each export format."""
+        self.assertEqual(
+            {name: extension for name, (extension, _writer) in EXPORT_WRITERS.items()},
+            {'json': 'json', 'ndjson': 'ndjson', 'csv': 'zip', 'xml': 'xml', 'html': 'html'}
+        )
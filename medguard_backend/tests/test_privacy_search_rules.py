@@ -0,0 +1,260 @@
+"""
+Tests for privacy rule evaluation in the privacy-aware search.
+
+Rule compilation and the data-age filter run everywhere. The end-to-end
+cases need the privacy models (consent records, rules and the search
+audit log), so they are skipped unless the ``privacy`` app is installed.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from medications.models import Medication, MedicationSchedule
+from privacy.search_rules import compile_search_rules, condition_q
+
+User = get_user_model()
+
+SCHEDULE_PATH = 'medications.medicationschedule'
+
+
+def make_rule(name, restriction_level='no_access', affected_models=(SCHEDULE_PATH,),
+              required_consent_types=(), time_restrictions=None, restricted_fields=()):
+    """Build a stand-in with the attributes compile_search_rules reads from a SearchPrivacyRule."""
+    return SimpleNamespace(
+        name=name,
+        restriction_level=restriction_level,
+        required_consent_types=list(required_consent_types),
+        time_restrictions=time_restrictions or {},
+        restricted_fields=list(restricted_fields),
+        anonymization_profile_id=None,
+        applies_to_model=lambda model_path: model_path in affected_models or '*' in affected_models,
+        applies_to_user=lambda user: True,
+    )
+
+
+def condition(max_age_days=None, consent_types=()):
+    return {
+        'rule': 'test', 'consent_types': list(consent_types),
+        'max_age_days': max_age_days, 'business_hours_only': False,
+    }
+
+
+class CompileSearchRulesTest(SimpleTestCase):
+    """Test which rules block a model and which only filter its rows."""
+
+    def test_unconditional_no_access_blocks_the_model(self):
+        """Test a no_access rule without conditions blocks every row."""
+        compiled = compile_search_rules([make_rule('Block schedules')], SCHEDULE_PATH, user=None)
+
+        self.assertEqual(compiled.blocked_by, ['Block schedules'])
+        self.assertEqual(compiled.conditions, [])
+        self.assertTrue(compiled.access_restrictions)
+
+    def test_conditional_no_access_filters_rows(self):
+        """Test consent and data-age rules become row conditions, not blocks."""
+        compiled = compile_search_rules([
+            make_rule('Consent', required_consent_types=['data_processing']),
+            make_rule('Recent only', time_restrictions={'max_age_days': 30}),
+        ], SCHEDULE_PATH, user=None)
+
+        self.assertEqual(compiled.blocked_by, [])
+        self.assertEqual(
+            [(c['rule'], c['consent_types'], c['max_age_days']) for c in compiled.conditions],
+            [('Consent', ['data_processing'], None), ('Recent only', [], 30)]
+        )
+
+    def test_anonymized_only_rules(self):
+        """Test unconditional anonymized_only rules anonymize everything, conditional ones filter rows."""
+        unconditional = compile_search_rules(
+            [make_rule('Anonymize', restriction_level='anonymized_only')], SCHEDULE_PATH, user=None
+        )
+        conditional = compile_search_rules([
+            make_rule('Anonymize without consent', restriction_level='anonymized_only',
+                      required_consent_types=['research'])
+        ], SCHEDULE_PATH, user=None)
+
+        self.assertEqual((unconditional.anonymize, unconditional.anonymize_conditions), (True, []))
+        self.assertFalse(conditional.anonymize)
+        self.assertEqual(
+            [(c['rule'], c['consent_types']) for c in conditional.anonymize_conditions],
+            [('Anonymize without consent', ['research'])]
+        )
+        self.assertEqual((conditional.blocked_by, conditional.conditions), ([], []))
+
+    def test_rules_for_other_models_are_ignored(self):
+        """Test rules only apply to the models they name."""
+        compiled = compile_search_rules(
+            [make_rule('Block users', affected_models=('users.user',))], SCHEDULE_PATH, user=None
+        )
+
+        self.assertEqual((compiled.rule_names, compiled.blocked_by), ([], []))
+
+
+class SearchRuleFilterTest(TestCase):
+    """Test conditional rules evaluated in the query."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.patient = User.objects.create_user(username='patient', password='testpass123')
+        self.medication = Medication.objects.create(
+            name='Metformin', generic_name='Metformin', medication_type='tablet',
+            strength='500mg', dosage_unit='mg', pill_count=60
+        )
+        self.now = timezone.now()
+
+    def _create_schedule(self, age_days):
+        schedule = MedicationSchedule.objects.create(
+            patient=self.patient, medication=self.medication, timing=MedicationSchedule.Timing.MORNING,
+            dosage_amount=Decimal('1.00'), start_date=date(2025, 8, 1), instructions='Take with food'
+        )
+        MedicationSchedule.objects.filter(pk=schedule.pk).update(created_at=self.now - timedelta(days=age_days))
+        return schedule
+
+    def test_max_age_days_window(self):
+        """Test only rows inside the data-age window are accessible."""
+        recent = self._create_schedule(age_days=5)
+        edge = self._create_schedule(age_days=30)
+        old = self._create_schedule(age_days=45)
+
+        accessible = set(MedicationSchedule.objects.filter(
+            condition_q(MedicationSchedule, condition(max_age_days=30), self.now)
+        ))
+
+        self.assertEqual(accessible, {recent, edge})
+        self.assertNotIn(old, accessible)
+
+    def test_no_conditions_allow_everything(self):
+        """Test a condition without age or consent limits filters nothing."""
+        self._create_schedule(age_days=400)
+
+        self.assertEqual(
+            MedicationSchedule.objects.filter(condition_q(MedicationSchedule, condition(), self.now)).count(), 1
+        )
+
+
+@skipUnless(apps.is_installed('privacy'), 'privacy app is not installed')
+class PrivacyAwareSearchTest(TestCase):
+    """Test consent-conditioned rules and paginated counts end to end."""
+
+    def setUp(self):
+        """Set up test data."""
+        from privacy.wagtail_privacy import ConsentCategory, PatientConsent
+
+        # Compiled rules are cached and only invalidated on commit
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.searcher = User.objects.create_user(username='doctor', password='testpass123')
+        medication = Medication.objects.create(
+            name='Metformin', generic_name='Metformin', medication_type='tablet',
+            strength='500mg', dosage_unit='mg', pill_count=60
+        )
+        category = ConsentCategory.objects.create(
+            name='Data processing', consent_type='data_processing', description='Processing',
+            purpose='Care', legal_basis='consent'
+        )
+
+        self.consenting = User.objects.create_user(username='consenting', password='testpass123')
+        self.withdrawn = User.objects.create_user(username='withdrawn', password='testpass123')
+        self.silent = User.objects.create_user(username='silent', password='testpass123')
+        PatientConsent.objects.create(patient=self.consenting, category=category, status='given')
+        PatientConsent.objects.create(patient=self.withdrawn, category=category, status='withdrawn')
+
+        # 5 accessible rows and 3 denied ones
+        for patient, count in ((self.consenting, 5), (self.withdrawn, 2), (self.silent, 1)):
+            for _index in range(count):
+                MedicationSchedule.objects.create(
+                    patient=patient, medication=medication, timing=MedicationSchedule.Timing.MORNING,
+                    dosage_amount=Decimal('1.00'), start_date=date(2025, 8, 1), instructions='Take with food'
+                )
+
+    def _create_rule(self, **kwargs):
+        from privacy.privacy_search import SearchPrivacyRule
+
+        defaults = {
+            'name': 'Schedules need consent', 'rule_type': 'consent_based_restriction',
+            'restriction_level': 'no_access', 'affected_models': [SCHEDULE_PATH],
+        }
+        defaults.update(kwargs)
+        return SearchPrivacyRule.objects.create(**defaults)
+
+    def _search(self, **kwargs):
+        from privacy.privacy_search import PrivacyAwareSearchBackend
+
+        backend = PrivacyAwareSearchBackend(self.searcher, ip_address='127.0.0.1')
+        return backend.search('with food', [MedicationSchedule], **kwargs)
+
+    def test_unconditional_rule_blocks_the_model(self):
+        """Test a no_access rule without conditions returns nothing."""
+        self._create_rule(name='Block schedules')
+
+        model_results = self._search()['results'][SCHEDULE_PATH]
+
+        self.assertEqual(model_results['results'], [])
+        self.assertEqual(model_results['privacy_summary']['blocked_by'], ['Block schedules'])
+
+    def test_consent_rule_denies_only_rows_without_valid_consent(self):
+        """Test rows of patients without given consent are denied, the rest returned."""
+        self._create_rule(required_consent_types=['data_processing'])
+
+        model_results = self._search(page_size=50)['results'][SCHEDULE_PATH]
+
+        self.assertEqual(
+            {row['patient'] for row in model_results['results']}, {str(self.consenting)}
+        )
+        self.assertEqual((model_results['accessible_count'], model_results['denied_count']), (5, 3))
+
+    def test_pagination_counts_match_audit_log(self):
+        """Test page slicing and that the audit log records the same counts."""
+        from privacy.privacy_search import SearchAuditLog
+
+        self._create_rule(required_consent_types=['data_processing'])
+
+        results = self._search(page=2, page_size=2)
+
+        self.assertEqual(len(results['results'][SCHEDULE_PATH]['results']), 2)
+        self.assertEqual(
+            (results['total_results'], results['accessible_results'], results['denied_results']), (8, 5, 3)
+        )
+        audit_log = SearchAuditLog.objects.get(searcher=self.searcher)
+        self.assertEqual(
+            (audit_log.results_count, audit_log.filtered_results_count, audit_log.access_denied_count), (8, 5, 3)
+        )
+        self.assertEqual(audit_log.privacy_rules_applied, ['Schedules need consent'])
+
+    def test_anonymized_only_rule_anonymizes_only_rows_without_consent(self):
+        """Test rows of consenting patients are returned as-is and only the rest anonymized."""
+        self._create_rule(
+            name='Anonymize without consent', restriction_level='anonymized_only',
+            required_consent_types=['data_processing']
+        )
+
+        model_results = self._search(page_size=50)['results'][SCHEDULE_PATH]
+
+        anonymized = [row for row in model_results['results'] if row.get('anonymized')]
+        plain = [row for row in model_results['results'] if not row.get('anonymized')]
+        self.assertEqual(len(anonymized), 3)
+        self.assertEqual({row['patient'] for row in plain}, {str(self.consenting)})
+        self.assertEqual(
+            (model_results['accessible_count'], model_results['anonymized_count'], model_results['denied_count']),
+            (8, 3, 0)
+        )
+
+    def test_filters_apply_before_counting(self):
+        """Test records outside the filters are neither counted nor denied."""
+        self._create_rule(required_consent_types=['data_processing'])
+
+        model_results = self._search(filters={'patient': self.withdrawn})['results'][SCHEDULE_PATH]
+
+        self.assertEqual(
+            (model_results['total_count'], model_results['accessible_count'], model_results['denied_count']),
+            (2, 0, 2)
+        )
+        self.assertFalse(model_results['count_estimated'])
@@ -0,0 +1,106 @@
+"""
+Tests for stampede-proof read-through caching in MedGuard SA.
+"""
+
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from medguard_backend.cache import read_through
+
+
+class ReadThroughCacheTest(SimpleTestCase):
+    """Test single-flight computation, early refresh and stale serving."""
+
+    def setUp(self):
+        """Start every test with an empty cache."""
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='report', delay=0.0):
+        def build():
+            self.calls += 1
+            time.sleep(delay)
+            return f"{value}-{self.calls}"
+        return build
+
+    def store_expired(self, key, value, delta=0.1):
+        cache.set(key, {'value': value, 'expires_at': time.time() - 1, 'delta': delta}, 300)
+
+    def test_concurrent_misses_compute_once(self):
+        """Test workers missing the same key at once share one computation."""
+        build = self.compute(delay=0.2)
+        results = []
+
+        def worker():
+            results.append(read_through('dashboard', build, 300))
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['report-1'] * 10)
+        self.assertEqual(read_through('dashboard', build, 300), 'report-1')
+
+    def test_gives_up_waiting_for_a_stuck_lock(self):
+        """Test a lock left behind only delays a miss by lock_wait."""
+        cache.add('dashboard:refresh_lock', 'crashed-worker', 30)
+
+        self.assertEqual(read_through('dashboard', self.compute(), 300, lock_wait=0.1), 'report-1')
+
+    def test_early_expiration(self):
+        """Test XFetch refreshes a fresh value only when the draw says so."""
+        # Ten seconds left on a value that took five to compute
+        cache.set('list', {'value': 'old', 'expires_at': time.time() + 10, 'delta': 5.0}, 300)
+
+        with mock.patch('medguard_backend.cache.read_through.random.random', return_value=0.0):
+            self.assertEqual(read_through('list', self.compute(), 300), 'old')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(read_through('list', self.compute(), 300, beta=0), 'old')
+
+        # -5 * ln(0.01) is about 23 seconds, past the expiry
+        with mock.patch('medguard_backend.cache.read_through.random.random', return_value=0.99):
+            self.assertEqual(read_through('list', self.compute(), 300), 'old')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(read_through('list', self.compute(), 300), 'report-1')
+
+    def test_stale_while_revalidate(self):
+        """Test an expired value is served while one refresh runs in the background."""
+        self.store_expired('dashboard', 'old')
+        build = self.compute(delay=0.2)
+
+        self.assertEqual(read_through('dashboard', build, 300, stale_ttl=60), 'old')
+        self.assertEqual(read_through('dashboard', build, 300, stale_ttl=60), 'old')
+
+        deadline = time.monotonic() + 5
+        while cache.has_key('dashboard:refresh_lock') and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(read_through('dashboard', build, 300, stale_ttl=60), 'report-1')
+
+    def test_expired_value_is_not_served_without_stale_ttl(self):
+        """Test an expired value is recomputed when stale serving is off."""
+        self.store_expired('dashboard', 'old')
+
+        self.assertEqual(read_through('dashboard', self.compute(), 300), 'report-1')
+
+    def test_invalidated_value_is_recomputed(self):
+        """Test values failing is_current are never served, even when stale serving is on."""
+        read_through('entry', self.compute(), 300)
+
+        value = read_through('entry', self.compute(), 300, stale_ttl=60, is_current=lambda value: False)
+        self.assertEqual(value, 'report-2')
+
+    def test_failed_computation_releases_lock(self):
+        """Test a computation error propagates and lets the next caller retry."""
+        with self.assertRaises(ValueError):
+            read_through('report', mock.Mock(side_effect=ValueError('database down')), 300)
+
+        self.assertFalse(cache.has_key('report:refresh_lock'))
+        self.assertEqual(read_through('report', self.compute(), 300), 'report-1')
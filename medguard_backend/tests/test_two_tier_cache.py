@@ -0,0 +1,125 @@
+"""
+Tests for the two-tier cache backend in MedGuard SA.
+
+Two workers are simulated with two caches that share a local-memory L2 and
+an in-memory invalidation bus but have separate in-process tiers.
+"""
+
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from medguard_backend.cache import TwoTierCache
+from medguard_backend.cache.invalidation import InMemoryInvalidationBus
+
+
+class UnavailableBus(InMemoryInvalidationBus):
+    """A bus whose subscription always fails."""
+
+    def subscribe(self, subscriber):
+        return False
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    """Test L1 reads, cross-worker invalidation and counters."""
+
+    def setUp(self):
+        """Set up two workers sharing one L2."""
+        self.location = f"two-tier-{uuid.uuid4().hex}"
+        self.worker_a = self.make_cache('worker-a')
+        self.worker_b = self.make_cache('worker-b')
+
+    def make_cache(self, name, **options):
+        return TwoTierCache(self.location, {
+            'KEY_PREFIX': 'test',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'L2_BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'INVALIDATION_BACKEND': 'medguard_backend.cache.invalidation.InMemoryInvalidationBus',
+                'L1_NAME': name,
+                **options,
+            },
+        })
+
+    def test_reads_through_to_l2_once(self):
+        """Test a value fetched from L2 is then served from L1."""
+        self.worker_a.set('medication:1', {'name': 'Panado'})
+
+        self.assertEqual(self.worker_b.get('medication:1'), {'name': 'Panado'})
+        with mock.patch.object(self.worker_b.l2, 'get') as l2_get:
+            self.assertEqual(self.worker_b.get('medication:1'), {'name': 'Panado'})
+        l2_get.assert_not_called()
+
+        stats = self.worker_b.get_stats()
+        self.assertEqual((stats['l1_hits'], stats['l1_misses'], stats['l2_hits']), (1, 1, 1))
+        self.assertIsNone(self.worker_b.get('missing'))
+        self.assertEqual(self.worker_b.get_stats()['l2_misses'], 1)
+
+    def test_writes_invalidate_other_workers(self):
+        """Test set, delete and incr on one worker are seen by the other."""
+        self.worker_a.set('stock', 10)
+        self.assertEqual(self.worker_b.get('stock'), 10)
+
+        self.worker_a.set('stock', 20)
+        self.assertEqual(self.worker_b.get('stock'), 20)
+
+        self.worker_a.incr('stock', 5)
+        self.assertEqual(self.worker_b.get('stock'), 25)
+
+        self.worker_a.delete('stock')
+        self.assertIsNone(self.worker_b.get('stock'))
+
+        self.worker_b.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.worker_a.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.worker_b.clear()
+        self.assertEqual(self.worker_a.get_many(['a', 'b']), {})
+        self.assertGreater(self.worker_a.get_stats()['invalidations_received'], 0)
+
+    def test_value_invalidated_while_fetched_is_not_kept(self):
+        """Test a fetch racing with another worker's write does not fill L1."""
+        self.worker_a.set('report', 'old')
+        l2_get = self.worker_b.l2.get
+
+        def get_racing_write(*args, **kwargs):
+            value = l2_get(*args, **kwargs)
+            self.worker_a.set('report', 'new')
+            return value
+
+        with mock.patch.object(self.worker_b.l2, 'get', side_effect=get_racing_write):
+            self.assertEqual(self.worker_b.get('report'), 'old')
+        self.assertEqual(self.worker_b.get('report'), 'new')
+
+    def test_l1_is_bounded_in_bytes(self):
+        """Test least recently used entries are evicted past the byte limit."""
+        cache = self.make_cache('small', L1_MAX_BYTES=2000, L1_MAX_ENTRY_BYTES=1000)
+        for index in range(10):
+            cache.set(f"key:{index}", 'x' * 500)
+
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['l1_bytes'], 2000)
+        self.assertEqual(stats['l1_evictions'], 10 - stats['l1_entries'])
+        self.assertEqual(cache.get('key:0'), 'x' * 500)
+        self.assertEqual(cache.get_stats()['l2_hits'], 1)
+
+        cache.set('large', 'x' * 5000)
+        self.assertEqual(cache.get('large'), 'x' * 5000)
+        self.assertEqual(cache.get_stats()['l2_hits'], 2)
+
+    def test_cached_none_is_a_hit(self):
+        """Test None values are cached rather than treated as misses."""
+        self.worker_a.set('nothing', None)
+
+        self.assertIsNone(self.worker_b.get('nothing', 'default'))
+        self.assertIsNone(self.worker_b.get('nothing', 'default'))
+        self.assertEqual(self.worker_b.get_stats()['l1_hits'], 1)
+
+    def test_l1_is_bypassed_without_invalidation(self):
+        """Test nothing is kept in L1 while the bus cannot deliver invalidations."""
+        cache = self.make_cache('unsubscribed', INVALIDATION_BACKEND='tests.test_two_tier_cache.UnavailableBus')
+        cache.set('key', 'value')
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        stats = cache.get_stats()
+        self.assertEqual((stats['l1_hits'], stats['l1_entries'], stats['l2_hits']), (0, 0, 2))